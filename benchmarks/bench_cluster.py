@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_cluster.py
+#
+# P2P Miner GUI - Benchmark de punta a punta de un cluster local.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Lanza K nodos en localhost, cada uno con un XMRig simulado (fake_xmrig.py)
+# y con peers de arranque en anillo como cluster_launcher.py. Mide el tiempo hasta que todos
+# abren el canal de control, hasta que la red queda conexa y hasta que cada tabla de peers
+# conoce a los K-1 restantes. Después origina transacciones y bloques a las tasas pedidas
+# desde nodos al azar y, con el evento 'gossip' del canal de control (marca de tiempo de la
+# primera recepción en cada nodo), calcula mensajes por segundo, latencia de propagación a
+# cada nodo y a todos, cobertura y proporción de duplicados. También registra CPU y RSS de
+# cada nodo y de su XMRig. El resultado completo se guarda en JSON, con el commit, para
+# comparar corridas.
+#
+# Uso: python benchmarks/bench_cluster.py [--nodes 5] [--duration 10] [--tx-rate 50] [--block-rate 1]
+#                                          [--engine asyncio] [--json salida.json]
+#
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from cluster_launcher import bootstrap_peers  # noqa: E402
+from node_control import CONTROL_TOKEN_ENV, ControlError, NodeControlClient  # noqa: E402
+
+NODE_SCRIPT = os.path.join(BASE_DIR, "p2p_miner_node.py")
+FAKE_XMRIG = os.path.join(BASE_DIR, "benchmarks", "fake_xmrig.py")
+WALLET = "4" * 95
+POLL_INTERVAL = 0.1
+
+
+def free_ports(count):
+    """`count` puertos libres distintos (se mantienen abiertos hasta tenerlos todos)."""
+    sockets = []
+    try:
+        for _ in range(count):
+            s = socket.socket()
+            s.bind(("127.0.0.1", 0))
+            sockets.append(s)
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+
+    def at(q):
+        return round(samples[min(int(len(samples) * q), len(samples) - 1)] * 1000, 2)
+    return {"count": len(samples), "p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99),
+            "max_ms": round(samples[-1] * 1000, 2)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def write_xmrig_wrapper(directory):
+    """El nodo espera un ejecutable: un script que lanza fake_xmrig.py con este intérprete."""
+    if os.name == "nt":
+        path = os.path.join(directory, "xmrig.cmd")
+        with open(path, "w") as f:
+            f.write(f'@"{sys.executable}" "{FAKE_XMRIG}" %*\n')
+    else:
+        path = os.path.join(directory, "xmrig")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_XMRIG}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+class BenchNode:
+    """Un nodo del benchmark: proceso, canal de control y recepciones de gossip (id -> marca de tiempo)."""
+    def __init__(self, port, control_port, process, client):
+        self.port = port
+        self.control_port = control_port
+        self.process = process
+        self.client = client
+        self.received = {}
+        self.origins = {}
+
+    def on_event(self, event, data):
+        if event != "gossip":
+            return
+        target = self.origins if data.get("origin") else self.received
+        target.setdefault(data["id"], data["ts"])
+
+    def tree(self):
+        """(proceso del nodo, procesos hijos) con psutil; hijos = XMRig simulado."""
+        try:
+            process = psutil.Process(self.process.pid)
+            return process, process.children(recursive=True)
+        except psutil.Error:
+            return None, []
+
+
+def cpu_seconds(processes):
+    total = 0.0
+    for process in processes:
+        try:
+            times = process.cpu_times()
+            total += times.user + times.system
+        except psutil.Error:
+            pass
+    return total
+
+
+def rss_mb(processes):
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return round(total / 1e6, 1)
+
+
+def request_all(nodes, cmd, args=None, timeout=10):
+    """Misma solicitud a todos los nodos en paralelo; {puerto: resultado o None si falló}."""
+    futures = {node.port: node.client.request(cmd, args, timeout) for node in nodes}
+    results = {}
+    for port, future in futures.items():
+        try:
+            results[port] = future.result(timeout + 1)
+        except (ControlError, TimeoutError, OSError):
+            results[port] = None
+    return results
+
+
+def connected_graph(nodes, peer_rows):
+    """True si todos los nodos se alcanzan entre sí por conexiones directas."""
+    edges = {node.port: set() for node in nodes}
+    for port, rows in peer_rows.items():
+        for row in rows or ():
+            if row["connected"] and row["port"] in edges:
+                edges[port].add(row["port"])
+                edges[row["port"]].add(port)
+    start = nodes[0].port
+    seen, pending = {start}, [start]
+    while pending:
+        for other in edges[pending.pop()] - seen:
+            seen.add(other)
+            pending.append(other)
+    return len(seen) == len(nodes)
+
+
+def start_nodes(loop, args, xmrig_path):
+    ports = free_ports(args.nodes * 2)
+    node_ports, control_ports = ports[:args.nodes], ports[args.nodes:]
+    env = dict(os.environ, FAKE_XMRIG_HASHRATE=str(args.hashrate), FAKE_XMRIG_INTERVAL=str(args.speed_interval))
+    nodes = []
+    for port, control_port in zip(node_ports, control_ports):
+        token = secrets.token_hex(16)
+        command = [sys.executable, NODE_SCRIPT, str(port), WALLET, "--engine", args.engine,
+                   "--peers", bootstrap_peers(node_ports, port, args.bootstrap_peers),
+                   "--control-port", str(control_port), "--xmrig-api-port", "0"]
+        command += ["--no-xmrig"] if args.no_xmrig else ["--xmrig-path", xmrig_path]
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, env=dict(env, **{CONTROL_TOKEN_ENV: token}))
+        node = BenchNode(port, control_port, process, None)
+        # El evento trae la marca de tiempo del nodo (mismo reloj: todos corren en esta máquina)
+        node.client = NodeControlClient(loop, control_port, token, events=["gossip"], on_event=node.on_event)
+        nodes.append(node)
+    return nodes
+
+
+def measure_startup(nodes, started, timeout):
+    """Segundos hasta control conectado, red conexa y tablas de peers completas (None si no se alcanzó)."""
+    result = {"control_s": None, "connected_graph_s": None, "full_mesh_s": None}
+    deadline = started + timeout
+    while time.monotonic() < deadline:
+        now = time.monotonic() - started
+        if result["control_s"] is None:
+            if all(node.client.connected for node in nodes):
+                result["control_s"] = round(now, 3)
+            else:
+                time.sleep(POLL_INTERVAL)
+                continue
+        rows = request_all(nodes, "peers")
+        if result["connected_graph_s"] is None and connected_graph(nodes, rows):
+            result["connected_graph_s"] = round(time.monotonic() - started, 3)
+        ports = {node.port for node in nodes}
+        if all(rows.get(node.port) is not None
+               and {row["port"] for row in rows[node.port]} >= ports - {node.port} for node in nodes):
+            result["full_mesh_s"] = round(time.monotonic() - started, 3)
+            return result
+        time.sleep(POLL_INTERVAL)
+    return result
+
+
+def gossip_counters(nodes):
+    """{puerto: (nuevos retransmitidos, duplicados, mensajes gossip recibidos)} desde las métricas."""
+    counters = {}
+    for port, snapshot in request_all(nodes, "metrics").items():
+        if snapshot is None:
+            continue
+        gauges = snapshot.get("gauges") or {}
+        types = snapshot.get("types") or {}
+        received = sum((types.get(t) or {}).get("messages_in", 0) for t in ("transaction", "block"))
+        counters[port] = (gauges.get("p2p_gossip_relayed_total") or 0,
+                          gauges.get("p2p_gossip_duplicates_total") or 0, received)
+    return counters
+
+
+def drive_gossip(nodes, args):
+    """Origina gossip a las tasas pedidas durante args.duration; devuelve [(msg_id, tipo, nodo de origen)]."""
+    schedule = []
+    for msg_type, rate in (("transaction", args.tx_rate), ("block", args.block_rate)):
+        if rate > 0:
+            schedule += [(i / rate, msg_type) for i in range(int(args.duration * rate))]
+    schedule.sort()
+    payload = secrets.token_hex(max(args.payload_size // 2, 1))
+    pending = []
+    started = time.monotonic()
+    for seq, (offset, msg_type) in enumerate(schedule):
+        delay = started + offset - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        origin = random.choice(nodes)
+        if msg_type == "transaction":
+            command = "send_transaction " + json.dumps({"seq": seq, "payload": payload})
+        else:
+            command = "send_block " + json.dumps({"index": seq, "payload": payload})
+        pending.append((origin, msg_type, origin.client.request("command", {"command": command})))
+    sent = []
+    for origin, msg_type, future in pending:
+        try:
+            sent.append((future.result(30)["msg_id"], msg_type, origin))
+        except (ControlError, TimeoutError, KeyError, TypeError):
+            pass
+    return sent, time.monotonic() - started
+
+
+def propagation_report(nodes, sent, elapsed):
+    per_node, to_all = [], []
+    deliveries = complete = 0
+    by_type = {}
+    for msg_id, msg_type, origin in sent:
+        origin_ts = origin.origins.get(msg_id)
+        by_type[msg_type] = by_type.get(msg_type, 0) + 1
+        if origin_ts is None:
+            continue
+        latencies = [node.received[msg_id] - origin_ts for node in nodes
+                     if node is not origin and msg_id in node.received]
+        deliveries += len(latencies)
+        per_node += latencies
+        if len(latencies) == len(nodes) - 1:
+            complete += 1
+            if latencies:
+                to_all.append(max(latencies))
+    expected = len(sent) * (len(nodes) - 1)
+    return {
+        "sent": len(sent),
+        "sent_by_type": by_type,
+        "sent_per_s": round(len(sent) / elapsed, 1) if elapsed else None,
+        "deliveries": deliveries,
+        "deliveries_per_s": round(deliveries / elapsed, 1) if elapsed else None,
+        "coverage": round(deliveries / expected, 4) if expected else None,
+        "complete_messages": complete,
+        "latency_per_node": percentiles(per_node),
+        "latency_to_all": percentiles(to_all),
+    }
+
+
+def stop_nodes(nodes, timeout=10):
+    for node in nodes:
+        try:
+            node.client.request("command", {"command": "stop"})
+        except RuntimeError: # Loop ya detenido
+            pass
+    deadline = time.monotonic() + timeout
+    for node in nodes:
+        _, children = node.tree()
+        try:
+            node.process.wait(max(deadline - time.monotonic(), 0.1))
+        except subprocess.TimeoutExpired:
+            node.process.kill()
+            node.process.wait()
+        for child in children:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+        node.client.close()
+
+
+def run(args):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    wrapper_dir = tempfile.mkdtemp(prefix="fake_xmrig_")
+    nodes = []
+    try:
+        started = time.monotonic()
+        nodes = start_nodes(loop, args, write_xmrig_wrapper(wrapper_dir))
+        startup = measure_startup(nodes, started, args.mesh_timeout)
+        print(f"Arranque de {len(nodes)} nodos: " + ", ".join(
+            f"{name} {'no alcanzado' if startup[key] is None else str(startup[key]) + 's'}"
+            for name, key in (("control", "control_s"), ("red conexa", "connected_graph_s"),
+                              ("malla completa", "full_mesh_s"))))
+        if startup["control_s"] is None:
+            raise RuntimeError("no todos los nodos abrieron el canal de control")
+
+        trees = {node.port: node.tree() for node in nodes}
+        before_counters = gossip_counters(nodes)
+        before_cpu = {port: (cpu_seconds([p] if p else []), cpu_seconds(children))
+                      for port, (p, children) in trees.items()}
+        sent, elapsed = drive_gossip(nodes, args)
+        time.sleep(args.settle) # Las últimas recepciones
+        window = elapsed + args.settle
+        after_counters = gossip_counters(nodes)
+        statuses = request_all(nodes, "status")
+
+        gossip = propagation_report(nodes, sent, elapsed)
+        relayed = duplicates = wire_in = 0
+        for port, (relayed_after, duplicates_after, wire_after) in after_counters.items():
+            relayed_before, duplicates_before, wire_before = before_counters.get(port, (0, 0, 0))
+            relayed += relayed_after - relayed_before
+            duplicates += duplicates_after - duplicates_before
+            wire_in += wire_after - wire_before
+        gossip["wire_messages_in"] = wire_in
+        gossip["wire_messages_per_s"] = round(wire_in / window, 1)
+        gossip["duplicates"] = duplicates
+        gossip["duplicate_ratio"] = round(duplicates / (relayed + duplicates), 4) if relayed + duplicates else None
+
+        per_node = []
+        for node in nodes:
+            process, children = trees[node.port]
+            node_cpu, xmrig_cpu = before_cpu[node.port]
+            status = statuses.get(node.port) or {}
+            per_node.append({
+                "port": node.port,
+                "cpu_percent": round((cpu_seconds([process] if process else []) - node_cpu) / window * 100, 1),
+                "rss_mb": rss_mb([process] if process else []),
+                "xmrig_cpu_percent": round((cpu_seconds(children) - xmrig_cpu) / window * 100, 1),
+                "xmrig_rss_mb": rss_mb(children),
+                "xmrig": (status.get("xmrig") or {}).get("state"),
+                "hashrate": (status.get("hashrate") or {}).get("hashrate"),
+                "peers": status.get("peers"),
+            })
+        return {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": {"python": platform.python_version(), "system": platform.platform(),
+                         "cpus": os.cpu_count()},
+            "params": {key: value for key, value in vars(args).items() if key != "json"},
+            "startup": startup,
+            "gossip": gossip,
+            "nodes": per_node,
+        }
+    finally:
+        stop_nodes(nodes)
+        loop.call_soon_threadsafe(loop.stop)
+        shutil.rmtree(wrapper_dir, ignore_errors=True)
+
+
+def print_report(result):
+    g = result["gossip"]
+    print(f"Gossip: {g['sent']} originados ({g['sent_per_s']}/s), {g['deliveries']} entregas "
+          f"({g['deliveries_per_s']}/s), cobertura {g['coverage']}, {g['wire_messages_per_s']} mensajes/s en la red, "
+          f"duplicados {g['duplicate_ratio']}")
+    for name, key in (("a cada nodo", "latency_per_node"), ("a todos", "latency_to_all")):
+        p = g[key]
+        if p:
+            print(f"Latencia {name}: p50 {p['p50_ms']}ms, p95 {p['p95_ms']}ms, p99 {p['p99_ms']}ms, "
+                  f"máx {p['max_ms']}ms ({p['count']} muestras)")
+    header = f"{'nodo':>6} {'CPU %':>7} {'RSS MB':>7} {'XMRig CPU %':>12} {'XMRig MB':>9} {'H/s':>8} {'peers':>6}"
+    print(header)
+    print("-" * len(header))
+    for n in result["nodes"]:
+        peers = (n["peers"] or {}).get("connected", "?")
+        hashrate = "n/a" if n["hashrate"] is None else f"{n['hashrate']:.0f}"
+        print(f"{n['port']:>6} {n['cpu_percent']:>7} {n['rss_mb']:>7} {n['xmrig_cpu_percent']:>12} "
+              f"{n['xmrig_rss_mb']:>9} {hashrate:>8} {peers:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta de un cluster local de nodos.")
+    parser.add_argument("--nodes", type=int, default=5, help="Cantidad de nodos (K)")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="asyncio")
+    parser.add_argument("--bootstrap-peers", type=int, default=3, help="Peers de arranque de cada nodo (anillo)")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos de gossip")
+    parser.add_argument("--tx-rate", type=float, default=50, help="Transacciones originadas por segundo (total)")
+    parser.add_argument("--block-rate", type=float, default=1, help="Bloques originados por segundo (total)")
+    parser.add_argument("--payload-size", type=int, default=256, help="Bytes de datos de cada mensaje")
+    parser.add_argument("--settle", type=float, default=2, help="Espera final para las últimas recepciones")
+    parser.add_argument("--mesh-timeout", type=float, default=60,
+                        help="Plazo para que las tablas de peers se completen al arrancar")
+    parser.add_argument("--hashrate", type=float, default=1500, help="Hashrate medio del XMRig simulado")
+    parser.add_argument("--speed-interval", type=float, default=1, help="Segundos entre líneas 'speed' del XMRig simulado")
+    parser.add_argument("--no-xmrig", action="store_true", help="Sin XMRig simulado (solo la red)")
+    parser.add_argument("--json", help="Guardar el resultado en este archivo JSON")
+    args = parser.parse_args()
+    if args.nodes < 2:
+        parser.error("hacen falta al menos 2 nodos")
+
+    result = run(args)
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_codec.py
+#
+# P2P Miner GUI - Microbenchmark de las codificaciones de mensajes P2P.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Para cada tipo de mensaje (MSG_TYPE_*) con datos representativos, mide
+# el tiempo de codificación y decodificación y el tamaño en bytes con JSON y con el
+# codec binario negociado en el handshake.
+#
+# Uso: python benchmarks/bench_codec.py [--iterations 20000] [--json salida.json]
+#
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from p2p_miner_node import (MessageCodec, FRAME_HEADER, CODEC_JSON, CODEC_BINARY,  # noqa: E402
+                            MSG_TYPE_HANDSHAKE, MSG_TYPE_TRANSACTION, MSG_TYPE_BLOCK, MSG_TYPE_PEER_LIST,
+                            MSG_TYPE_REQUEST_PEERS, MSG_TYPE_POOL_INFO_REQUEST, MSG_TYPE_POOL_INFO_RESPONSE,
+                            MSG_TYPE_INTERNAL_COMMAND, MSG_TYPE_STATS_REQUEST, MSG_TYPE_STATS_RESPONSE,
+                            SUPPORTED_CODECS)
+
+WALLET = "4931PMmb9FE2LapSempngoBNYoVPxZdDt8C1bDScwhbNMcKzLw2guY5H1hxvNnRmfydJVKemEJQFdguxRK6J9hv3FHc8ABk"
+
+SAMPLES = {
+    MSG_TYPE_HANDSHAKE: ({"port": 8001, "codecs": SUPPORTED_CODECS}, None),
+    MSG_TYPE_TRANSACTION: ({"from": WALLET, "to": WALLET, "amount": 1250000000, "fee": 30000,
+                            "timestamp": 1735689600.123}, "8000-5f1c0c6e2a8b4f0f9d4b0e8f7c6a5b4d"),
+    MSG_TYPE_BLOCK: ({"index": 3120456, "timestamp": 1735689600.5, "previous_hash": "ab" * 32, "hash": "cd" * 32,
+                      "nonce": 2863311530, "transactions": [{"from": WALLET, "amount": i * 1000} for i in range(20)]},
+                     "8001-0b7e4b4e6f0c4d8e9a1b2c3d4e5f6a7b"),
+    MSG_TYPE_PEER_LIST: ([["192.168.1.%d" % i, 8000 + i] for i in range(50)], None),
+    MSG_TYPE_REQUEST_PEERS: ({}, None),
+    MSG_TYPE_POOL_INFO_REQUEST: ({"requester_port": 8000}, None),
+    MSG_TYPE_POOL_INFO_RESPONSE: ({"wallet_address": WALLET, "pool_url": "pool.supportxmr.com:443",
+                                   "hashrate": "10s/60s/15m 4620.5 4601.2 n/a H/s", "last_activity": "12:30:05",
+                                   "node_port": 8002}, None),
+    MSG_TYPE_INTERNAL_COMMAND: ({"command": "request_pool_info"}, None),
+    MSG_TYPE_STATS_REQUEST: ({"window": "1h"}, None),
+    MSG_TYPE_STATS_RESPONSE: ({"node_port": 8002, "windows": {"1h": {
+        "samples": 712, "mean": 4610.2, "min": 4501.7, "max": 4702.3, "p95": 4688.1,
+        "shares_accepted": 59, "shares_rejected": 1}}}, None),
+}
+
+
+def bench(codec, codec_name, msg_type, data, msg_id, iterations):
+    frame = codec.encode(msg_type, data, msg_id, codec_name)
+    payload = frame[FRAME_HEADER.size:]
+    assert codec.decode(payload)["data"] == json.loads(json.dumps(data)), msg_type
+    encode_s = timeit.timeit(lambda: codec.encode(msg_type, data, msg_id, codec_name), number=iterations)
+    decode_s = timeit.timeit(lambda: codec.decode(payload), number=iterations)
+    return {
+        "bytes": len(frame),
+        "encode_us": round(encode_s / iterations * 1e6, 2),
+        "decode_us": round(decode_s / iterations * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    codec = MessageCodec()
+    results = {}
+    header = f"{'tipo':<20} {'bytes json':>10} {'bytes bin':>9} {'ahorro':>7} {'enc json µs':>11} {'enc bin µs':>10} {'dec json µs':>11} {'dec bin µs':>10}"
+    print(header)
+    print("-" * len(header))
+    for msg_type, (data, msg_id) in SAMPLES.items():
+        j = bench(codec, CODEC_JSON, msg_type, data, msg_id, args.iterations)
+        b = bench(codec, CODEC_BINARY, msg_type, data, msg_id, args.iterations)
+        results[msg_type] = {CODEC_JSON: j, CODEC_BINARY: b}
+        saving = 1 - b["bytes"] / j["bytes"]
+        print(f"{msg_type:<20} {j['bytes']:>10} {b['bytes']:>9} {saving:>7.0%} {j['encode_us']:>11} "
+              f"{b['encode_us']:>10} {j['decode_us']:>11} {b['decode_us']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
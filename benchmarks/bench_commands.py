@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_commands.py
+#
+# P2P Miner GUI - Benchmark de latencia de comandos de la GUI al nodo.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Lanza un nodo (sin XMRig) con cada motor y se conecta a su canal de control
+# como lo hace la GUI. Mide la ida y vuelta de 'ping' (resuelto en el hilo del canal), de
+# 'command' (pasa por la cola del bucle principal del nodo) y el tiempo desde 'stop' hasta
+# que el proceso termina.
+#
+# Uso: python benchmarks/bench_commands.py [--iterations 50] [--engines threads asyncio] [--json salida.json]
+#
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from node_control import CONTROL_TOKEN_ENV, NodeControlClient  # noqa: E402
+
+NODE_SCRIPT = os.path.join(BASE_DIR, "p2p_miner_node.py")
+WALLET = "4" * 95
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+        "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def timed(client, cmd, args=None):
+    start = time.perf_counter()
+    client.request(cmd, args).result(30)
+    return time.perf_counter() - start
+
+
+def run_case(loop, engine, iterations):
+    port = free_port()
+    control_port = free_port()
+    token = secrets.token_hex(16)
+    node = subprocess.Popen([sys.executable, NODE_SCRIPT, str(port), WALLET, "--engine", engine, "--no-xmrig",
+                             "--peers", "", "--control-port", str(control_port)],
+                            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            env=dict(os.environ, **{CONTROL_TOKEN_ENV: token}))
+    client = NodeControlClient(loop, control_port, token, events=False)
+    try:
+        deadline = time.monotonic() + 15
+        while not client.connected:
+            if time.monotonic() > deadline:
+                raise RuntimeError("el nodo no abrió el canal de control")
+            time.sleep(0.05)
+        ping, command = [], []
+        for _ in range(iterations):
+            # Pausa al azar entre comandos, como los clics de un usuario (no alineada con el bucle del nodo)
+            time.sleep(random.uniform(0, 0.05))
+            ping.append(timed(client, "ping"))
+            command.append(timed(client, "command", {"command": "gossip_stats"}))
+        start = time.perf_counter()
+        client.request("command", {"command": "stop"})
+        node.wait(timeout=30)
+        stop_s = time.perf_counter() - start
+    finally:
+        client.close()
+        if node.poll() is None:
+            node.kill()
+    return {"engine": engine, "ping": percentiles(ping), "command": percentiles(command),
+            "stop_to_exit_s": round(stop_s, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--engines", nargs="+", default=["threads", "asyncio"])
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    results = []
+    header = (f"{'motor':<8} {'ping p50':>9} {'ping p95':>9} {'cmd p50':>9} {'cmd p95':>9} {'cmd máx':>9} "
+              f"{'stop→fin s':>11}")
+    print(header)
+    print("-" * len(header))
+    for engine in args.engines:
+        r = run_case(loop, engine, args.iterations)
+        results.append(r)
+        print(f"{r['engine']:<8} {r['ping']['p50_ms']:>9} {r['ping']['p95_ms']:>9} {r['command']['p50_ms']:>9} "
+              f"{r['command']['p95_ms']:>9} {r['command']['max_ms']:>9} {r['stop_to_exit_s']:>11}")
+    loop.call_soon_threadsafe(loop.stop)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_engines.py
+#
+# P2P Miner GUI - Benchmark de los motores de E/S del nodo.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Lanza un nodo (sin XMRig) con cada motor (--engine threads / asyncio),
+# abre N conexiones de peers simulados y mide latencia de ida y vuelta de
+# POOL_INFO_REQUEST, mensajes por segundo, hilos y memoria del proceso del nodo.
+#
+# Uso: python benchmarks/bench_engines.py [--connections 10 100 500] [--rounds 20] [--json salida.json]
+#
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from p2p_miner_node import (MessageCodec, MSG_TYPE_HANDSHAKE, MSG_TYPE_POOL_INFO_REQUEST,  # noqa: E402
+                            MSG_TYPE_POOL_INFO_RESPONSE)
+
+NODE_SCRIPT = os.path.join(BASE_DIR, "p2p_miner_node.py")
+WALLET = "4" * 95
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_usage(pid):
+    """Devuelve (hilos, RSS en MB, tiempo de CPU en s) del proceso del nodo."""
+    if psutil is not None:
+        p = psutil.Process(pid)
+        cpu = p.cpu_times()
+        return p.num_threads(), p.memory_info().rss / 1e6, cpu.user + cpu.system
+    # Alternativa sin psutil (solo Linux)
+    threads = rss_kb = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                threads = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return threads, rss_kb / 1e3, cpu
+
+
+async def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"el nodo no abrió el puerto {port}")
+
+
+class SimulatedPeer:
+    def __init__(self, codec, reader, writer):
+        self.codec = codec
+        self.reader = reader
+        self.writer = writer
+        self.decoder = codec.new_decoder()
+        self.pending = []
+
+    async def next_message(self, msg_type):
+        while True:
+            while self.pending:
+                message = self.codec.decode(self.pending.pop(0))
+                if message.get("type") == msg_type:
+                    return message
+            data = await self.reader.read(65536)
+            if not data:
+                raise ConnectionError("el nodo cerró la conexión")
+            self.pending.extend(self.decoder.feed(data))
+
+    async def request(self):
+        start = time.perf_counter()
+        self.writer.write(self.codec.encode(MSG_TYPE_POOL_INFO_REQUEST, {"requester_port": 0}))
+        await self.next_message(MSG_TYPE_POOL_INFO_RESPONSE)
+        return time.perf_counter() - start
+
+
+async def run_case(engine, connections, rounds):
+    port = free_port()
+    node = subprocess.Popen([sys.executable, NODE_SCRIPT, str(port), WALLET, "--engine", engine,
+                             "--no-xmrig", "--peers", ""],
+                            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    codec = MessageCodec()
+    peers = []
+    try:
+        await wait_for_port(port)
+        _, _, cpu_before = process_usage(node.pid)
+        start = time.perf_counter()
+        for i in range(connections):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(codec.encode(MSG_TYPE_HANDSHAKE, {"port": 40000 + i}))
+            peers.append(SimulatedPeer(codec, reader, writer))
+        await asyncio.gather(*(p.next_message(MSG_TYPE_HANDSHAKE) for p in peers))
+        connect_time = time.perf_counter() - start
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            latencies.extend(await asyncio.gather(*(p.request() for p in peers)))
+        elapsed = time.perf_counter() - start
+        threads, rss_mb, cpu_after = process_usage(node.pid)
+    finally:
+        for p in peers:
+            p.writer.close()
+        node.stdin.write(b"stop\n")
+        node.stdin.close()
+        try:
+            node.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            node.kill()
+
+    latencies.sort()
+    return {
+        "engine": engine,
+        "connections": connections,
+        "connect_s": round(connect_time, 3),
+        "msgs_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "threads": threads,
+        "rss_mb": round(rss_mb, 1),
+        "cpu_s": round(cpu_after - cpu_before, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--rounds", type=int, default=20, help="Solicitudes por conexión")
+    parser.add_argument("--engines", nargs="+", default=["threads", "asyncio"])
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    results = []
+    header = f"{'motor':<8} {'conex':>6} {'conexión s':>10} {'msg/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'hilos':>6} {'RSS MB':>7} {'CPU s':>6}"
+    print(header)
+    print("-" * len(header))
+    for connections in args.connections:
+        for engine in args.engines:
+            r = asyncio.run(run_case(engine, connections, args.rounds))
+            results.append(r)
+            print(f"{r['engine']:<8} {r['connections']:>6} {r['connect_s']:>10} {r['msgs_per_s']:>9} "
+                  f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['threads']:>6} {r['rss_mb']:>7} {r['cpu_s']:>6}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
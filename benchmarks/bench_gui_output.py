@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_gui_output.py
+#
+# P2P Miner GUI - Benchmark del renderizado de logs de la GUI.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Crea el controlador de la GUI (sin lanzar nodos), inyecta líneas en los
+# buffers de salida de cada nodo a un ritmo fijo (por defecto 10k líneas/s en total) y mide
+# la duración de cada tick de update_output_areas, las líneas omitidas y la memoria (RSS).
+# Con --nodes 50 mide el costo de muchos nodos con solo NODE_PANELS paneles visibles.
+# Requiere un display (en Linux sin escritorio: xvfb-run python benchmarks/bench_gui_output.py).
+#
+# Uso: python benchmarks/bench_gui_output.py [--rate 10000] [--duration 30] [--nodes 3] [--json salida.json]
+#
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil  # noqa: E402
+
+from p2p_gui_controller import (P2PGUIController, NODE_PORTS, OUTPUT_MAX_LINES,  # noqa: E402
+                                OUTPUT_MAX_LINES_PER_TICK)
+
+SAMPLE_LINE = ("[8000] XMRig: [2025-01-01 12:00:00.000]  miner    speed 10s/60s/15m 4620.5 4601.2 n/a H/s "
+               "max 4700.1 H/s\n")
+
+
+class TimedController(P2PGUIController):
+    """Controlador que registra la duración de cada tick de renderizado."""
+
+    def __init__(self, master, **kwargs):
+        self.tick_times = []
+        super().__init__(master, **kwargs)
+
+    def update_output_areas(self):
+        start = time.perf_counter()
+        super().update_output_areas()
+        self.tick_times.append(time.perf_counter() - start)
+
+    def update_pool_stats_gui(self):
+        pass # El benchmark no consulta la API del pool
+
+
+def feed_lines(app, rate, duration, stop_event):
+    """Reparte `rate` líneas por segundo entre los buffers de todos los nodos, en ráfagas de 10 ms."""
+    per_burst = max(rate // 100 // len(app.ports), 1)
+    sent = 0
+    next_burst = time.perf_counter()
+    deadline = next_burst + duration
+    while not stop_event.is_set() and time.perf_counter() < deadline:
+        for port in app.ports:
+            for _ in range(per_burst):
+                app.output_buffers[port].append("stdout", SAMPLE_LINE)
+            sent += per_burst
+        next_burst += 0.01
+        time.sleep(max(next_burst - time.perf_counter(), 0))
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=int, default=10000, help="Líneas por segundo (total entre todos los nodos)")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--nodes", type=int, default=len(NODE_PORTS), help="Cantidad de nodos de la GUI")
+    parser.add_argument("--max-lines", type=int, default=OUTPUT_MAX_LINES)
+    parser.add_argument("--max-lines-per-tick", type=int, default=OUTPUT_MAX_LINES_PER_TICK)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    log_dir = tempfile.mkdtemp(prefix="bench_gui_logs_") # El log persistente de los nodos también entra en la medición
+    app = TimedController(root, ports=[NODE_PORTS[0] + i for i in range(args.nodes)], max_lines=args.max_lines,
+                          max_lines_per_tick=args.max_lines_per_tick, debug_echo=False, log_dir=log_dir)
+    process = psutil.Process()
+    rss_start = process.memory_info().rss
+    rss_samples = []
+    stop_event = threading.Event()
+    result = {}
+
+    def feeder():
+        result["sent"] = feed_lines(app, args.rate, args.duration, stop_event)
+        root.after(0, root.quit)
+
+    def sample_rss():
+        rss_samples.append(process.memory_info().rss)
+        root.after(1000, sample_rss)
+
+    threading.Thread(target=feeder, daemon=True).start()
+    sample_rss()
+    try:
+        root.mainloop()
+    finally:
+        stop_event.set()
+
+    ticks = sorted(app.tick_times)
+    shown_lines = {panel.port: int(panel.text.index('end-1c').split('.')[0]) for panel in app.panels
+                   if panel.port is not None}
+    app.output_mux.stop()
+    app._close_log_stores()
+    root.destroy()
+    shutil.rmtree(log_dir, ignore_errors=True)
+    summary = {
+        "rate": args.rate,
+        "nodes": args.nodes,
+        "duration_s": args.duration,
+        "lines_sent": result.get("sent", 0),
+        "lines_dropped": sum(app.dropped_lines.values()),
+        "lines_in_widgets": shown_lines,
+        "ticks": len(ticks),
+        "tick_p50_ms": round(statistics.median(ticks) * 1000, 2),
+        "tick_p95_ms": round(ticks[max(int(len(ticks) * 0.95) - 1, 0)] * 1000, 2),
+        "tick_max_ms": round(ticks[-1] * 1000, 2),
+        "rss_start_mb": round(rss_start / 1e6, 1),
+        "rss_end_mb": round(rss_samples[-1] / 1e6, 1),
+        "rss_peak_mb": round(max(rss_samples) / 1e6, 1),
+    }
+    for key, value in summary.items():
+        print(f"{key:<18} {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_metrics.py
+#
+# P2P Miner GUI - Microbenchmark del costo de las métricas del nodo.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Mide el costo por llamada de los registros del camino caliente de
+# NodeMetrics (record_in, record_out, record_fan_out) y el de exportar un snapshot y el
+# texto de Prometheus, para comparar con el costo de procesar un mensaje.
+#
+# Uso: python benchmarks/bench_metrics.py [--iterations 200000] [--json salida.json]
+#
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_metrics import NodeMetrics  # noqa: E402
+from p2p_miner_node import MSG_TYPE_CODES, MSG_TYPE_TRANSACTION  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    metrics = NodeMetrics(MSG_TYPE_CODES)
+    metrics.register("p2p_peers", "Peers conectados", lambda: 8)
+    results = {}
+    for name, func, iterations in (
+            ("record_in", lambda: metrics.record_in(MSG_TYPE_TRANSACTION, 120, 0.00004), args.iterations),
+            ("record_out", lambda: metrics.record_out(MSG_TYPE_TRANSACTION, 960, 8), args.iterations),
+            ("record_fan_out", lambda: metrics.record_fan_out(8, 0.00003), args.iterations),
+            ("snapshot", metrics.snapshot, args.iterations // 100),
+            ("prometheus_text", metrics.prometheus_text, args.iterations // 100)):
+        seconds = timeit.timeit(func, number=iterations)
+        results[name] = round(seconds / iterations * 1e6, 3)
+        print(f"{name:<16} {results[name]:>9} µs/llamada")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
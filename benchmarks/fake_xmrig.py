@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# benchmarks/fake_xmrig.py
+#
+# P2P Miner GUI - XMRig simulado para benchmarks.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Imita la salida de consola de XMRig 6.x (banner, conexión al pool, trabajos,
+# shares aceptados y líneas 'speed 10s/60s/15m') sin minar ni abrir conexiones. Acepta y
+# descarta los argumentos que le pasa el nodo; el comportamiento se ajusta con variables de
+# entorno, porque la línea de comandos la arma el nodo:
+#   FAKE_XMRIG_HASHRATE  hashrate medio en H/s (por defecto 1500)
+#   FAKE_XMRIG_INTERVAL  segundos entre líneas 'speed' (por defecto 1; XMRig real usa 60)
+#   FAKE_XMRIG_EXIT_AFTER  terminar con código 1 pasados estos segundos (simula una caída)
+#   FAKE_XMRIG_STALL_AFTER  dejar de informar pasados estos segundos sin terminar (simula un cuelgue)
+#
+# Uso: python benchmarks/fake_xmrig.py [argumentos de XMRig ignorados]
+#
+
+import os
+import random
+import sys
+import time
+
+HASHRATE = float(os.environ.get("FAKE_XMRIG_HASHRATE", "1500"))
+INTERVAL = float(os.environ.get("FAKE_XMRIG_INTERVAL", "1"))
+EXIT_AFTER = float(os.environ.get("FAKE_XMRIG_EXIT_AFTER", "0")) or None
+STALL_AFTER = float(os.environ.get("FAKE_XMRIG_STALL_AFTER", "0")) or None
+SHARE_PROBABILITY = 0.2 # Probabilidad de un share aceptado en cada intervalo
+
+
+def log(tag, text):
+    now = time.time()
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)) + f".{int(now % 1 * 1000):03d}"
+    print(f"[{stamp}]  {tag:<8} {text}", flush=True)
+
+
+def option(name, default):
+    """Valor de '-o X', '--opt X' o '--opt=X' en los argumentos del nodo."""
+    args = sys.argv[1:]
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+    return default
+
+
+def main():
+    pool = option("-o", "pool.supportxmr.com:443")
+    threads = int(option("--threads", os.cpu_count() or 1))
+    print(" * ABOUT        XMRig/6.21.0 gcc/11.4.0 (simulado)", flush=True)
+    print(f" * CPU          simulado ({threads} hilos)", flush=True)
+    print(f" * POOL #1      {pool} algo auto", flush=True)
+    log("net", f"use pool {pool} 127.0.0.1")
+    log("net", f"new job from {pool} diff 120001 algo rx/0 height 3300000")
+    log("randomx", "dataset ready (1 ms)")
+    log("cpu", f"READY threads {threads}/{threads} ({threads}) huge pages 0% 0/{threads} memory 2048 KB (1 ms)")
+
+    started = time.monotonic()
+    samples = []
+    maximum = 0.0
+    accepted = 0
+    while EXIT_AFTER is None or time.monotonic() - started < EXIT_AFTER:
+        time.sleep(INTERVAL)
+        if STALL_AFTER is not None and time.monotonic() - started >= STALL_AFTER:
+            continue
+        samples.append(max(random.gauss(HASHRATE, HASHRATE * 0.03), 0.0))
+        samples = samples[-60:]
+        current = samples[-1]
+        average = sum(samples) / len(samples)
+        maximum = max(maximum, current)
+        log("miner", f"speed 10s/60s/15m {current:.1f} {average:.1f} n/a H/s max {maximum:.1f} H/s")
+        if random.random() < SHARE_PROBABILITY:
+            accepted += 1
+            log("cpu", f"accepted ({accepted}/0) diff 120001 ({random.randint(20, 80)} ms)")
+    log("cpu", "simulated crash")
+    return 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(0)
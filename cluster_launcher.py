@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+# cluster_launcher.py
+#
+# P2P Miner GUI - Lanzador sin interfaz gráfica de un cluster local de N nodos.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Lee un archivo de configuración JSON, genera los puertos de los nodos y sus
+# peers de arranque (un anillo: cada nodo conoce a los anteriores, sin un nodo semilla que
+# reciba todas las conexiones), lanza los procesos de p2p_miner_node.py en paralelo con la
+# salida de cada uno en su log persistente (ver node_log_store.py) y los supervisa: un nodo que termina con error se reinicia
+# con espera creciente, uno que termina con 'stop' no. Cada `health_interval` segundos
+# informa la salud del cluster (estado por el canal de control de cada nodo) y el uso de CPU
+# y memoria de los procesos (incluido XMRig). Al terminar (Ctrl+C o SIGTERM) detiene todos
+# los nodos con node_orchestrator.py.
+#
+# El archivo de estado (puertos, PIDs, tokens de control y logs) permite que la GUI se
+# conecte al cluster en ejecución sin ser dueña de los procesos (p2p_gui_controller.py --attach).
+#
+# Uso: python cluster_launcher.py [cluster.json] [--nodes N] [--base-port P] [--wallet W] [--no-xmrig]
+#
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+import psutil
+
+from cpu_topology import CPU_MODES, CPU_MODE_SPLIT
+from node_control import CONTROL_PORT_OFFSET, CONTROL_TOKEN_ENV, NodeControlClient
+from node_metrics import METRICS_PORT_OFFSET
+from node_log_store import LOG_MAX_BYTES, NodeLogStore
+from node_orchestrator import (NODE_START_TIMEOUT, NODE_STOP_GRACE, NODE_TERM_GRACE, NodeOrchestrator,
+                               format_operation_summary, wait_for_exit)
+
+NODE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "p2p_miner_node.py")
+CLUSTER_STATE_VERSION = 2 # 2: "log" es el directorio del log persistente del nodo
+NODE_LOG_LINE_LIMIT = 1024 * 1024 # Largo máximo de una línea de salida de un nodo
+CLUSTER_HEALTH_TIMEOUT = 2 # Segundos que se espera el 'status' de cada nodo en un informe
+NODE_RESTART_BACKOFF_INITIAL = 1 # Espera antes del primer reinicio (se duplica en cada fallo seguido)
+NODE_RESTART_BACKOFF_MAX = 60
+NODE_RESTART_RESET_AFTER = 60 # Segundos en ejecución tras los que se olvidan los fallos anteriores
+# Los nodos van en su propio grupo de procesos: Ctrl+C llega solo al lanzador, que los detiene en orden
+NODE_PROCESS_GROUP = ({"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt"
+                      else {"start_new_session": True})
+
+CLUSTER_CONFIG_DEFAULTS = {
+    "nodes": 3, # Cantidad de nodos
+    "base_port": 8000, # Puerto del primer nodo; el resto son consecutivos
+    "host": "127.0.0.1", # Dirección con la que los nodos se conocen entre sí
+    "wallet_address": None, # Obligatoria
+    "xmrig": False, # Lanzar XMRig en cada nodo (con su parte de la CPU, ver cpu_topology.py)
+    "cpu_mode": CPU_MODE_SPLIT,
+    "engine": "asyncio", # Motor de E/S de los nodos: asyncio escala mejor con muchas conexiones
+    "bootstrap_peers": 3, # Peers de arranque de cada nodo
+    "metrics": True, # Endpoint de métricas de cada nodo (puerto + METRICS_PORT_OFFSET)
+    "extra_args": [], # Argumentos adicionales para todos los nodos
+    "log_dir": "cluster_logs", # Un log persistente por nodo en log_dir/node_PUERTO
+    "log_max_bytes": LOG_MAX_BYTES, # Espacio de los segmentos comprimidos de cada nodo
+    "state_file": "cluster_state.json",
+    "health_interval": 10,
+    "restart": True, # Reiniciar los nodos que terminan con error
+    "stop_grace": NODE_STOP_GRACE,
+    "term_grace": NODE_TERM_GRACE,
+    "start_timeout": NODE_START_TIMEOUT,
+}
+
+
+def load_cluster_config(path=None, overrides=None):
+    """Configuración del cluster: valores por defecto, el archivo JSON (si hay) y `overrides`, en ese orden."""
+    config = dict(CLUSTER_CONFIG_DEFAULTS)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        unknown = set(loaded) - set(CLUSTER_CONFIG_DEFAULTS)
+        if unknown:
+            raise ValueError(f"claves desconocidas en {path}: {', '.join(sorted(unknown))}")
+        config.update(loaded)
+    config.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    if not config["wallet_address"]:
+        raise ValueError("falta 'wallet_address' (en el archivo o con --wallet)")
+    if config["nodes"] < 1:
+        raise ValueError("'nodes' debe ser al menos 1")
+    if config["cpu_mode"] not in CPU_MODES:
+        raise ValueError(f"'cpu_mode' debe ser uno de: {', '.join(CPU_MODES)}")
+    return config
+
+
+def node_ports(config):
+    return [config["base_port"] + i for i in range(config["nodes"])]
+
+
+def bootstrap_peers(ports, port, count, host="127.0.0.1"):
+    """
+    Peers de arranque de `port` en formato 'host:puerto,...': los `count` nodos anteriores en
+    un anillo. Todos quedan conectados y ningún nodo recibe las conexiones de todos; el resto
+    de la red se aprende con la sincronización de la tabla de peers.
+    """
+    index = ports.index(port)
+    seeds = []
+    for offset in range(1, min(count, len(ports) - 1) + 1):
+        seeds.append(f"{host}:{ports[(index - offset) % len(ports)]}")
+    return ",".join(seeds)
+
+
+def node_command(config, ports, port):
+    """Línea de comandos de un nodo del cluster (sin el token de control, que va por el entorno)."""
+    command = [sys.executable, "-u", NODE_SCRIPT, str(port), config["wallet_address"],
+               "--engine", config["engine"],
+               "--peers", bootstrap_peers(ports, port, config["bootstrap_peers"], config["host"]),
+               "--control-port", str(port + CONTROL_PORT_OFFSET)]
+    if config["metrics"]:
+        command += ["--metrics-port", str(port + METRICS_PORT_OFFSET)]
+    if config["xmrig"]:
+        command += ["--cpu-slot", f"{ports.index(port) + 1}/{len(ports)}", "--cpu-mode", config["cpu_mode"]]
+    else:
+        command.append("--no-xmrig")
+    return command + list(config["extra_args"])
+
+
+def read_cluster_state(path):
+    """Archivo de estado escrito por el lanzador: {"nodes": [{port, pid, control_port, metrics_port, token, log}], ...}."""
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != CLUSTER_STATE_VERSION:
+        raise ValueError(f"versión de estado no soportada: {state.get('version')}")
+    return state
+
+
+class ClusterNode:
+    """Un nodo del cluster: su proceso actual, el canal de control y el historial de reinicios."""
+    def __init__(self, port, command, token, log_dir):
+        self.port = port
+        self.command = command
+        self.token = token
+        self.log_dir = log_dir
+        self.log = None # NodeLogStore, abierto mientras corre el lanzador
+        self.pump = None # Tarea que copia la salida del proceso actual al log
+        self.process = None
+        self.control = None
+        self.started_at = None
+        self.restarts = 0
+        self.failures = 0 # Fallos seguidos (para la espera entre reinicios)
+        self.stopped = False # Terminó con 'stop' (o lo detuvo el lanzador): no se reinicia
+        self.status = None # Última respuesta a 'status'
+        self._ps = {} # pid -> psutil.Process, para que cpu_percent mida desde el informe anterior
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    def resources(self):
+        """(% de CPU, bytes de RSS) del nodo y sus procesos hijos (XMRig)."""
+        if not self.running:
+            return 0.0, 0
+        try:
+            root = psutil.Process(self.process.pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0.0, 0
+        cpu, rss = 0.0, 0
+        current = {}
+        for proc in procs:
+            proc = self._ps.get(proc.pid, proc)
+            try:
+                cpu += proc.cpu_percent(None)
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+            current[proc.pid] = proc
+        self._ps = current
+        return cpu, rss
+
+
+class ClusterLauncher:
+    """Lanza, supervisa y detiene los nodos del cluster en el event loop en el que corre run()."""
+    def __init__(self, config):
+        self.config = config
+        self.ports = node_ports(config)
+        self.nodes = {port: ClusterNode(port, node_command(config, self.ports, port), secrets.token_hex(16),
+                                        os.path.abspath(os.path.join(config["log_dir"], f"node_{port}")))
+                      for port in self.ports}
+        self.loop = None
+        self.orchestrator = None
+        self.started_at = time.time()
+        self._stopping = None # asyncio.Event: pedido de detención (señal o todos los nodos detenidos)
+        self._tasks = []
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self.orchestrator = NodeOrchestrator(self.loop, self.config["stop_grace"], self.config["term_grace"],
+                                             self.config["start_timeout"])
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError): # Windows: Ctrl+C llega como KeyboardInterrupt
+                pass
+        for node in self.nodes.values():
+            node.log = NodeLogStore(node.log_dir, max_bytes=self.config["log_max_bytes"])
+        print(f"[cluster] Iniciando {len(self.nodes)} nodos (puertos {self.ports[0]}-{self.ports[-1]}, "
+              f"XMRig {'sí' if self.config['xmrig'] else 'no'}, logs en {os.path.abspath(self.config['log_dir'])})...")
+        try:
+            started = time.monotonic()
+            results = await asyncio.wrap_future(self.orchestrator.start_all(
+                {port: (lambda node=node: self._spawn(node), lambda node=node: node.control.connected)
+                 for port, node in self.nodes.items()}))
+            for result in results:
+                if not result.ok:
+                    print(f"[cluster] {result.describe()}")
+            print(f"[cluster] {format_operation_summary('start', results, time.monotonic() - started)}")
+            self._write_state()
+            print(f"[cluster] Estado en {os.path.abspath(self.config['state_file'])} "
+                  f"(la GUI se conecta con: python p2p_gui_controller.py --attach {self.config['state_file']})")
+            self._tasks = [self.loop.create_task(self._supervise(node)) for node in self.nodes.values()]
+            self._tasks.append(self.loop.create_task(self._health_loop()))
+            await self._stopping.wait()
+        finally:
+            await self._teardown()
+
+    async def _spawn(self, node):
+        """Lanza (o relanza) el proceso del nodo con su salida en su log persistente."""
+        if node.control is None:
+            node.control = NodeControlClient(self.loop, node.port + CONTROL_PORT_OFFSET, node.token, events=False)
+        env = dict(os.environ, **{CONTROL_TOKEN_ENV: node.token})
+        node.log.append("launcher", f"--- {time.strftime('%Y-%m-%d %H:%M:%S')} inicio del nodo {node.port} ---")
+        node.process = await asyncio.create_subprocess_exec(
+            *node.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, limit=NODE_LOG_LINE_LIMIT, env=env, **NODE_PROCESS_GROUP)
+        node.pump = self.loop.create_task(self._pump_output(node, node.process))
+        node.started_at = time.monotonic()
+        node.stopped = False
+        return node.process
+
+    @staticmethod
+    async def _pump_output(node, process):
+        """Copia stdout y stderr del proceso al log del nodo hasta que se cierren."""
+        async def pump(stream, stream_name):
+            while True:
+                try:
+                    raw_line = await stream.readline()
+                except ValueError: # Línea más larga que NODE_LOG_LINE_LIMIT: se descarta el resto
+                    raw_line = b"[linea truncada]\n"
+                if not raw_line:
+                    return
+                node.log.append(stream_name, raw_line.decode("utf-8", errors="replace"))
+        await asyncio.gather(pump(process.stdout, "stdout"), pump(process.stderr, "stderr"))
+
+    async def _supervise(self, node):
+        """Espera a que el nodo termine; lo reinicia si falló y avisa cuando ya no queda ninguno."""
+        while True:
+            if node.running:
+                await wait_for_exit(node.process)
+            if self._stopping.is_set():
+                return
+            returncode = node.process.returncode if node.process is not None else None
+            if returncode == 0 or not self.config["restart"]:
+                node.stopped = True
+                print(f"[cluster] Nodo {node.port} terminó (código {returncode}); no se reinicia.")
+                if not any(n.running for n in self.nodes.values()):
+                    print("[cluster] No queda ningún nodo en ejecución.")
+                    self._stopping.set()
+                return
+            if time.monotonic() - (node.started_at or 0) >= NODE_RESTART_RESET_AFTER:
+                node.failures = 0
+            delay = min(NODE_RESTART_BACKOFF_INITIAL * 2 ** node.failures, NODE_RESTART_BACKOFF_MAX)
+            node.failures += 1
+            print(f"[cluster] Nodo {node.port} terminó con código {returncode}; reinicio en {delay}s.")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                return # Se pidió detener el cluster durante la espera
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self._spawn(node)
+            except OSError as e:
+                print(f"[cluster] No se pudo reiniciar el nodo {node.port}: {e}")
+                return
+            node.restarts += 1
+            self._write_state()
+
+    async def _health_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.config["health_interval"])
+                return
+            except asyncio.TimeoutError:
+                pass
+            health = await self.health()
+            print(f"[cluster] {format_cluster_health(health)}")
+            self._write_state(health)
+
+    async def health(self):
+        """Salud del cluster: estado de cada nodo (por su canal de control) y uso de recursos de los procesos."""
+        nodes = list(self.nodes.values())
+        statuses = await asyncio.gather(*(self._node_status(node) for node in nodes))
+        entries = []
+        for node, status in zip(nodes, statuses):
+            cpu, rss = node.resources()
+            peers = (status or {}).get("peers") or {}
+            xmrig = (status or {}).get("xmrig") or {}
+            hashrate = ((status or {}).get("hashrate") or {}).get("hashrate")
+            entries.append({
+                "port": node.port,
+                "running": node.running,
+                "control": status is not None,
+                "restarts": node.restarts,
+                "peers_connected": peers.get("connected"),
+                "peers_known": peers.get("known"),
+                "xmrig": xmrig.get("state"),
+                "hashrate": hashrate,
+                "cpu_percent": round(cpu, 1),
+                "rss": rss,
+            })
+        connected = [e["peers_connected"] for e in entries if e["peers_connected"] is not None]
+        return {
+            "timestamp": time.time(),
+            "nodes": len(entries),
+            "running": sum(e["running"] for e in entries),
+            "control": sum(e["control"] for e in entries),
+            "restarts": sum(e["restarts"] for e in entries),
+            "xmrig_running": sum(e["xmrig"] == "running" for e in entries),
+            "hashrate": round(sum(e["hashrate"] or 0.0 for e in entries), 1),
+            "peers_avg": round(sum(connected) / len(connected), 1) if connected else None,
+            "peers_min": min(connected) if connected else None,
+            "cpu_percent": round(sum(e["cpu_percent"] for e in entries), 1),
+            "rss": sum(e["rss"] for e in entries),
+            "entries": entries,
+        }
+
+    async def _node_status(self, node):
+        if not node.running or node.control is None or not node.control.connected:
+            return None
+        try:
+            node.status = await asyncio.wrap_future(node.control.request("status", timeout=CLUSTER_HEALTH_TIMEOUT))
+        except Exception:
+            return None
+        return node.status
+
+    def _write_state(self, health=None):
+        """Escribe el archivo de estado de forma atómica y legible solo por el usuario (contiene los tokens)."""
+        state = {
+            "version": CLUSTER_STATE_VERSION,
+            "launcher_pid": os.getpid(),
+            "started_at": self.started_at,
+            "nodes": [{
+                "port": node.port,
+                "pid": node.process.pid if node.running else None,
+                "control_port": node.port + CONTROL_PORT_OFFSET,
+                "metrics_port": node.port + METRICS_PORT_OFFSET if self.config["metrics"] else None,
+                "token": node.token,
+                "log": node.log_dir,
+                "restarts": node.restarts,
+            } for node in self.nodes.values()],
+        }
+        if health is not None:
+            state["health"] = {key: value for key, value in health.items() if key != "entries"}
+        path = self.config["state_file"]
+        temp_path = f"{path}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, path)
+
+    async def _teardown(self):
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        running = {port: (node.process, node.control) for port, node in self.nodes.items() if node.running}
+        if running:
+            print(f"[cluster] Deteniendo {len(running)} nodos...")
+            started = time.monotonic()
+            results = await asyncio.wrap_future(self.orchestrator.stop_all(running))
+            for result in results:
+                if result.outcome != "stopped":
+                    print(f"[cluster] {result.describe()}")
+            print(f"[cluster] {format_operation_summary('stop', results, time.monotonic() - started)}")
+        # Lo que los nodos escribieron al terminar llega al log; un XMRig huérfano no lo retiene
+        pumps = [node.pump for node in self.nodes.values() if node.pump is not None]
+        if pumps:
+            await asyncio.wait(pumps, timeout=NODE_TERM_GRACE)
+        for node in self.nodes.values():
+            if node.pump is not None:
+                node.pump.cancel()
+            if node.control is not None:
+                node.control.close()
+            if node.log is not None:
+                node.log.close()
+        try:
+            os.remove(self.config["state_file"])
+        except OSError:
+            pass
+
+
+def format_cluster_health(health):
+    """Una línea con la salud del cluster y, debajo, los nodos con problemas."""
+    def value(key, suffix=""):
+        return "n/a" if health[key] is None else f"{health[key]}{suffix}"
+
+    lines = [f"{time.strftime('%H:%M:%S', time.localtime(health['timestamp']))} nodos {health['running']}/"
+             f"{health['nodes']} vivos, {health['control']} con control, {health['restarts']} reinicios | "
+             f"peers prom {value('peers_avg')} (mín {value('peers_min')}) | XMRig {health['xmrig_running']}/"
+             f"{health['nodes']}, {health['hashrate']:.1f} H/s | CPU {health['cpu_percent']:.1f}% "
+             f"RAM {health['rss'] / 2 ** 20:.0f} MiB"]
+    for entry in health["entries"]:
+        if not entry["running"]:
+            lines.append(f"  Nodo {entry['port']}: detenido (reinicios {entry['restarts']})")
+        elif not entry["control"]:
+            lines.append(f"  Nodo {entry['port']}: sin respuesta del canal de control")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Lanza y supervisa un cluster local de nodos P2P sin la GUI.")
+    parser.add_argument("config", nargs="?", help="Archivo de configuración JSON (ver CLUSTER_CONFIG_DEFAULTS)")
+    parser.add_argument("--nodes", type=int, default=None, help="Cantidad de nodos")
+    parser.add_argument("--base-port", type=int, default=None, help="Puerto del primer nodo")
+    parser.add_argument("--wallet", default=None, help="Dirección de billetera Monero")
+    parser.add_argument("--no-xmrig", action="store_true", help="No lanzar XMRig en los nodos")
+    parser.add_argument("--state-file", default=None, help="Archivo de estado para conectar la GUI")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        cluster_config = load_cluster_config(args.config, {
+            "nodes": args.nodes, "base_port": args.base_port, "wallet_address": args.wallet,
+            "xmrig": False if args.no_xmrig else None, "state_file": args.state_file})
+    except (OSError, ValueError) as e:
+        print(f"[cluster] Configuración inválida: {e}")
+        sys.exit(2)
+    try:
+        asyncio.run(ClusterLauncher(cluster_config).run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# cluster_query.py
+#
+# P2P Miner GUI - Consultas scatter-gather al cluster de nodos.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Una consulta se envía a la vez a todos los peers con un ID propio y un plazo
+# común. Las respuestas que traen ese ID se agrupan y, cuando respondieron todos o venció el
+# plazo, se arma un único resumen del cluster (hashrate total, estado de cada nodo y nodos
+# que no respondieron). El nodo que originó la consulta lo imprime en su log y lo entrega a
+# la GUI por el canal de control (ver node_control.py).
+#
+
+import secrets
+import threading
+import time
+
+CLUSTER_QUERY_TIMEOUT = 5 # Plazo (segundos) para que respondan todos los peers
+CLUSTER_QUERY_POOL_INFO = "pool_info"
+
+
+class ClusterQuery:
+    """Una consulta en curso: peers esperados (node_id -> dirección), respuestas y peers inalcanzables."""
+    __slots__ = ("query_id", "kind", "started_at", "deadline", "expected", "responses", "unreachable")
+
+    def __init__(self, kind, expected, timeout=CLUSTER_QUERY_TIMEOUT):
+        self.query_id = secrets.token_hex(8)
+        self.kind = kind
+        self.started_at = time.time()
+        self.deadline = self.started_at + timeout
+        self.expected = dict(expected)
+        self.responses = {} # node_id -> (datos, segundos hasta la respuesta)
+        self.unreachable = set() # Peers a los que no se pudo enviar la consulta: no se los espera
+
+    @property
+    def complete(self):
+        return all(node_id in self.responses or node_id in self.unreachable for node_id in self.expected)
+
+    def missing(self):
+        return {node_id: address for node_id, address in self.expected.items() if node_id not in self.responses}
+
+
+class ClusterQueryTracker:
+    """
+    Consultas en curso indexadas por ID. Una consulta sale del tracker una sola vez: al
+    completarse (add_response) o al vencer su plazo (expire); las respuestas que llegan
+    después se descartan.
+    """
+    def __init__(self, timeout=CLUSTER_QUERY_TIMEOUT):
+        self.timeout = timeout
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._queries)
+
+    def start(self, kind, expected):
+        """Nueva consulta a los peers `expected`; sin peers queda completa y no se registra."""
+        query = ClusterQuery(kind, expected, self.timeout)
+        if query.expected:
+            with self._lock:
+                self._queries[query.query_id] = query
+        return query
+
+    def add_response(self, query_id, node_id, data):
+        """
+        Registra la respuesta de un nodo. Sin query_id (peer antiguo que no lo devuelve) se
+        asigna a la consulta más vieja que espera a ese nodo. Devuelve la consulta (ya
+        retirada si quedó completa) o None si no hay ninguna que la espere.
+        """
+        with self._lock:
+            if query_id is not None:
+                query = self._queries.get(query_id)
+            else:
+                query = next((q for q in self._queries.values()
+                              if node_id in q.expected and node_id not in q.responses), None)
+            if query is None or node_id in query.responses:
+                return None
+            query.responses[node_id] = (data, time.time() - query.started_at)
+            if query.complete:
+                del self._queries[query.query_id]
+            return query
+
+    def peer_unreachable(self, node_id):
+        """No se pudo enviar la consulta a un peer. Retira y devuelve las consultas que así quedan completas."""
+        finished = []
+        with self._lock:
+            for query in list(self._queries.values()):
+                if node_id in query.expected and node_id not in query.responses:
+                    query.unreachable.add(node_id)
+                    if query.complete:
+                        del self._queries[query.query_id]
+                        finished.append(query)
+        return finished
+
+    def expire(self, now=None):
+        """Retira y devuelve las consultas cuyo plazo venció."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [query for query in self._queries.values() if query.deadline <= now]
+            for query in expired:
+                del self._queries[query.query_id]
+        return expired
+
+
+def response_hashrate(data):
+    """Hashrate numérico (H/s) de una respuesta de pool info: API de XMRig o, si no, la media del último minuto."""
+    stats = data.get("xmrig_stats") or {}
+    for key in ("hashrate_10s", "hashrate_60s", "hashrate_15m"):
+        if isinstance(stats.get(key), (int, float)):
+            return float(stats[key])
+    mean = ((data.get("trends") or {}).get("1m") or {}).get("mean")
+    return float(mean) if isinstance(mean, (int, float)) else None
+
+
+def _node_port(value):
+    """Puerto informado por un peer como int; None si falta o no es un puerto válido."""
+    if isinstance(value, bool):
+        return None
+    try:
+        port = int(value)
+    except (TypeError, ValueError):
+        return None
+    return port if 0 < port < 65536 else None
+
+
+def _node_entry(node_id, address, data, seconds, local=False):
+    stats = data.get("xmrig_stats") or {}
+    supervisor = data.get("xmrig_supervisor") or {} # Ausente en peers antiguos
+    hashrate = response_hashrate(data)
+    return {
+        "node_id": node_id,
+        "node_port": _node_port(data.get("node_port")),
+        "address": address,
+        "status": "local" if local else ("mining" if hashrate else "idle"),
+        "hashrate": hashrate,
+        "hashrate_text": data.get("hashrate"),
+        "pool_url": data.get("pool_url"),
+        "wallet_address": data.get("wallet_address"),
+        "shares_good": stats.get("shares_good"),
+        "shares_total": stats.get("shares_total"),
+        "last_activity": data.get("last_activity"),
+        "xmrig_restarts": supervisor.get("restarts"),
+        "xmrig_lost_time": supervisor.get("lost_time"),
+        "response_ms": None if seconds is None else round(seconds * 1000, 1),
+    }
+
+
+def summarize_pool_info(query, local_id, local_data):
+    """Resumen del cluster a partir de una consulta de pool info terminada (completa o vencida)."""
+    nodes = [_node_entry(local_id, None, local_data, None, local=True)]
+    for node_id, (data, seconds) in query.responses.items():
+        address = query.expected.get(node_id)
+        address = f"{address[0]}:{address[1]}" if address else None
+        nodes.append(_node_entry(node_id, address, data, seconds))
+    missing = [{"node_id": node_id, "address": f"{address[0]}:{address[1]}",
+                "reason": "unreachable" if node_id in query.unreachable else "timeout"}
+               for node_id, address in query.missing().items()]
+    return {
+        "query_id": query.query_id,
+        "kind": query.kind,
+        "started_at": query.started_at,
+        "duration": round(time.time() - query.started_at, 3),
+        "complete": not missing,
+        "total_hashrate": round(sum(node["hashrate"] or 0.0 for node in nodes), 1),
+        "xmrig_restarts": sum(node["xmrig_restarts"] or 0 for node in nodes),
+        "xmrig_lost_time": round(sum(node["xmrig_lost_time"] or 0.0 for node in nodes), 1),
+        "responded": len(nodes),
+        "expected": len(query.expected) + 1,
+        "nodes": nodes,
+        "missing": missing,
+    }
+
+
+def format_cluster_summary(summary):
+    """Resumen legible (log del nodo y panel de la GUI)."""
+    def hashrate(value):
+        return "n/a" if value is None else f"{value:.1f} H/s"
+
+    started = time.strftime("%H:%M:%S", time.localtime(summary["started_at"]))
+    state = "completo" if summary["complete"] else f"faltan {len(summary['missing'])}"
+    lines = [f"Cluster ({started}, {summary['duration'] * 1000:.0f}ms): {summary['responded']}/{summary['expected']} "
+             f"nodos respondieron ({state}). Hashrate total: {hashrate(summary['total_hashrate'])}"]
+    if summary.get("xmrig_restarts"):
+        lines[0] += (f". Reinicios de XMRig: {summary['xmrig_restarts']} "
+                     f"({summary['xmrig_lost_time']:.0f}s sin minar)")
+    for node in sorted(summary["nodes"], key=lambda node: (node["status"] != "local", node["node_port"] or 0)):
+        shares = (f", shares {node['shares_good']}/{node['shares_total']}"
+                  if node["shares_total"] is not None else "")
+        latency = f", {node['response_ms']:.0f}ms" if node["response_ms"] is not None else ""
+        restarts = (f", {node['xmrig_restarts']} reinicios de XMRig ({node['xmrig_lost_time']:.0f}s perdidos)"
+                    if node["xmrig_restarts"] else "")
+        lines.append(f"  Nodo {node['node_port']} [{node['status']}] {hashrate(node['hashrate'])}{shares}, "
+                     f"pool {node['pool_url'] or 'n/a'}, última actividad {node['last_activity']}{restarts}{latency}")
+    for node in summary["missing"]:
+        reason = "inalcanzable" if node["reason"] == "unreachable" else "sin respuesta en el plazo"
+        lines.append(f"  Falta: {node['address']} ({node['node_id']}), {reason}")
+    return "\n".join(lines)
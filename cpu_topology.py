@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+# cpu_topology.py
+#
+# P2P Miner GUI - Planificador de núcleos de CPU para las instancias locales de XMRig.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Lee la topología de la CPU (núcleos físicos, dominios de caché L3 y nodos
+# NUMA) y reparte los núcleos entre los nodos que corren XMRig en la misma máquina, para
+# que no compitan por los mismos núcleos ni por la misma L3. Cada parte se traduce en
+# argumentos --threads / --cpu-affinity / --randomx-no-numa de XMRig.
+#
+# Uso: python cpu_topology.py [--nodes 3] [--mode split|single]
+#
+
+import argparse
+import os
+
+try:
+    import psutil
+except ImportError: # psutil es opcional: sin él se usa os.cpu_count y /sys
+    psutil = None
+
+CPU_MODE_SPLIT = "split" # Repartir núcleos y dominios L3 entre las instancias
+CPU_MODE_SINGLE = "single" # Una sola instancia de XMRig con todos los núcleos
+CPU_MODES = (CPU_MODE_SPLIT, CPU_MODE_SINGLE)
+
+RANDOMX_L3_PER_THREAD = 2 * 1024 * 1024 # Cada hilo de RandomX necesita ~2 MiB de L3 para rendir bien
+SYS_CPU_DIR = "/sys/devices/system/cpu"
+SYS_NODE_DIR = "/sys/devices/system/node"
+
+
+def parse_cpu_list(text):
+    """Convierte una lista de CPUs del kernel ('0-3,8,10-11') en una lista de enteros."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def parse_cache_size(text):
+    """Convierte un tamaño de caché de /sys ('32768K', '8M') en bytes."""
+    text = text.strip().upper()
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if text and text[-1] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+def cpu_mask(cpus):
+    """Máscara hexadecimal de afinidad de XMRig para las CPUs indicadas (ej. [0, 1] -> '0x3')."""
+    mask = 0
+    for cpu in cpus:
+        mask |= 1 << cpu
+    return hex(mask)
+
+
+class CpuTopology:
+    """
+    Topología de CPU disponible para el proceso: núcleos físicos (con sus CPUs lógicas
+    hermanas), dominios de caché L3 y nodos NUMA.
+    """
+    def __init__(self, cores, l3_domains, numa_nodes, source):
+        self.cores = cores # Lista de núcleos físicos; cada uno es la lista de sus CPUs lógicas
+        self.l3_domains = l3_domains # Lista de {"cpus": [...], "size": bytes o None}
+        self.numa_nodes = numa_nodes # {id de nodo NUMA: [cpus]}
+        self.source = source # De dónde se leyó ("sysfs" o "psutil"/"os")
+
+    @property
+    def logical_cpus(self):
+        return sorted(cpu for core in self.cores for cpu in core)
+
+    def numa_node_of(self, cpu):
+        for node_id, cpus in self.numa_nodes.items():
+            if cpu in cpus:
+                return node_id
+        return 0
+
+    def l3_index_of(self, cpu):
+        for index, domain in enumerate(self.l3_domains):
+            if cpu in domain["cpus"]:
+                return index
+        return 0
+
+
+def _read_file(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def _available_cpus():
+    """CPUs en las que este proceso puede ejecutarse (respeta cpusets y afinidad heredada)."""
+    if psutil is not None:
+        try:
+            return sorted(psutil.Process().cpu_affinity())
+        except (AttributeError, NotImplementedError, OSError): # cpu_affinity no existe en macOS
+            pass
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _read_sysfs_topology(cpus, sys_root):
+    cpu_dir = os.path.join(sys_root, SYS_CPU_DIR.lstrip("/"))
+    node_dir = os.path.join(sys_root, SYS_NODE_DIR.lstrip("/"))
+    cores = {}
+    l3_domains = {}
+    for cpu in cpus:
+        base = os.path.join(cpu_dir, f"cpu{cpu}")
+        package = _read_file(os.path.join(base, "topology", "physical_package_id"))
+        core_id = _read_file(os.path.join(base, "topology", "core_id"))
+        cores.setdefault((int(package), int(core_id)), []).append(cpu)
+
+        cache_dir = os.path.join(base, "cache")
+        for index in sorted(os.listdir(cache_dir)) if os.path.isdir(cache_dir) else []:
+            index_dir = os.path.join(cache_dir, index)
+            if not index.startswith("index") or _read_file(os.path.join(index_dir, "level")) != "3":
+                continue
+            shared = tuple(c for c in parse_cpu_list(_read_file(os.path.join(index_dir, "shared_cpu_list")))
+                           if c in cpus)
+            l3_domains.setdefault(shared, parse_cache_size(_read_file(os.path.join(index_dir, "size"))))
+
+    numa_nodes = {}
+    if os.path.isdir(node_dir):
+        for entry in os.listdir(node_dir):
+            if entry.startswith("node") and entry[4:].isdigit():
+                node_cpus = [c for c in parse_cpu_list(_read_file(os.path.join(node_dir, entry, "cpulist"))) if c in cpus]
+                if node_cpus:
+                    numa_nodes[int(entry[4:])] = node_cpus
+
+    if not l3_domains: # Sin información de L3: un único dominio sin tamaño conocido
+        l3_domains = {tuple(cpus): None}
+    return CpuTopology(
+        cores=[sorted(siblings) for _, siblings in sorted(cores.items())],
+        l3_domains=[{"cpus": list(shared), "size": size} for shared, size in sorted(l3_domains.items())],
+        numa_nodes=numa_nodes or {0: list(cpus)},
+        source="sysfs",
+    )
+
+
+def read_cpu_topology(sys_root="/"):
+    """
+    Lee la topología de la CPU. En Linux se usa /sys (núcleos, L3 y NUMA reales); en otros
+    sistemas se asume un único dominio L3 y NUMA, con los núcleos físicos que informe psutil.
+    """
+    cpus = _available_cpus() if sys_root == "/" else None
+    if os.path.isdir(os.path.join(sys_root, SYS_CPU_DIR.lstrip("/"))):
+        if cpus is None: # Topología de otra raíz (ej. una copia de /sys): todas sus CPUs
+            cpu_dir = os.path.join(sys_root, SYS_CPU_DIR.lstrip("/"))
+            cpus = sorted(int(e[3:]) for e in os.listdir(cpu_dir) if e.startswith("cpu") and e[3:].isdigit())
+        try:
+            return _read_sysfs_topology(cpus, sys_root)
+        except (OSError, ValueError):
+            pass # /sys incompleto (contenedores, WSL): se usa la alternativa genérica
+
+    if cpus is None:
+        cpus = _available_cpus()
+    if psutil is not None:
+        physical = psutil.cpu_count(logical=False) or len(cpus)
+        source = "psutil"
+    else:
+        physical = len(cpus)
+        source = "os"
+    # Sin datos de hermanos SMT, se agrupan las CPUs lógicas de a `smt` por núcleo físico
+    smt = max(len(cpus) // max(physical, 1), 1)
+    cores = [cpus[i:i + smt] for i in range(0, len(cpus), smt)]
+    return CpuTopology(cores=cores, l3_domains=[{"cpus": list(cpus), "size": None}],
+                       numa_nodes={0: list(cpus)}, source=source)
+
+
+def _split_evenly(items, parts):
+    """Divide `items` en `parts` bloques contiguos de tamaño lo más parejo posible."""
+    size, extra = divmod(len(items), parts)
+    blocks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        blocks.append(items[start:end])
+        start = end
+    return blocks
+
+
+def _domain_cores(topology):
+    """Núcleos físicos agrupados por dominio L3, ordenados por nodo NUMA."""
+    groups = [[] for _ in topology.l3_domains]
+    for core in topology.cores:
+        groups[topology.l3_index_of(core[0])].append(core)
+    order = sorted(range(len(groups)), key=lambda i: (topology.numa_node_of(groups[i][0][0]) if groups[i] else 0, i))
+    return [(i, groups[i]) for i in order if groups[i]]
+
+
+def _make_slot(topology, cores, l3_share_bytes):
+    """Traduce un conjunto de núcleos físicos en hilos, CPUs afines y ajustes NUMA de XMRig."""
+    if not cores:
+        return None
+    threads = len(cores)
+    if l3_share_bytes:
+        # RandomX rinde según la L3: no tiene sentido más hilos que bloques de 2 MiB disponibles,
+        # pero con L3 de sobra se aprovechan también las CPUs lógicas (SMT) de los núcleos
+        by_cache = max(int(l3_share_bytes // RANDOMX_L3_PER_THREAD), 1)
+        threads = min(by_cache, sum(len(core) for core in cores))
+    # Primero una CPU lógica por núcleo físico y después sus hermanas SMT
+    ordered = [core[0] for core in cores] + [cpu for core in cores for cpu in core[1:]]
+    cpus = sorted(ordered[:threads])
+    numa = sorted({topology.numa_node_of(cpu) for cpu in cpus})
+    return {
+        "threads": threads,
+        "cpus": cpus,
+        "affinity": cpu_mask(cpus),
+        "l3_domains": sorted({topology.l3_index_of(cpu) for cpu in cpus}),
+        "numa_nodes": numa,
+        # Confinada a un solo nodo NUMA en una máquina con varios: un único dataset RandomX local
+        "no_numa": len(topology.numa_nodes) > 1 and len(numa) == 1,
+    }
+
+
+def plan_cpu_partitions(topology, instances, mode=CPU_MODE_SPLIT):
+    """
+    Reparte la CPU entre `instances` instancias de XMRig. Devuelve una lista con un elemento
+    por instancia: un dict con threads/cpus/affinity/l3_domains/numa_nodes/no_numa, o None
+    si esa instancia no debe minar (modo 'single' o más instancias que núcleos físicos).
+    """
+    if mode not in CPU_MODES:
+        raise ValueError(f"modo de CPU desconocido: {mode}")
+    if instances < 1:
+        return []
+    domains = _domain_cores(topology)
+
+    if mode == CPU_MODE_SINGLE:
+        cores = [core for _, group in domains for core in group]
+        l3_total = sum(topology.l3_domains[i]["size"] or 0 for i, _ in domains)
+        return [_make_slot(topology, cores, l3_total)] + [None] * (instances - 1)
+
+    assignments = [[] for _ in range(instances)] # Por instancia: lista de (dominio, núcleos)
+    if instances <= len(domains):
+        # Alcanzan los dominios L3: cada instancia recibe dominios enteros, sin compartir L3
+        for slot, block in enumerate(_split_evenly(domains, instances)):
+            assignments[slot] = [(i, group) for i, group in block]
+    else:
+        # Más instancias que dominios: se reparten instancias por dominio según sus núcleos
+        # (restos mayores) y los núcleos de cada dominio en bloques contiguos
+        total_cores = sum(len(group) for _, group in domains)
+        quotas = [instances * len(group) / total_cores for _, group in domains]
+        counts = [int(q) for q in quotas]
+        for i in sorted(range(len(domains)), key=lambda i: quotas[i] - counts[i], reverse=True)[:instances - sum(counts)]:
+            counts[i] += 1
+        blocks = [(i, block) for (i, group), count in zip(domains, counts)
+                  for block in (_split_evenly(group, count) if count else [])]
+        # Con más instancias que núcleos, las que quedan sin núcleos van al final
+        for slot, (i, block) in enumerate(sorted(blocks, key=lambda item: not item[1])):
+            assignments[slot] = [(i, block)] if block else []
+
+    plan = []
+    for assigned in assignments:
+        cores = [core for _, block in assigned for core in block]
+        l3_share = 0
+        for i, block in assigned:
+            size = topology.l3_domains[i]["size"]
+            domain_cores = sum(1 for core in topology.cores if topology.l3_index_of(core[0]) == i)
+            if size:
+                l3_share += size * len(block) / domain_cores
+        plan.append(_make_slot(topology, cores, l3_share))
+    return plan
+
+
+def xmrig_cpu_args(slot):
+    """Argumentos de línea de comandos de XMRig para una parte del plan."""
+    if not slot:
+        return []
+    args = [f"--threads={slot['threads']}", f"--cpu-affinity={slot['affinity']}"]
+    if slot["no_numa"]:
+        args.append("--randomx-no-numa")
+    return args
+
+
+def format_cpu_plan(topology, plan, labels=None):
+    """Reporte legible del plan (topología detectada y qué recibe cada instancia)."""
+    sizes = [domain["size"] for domain in topology.l3_domains]
+    l3_desc = ", ".join(f"{size // (1024 * 1024)} MiB" if size else "tamaño desconocido" for size in sizes)
+    lines = [
+        f"CPU ({topology.source}): {len(topology.logical_cpus)} CPUs lógicas, {len(topology.cores)} núcleos físicos, "
+        f"{len(topology.l3_domains)} dominio(s) L3 [{l3_desc}], {len(topology.numa_nodes)} nodo(s) NUMA",
+    ]
+    for i, slot in enumerate(plan):
+        label = labels[i] if labels else f"Instancia {i + 1}"
+        if slot is None:
+            lines.append(f"  {label}: sin XMRig")
+            continue
+        lines.append(f"  {label}: {slot['threads']} hilos, CPUs {','.join(map(str, slot['cpus']))} "
+                     f"(máscara {slot['affinity']}), L3 {slot['l3_domains']}, NUMA {slot['numa_nodes']}"
+                     f"{', --randomx-no-numa' if slot['no_numa'] else ''}")
+    return "\n".join(lines)
+
+
+def parse_slot(text):
+    """Convierte 'I/N' (instancia I de N, desde 1) en (índice desde 0, N)."""
+    index, total = text.split("/", 1)
+    index, total = int(index), int(total)
+    if not 1 <= index <= total:
+        raise ValueError(f"instancia fuera de rango: {text}")
+    return index - 1, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muestra el reparto de CPU entre instancias locales de XMRig.")
+    parser.add_argument("--nodes", type=int, default=3, help="Cantidad de nodos con XMRig en esta máquina")
+    parser.add_argument("--mode", choices=CPU_MODES, default=CPU_MODE_SPLIT)
+    args = parser.parse_args()
+    topology = read_cpu_topology()
+    print(format_cpu_plan(topology, plan_cpu_partitions(topology, args.nodes, args.mode)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+# mining_governor.py
+#
+# P2P Miner GUI - Gobernador de intensidad de minería según la carga de la máquina.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: En hosts compartidos, XMRig a pleno le quita CPU al resto de los procesos.
+# El gobernador mide con psutil la CPU que usan los demás procesos (sin contar XMRig), la
+# memoria y la temperatura, y mueve la minería por una escalera de niveles:
+#   full -> low_priority (renice) -> half_threads (reinicio con la mitad de hilos) -> paused
+# con histéresis: baja un nivel cuando algún límite se supera durante `step_down_samples`
+# muestras seguidas y sube uno cuando todos quedan `hysteresis` por debajo durante
+# `step_up_samples`. En las horas de silencio se fuerza al menos `quiet_level`. Cada decisión
+# queda en un registro con el hashrate antes del cambio y, pasado `settle` segundos, el
+# hashrate después: lo que costó. El nodo aplica los niveles (ver P2PNode._apply_governor_level).
+#
+# Uso: python mining_governor.py [--policy politica.json] [--samples 5]  (muestra la carga medida)
+#
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+
+try:
+    import psutil
+except ImportError: # Sin psutil el gobernador no está disponible (el nodo lo informa)
+    psutil = None
+
+GOVERNOR_LOG_SIZE = 100 # Decisiones recordadas
+GOVERNOR_NICE = 10 # Prioridad de XMRig en los niveles reducidos (en Windows, BELOW_NORMAL)
+
+# Niveles de la escalera: (nombre, prioridad baja, fracción de hilos, en pausa)
+GOVERNOR_LEVELS = (
+    ("full", False, 1.0, False),
+    ("low_priority", True, 1.0, False),
+    ("half_threads", True, 0.5, False),
+    ("paused", True, 0.5, True),
+)
+GOVERNOR_LEVEL_NAMES = tuple(level[0] for level in GOVERNOR_LEVELS)
+
+GOVERNOR_POLICY_DEFAULTS = {
+    "max_load": 70, # % de CPU de la máquina usado por otros procesos a partir del cual se reduce la minería
+    "max_memory": 90, # % de memoria en uso
+    "max_temperature": 85, # °C (si psutil puede leer sensores)
+    "hysteresis": 15, # Puntos por debajo de cada límite para volver a subir
+    "sample_interval": 5, # Segundos entre muestras
+    "step_down_samples": 2, # Muestras seguidas sobre un límite para bajar un nivel
+    "step_up_samples": 6, # Muestras seguidas bajo los límites para subir un nivel
+    "quiet_hours": [], # Franjas "HH:MM-HH:MM" (pueden cruzar la medianoche)
+    "quiet_level": "paused", # Nivel mínimo de reducción durante las horas de silencio
+    "settle": 60, # Segundos tras un cambio para medir el hashrate que costó
+}
+
+
+def parse_quiet_hours(spec):
+    """'22:00-07:00' -> (minuto de inicio, minuto de fin) del día."""
+    try:
+        start, end = spec.split("-")
+        minutes = []
+        for part in (start, end):
+            hours, mins = part.strip().split(":")
+            value = int(hours) * 60 + int(mins)
+            if not 0 <= value < 24 * 60:
+                raise ValueError
+            minutes.append(value)
+    except ValueError:
+        raise ValueError(f"franja horaria inválida '{spec}' (formato HH:MM-HH:MM)") from None
+    return tuple(minutes)
+
+
+def in_quiet_hours(ranges, now=None):
+    local = time.localtime(time.time() if now is None else now)
+    minute = local.tm_hour * 60 + local.tm_min
+    for start, end in ranges:
+        if (start <= minute < end) if start <= end else (minute >= start or minute < end):
+            return True
+    return False
+
+
+def load_governor_policy(path=None, overrides=None):
+    """Política del gobernador: valores por defecto, el archivo JSON (si hay) y `overrides`, en ese orden."""
+    policy = dict(GOVERNOR_POLICY_DEFAULTS)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        unknown = set(loaded) - set(GOVERNOR_POLICY_DEFAULTS)
+        if unknown:
+            raise ValueError(f"claves desconocidas en {path}: {', '.join(sorted(unknown))}")
+        policy.update(loaded)
+    policy.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    if isinstance(policy["quiet_hours"], str):
+        policy["quiet_hours"] = [item for item in policy["quiet_hours"].split(",") if item.strip()]
+    for spec in policy["quiet_hours"]:
+        parse_quiet_hours(spec)
+    if policy["quiet_level"] not in GOVERNOR_LEVEL_NAMES:
+        raise ValueError(f"'quiet_level' debe ser uno de: {', '.join(GOVERNOR_LEVEL_NAMES)}")
+    if policy["sample_interval"] <= 0 or policy["step_down_samples"] < 1 or policy["step_up_samples"] < 1:
+        raise ValueError("'sample_interval', 'step_down_samples' y 'step_up_samples' deben ser positivos")
+    return policy
+
+
+def _executable_name(path):
+    name = os.path.basename(path or "").lower()
+    return name[:-4] if name.endswith(".exe") else name
+
+
+class SystemSampler:
+    """
+    Mide la carga de la máquina con psutil. La CPU de minería es la del XMRig del nodo (y sus
+    hijos) más la de cualquier proceso con el mismo nombre de ejecutable (los XMRig de los
+    otros nodos locales): esa CPU no cuenta como carga ajena.
+    """
+    def __init__(self, xmrig_path=None):
+        if psutil is None:
+            raise RuntimeError("el gobernador requiere psutil (pip install psutil)")
+        self.xmrig_name = _executable_name(xmrig_path)
+        self.cpu_count = psutil.cpu_count() or 1
+        self._processes = {} # pid -> psutil.Process (cpu_percent mide desde la llamada anterior)
+        psutil.cpu_percent(None)
+
+    def _mining_processes(self, xmrig_pid):
+        pids = set()
+        if xmrig_pid is not None:
+            try:
+                process = psutil.Process(xmrig_pid)
+                pids.add(process.pid)
+                pids.update(child.pid for child in process.children(recursive=True))
+            except psutil.Error:
+                pass
+        if self.xmrig_name:
+            for process in psutil.process_iter(["name"]):
+                if _executable_name(process.info["name"]) == self.xmrig_name:
+                    pids.add(process.pid)
+        return pids
+
+    def _mining_cpu(self, pids):
+        total = 0.0
+        for pid in pids:
+            process = self._processes.get(pid)
+            try:
+                if process is None:
+                    process = self._processes[pid] = psutil.Process(pid)
+                    process.cpu_percent(None) # Primera medición: desde ahora
+                    continue
+                total += process.cpu_percent(None)
+            except psutil.Error:
+                self._processes.pop(pid, None)
+        for pid in set(self._processes) - pids:
+            del self._processes[pid]
+        return total / self.cpu_count # Porcentaje de toda la máquina, como cpu_percent del sistema
+
+    @staticmethod
+    def _temperature():
+        try:
+            sensors = psutil.sensors_temperatures()
+        except (AttributeError, OSError): # No disponible en esta plataforma
+            return None
+        values = [entry.current for entries in sensors.values() for entry in entries if entry.current]
+        return max(values) if values else None
+
+    def sample(self, xmrig_pid=None):
+        cpu = psutil.cpu_percent(None)
+        mining = min(self._mining_cpu(self._mining_processes(xmrig_pid)), cpu)
+        return {
+            "time": time.time(),
+            "cpu": round(cpu, 1),
+            "mining_cpu": round(mining, 1),
+            "other_cpu": round(cpu - mining, 1),
+            "memory": round(psutil.virtual_memory().percent, 1),
+            "temperature": self._temperature(),
+        }
+
+
+class MiningGovernor:
+    """
+    Decide el nivel de minería a partir de las muestras (no toca procesos). decide() devuelve
+    la decisión tomada (también agregada al registro) o None si el nivel no cambia.
+    """
+    def __init__(self, policy):
+        self.policy = policy
+        self.quiet_ranges = [parse_quiet_hours(spec) for spec in policy["quiet_hours"]]
+        self.quiet_level = GOVERNOR_LEVEL_NAMES.index(policy["quiet_level"])
+        self.level = 0
+        self.last_sample = None
+        self.decisions = deque(maxlen=GOVERNOR_LOG_SIZE)
+        self._over = 0 # Muestras seguidas sobre algún límite
+        self._under = 0 # Muestras seguidas con todos los límites holgados
+
+    @property
+    def level_name(self):
+        return GOVERNOR_LEVEL_NAMES[self.level]
+
+    @property
+    def settings(self):
+        """(prioridad baja, fracción de hilos, en pausa) del nivel actual."""
+        return GOVERNOR_LEVELS[self.level][1:]
+
+    def _limits(self, sample):
+        """[(nombre, valor, límite)] de las mediciones disponibles."""
+        policy = self.policy
+        limits = [("carga ajena", sample["other_cpu"], policy["max_load"]),
+                  ("memoria", sample["memory"], policy["max_memory"])]
+        if sample.get("temperature") is not None:
+            limits.append(("temperatura", sample["temperature"], policy["max_temperature"]))
+        return limits
+
+    def decide(self, sample, hashrate=None):
+        self.last_sample = sample
+        policy = self.policy
+        limits = self._limits(sample)
+        exceeded = [(name, value, limit) for name, value, limit in limits if value >= limit]
+        relaxed = all(value <= limit - policy["hysteresis"] for _, value, limit in limits)
+        self._over = self._over + 1 if exceeded else 0
+        self._under = self._under + 1 if relaxed else 0
+        quiet = in_quiet_hours(self.quiet_ranges, sample["time"])
+        floor = self.quiet_level if quiet else 0
+
+        if self.level < floor:
+            return self._change(floor, "horas de silencio", sample, hashrate)
+        if exceeded and self._over >= policy["step_down_samples"] and self.level < len(GOVERNOR_LEVELS) - 1:
+            name, value, limit = exceeded[0]
+            seconds = self._over * policy["sample_interval"]
+            return self._change(self.level + 1, f"{name} {value:g} >= {limit:g} durante {seconds:g}s", sample, hashrate)
+        if relaxed and self._under >= policy["step_up_samples"] and self.level > floor:
+            seconds = self._under * policy["sample_interval"]
+            return self._change(self.level - 1, f"límites holgados durante {seconds:g}s", sample, hashrate)
+        return None
+
+    def _change(self, level, reason, sample, hashrate):
+        decision = {
+            "time": sample["time"],
+            "from": self.level_name,
+            "to": GOVERNOR_LEVEL_NAMES[level],
+            "reason": reason,
+            "sample": sample,
+            "hashrate_before": hashrate,
+            "hashrate_after": None,
+            "cost": None,
+        }
+        self.level = level
+        self._over = self._under = 0 # Cada cambio necesita su propia racha de muestras
+        self.decisions.append(decision)
+        return decision
+
+    def settle(self, hashrate, now=None):
+        """Completa el costo de las decisiones con más de `settle` segundos. Devuelve las completadas."""
+        now = time.time() if now is None else now
+        settled = []
+        for decision in self.decisions:
+            if decision["hashrate_after"] is None and now - decision["time"] >= self.policy["settle"]:
+                decision["hashrate_after"] = hashrate or 0.0
+                if decision["hashrate_before"] is not None:
+                    decision["cost"] = round(decision["hashrate_before"] - decision["hashrate_after"], 1)
+                settled.append(decision)
+        return settled
+
+    def status(self):
+        return {"level": self.level_name, "sample": self.last_sample,
+                "quiet": in_quiet_hours(self.quiet_ranges), "decisions": len(self.decisions),
+                "last_decision": self.decisions[-1] if self.decisions else None}
+
+
+def format_decision(decision):
+    when = time.strftime("%H:%M:%S", time.localtime(decision["time"]))
+    before = decision["hashrate_before"]
+    text = f"{when} {decision['from']} -> {decision['to']} ({decision['reason']})"
+    text += f", hashrate antes {before:.1f} H/s" if before is not None else ", hashrate antes n/a"
+    if decision["hashrate_after"] is not None:
+        text += f", después {decision['hashrate_after']:.1f} H/s"
+        if decision["cost"] is not None:
+            text += f", costo {decision['cost']:.1f} H/s"
+    return text
+
+
+def set_low_priority(pid, low):
+    """Baja (o restaura) la prioridad de un proceso. Restaurarla puede requerir privilegios."""
+    if psutil is None:
+        return False
+    try:
+        process = psutil.Process(pid)
+        if os.name == "nt":
+            process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if low else psutil.NORMAL_PRIORITY_CLASS)
+        else:
+            process.nice(GOVERNOR_NICE if low else 0)
+        return True
+    except psutil.Error:
+        return False
+
+
+def suspend_process(pid, suspend):
+    """Pausa o reanuda un proceso con señales (SIGSTOP/SIGCONT); alternativa a la API de XMRig."""
+    if psutil is None:
+        return False
+    try:
+        process = psutil.Process(pid)
+        if suspend:
+            process.suspend()
+        else:
+            process.resume()
+        return True
+    except psutil.Error:
+        return False
+
+
+def scale_threads_args(args, fraction):
+    """Aplica la fracción de hilos a los argumentos de CPU de XMRig (--threads=N o el hint de autoconfig)."""
+    if fraction >= 1:
+        return list(args)
+    scaled = []
+    found = False
+    for arg in args:
+        if arg.startswith("--threads="):
+            found = True
+            arg = f"--threads={max(int(int(arg.split('=', 1)[1]) * fraction), 1)}"
+        scaled.append(arg)
+    if not found:
+        scaled.append(f"--cpu-max-threads-hint={max(int(fraction * 100), 1)}")
+    return scaled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muestra la carga que mide el gobernador y el nivel que elegiría.")
+    parser.add_argument("--policy", default=None, help="Archivo JSON de política (ver GOVERNOR_POLICY_DEFAULTS)")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--xmrig-name", default="xmrig", help="Nombre del ejecutable de XMRig (CPU de minería)")
+    args = parser.parse_args()
+    policy = load_governor_policy(args.policy)
+    sampler = SystemSampler(args.xmrig_name)
+    governor = MiningGovernor(policy)
+    for _ in range(args.samples):
+        time.sleep(policy["sample_interval"])
+        sample = sampler.sample()
+        decision = governor.decide(sample)
+        print(f"CPU {sample['cpu']}% (minería {sample['mining_cpu']}%, ajena {sample['other_cpu']}%), "
+              f"memoria {sample['memory']}%, temperatura {sample['temperature']} -> {governor.level_name}")
+        if decision:
+            print(f"  {format_decision(decision)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+# node_control.py
+#
+# P2P Miner GUI - Canal de control estructurado entre la GUI y los nodos.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Protocolo de líneas JSON sobre un socket TCP local (solo 127.0.0.1), separado
+# de stdin/stdout. El cliente envía solicitudes {"id", "cmd", "args"}; el nodo contesta con
+# {"id", "type": "result", "result"} o {"id", "type": "error", "error"} (no necesariamente en
+# orden) y, si el cliente se suscribió, le envía eventos {"type": "event", "event", "data", "ts"}
+# cuando cambia su estado (hashrate, peers, XMRig, resumen del cluster).
+#
+# La primera solicitud de cada conexión debe ser "hello" con el token del nodo (variable de
+# entorno P2P_CONTROL_TOKEN al lanzarlo); con "events": true la conexión recibe los eventos
+# habituales y con una lista de nombres, solo ésos. Los eventos de CONTROL_OPT_IN_EVENTS (uno
+# por mensaje gossip, pensados para benchmarks) solo se envían a quien los pide por nombre.
+#
+
+import asyncio
+import hmac
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+CONTROL_HOST = "127.0.0.1" # El canal solo atiende conexiones locales
+CONTROL_PORT_OFFSET = 30000 # Puerto de control que usa la GUI: puerto del nodo + este valor
+CONTROL_TOKEN_ENV = "P2P_CONTROL_TOKEN"
+CONTROL_PROTOCOL_VERSION = 1
+CONTROL_MAX_LINE = 1024 * 1024 # Largo máximo de una línea (solicitud o respuesta)
+CONTROL_CLIENT_QUEUE_SIZE = 1000 # Mensajes pendientes por cliente antes de desconectarlo por lento
+CONTROL_REQUEST_TIMEOUT = 10 # Segundos que el cliente espera cada respuesta
+CONTROL_RECONNECT_INTERVAL = 0.5 # Espera del cliente entre intentos de conexión
+CONTROL_LATENCY_SAMPLES = 200 # Tiempos de ida y vuelta recordados por el cliente
+CONTROL_POLL_INTERVAL = 0.05 # Cada cuánto revisa el servidor si debe detenerse (acota la espera de stop)
+CONTROL_OPT_IN_EVENTS = frozenset({"gossip"}) # Eventos que no incluye "events": true
+
+
+class ControlError(Exception):
+    """La solicitud de control falló: error del nodo, sin conexión o sin respuesta a tiempo."""
+
+
+def encode_line(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _token_matches(given, expected):
+    """Comparación del token en tiempo constante (no revela cuántos caracteres coinciden)."""
+    if not isinstance(given, str):
+        return False
+    return hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
+class _ControlClientConnection:
+    """Conexión de un cliente en el nodo: lee solicitudes y escribe desde una cola con su propio hilo."""
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.authenticated = server.token is None
+        self.subscribed = False
+        self.topics = None # Eventos pedidos por nombre; None = los habituales
+        self.closed = False
+        self._queue = queue.Queue(maxsize=CONTROL_CLIENT_QUEUE_SIZE)
+        threading.Thread(target=self._write_loop, name="control-writer", daemon=True).start()
+
+    def wants(self, event):
+        if not self.subscribed:
+            return False
+        if self.topics is not None:
+            return event in self.topics
+        return event not in CONTROL_OPT_IN_EVENTS
+
+    def send(self, message):
+        self.send_line(encode_line(message))
+
+    def send_line(self, data):
+        """Encola una línea ya codificada sin bloquear; un cliente que no lee a tiempo se desconecta."""
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.close()
+
+    def reply(self, request_id, result=None, error=None):
+        if error is not None:
+            self.send({"id": request_id, "type": "error", "error": str(error)})
+        else:
+            self.send({"id": request_id, "type": "result", "result": result})
+
+    def _write_loop(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                break
+        self.close()
+
+    def close(self, flush=False):
+        """Cierra la conexión; con flush, después de enviar lo que ya estaba encolado."""
+        if flush and not self.closed:
+            try:
+                self._queue.put_nowait(None)
+                return
+            except queue.Full:
+                pass
+        if self.closed:
+            return
+        self.closed = True
+        self.server.discard(self)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class _ControlTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        control = self.server.control
+        conn = _ControlClientConnection(control, self.request)
+        control.add(conn)
+        try:
+            while not conn.closed:
+                line = self.rfile.readline(CONTROL_MAX_LINE)
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                control.handle_line(conn, line)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+class ControlServer:
+    """
+    Servidor del canal de control, atendido con un hilo por cliente. `handler(cmd, args,
+    reply)` resuelve cada solicitud llamando a reply(result) o reply(error=...), en ese
+    momento o más tarde desde cualquier hilo; publish() envía un evento a los suscriptos.
+    """
+    def __init__(self, handler, port, token=None, host=CONTROL_HOST, hello_info=None):
+        self.handler = handler
+        self.port = port
+        self.host = host
+        self.token = token
+        self.hello_info = hello_info or {}
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = _ControlTCPServer((self.host, self.port), _ControlRequestHandler)
+        self._server.control = self
+        threading.Thread(target=self._server.serve_forever, args=(CONTROL_POLL_INTERVAL,), name="control-server",
+                         daemon=True).start()
+
+    def add(self, conn):
+        with self._lock:
+            self._clients.add(conn)
+
+    def discard(self, conn):
+        with self._lock:
+            self._clients.discard(conn)
+
+    def client_count(self):
+        return len(self._clients)
+
+    def handle_line(self, conn, line):
+        try:
+            message = json.loads(line)
+            request_id = message.get("id")
+            cmd = message.get("cmd")
+            args = message.get("args") or {}
+            if not isinstance(args, dict):
+                raise ValueError("'args' no es un objeto")
+        except (ValueError, AttributeError):
+            conn.send({"id": None, "type": "error", "error": "solicitud JSON inválida"})
+            return
+        if cmd == "hello":
+            if self.token is not None and not _token_matches(args.get("token"), self.token):
+                conn.reply(request_id, error="token inválido")
+                conn.close(flush=True)
+                return
+            events = args.get("events")
+            if not (events is None or isinstance(events, bool) or
+                    isinstance(events, list) and all(isinstance(event, str) for event in events)):
+                conn.reply(request_id, error="'events' debe ser true o una lista de nombres de evento")
+                return
+            conn.authenticated = True
+            conn.subscribed = bool(events)
+            conn.topics = frozenset(events) if isinstance(events, list) else None
+            conn.reply(request_id, dict(self.hello_info, protocol=CONTROL_PROTOCOL_VERSION))
+            return
+        if not conn.authenticated:
+            conn.reply(request_id, error="falta 'hello' con el token del nodo")
+            conn.close(flush=True)
+            return
+
+        def reply(result=None, error=None):
+            conn.reply(request_id, result, error)
+        try:
+            self.handler(cmd, args, reply)
+        except Exception as e:
+            reply(error=f"error al procesar '{cmd}': {e}")
+
+    def publish(self, event, data):
+        """Envía un evento a los clientes suscriptos (no bloquea)."""
+        if not self._clients:
+            return
+        with self._lock:
+            clients = [conn for conn in self._clients if conn.wants(event)]
+        if not clients:
+            return
+        line = encode_line({"type": "event", "event": event, "data": data, "ts": time.time()})
+        for conn in clients:
+            conn.send_line(line)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            clients = list(self._clients)
+        for conn in clients:
+            conn.close(flush=True) # Las respuestas pendientes (ej. a 'stop') llegan antes del cierre
+
+
+class NodeControlClient:
+    """
+    Cliente del canal de control de un nodo. Corre en un event loop de asyncio que gira en
+    otro hilo (el de la GUI es el del multiplexor de salida) y se reconecta solo mientras no
+    se cierre. request() se puede llamar desde cualquier hilo y devuelve un
+    concurrent.futures.Future; on_event(event, data) y on_state(conectado) se llaman desde el
+    hilo del loop. `events` es True (eventos habituales), False o una lista de nombres.
+    Registra el tiempo de ida y vuelta de cada solicitud (latency()).
+    """
+    def __init__(self, loop, port, token=None, host=CONTROL_HOST, on_event=None, on_state=None, events=True):
+        self.loop = loop
+        self.host = host
+        self.port = port
+        self.token = token
+        self.on_event = on_event
+        self.on_state = on_state
+        self.events = events
+        self.connected = False
+        self.node_info = {} # Respuesta a 'hello': node_id, puerto, versión del protocolo
+        self.round_trips = deque(maxlen=CONTROL_LATENCY_SAMPLES)
+        self._writer = None
+        self._pending = {} # id -> asyncio.Future
+        self._next_id = 0
+        self._closed = False
+        self._task = None
+        loop.call_soon_threadsafe(self._start)
+
+    def request(self, cmd, args=None, timeout=CONTROL_REQUEST_TIMEOUT):
+        return asyncio.run_coroutine_threadsafe(self._request(cmd, args, timeout), self.loop)
+
+    def latency(self):
+        """(muestras, p50, p95) del tiempo de ida y vuelta en segundos; None sin muestras."""
+        samples = sorted(self.round_trips)
+        if not samples:
+            return 0, None, None
+        return len(samples), samples[len(samples) // 2], samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+
+    async def _request(self, cmd, args, timeout, connection_request=False):
+        if self._writer is None or (not self.connected and not connection_request):
+            raise ControlError("sin conexión con el nodo")
+        self._next_id += 1
+        request_id = self._next_id
+        future = self.loop.create_future()
+        self._pending[request_id] = future
+        start = time.perf_counter()
+        try:
+            self._writer.write(encode_line({"id": request_id, "cmd": cmd, "args": args or {}}))
+            await self._writer.drain()
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise ControlError(f"el nodo no respondió '{cmd}' en {timeout}s") from None
+        except OSError as e:
+            raise ControlError(f"error de conexión: {e}") from e
+        finally:
+            self._pending.pop(request_id, None)
+        self.round_trips.append(time.perf_counter() - start)
+        return result
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=CONTROL_MAX_LINE)
+            except OSError:
+                await asyncio.sleep(CONTROL_RECONNECT_INTERVAL)
+                continue
+            self._writer = writer
+            read_task = self.loop.create_task(self._read(reader))
+            try:
+                self.node_info = await self._request("hello", {"token": self.token, "events": self.events},
+                                                     CONTROL_REQUEST_TIMEOUT, connection_request=True)
+                self._set_connected(True)
+                await read_task
+            except (ControlError, OSError, asyncio.CancelledError):
+                pass
+            finally:
+                read_task.cancel()
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ControlError("se cerró la conexión con el nodo"))
+                self._set_connected(False)
+            if not self._closed:
+                await asyncio.sleep(CONTROL_RECONNECT_INTERVAL)
+
+    async def _read(self, reader):
+        while True:
+            try:
+                line = await reader.readline()
+            except (ValueError, OSError): # Línea demasiado larga o conexión reseteada
+                break
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            if message.get("type") == "event":
+                if self.on_event is not None:
+                    try:
+                        self.on_event(message.get("event"), message.get("data"))
+                    except Exception as e: # Un error del callback no debe cortar la conexión
+                        print(f"[{self.port}] Error al procesar el evento '{message.get('event')}': {e}")
+                continue
+            future = self._pending.get(message.get("id"))
+            if future is None or future.done():
+                continue
+            if message.get("type") == "error":
+                future.set_exception(ControlError(message.get("error")))
+            else:
+                future.set_result(message.get("result"))
+
+    def _set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            if self.on_state is not None:
+                self.on_state(connected)
+
+    def close(self):
+        self._closed = True
+        self.loop.call_soon_threadsafe(self._cancel)
+
+    def _start(self):
+        self._task = self.loop.create_task(self._run())
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+# node_log_store.py
+#
+# P2P Miner GUI - Log persistente de cada nodo, rotativo y comprimido, con índice.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Guarda la salida de un nodo (y de su XMRig) en un directorio propio, una línea
+# por registro: "timestamp<TAB>nivel<TAB>stream<TAB>texto". El segmento activo (current.log)
+# es texto plano y se escribe en bloques de ~LOG_BLOCK_SIZE; al cerrar cada bloque se agrega
+# una línea a su índice (current.log.idx) con la posición, el rango de tiempo y los niveles
+# que contiene. Al llegar a LOG_SEGMENT_SIZE el segmento se rota y un hilo lo comprime bloque
+# por bloque (un miembro gzip por bloque: 000001.log.gz se lee con zcat y cada bloque se
+# descomprime por separado). Los segmentos comprimidos más viejos se borran al superar
+# LOG_MAX_BYTES.
+#
+# NodeLogReader lee con mmap solo los bloques necesarios: el final del log, la página
+# anterior o siguiente a una posición, y búsquedas por rango de tiempo, nivel o texto que
+# saltean los bloques que el índice descarta. Una posición es (segmento, byte del registro
+# en el texto sin comprimir) y no cambia al rotar ni al comprimir.
+#
+# Uso: python node_log_store.py DIRECTORIO [--tail N] [--since T] [--until T] [--level L] [--grep TEXTO]
+#
+
+import argparse
+import concurrent.futures
+import json
+import mmap
+import os
+import threading
+import time
+import zlib
+
+LOG_BLOCK_SIZE = 64 * 1024 # Bytes de texto por bloque (unidad de índice, compresión y lectura)
+LOG_SEGMENT_SIZE = 16 * 1024 * 1024 # Tamaño del segmento activo antes de rotarlo
+LOG_MAX_BYTES = 512 * 1024 * 1024 # Espacio máximo de los segmentos comprimidos de un nodo
+LOG_COMPRESS_LEVEL = 6
+LOG_PAGE_LINES = 500 # Registros por página al recorrer el historial
+LOG_SEARCH_LIMIT = 1000 # Coincidencias máximas por búsqueda (las más recientes)
+LOG_CURRENT = "current.log"
+LOG_INDEX_SUFFIX = ".idx"
+LOG_COMPRESSED_SUFFIX = ".gz"
+
+LOG_LEVELS = ("INFO", "WARN", "ERROR")
+LOG_ALL_LEVELS = (1 << len(LOG_LEVELS)) - 1 # Máscara de bits de niveles de un bloque
+_ERROR_WORDS = ("error", "traceback", "exception", "excepción", "fatal")
+_WARN_WORDS = ("advertencia", "warning", "aviso", "no se pudo", "falló", "rechaz", "timeout")
+
+
+def classify_level(stream, text):
+    """Nivel de una línea: stderr es ERROR; si no, se deduce del texto."""
+    if stream == "stderr":
+        return "ERROR"
+    lowered = text.lower()
+    if any(word in lowered for word in _ERROR_WORDS):
+        return "ERROR"
+    if any(word in lowered for word in _WARN_WORDS):
+        return "WARN"
+    return "INFO"
+
+
+def level_mask(min_level=None):
+    """Máscara de los niveles iguales o más graves que `min_level` (todos con None)."""
+    if min_level is None:
+        return LOG_ALL_LEVELS
+    if min_level not in LOG_LEVELS:
+        raise ValueError(f"nivel desconocido: '{min_level}' (usar {', '.join(LOG_LEVELS)})")
+    start = LOG_LEVELS.index(min_level)
+    return sum(1 << i for i in range(start, len(LOG_LEVELS)))
+
+
+def format_record(timestamp, level, stream, text):
+    return f"{timestamp:.3f}\t{level}\t{stream}\t{text}\n".encode("utf-8")
+
+
+def parse_record(line):
+    """(timestamp, nivel, stream, texto) de una línea del log, o None si no tiene el formato."""
+    parts = line.decode("utf-8", errors="replace").split("\t", 3)
+    if len(parts) != 4:
+        return None
+    try:
+        return float(parts[0]), parts[1], parts[2], parts[3]
+    except ValueError:
+        return None
+
+
+def format_log_record(record):
+    """Una línea para mostrar: fecha, nivel y texto."""
+    timestamp, level, _, text = record
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+    return f"{when} {level:<5} {text}"
+
+
+def parse_log_time(text, now=None):
+    """Timestamp de 'AAAA-MM-DD HH:MM[:SS]', 'AAAA-MM-DD' o 'HH:MM[:SS]' (hoy)."""
+    text = text.strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            pass
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            parsed = time.strptime(text, fmt)
+        except ValueError:
+            continue
+        today = time.localtime(now)
+        return time.mktime((today.tm_year, today.tm_mon, today.tm_mday, parsed.tm_hour, parsed.tm_min,
+                            parsed.tm_sec, 0, 0, -1))
+    raise ValueError(f"hora inválida: '{text}' (usar AAAA-MM-DD HH:MM o HH:MM)")
+
+
+def _segment_name(seq):
+    return f"{seq:06d}.log"
+
+
+def _segment_seq(name):
+    """Número de segmento de un archivo '000123.log...' (sin temporales) o None."""
+    if len(name) < 10 or not name[:6].isdigit() or name[6:10] != ".log" or name.endswith(".tmp"):
+        return None
+    return int(name[:6])
+
+
+def _read_index(path):
+    """Entradas del índice; una última línea a medio escribir (corte abrupto) se ignora."""
+    entries = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+    except OSError:
+        pass
+    return entries
+
+
+def _write_index(path, entries):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(temp_path, path)
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError: # Ya no está, o (en Windows) un lector lo tiene abierto: se reintenta después
+            pass
+
+
+def compress_segment(directory, seq, level=LOG_COMPRESS_LEVEL, max_bytes=LOG_MAX_BYTES):
+    """Comprime un segmento cerrado, un miembro gzip por bloque, y aplica la retención."""
+    plain_path = os.path.join(directory, _segment_name(seq))
+    compressed_path = plain_path + LOG_COMPRESSED_SUFFIX
+    entries = []
+    with open(plain_path, "rb") as source, open(f"{compressed_path}.tmp", "wb") as target:
+        for entry in _read_index(plain_path + LOG_INDEX_SUFFIX):
+            source.seek(entry["offset"])
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31: formato gzip
+            chunk = compressor.compress(source.read(entry["size"])) + compressor.flush()
+            entries.append(dict(entry, offset=target.tell(), size=len(chunk)))
+            target.write(chunk)
+    os.replace(f"{compressed_path}.tmp", compressed_path)
+    # El índice va último: un segmento comprimido existe para los lectores cuando tiene índice
+    _write_index(compressed_path + LOG_INDEX_SUFFIX, entries)
+    _remove(plain_path + LOG_INDEX_SUFFIX, plain_path)
+    enforce_retention(directory, max_bytes)
+
+
+def enforce_retention(directory, max_bytes=LOG_MAX_BYTES):
+    """Borra los segmentos comprimidos más viejos hasta quedar bajo `max_bytes` (conserva el último)."""
+    sizes = {}
+    for name in os.listdir(directory):
+        seq = _segment_seq(name)
+        if seq is not None and name.endswith(LOG_COMPRESSED_SUFFIX + LOG_INDEX_SUFFIX):
+            data_path = os.path.join(directory, name[:-len(LOG_INDEX_SUFFIX)])
+            try:
+                sizes[seq] = os.path.getsize(data_path) + os.path.getsize(data_path + LOG_INDEX_SUFFIX)
+            except OSError:
+                continue
+    total = sum(sizes.values())
+    for seq in sorted(sizes)[:-1]:
+        if total <= max_bytes:
+            break
+        data_path = os.path.join(directory, _segment_name(seq) + LOG_COMPRESSED_SUFFIX)
+        _remove(data_path + LOG_INDEX_SUFFIX, data_path)
+        total -= sizes[seq]
+
+
+class NodeLogStore:
+    """
+    Escritor del log de un nodo. append() se puede llamar desde cualquier hilo; la compresión
+    de los segmentos rotados corre en un hilo aparte para no frenar a quien escribe.
+    """
+    def __init__(self, directory, block_size=LOG_BLOCK_SIZE, segment_size=LOG_SEGMENT_SIZE,
+                 max_bytes=LOG_MAX_BYTES, compress_level=LOG_COMPRESS_LEVEL):
+        self.directory = directory
+        self.block_size = block_size
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._compressor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+        self._data = None
+        self._index = None
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self._open_current()
+        self._rotate_at = segment_size
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _recover(self):
+        """Termina lo que un cierre abrupto dejó a medias: compresiones pendientes y temporales."""
+        names = os.listdir(self.directory)
+        seqs = {_segment_seq(name) for name in names} - {None}
+        self.seq = max(seqs) + 1 if seqs else 1 # Número que tendrá el segmento activo al rotarlo
+        for name in names:
+            if name.endswith(".tmp"):
+                _remove(self._path(name))
+        for seq in sorted(seqs):
+            plain_path = self._path(_segment_name(seq))
+            if os.path.exists(plain_path + LOG_COMPRESSED_SUFFIX + LOG_INDEX_SUFFIX):
+                _remove(plain_path + LOG_INDEX_SUFFIX, plain_path) # Ya comprimido
+            elif os.path.exists(plain_path + LOG_INDEX_SUFFIX):
+                self._submit_compression(seq)
+            else: # Datos de un segmento que la retención no pudo terminar de borrar
+                _remove(plain_path + LOG_COMPRESSED_SUFFIX, plain_path)
+
+    def _open_current(self):
+        """Abre el segmento activo; si ya existía, retoma su último bloque sin cerrar."""
+        data_path = self._path(LOG_CURRENT)
+        index_path = data_path + LOG_INDEX_SUFFIX
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        entries = [entry for entry in _read_index(index_path) if entry["pos"] + entry["length"] <= size]
+        indexed = entries[-1]["pos"] + entries[-1]["length"] if entries else 0
+        tail = b""
+        if size > indexed:
+            with open(data_path, "r+b") as f:
+                f.seek(indexed)
+                tail = f.read()
+                tail = tail[:tail.rfind(b"\n") + 1] # Una línea a medio escribir se descarta
+                f.truncate(indexed + len(tail))
+        _write_index(index_path, entries)
+        self._data = open(data_path, "ab")
+        self._index = open(index_path, "a", encoding="utf-8")
+        self._size = indexed + len(tail)
+        self._new_block(indexed)
+        for line in tail.split(b"\n")[:-1]:
+            record = parse_record(line)
+            if record is not None:
+                self._add_to_block(record[0], record[1], len(line) + 1)
+
+    def _new_block(self, pos):
+        # pos/length: en el texto sin comprimir; offset/size: en el archivo (iguales hasta comprimirlo)
+        self._block = {"pos": pos, "length": 0, "offset": pos, "size": 0, "start": None, "end": None,
+                       "lines": 0, "levels": 0}
+
+    def _add_to_block(self, timestamp, level, size):
+        block = self._block
+        if block["start"] is None:
+            block["start"] = timestamp
+        block["end"] = max(timestamp, block["end"] or timestamp)
+        block["length"] += size
+        block["size"] += size
+        block["lines"] += 1
+        block["levels"] |= 1 << (LOG_LEVELS.index(level) if level in LOG_LEVELS else 0)
+
+    def append(self, stream, text, timestamp=None):
+        """Agrega las líneas no vacías de `text` como registros de `stream`."""
+        lines = [line for line in text.splitlines() if line.strip()]
+        if not lines:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._data is None: # Cerrado
+                return
+            for line in lines:
+                level = classify_level(stream, line)
+                record = format_record(timestamp, level, stream, line)
+                self._data.write(record)
+                self._size += len(record)
+                self._add_to_block(timestamp, level, len(record))
+                if self._block["length"] >= self.block_size:
+                    self._close_block()
+            self._data.flush()
+            if self._size >= self._rotate_at:
+                self._rotate()
+
+    def _close_block(self):
+        if self._block["lines"]:
+            self._data.flush() # Los lectores solo usan entradas del índice que ya están en el archivo
+            self._index.write(json.dumps(self._block) + "\n")
+            self._index.flush()
+        self._new_block(self._size)
+
+    def _rotate(self):
+        self._close_block()
+        self._data.close()
+        self._index.close()
+        data_path = self._path(LOG_CURRENT)
+        target = self._path(_segment_name(self.seq))
+        try:
+            os.replace(data_path, target)
+        except OSError as e: # En Windows falla si un lector lo tiene abierto: se reintenta en el próximo bloque
+            print(f"No se pudo rotar el log de {self.directory}: {e}")
+            self._data = open(data_path, "ab")
+            self._index = open(data_path + LOG_INDEX_SUFFIX, "a", encoding="utf-8")
+            self._rotate_at = self._size + self.block_size
+            return
+        os.replace(data_path + LOG_INDEX_SUFFIX, target + LOG_INDEX_SUFFIX)
+        self._submit_compression(self.seq)
+        self.seq += 1
+        self._rotate_at = self.segment_size
+        self._open_current()
+
+    def _submit_compression(self, seq):
+        def report(future):
+            if future.exception() is not None:
+                print(f"No se pudo comprimir el segmento {seq} de {self.directory}: {future.exception()}")
+        self._compressor.submit(compress_segment, self.directory, seq, self.compress_level,
+                                self.max_bytes).add_done_callback(report)
+
+    def close(self):
+        with self._lock:
+            if self._data is None:
+                return
+            self._close_block()
+            self._data.close()
+            self._index.close()
+            self._data = self._index = None
+        self._compressor.shutdown(wait=True)
+
+
+class NodeLogReader:
+    """
+    Lectura del log de un nodo (puede estar escribiéndolo otro proceso). Las páginas se
+    devuelven como (registros, posición del primero, posición siguiente al último): la
+    primera sirve para pedir la página anterior y la segunda para la siguiente.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._indexes = {} # Ruta -> entradas de los segmentos cerrados (no cambian)
+        self._lock = threading.Lock() # La GUI lee desde varios hilos a la vez
+
+    def _segments(self):
+        """[(número, ruta, comprimido, entradas)] del más viejo al segmento activo."""
+        try:
+            names = set(os.listdir(self.directory))
+        except OSError:
+            return []
+        seqs = {_segment_seq(name) for name in names} - {None}
+        segments = []
+        with self._lock:
+            for seq in sorted(seqs):
+                plain_path = os.path.join(self.directory, _segment_name(seq))
+                for path, compressed in ((plain_path + LOG_COMPRESSED_SUFFIX, True), (plain_path, False)):
+                    if os.path.basename(path) + LOG_INDEX_SUFFIX in names and os.path.basename(path) in names:
+                        if path not in self._indexes:
+                            self._indexes[path] = _read_index(path + LOG_INDEX_SUFFIX)
+                        segments.append((seq, path, compressed, self._indexes[path]))
+                        break
+            listed = {segment[1] for segment in segments}
+            for path in set(self._indexes) - listed: # Segmentos borrados por la retención
+                self._indexes.pop(path, None)
+        current = os.path.join(self.directory, LOG_CURRENT)
+        segments.append((max(seqs) + 1 if seqs else 1, current, False, self._current_entries(current)))
+        return segments
+
+    @staticmethod
+    def _current_entries(path):
+        """Entradas del segmento activo; lo escrito después del último bloque cerrado es un bloque abierto."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return []
+        entries = [entry for entry in _read_index(path + LOG_INDEX_SUFFIX) if entry["pos"] + entry["length"] <= size]
+        indexed = entries[-1]["pos"] + entries[-1]["length"] if entries else 0
+        if size > indexed:
+            entries.append({"pos": indexed, "length": size - indexed, "offset": indexed, "size": size - indexed,
+                            "start": None, "end": None, "lines": None, "levels": LOG_ALL_LEVELS})
+        return entries
+
+    @staticmethod
+    def _read_block(path, compressed, entry, start=None):
+        """Texto del bloque (desde el registro en `start` si el segmento no está comprimido)."""
+        skip = start - entry["pos"] if start is not None and not compressed and start > entry["pos"] else 0
+        try:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = mapped[entry["offset"] + skip:entry["offset"] + entry["size"]]
+        except (OSError, ValueError): # Rotado, borrado o vacío mientras se leía
+            return b"", skip
+        if compressed:
+            data = zlib.decompress(data, 31)
+        return data, skip
+
+    def _block_records(self, seq, path, compressed, entry, start=None):
+        """[((segmento, posición), registro, posición siguiente)] de los registros completos del bloque."""
+        data, skip = self._read_block(path, compressed, entry, start)
+        records = []
+        pos = entry["pos"] + skip
+        lines = data.split(b"\n")
+        for line in lines[:-1]: # Lo que sigue al último salto de línea está a medio escribir
+            record = parse_record(line)
+            if record is not None:
+                records.append(((seq, pos), record, (seq, pos + len(line) + 1)))
+            pos += len(line) + 1
+        return records
+
+    def _blocks(self, segments, reverse=False, since=None, until=None, mask=LOG_ALL_LEVELS):
+        """Bloques en orden (inverso con `reverse`) salteando los que el índice descarta."""
+        for seq, path, compressed, entries in (reversed(segments) if reverse else segments):
+            for entry in (reversed(entries) if reverse else entries):
+                if entry["start"] is not None:
+                    if (since is not None and entry["end"] < since) or (until is not None and entry["start"] > until):
+                        continue
+                if not entry["levels"] & mask:
+                    continue
+                yield seq, path, compressed, entry
+
+    @staticmethod
+    def _page(records):
+        if not records:
+            return [], None, None
+        return [record for _, record, _ in records], records[0][0], records[-1][2]
+
+    def page_before(self, position=None, count=LOG_PAGE_LINES):
+        """Los `count` registros anteriores a `position` (los últimos del log con None)."""
+        page = []
+        for seq, path, compressed, entry in self._blocks(self._segments(), reverse=True):
+            if position is not None and (seq, entry["pos"]) >= position:
+                continue
+            block = [item for item in self._block_records(seq, path, compressed, entry)
+                     if position is None or item[0] < position]
+            page[:0] = block[-(count - len(page)):]
+            if len(page) >= count:
+                break
+        return self._page(page)
+
+    def page_after(self, position=None, count=LOG_PAGE_LINES):
+        """Los `count` registros desde `position` inclusive (desde el principio con None)."""
+        page = []
+        for seq, path, compressed, entry in self._blocks(self._segments()):
+            if position is not None and (seq, entry["pos"] + entry["length"]) <= position:
+                continue
+            start = position[1] if position is not None and position[0] == seq else None
+            block = [item for item in self._block_records(seq, path, compressed, entry, start)
+                     if position is None or item[0] >= position]
+            page += block[:count - len(page)]
+            if len(page) >= count:
+                break
+        return self._page(page)
+
+    def tail(self, count=LOG_PAGE_LINES):
+        return self.page_before(None, count)
+
+    def end_position(self):
+        """Posición siguiente al último registro completo: desde ahí se sigue lo que se escriba."""
+        segments = self._segments()
+        if not segments:
+            return (1, 0)
+        seq, path, _, entries = segments[-1]
+        if not entries:
+            return (seq, 0)
+        entry = entries[-1]
+        if entry["lines"] is not None:
+            return (seq, entry["pos"] + entry["length"])
+        data, _ = self._read_block(path, False, entry)
+        return (seq, entry["pos"] + data.rfind(b"\n") + 1)
+
+    def search(self, keyword=None, since=None, until=None, min_level=None, limit=LOG_SEARCH_LIMIT):
+        """
+        Las últimas `limit` coincidencias (en orden cronológico) y estadísticas de la búsqueda:
+        {"matches", "truncated", "blocks", "scanned", "bytes"}.
+        """
+        mask = level_mask(min_level)
+        needle = keyword.lower() if keyword else None
+        # Prefiltro por bloque sobre los bytes; bytes.lower() solo cambia ASCII
+        raw_needle = needle.encode("utf-8") if needle and needle.isascii() else None
+        segments = self._segments()
+        result = {"matches": [], "truncated": False, "blocks": sum(len(entries) for *_, entries in segments),
+                  "scanned": 0, "bytes": 0}
+        matches = result["matches"]
+        for seq, path, compressed, entry in self._blocks(segments, True, since, until, mask):
+            data, _ = self._read_block(path, compressed, entry)
+            result["scanned"] += 1
+            result["bytes"] += len(data)
+            if raw_needle is not None and raw_needle not in data.lower():
+                continue
+            for line in reversed(data.split(b"\n")[:-1]):
+                record = parse_record(line)
+                if record is None:
+                    continue
+                timestamp, level, _, text = record
+                if (since is not None and timestamp < since) or (until is not None and timestamp > until):
+                    continue
+                if level in LOG_LEVELS and not (1 << LOG_LEVELS.index(level)) & mask:
+                    continue
+                if needle is not None and needle not in text.lower():
+                    continue
+                matches.append(record)
+                if len(matches) >= limit:
+                    result["truncated"] = True
+                    break
+            if result["truncated"]:
+                break
+        matches.reverse()
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lee el log persistente de un nodo (directorio de NodeLogStore).")
+    parser.add_argument("directory")
+    parser.add_argument("--tail", type=int, default=50, help="Últimos N registros (sin filtros de búsqueda)")
+    parser.add_argument("--since", default=None, help="Desde (AAAA-MM-DD HH:MM o HH:MM)")
+    parser.add_argument("--until", default=None, help="Hasta (AAAA-MM-DD HH:MM o HH:MM)")
+    parser.add_argument("--level", default=None, choices=LOG_LEVELS, help="Nivel mínimo")
+    parser.add_argument("--grep", default=None, help="Texto a buscar (sin distinguir mayúsculas)")
+    parser.add_argument("--limit", type=int, default=LOG_SEARCH_LIMIT)
+    args = parser.parse_args()
+    reader = NodeLogReader(args.directory)
+    if not (args.since or args.until or args.level or args.grep):
+        for record in reader.tail(args.tail)[0]:
+            print(format_log_record(record))
+        return
+    started = time.perf_counter()
+    result = reader.search(args.grep, parse_log_time(args.since) if args.since else None,
+                           parse_log_time(args.until) if args.until else None, args.level, args.limit)
+    for record in result["matches"]:
+        print(format_log_record(record))
+    print(f"{len(result['matches'])} coincidencias{' (las más recientes)' if result['truncated'] else ''}; "
+          f"{result['scanned']}/{result['blocks']} bloques leídos ({result['bytes'] / 2 ** 20:.1f} MiB) "
+          f"en {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
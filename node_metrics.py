@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# node_metrics.py
+#
+# P2P Miner GUI - Métricas internas del nodo P2P.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Contadores por tipo de mensaje (recibidos/enviados, mensajes y bytes),
+# histogramas de latencia de los handlers y del fan-out de broadcast, y valores instantáneos
+# (peers, profundidad de colas) que se leen solo al exportar. Se exportan como diccionario
+# (comando 'metrics' y GUI) y en formato de texto de Prometheus por un endpoint HTTP local
+# opcional (/metrics y /metrics.json).
+#
+
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "127.0.0.1" # El endpoint solo atiende conexiones locales
+METRICS_PORT_OFFSET = 20000 # Puerto de métricas que usa la GUI: puerto del nodo + este valor
+METRICS_OTHER_TYPE = "other" # Tipos de mensaje desconocidos (evita etiquetas sin límite)
+# Límites de los buckets en segundos (50 µs a 1 s), como los histogramas de Prometheus
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_POLL_INTERVAL = 0.05 # Cada cuánto revisa el servidor si debe detenerse (acota la espera de stop)
+
+
+class Histogram:
+    """Histograma de buckets fijos: observar es una búsqueda binaria y un incremento."""
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # El último bucket es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, fraction):
+        """Estimación del cuantil interpolando dentro del bucket (como histogram_quantile)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": list(self.counts),
+        }
+
+
+class _TypeCounters:
+    __slots__ = ("messages_in", "bytes_in", "messages_out", "bytes_out", "handler")
+
+    def __init__(self):
+        self.messages_in = 0
+        self.bytes_in = 0
+        self.messages_out = 0
+        self.bytes_out = 0
+        self.handler = Histogram()
+
+
+class NodeMetrics:
+    """
+    Métricas de un nodo. Los registros del camino caliente (record_in, record_out,
+    record_fan_out) solo incrementan contadores bajo un lock; los valores instantáneos se
+    registran como funciones con register() y se evalúan únicamente en snapshot().
+    """
+    def __init__(self, known_types=()):
+        self.known_types = frozenset(known_types)
+        self.started_at = time.time()
+        self.decode_errors = 0
+        self.fan_out = Histogram()
+        self.fan_out_peers = 0
+        self._types = {}
+        self._gauges = {} # nombre -> (ayuda, tipo de Prometheus, función)
+        self._lock = threading.Lock()
+
+    def _counters(self, msg_type):
+        if msg_type not in self.known_types:
+            msg_type = METRICS_OTHER_TYPE
+        counters = self._types.get(msg_type)
+        if counters is None:
+            counters = self._types[msg_type] = _TypeCounters()
+        return counters
+
+    def record_in(self, msg_type, size, seconds):
+        """Mensaje recibido de `size` bytes cuyo handler tardó `seconds`."""
+        with self._lock:
+            counters = self._counters(msg_type)
+            counters.messages_in += 1
+            counters.bytes_in += size
+            counters.handler.observe(seconds)
+
+    def record_out(self, msg_type, size, count=1):
+        """`count` mensajes enviados (o encolados) que suman `size` bytes."""
+        with self._lock:
+            counters = self._counters(msg_type)
+            counters.messages_out += count
+            counters.bytes_out += size
+
+    def record_fan_out(self, peers, seconds):
+        with self._lock:
+            self.fan_out.observe(seconds)
+            self.fan_out_peers += peers
+
+    def record_decode_error(self):
+        with self._lock:
+            self.decode_errors += 1
+
+    def register(self, name, help_text, func, kind="gauge"):
+        """Valor leído al exportar: `func()` devuelve un número."""
+        self._gauges[name] = (help_text, kind, func)
+
+    def _read_gauges(self):
+        values = {}
+        for name, (_, _, func) in self._gauges.items():
+            try:
+                values[name] = func()
+            except Exception: # Una métrica rota no debe impedir exportar las demás
+                values[name] = None
+        return values
+
+    def snapshot(self):
+        gauges = self._read_gauges()
+        with self._lock:
+            types = {msg_type: {
+                "messages_in": c.messages_in,
+                "bytes_in": c.bytes_in,
+                "messages_out": c.messages_out,
+                "bytes_out": c.bytes_out,
+                "handler": c.handler.snapshot(),
+            } for msg_type, c in self._types.items()}
+            fan_out = self.fan_out.snapshot()
+            fan_out["peers"] = self.fan_out_peers
+            decode_errors = self.decode_errors
+        return {
+            "timestamp": time.time(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "types": types,
+            "fan_out": fan_out,
+            "decode_errors": decode_errors,
+            "gauges": gauges,
+            "buckets": list(LATENCY_BUCKETS),
+        }
+
+    def prometheus_text(self):
+        """Exportación en el formato de texto de Prometheus (versión 0.0.4)."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, data, labels=""):
+            cumulative = 0
+            for bound, bucket_count in zip(list(LATENCY_BUCKETS) + ["+Inf"], data["buckets"]):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            brace = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{name}_sum{brace} {data['sum']}")
+            lines.append(f"{name}_count{brace} {data['count']}")
+
+        types = sorted(snapshot["types"].items())
+        for key, name, help_text in (
+                ("messages_in", "p2p_messages_received_total", "Mensajes P2P recibidos por tipo"),
+                ("bytes_in", "p2p_bytes_received_total", "Bytes P2P recibidos por tipo (con cabecera de trama)"),
+                ("messages_out", "p2p_messages_sent_total", "Mensajes P2P enviados o encolados por tipo"),
+                ("bytes_out", "p2p_bytes_sent_total", "Bytes P2P enviados o encolados por tipo")):
+            family(name, "counter", help_text)
+            for msg_type, data in types:
+                lines.append(f'{name}{{type="{_escape(msg_type)}"}} {data[key]}')
+
+        family("p2p_handler_seconds", "histogram", "Duración del procesamiento de cada mensaje recibido")
+        for msg_type, data in types:
+            histogram("p2p_handler_seconds", data["handler"], f'type="{_escape(msg_type)}",')
+
+        family("p2p_broadcast_fanout_seconds", "histogram", "Duración de codificar y encolar un broadcast")
+        histogram("p2p_broadcast_fanout_seconds", snapshot["fan_out"])
+        family("p2p_broadcast_fanout_peers_total", "counter", "Peers alcanzados sumando todos los broadcasts")
+        lines.append(f"p2p_broadcast_fanout_peers_total {snapshot['fan_out']['peers']}")
+        family("p2p_decode_errors_total", "counter", "Mensajes recibidos que no se pudieron decodificar")
+        lines.append(f"p2p_decode_errors_total {snapshot['decode_errors']}")
+        family("p2p_uptime_seconds", "gauge", "Segundos desde que se inició el nodo")
+        lines.append(f"p2p_uptime_seconds {snapshot['uptime']}")
+
+        for name, (help_text, kind, _) in self._gauges.items():
+            value = snapshot["gauges"].get(name)
+            if value is None:
+                continue
+            family(name, kind, help_text)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_metrics(snapshot):
+    """Resumen legible de un snapshot (para el comando 'metrics')."""
+    def ms(value):
+        return "n/a" if value is None else f"{value * 1000:.2f}ms"
+
+    lines = [f"{'tipo':<24} {'rx msgs':>8} {'rx bytes':>10} {'tx msgs':>8} {'tx bytes':>10} "
+             f"{'p50':>8} {'p95':>8} {'max':>8}"]
+    for msg_type, data in sorted(snapshot["types"].items()):
+        handler = data["handler"]
+        lines.append(f"{msg_type:<24} {data['messages_in']:>8} {data['bytes_in']:>10} {data['messages_out']:>8} "
+                     f"{data['bytes_out']:>10} {ms(handler['p50']):>8} {ms(handler['p95']):>8} "
+                     f"{ms(handler['max'] if handler['count'] else None):>8}")
+    fan_out = snapshot["fan_out"]
+    average_peers = fan_out["peers"] / fan_out["count"] if fan_out["count"] else 0
+    lines.append(f"Broadcasts: {fan_out['count']} (p50 {ms(fan_out['p50'])}, p95 {ms(fan_out['p95'])}, "
+                 f"{average_peers:.1f} peers en promedio). Errores de decodificación: {snapshot['decode_errors']}.")
+    gauges = ", ".join(f"{name}={value}" for name, value in snapshot["gauges"].items())
+    lines.append(f"Uptime {snapshot['uptime']}s. {gauges}")
+    return "\n".join(lines)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        metrics = self.server.metrics
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body, content_type = metrics.prometheus_text().encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Sin una línea de log por cada consulta de Prometheus o de la GUI
+
+
+class MetricsHTTPServer:
+    """Endpoint HTTP local de métricas, atendido en un hilo propio."""
+    def __init__(self, metrics, port, host=METRICS_HOST):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = self.metrics
+        threading.Thread(target=self._server.serve_forever, args=(METRICS_POLL_INTERVAL,), name="metrics-http",
+                         daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
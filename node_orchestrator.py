@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# node_orchestrator.py
+#
+# P2P Miner GUI - Arranque y detención en paralelo de los procesos de los nodos.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Todas las operaciones corren en un event loop de asyncio (el del multiplexor
+# de salida de la GUI), nunca en el hilo de Tk, y sobre todos los nodos a la vez. Detener un
+# nodo escala por etapas: comando 'stop' (canal de control o stdin) y plazo de gracia, SIGTERM
+# y otro plazo, y por último kill. Los procesos hijos del nodo (XMRig) se anotan con psutil
+# antes de empezar y, si sobreviven al nodo, se terminan igual. Cada operación devuelve un
+# resultado por nodo y un resumen que la GUI muestra sin ventanas modales.
+#
+
+import asyncio
+import time
+
+import psutil
+
+NODE_STOP_GRACE = 5 # Segundos para que el nodo termine solo después del comando 'stop'
+NODE_TERM_GRACE = 3 # Segundos después de SIGTERM antes de matarlo (también para los procesos hijos)
+NODE_KILL_WAIT = 2 # Espera final después de kill
+NODE_START_TIMEOUT = 15 # Segundos para que un nodo recién lanzado abra su canal de control
+NODE_POLL_INTERVAL = 0.05 # Cada cuánto se revisa si un nodo ya está listo o ya terminó
+
+# Resultado de cada nodo
+OUTCOME_READY = "ready" # Arrancó y su canal de control respondió
+OUTCOME_NO_CONTROL = "no_control" # Sigue en ejecución pero no abrió el canal de control a tiempo
+OUTCOME_EXITED = "exited" # Terminó durante el arranque
+OUTCOME_STOPPED = "stopped" # Terminó por el comando 'stop'
+OUTCOME_TERMINATED = "terminated" # Hizo falta SIGTERM
+OUTCOME_KILLED = "killed" # Hizo falta kill
+OUTCOME_NOT_RUNNING = "not_running"
+OUTCOME_ERROR = "error"
+
+OUTCOME_TEXTS = {
+    OUTCOME_READY: "listo",
+    OUTCOME_NO_CONTROL: "sin canal de control",
+    OUTCOME_EXITED: "terminó al arrancar",
+    OUTCOME_STOPPED: "detenido con 'stop'",
+    OUTCOME_TERMINATED: "detenido con SIGTERM",
+    OUTCOME_KILLED: "forzado con kill",
+    OUTCOME_NOT_RUNNING: "no estaba en ejecución",
+    OUTCOME_ERROR: "error",
+}
+
+
+class NodeOperationResult:
+    """Resultado de arrancar o detener un nodo."""
+    __slots__ = ("port", "action", "outcome", "seconds", "detail", "process", "children_killed")
+
+    def __init__(self, port, action, outcome, seconds, detail=None, process=None, children_killed=0):
+        self.port = port
+        self.action = action # "start" o "stop"
+        self.outcome = outcome
+        self.seconds = seconds
+        self.detail = detail
+        self.process = process # El proceso lanzado (solo al arrancar)
+        self.children_killed = children_killed # Procesos hijos (XMRig) que sobrevivieron al nodo
+
+    @property
+    def ok(self):
+        return self.outcome not in (OUTCOME_EXITED, OUTCOME_ERROR)
+
+    def describe(self):
+        text = f"Nodo {self.port}: {OUTCOME_TEXTS.get(self.outcome, self.outcome)} en {self.seconds:.1f}s"
+        if self.children_killed:
+            text += f", {self.children_killed} proceso(s) hijo(s) terminados"
+        if self.detail:
+            text += f" ({self.detail})"
+        return text
+
+
+def format_operation_summary(action, results, seconds):
+    """Una línea con el resultado de una operación sobre varios nodos (barra de estado de la GUI)."""
+    verb = "Arranque" if action == "start" else "Detención"
+    counts = {}
+    for result in results:
+        counts[result.outcome] = counts.get(result.outcome, 0) + 1
+    parts = ", ".join(f"{count} {OUTCOME_TEXTS.get(outcome, outcome)}" for outcome, count in sorted(counts.items()))
+    children = sum(result.children_killed for result in results)
+    text = f"{verb} de {len(results)} nodo(s) en {seconds:.1f}s: {parts or 'nada que hacer'}"
+    if children:
+        text += f"; {children} proceso(s) hijo(s) terminados"
+    return text + "."
+
+
+async def wait_for_exit(process, timeout=None):
+    """
+    Espera a que el proceso termine (sin límite con timeout=None); devuelve False si venció el
+    plazo. No usa process.wait(): éste también espera a que se cierren los pipes, que siguen
+    abiertos mientras viva un hijo que los heredó (XMRig).
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while process.returncode is None:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(NODE_POLL_INTERVAL)
+    return True
+
+
+def _children(pid):
+    try:
+        return psutil.Process(pid).children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def _reap_children(children, grace):
+    """Termina los procesos hijos que siguen vivos (SIGTERM y, pasado `grace`, kill). Devuelve cuántos había."""
+    alive = [child for child in children if child.is_running()]
+    for child in alive:
+        try:
+            child.terminate()
+        except psutil.Error:
+            pass
+    _, still_alive = psutil.wait_procs(alive, timeout=grace)
+    for child in still_alive:
+        try:
+            child.kill()
+        except psutil.Error:
+            pass
+    return len(alive)
+
+
+class NodeOrchestrator:
+    """
+    Arranca y detiene nodos en paralelo en `loop`, que gira en otro hilo. start_all() y
+    stop_all() se pueden llamar desde cualquier hilo y devuelven un concurrent.futures.Future
+    con la lista de NodeOperationResult; on_result(result) se llama desde el hilo del loop a
+    medida que termina cada nodo.
+    """
+    def __init__(self, loop, stop_grace=NODE_STOP_GRACE, term_grace=NODE_TERM_GRACE,
+                 start_timeout=NODE_START_TIMEOUT):
+        self.loop = loop
+        self.stop_grace = stop_grace
+        self.term_grace = term_grace
+        self.start_timeout = start_timeout
+
+    def start_all(self, nodes, on_result=None):
+        """
+        `nodes`: {puerto: (spawn, is_ready)}. spawn() es una corrutina que lanza el nodo y
+        devuelve su proceso; is_ready() indica si el canal de control ya respondió.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._run_all([self._start_one(port, spawn, is_ready) for port, (spawn, is_ready) in nodes.items()],
+                          on_result), self.loop)
+
+    def stop_all(self, nodes, on_result=None):
+        """
+        `nodes`: {puerto: (proceso, control)}. El proceso es un asyncio.subprocess.Process;
+        control, un NodeControlClient o None (entonces 'stop' va por stdin).
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._run_all([self._stop_one(port, process, control) for port, (process, control) in nodes.items()],
+                          on_result), self.loop)
+
+    async def _run_all(self, operations, on_result):
+        async def run(operation):
+            result = await operation
+            if on_result is not None:
+                on_result(result)
+            return result
+        return list(await asyncio.gather(*(run(operation) for operation in operations)))
+
+    async def _start_one(self, port, spawn, is_ready):
+        start = time.monotonic()
+        try:
+            process = await spawn()
+        except Exception as e:
+            return NodeOperationResult(port, "start", OUTCOME_ERROR, time.monotonic() - start, str(e))
+        deadline = start + self.start_timeout
+        while not is_ready():
+            if process.returncode is not None:
+                return NodeOperationResult(port, "start", OUTCOME_EXITED, time.monotonic() - start,
+                                           f"código {process.returncode}", process)
+            if time.monotonic() >= deadline:
+                return NodeOperationResult(port, "start", OUTCOME_NO_CONTROL, time.monotonic() - start,
+                                           f"más de {self.start_timeout}s", process)
+            await asyncio.sleep(NODE_POLL_INTERVAL)
+        return NodeOperationResult(port, "start", OUTCOME_READY, time.monotonic() - start, process=process)
+
+    async def _stop_one(self, port, process, control):
+        start = time.monotonic()
+        if process is None or process.returncode is not None:
+            return NodeOperationResult(port, "stop", OUTCOME_NOT_RUNNING, 0.0)
+        # Los hijos se anotan antes: si el nodo muere primero, XMRig queda huérfano y ya no cuelga de él
+        children = await self.loop.run_in_executor(None, _children, process.pid)
+        detail = None
+        try:
+            outcome = await self._escalate(process, control)
+        except Exception as e:
+            outcome, detail = OUTCOME_ERROR, str(e)
+        children_killed = await self.loop.run_in_executor(None, _reap_children, children, self.term_grace)
+        return NodeOperationResult(port, "stop", outcome, time.monotonic() - start, detail,
+                                   children_killed=children_killed)
+
+    async def _escalate(self, process, control):
+        """'stop' -> SIGTERM -> kill, cada etapa con su plazo. Devuelve la etapa que lo detuvo."""
+        if await self._request_stop(process, control) and await wait_for_exit(process, self.stop_grace):
+            return OUTCOME_STOPPED
+        for signal, outcome, grace in ((process.terminate, OUTCOME_TERMINATED, self.term_grace),
+                                       (process.kill, OUTCOME_KILLED, NODE_KILL_WAIT)):
+            try:
+                signal()
+            except ProcessLookupError: # Terminó justo antes de la señal
+                return OUTCOME_STOPPED
+            if await wait_for_exit(process, grace):
+                return outcome
+        raise RuntimeError(f"el proceso {process.pid} sigue vivo después de kill")
+
+    async def _request_stop(self, process, control):
+        """Pide al nodo que se detenga: por el canal de control si está conectado, si no por stdin."""
+        if control is not None and control.connected:
+            control.request("command", {"command": "stop"}) # La respuesta no hace falta: se espera la salida
+            return True
+        if process.stdin is None:
+            return False
+        try:
+            process.stdin.write(b"stop\n")
+            await process.stdin.drain()
+        except (OSError, RuntimeError): # stdin cerrado (el nodo está terminando)
+            return False
+        return True
@@ -10,18 +10,32 @@
 #
 
 import tkinter as tk
-from tkinter import scrolledtext, messagebox, simpledialog
+from tkinter import scrolledtext, messagebox, simpledialog, filedialog
+import argparse
+import asyncio
+import concurrent.futures
 import subprocess
 import os
 import threading
 import time
-import queue
+from collections import deque
 import requests
 import psutil
-import json
+import secrets
+
+from cpu_topology import CPU_MODE_SPLIT, CPU_MODE_SINGLE, read_cpu_topology, plan_cpu_partitions, format_cpu_plan
+from node_metrics import METRICS_HOST, METRICS_PORT_OFFSET
+from cluster_query import CLUSTER_QUERY_TIMEOUT, format_cluster_summary
+from node_control import CONTROL_PORT_OFFSET, CONTROL_TOKEN_ENV, ControlError, NodeControlClient
+from node_orchestrator import NodeOrchestrator, format_operation_summary
+from cluster_launcher import bootstrap_peers, read_cluster_state
+from node_log_store import (LOG_LEVELS, LOG_PAGE_LINES, NodeLogReader, NodeLogStore, format_log_record,
+                            parse_log_time)
 
 # --- Configuración ---
-NODE_PORTS = [8000, 8001, 8002] # Puertos de tus nodos P2P
+NODE_PORTS = [8000, 8001, 8002] # Puertos de tus nodos P2P (por defecto; ver --nodes y --base-port)
+NODE_BOOTSTRAP_PEERS = 3 # Peers de arranque de cada nodo lanzado por la GUI (anillo, ver cluster_launcher.py)
+NODE_PANELS = 3 # Paneles de log visibles a la vez: los nodos a mostrar se eligen en la lista
 NODE_SCRIPT_PATH = "p2p_miner_node.py" # Asegúrate de que este script esté en la misma carpeta o especifica la ruta completa
 
 # --- Configuración de Minería Monero (XMRig) para la GUI ---
@@ -30,25 +44,512 @@ NODE_SCRIPT_PATH = "p2p_miner_node.py" # Asegúrate de que este script esté en
 MONERO_WALLET_ADDRESS = "4931PMmb9FE2LapSempngoBNYoVPxZdDt8C1bDScwhbNMcKzLw2guY5H1hxvNnRmfydJVKemEJQFdguxRK6J9hv3FHc8ABk"
 XMRIG_POOL_API_URL = f"https://supportxmr.com/api/miner/{MONERO_WALLET_ADDRESS}/stats"
 
+# --- Cliente de estadísticas del pool ---
+# Plantilla de la URL de la API (P2P_POOL_API_URL permite apuntar a otro servidor, ej. uno local de pruebas)
+POOL_STATS_URL_TEMPLATE = os.environ.get("P2P_POOL_API_URL", "https://supportxmr.com/api/miner/{wallet}/stats")
+POOL_STATS_TIMEOUT = (5, 10) # Timeouts de conexión y lectura en segundos
+POOL_STATS_TTL = 60 # Segundos que se reutiliza una respuesta para la misma billetera
+POOL_STATS_REFRESH_INTERVAL_MS = 60000 # Actualización periódica del panel de estadísticas
+POOL_STATS_BACKOFF_INITIAL = 5 # Espera tras el primer error (se duplica en cada error seguido)
+POOL_STATS_BACKOFF_MAX = 600
+
+# Proxy stratum compartido: lo aloja el primer nodo y las demás instancias de XMRig se conectan a él
+STRATUM_PROXY_PORT = 3333
+
+# --- Panel de métricas de los nodos (endpoint /metrics.json de cada nodo, ver node_metrics.py) ---
+METRICS_REFRESH_INTERVAL_MS = 2000
+METRICS_TIMEOUT = (1, 2) # Timeouts de conexión y lectura en segundos (el endpoint es local)
+
+# --- Renderizado de logs de los nodos ---
+OUTPUT_UPDATE_INTERVAL_MS = 100 # Cada cuánto se vuelcan los buffers de salida a la GUI
+OUTPUT_MAX_LINES = 5000 # Líneas máximas por nodo en su área de texto (se recortan las más viejas)
+OUTPUT_MAX_LINES_PER_TICK = 500 # Líneas máximas a insertar por nodo y por tick; el exceso se descarta
+OUTPUT_BUFFER_LINES = 10000 # Líneas pendientes por nodo antes de dejar de leer su salida (contrapresión)
+OUTPUT_LINE_LIMIT = 1024 * 1024 # Largo máximo de una línea de salida de un nodo
+# Log persistente de cada nodo (ver node_log_store.py): NODE_LOG_DIR/node_PUERTO
+NODE_LOG_DIR = "node_logs"
+LOG_FOLLOW_INTERVAL = 0.5 # Cada cuánto se lee lo nuevo del log de un nodo de un cluster ajeno
+# Eco de depuración en la consola (cada línea de los nodos); desactivado salvo P2P_GUI_DEBUG=1
+GUI_DEBUG_ECHO = os.environ.get("P2P_GUI_DEBUG", "") == "1"
+
+
+class NodeOutputBuffer:
+    """
+    Buffer acotado de líneas de un nodo, compartido entre el lector asyncio (productor) y la
+    GUI (consumidor). Cada entrada es (timestamp, stream, texto). Si la GUI se atrasa y el
+    buffer se llena, el lector espera en lugar de seguir leyendo: la contrapresión llega
+    así hasta el pipe del proceso del nodo. Con `store`, cada línea se guarda además en el
+    log persistente del nodo (antes de que la GUI la descarte o la recorte).
+    """
+    def __init__(self, loop, capacity=OUTPUT_BUFFER_LINES, store=None):
+        self.loop = loop
+        self.capacity = capacity
+        self.store = store
+        self._lines = deque()
+        self._lock = threading.Lock()
+        self._space = None # asyncio.Event, creado en el hilo del loop
+        self._waiting = False
+        self.stalls = 0 # Veces que el lector tuvo que esperar a la GUI
+
+    def append(self, stream, text):
+        """Agrega una línea sin esperar (mensajes propios de la GUI)."""
+        timestamp = time.time()
+        if self.store is not None:
+            self.store.append(stream, text, timestamp)
+        with self._lock:
+            self._lines.append((timestamp, stream, text))
+
+    async def put(self, stream, text):
+        """Agrega una línea leída de un nodo, esperando si el buffer está lleno."""
+        entry = (time.time(), stream, text)
+        if self.store is not None:
+            self.store.append(stream, text, entry[0])
+        while True:
+            with self._lock:
+                if len(self._lines) < self.capacity:
+                    self._lines.append(entry)
+                    return
+                self._waiting = True
+            if self._space is None:
+                self._space = asyncio.Event()
+            self._space.clear()
+            with self._lock:
+                if len(self._lines) < self.capacity:
+                    continue
+            self.stalls += 1
+            await self._space.wait()
+
+    def drain(self):
+        """Saca todas las líneas pendientes (desde el hilo de la GUI) y despierta al lector."""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            waiting, self._waiting = self._waiting, False
+        if waiting:
+            self.loop.call_soon_threadsafe(self._wake)
+        return lines
+
+    def _wake(self):
+        if self._space is not None:
+            self._space.set()
+
+
+class NodeProcessStdin:
+    """Adaptador de stdin con la interfaz de un archivo de texto (write/flush) sobre un StreamWriter."""
+    def __init__(self, multiplexer, writer):
+        self.multiplexer = multiplexer
+        self._writer = writer
+        self._pending = []
+
+    def write(self, text):
+        self._pending.append(text)
+
+    def flush(self):
+        data = "".join(self._pending).encode('utf-8')
+        self._pending.clear()
+        if data:
+            self.multiplexer.run_coroutine(self._write(data), timeout=5)
+
+    async def _write(self, data):
+        self._writer.write(data)
+        await self._writer.drain()
+
+
+class NodeProcess:
+    """Adaptador con la interfaz de Popen (poll/wait/terminate/kill/stdin) sobre un proceso de asyncio."""
+    def __init__(self, multiplexer, process):
+        self.multiplexer = multiplexer
+        self._process = process
+        self.pid = process.pid
+        self.stdin = NodeProcessStdin(multiplexer, process.stdin)
+
+    @property
+    def returncode(self):
+        return self._process.returncode
+
+    @property
+    def asyncio_process(self):
+        """El proceso de asyncio subyacente (para esperarlo desde el loop del multiplexor)."""
+        return self._process
+
+    def poll(self):
+        return self._process.returncode
+
+    def wait(self, timeout=None):
+        try:
+            return self.multiplexer.run_coroutine(self._process.wait(), timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+
+    def _signal(self, method):
+        try:
+            method()
+        except ProcessLookupError: # El proceso ya terminó
+            pass
+
+    def terminate(self):
+        self.multiplexer.loop.call_soon_threadsafe(self._signal, self._process.terminate)
+
+    def kill(self):
+        self.multiplexer.loop.call_soon_threadsafe(self._signal, self._process.kill)
+
+
+class OutputMultiplexer:
+    """
+    Un único hilo con un event loop lanza los procesos de los nodos y lee stdout y stderr
+    de todos a la vez, en lugar de un hilo por nodo que vacía stdout antes de mirar stderr
+    (lo que podía bloquear a un nodo con el pipe de stderr lleno).
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="gui-output", daemon=True)
+        self._thread.start()
+
+    def create_buffer(self, capacity=OUTPUT_BUFFER_LINES, store=None):
+        return NodeOutputBuffer(self.loop, capacity, store)
+
+    def run_coroutine(self, coro, timeout=None):
+        """Ejecuta una corrutina en el loop y espera su resultado (desde el hilo de la GUI)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def spawn(self, command, output_buffer, label, env=None):
+        """Lanza el proceso y empieza a volcar su salida en `output_buffer`. Devuelve un NodeProcess."""
+        return self.run_coroutine(self.spawn_async(command, output_buffer, label, env))
+
+    async def spawn_async(self, command, output_buffer, label, env=None):
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, limit=OUTPUT_LINE_LIMIT, env=env)
+        self.loop.create_task(self._pump_output(process, output_buffer, label))
+        return NodeProcess(self, process)
+
+    async def _pump_output(self, process, output_buffer, label):
+        async def pump(stream, stream_name):
+            while True:
+                try:
+                    raw_line = await stream.readline()
+                except ValueError: # Línea más larga que OUTPUT_LINE_LIMIT: se descarta el resto
+                    raw_line = b"[linea truncada]\n"
+                if not raw_line:
+                    break
+                await output_buffer.put(stream_name, raw_line.decode('utf-8', errors='replace'))
+        await asyncio.gather(pump(process.stdout, "stdout"), pump(process.stderr, "stderr"))
+        await process.wait()
+        output_buffer.append("gui", f"\n--- {label} ha terminado (código {process.returncode}). ---\n")
+
+    def follow_log(self, directory, position, output_buffer):
+        """
+        Vuelca en `output_buffer` lo que se agregue desde `position` al log persistente de un
+        nodo de un cluster ajeno (que la GUI no lanzó). Devuelve un concurrent.futures.Future:
+        cancel() lo detiene.
+        """
+        return asyncio.run_coroutine_threadsafe(self._follow_log(NodeLogReader(directory), position, output_buffer),
+                                                self.loop)
+
+    async def _follow_log(self, reader, position, output_buffer):
+        while True:
+            try: # La lectura va a un hilo: la primera carga los índices de todo el log
+                records, _, following = await self.loop.run_in_executor(None, reader.page_after, position)
+            except OSError: # El lanzador todavía no creó el log
+                records, following = [], None
+            for _, _, stream, text in records:
+                await output_buffer.put(stream, text + "\n")
+            if following is not None:
+                position = following
+            if len(records) < LOG_PAGE_LINES:
+                await asyncio.sleep(LOG_FOLLOW_INTERVAL)
+
+    def stop(self):
+        if self.loop.is_running():
+            try:
+                self.run_coroutine(self._cancel_tasks(), timeout=5)
+            except Exception as e:
+                print(f"Error al cancelar las tareas del multiplexor: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+    async def _cancel_tasks(self):
+        """Cancela las tareas pendientes (lectores de salida y de logs, canales de control) y espera a que terminen."""
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class PoolStatsError(Exception):
+    """Error al obtener las estadísticas del pool (red, HTTP, JSON o espera por backoff)."""
+
+
+class PoolStatsClient:
+    """
+    Cliente de la API de estadísticas del pool. Reutiliza una sesión HTTP, guarda la última
+    respuesta por billetera durante `ttl` segundos, comparte una única consulta en curso
+    entre pedidos simultáneos y, tras errores o límites de tasa (HTTP 429), espera con
+    backoff exponencial antes de volver a consultar.
+    """
+    def __init__(self, url_template=POOL_STATS_URL_TEMPLATE, ttl=POOL_STATS_TTL, timeout=POOL_STATS_TIMEOUT,
+                 backoff_initial=POOL_STATS_BACKOFF_INITIAL, backoff_max=POOL_STATS_BACKOFF_MAX):
+        self.url_template = url_template
+        self.ttl = ttl
+        self.timeout = timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "P2PMinerGUI"
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="pool-stats")
+        self._lock = threading.Lock()
+        self._cache = {} # billetera -> (timestamp, stats)
+        self._inflight = {} # billetera -> Future de la consulta en curso
+        self._failures = {} # billetera -> (errores seguidos, no consultar antes de este timestamp)
+
+    def get(self, wallet, force=False):
+        """
+        Devuelve un Future con {"stats", "fetched_at", "cached", "error"}. Si no se puede
+        consultar (backoff) y hay una respuesta vieja, se devuelve esa con el error en "error";
+        si no la hay, el Future falla con PoolStatsError.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(wallet)
+            if cached and not force and now - cached[0] < self.ttl:
+                return self._done({"stats": cached[1], "fetched_at": cached[0], "cached": True, "error": None})
+            inflight = self._inflight.get(wallet)
+            if inflight is not None: # Se comparte la consulta que ya está en curso
+                return inflight
+            failures, retry_at = self._failures.get(wallet, (0, 0))
+            if now < retry_at:
+                error = PoolStatsError(f"API del pool en espera tras {failures} errores; "
+                                       f"reintento en {int(retry_at - now) + 1}s")
+                if cached:
+                    return self._done({"stats": cached[1], "fetched_at": cached[0], "cached": True, "error": str(error)})
+                return self._done(error=error)
+            future = self._executor.submit(self._fetch, wallet)
+            self._inflight[wallet] = future
+            return future
+
+    @staticmethod
+    def _done(result=None, error=None):
+        future = concurrent.futures.Future()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        return future
+
+    def _fetch(self, wallet):
+        retry_after = 0
+        try:
+            response = self.session.get(self.url_template.format(wallet=wallet), timeout=self.timeout)
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.headers.get("Retry-After", 0))
+                except ValueError:
+                    retry_after = 0
+                raise PoolStatsError("la API del pool limitó las consultas (HTTP 429)")
+            response.raise_for_status()
+            stats = response.json()
+        except requests.exceptions.RequestException as e:
+            self._register_failure(wallet, retry_after)
+            raise PoolStatsError(f"Error al obtener estadísticas del pool: {e}") from e
+        except ValueError as e: # JSON inválido
+            self._register_failure(wallet, retry_after)
+            raise PoolStatsError("Error al decodificar la respuesta JSON del pool.") from e
+        except PoolStatsError:
+            self._register_failure(wallet, retry_after)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(wallet, None)
+
+        fetched_at = time.time()
+        with self._lock:
+            self._cache[wallet] = (fetched_at, stats)
+            self._failures.pop(wallet, None)
+        return {"stats": stats, "fetched_at": fetched_at, "cached": False, "error": None}
+
+    def _register_failure(self, wallet, retry_after=0):
+        with self._lock:
+            failures = self._failures.get(wallet, (0, 0))[0] + 1
+            delay = min(self.backoff_initial * (2 ** (failures - 1)), self.backoff_max)
+            self._failures[wallet] = (failures, time.time() + max(delay, retry_after))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class NodeMetricsClient:
+    """Consulta en segundo plano el endpoint de métricas de cada nodo con una sesión HTTP compartida."""
+    def __init__(self, host=METRICS_HOST, port_offset=METRICS_PORT_OFFSET, timeout=METRICS_TIMEOUT):
+        self.host = host
+        self.port_offset = port_offset
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="node-metrics")
+
+    def metrics_port(self, node_port):
+        return node_port + self.port_offset
+
+    def get(self, node_port):
+        """Future con el snapshot de métricas del nodo (falla con requests.RequestException)."""
+        return self._executor.submit(self._fetch, node_port)
+
+    def _fetch(self, node_port):
+        url = f"http://{self.host}:{self.metrics_port(node_port)}/metrics.json"
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def format_node_metrics(current, previous=None):
+    """
+    Texto del panel de métricas de un nodo. Con el snapshot anterior se muestran tasas
+    (mensajes y bytes por segundo); si no, los totales.
+    """
+    def totals(snapshot, key):
+        return sum(data[key] for data in snapshot["types"].values())
+
+    def ms(value):
+        return "n/a" if value is None else f"{value * 1000:.2f}ms"
+
+    elapsed = current["timestamp"] - previous["timestamp"] if previous else 0
+    if elapsed > 0 and previous["uptime"] <= current["uptime"]:
+        def value(key):
+            return (totals(current, key) - totals(previous, key)) / elapsed
+        rx = f"rx {value('messages_in'):.1f} msg/s {value('bytes_in') / 1024:.1f} KiB/s"
+        tx = f"tx {value('messages_out'):.1f} msg/s {value('bytes_out') / 1024:.1f} KiB/s"
+    else:
+        rx = f"rx {totals(current, 'messages_in')} msgs {totals(current, 'bytes_in') / 1024:.1f} KiB"
+        tx = f"tx {totals(current, 'messages_out')} msgs {totals(current, 'bytes_out') / 1024:.1f} KiB"
+    gauges = current["gauges"]
+    lines = [f"{rx} | {tx}",
+             f"peers {gauges.get('p2p_peers')} | colas de salida {gauges.get('p2p_outbox_depth_total')} "
+             f"(máx {gauges.get('p2p_outbox_depth_max')}) | comandos {gauges.get('p2p_command_queue_depth')} | "
+             f"broadcast p95 {ms(current['fan_out']['p95'])}"]
+    # Latencia de los handlers de los tipos con más mensajes recibidos
+    busiest = sorted(current["types"].items(), key=lambda item: item[1]["messages_in"], reverse=True)[:3]
+    handlers = [f"{msg_type} p50 {ms(data['handler']['p50'])} p95 {ms(data['handler']['p95'])}"
+                for msg_type, data in busiest if data["messages_in"]]
+    if handlers:
+        lines.append("; ".join(handlers))
+    return "\n".join(lines)
+
+
+class NodePanel:
+    """
+    Panel de log reutilizable. La GUI crea unos pocos (NODE_PANELS) y les asigna los nodos
+    elegidos en la lista, en lugar de un área de texto por nodo: con 50 nodos no hay 50 widgets
+    Text, y el historial de los nodos que no se ven se guarda fuera de Tk. El panel muestra la
+    salida en vivo o, al recorrer el log en disco, una página del historial.
+    """
+    def __init__(self, parent, controller):
+        self.port = None
+        self.history = None # (posición del primer registro, posición siguiente al último) de la página vista
+        self.frame = tk.LabelFrame(parent, bd=2, relief="ridge", padx=10, pady=10)
+
+        # Controles del nodo
+        controls_subframe = tk.Frame(self.frame)
+        controls_subframe.pack(side=tk.TOP, fill=tk.X, pady=5)
+        for text, action in (("Iniciar Nodo", controller.start_node), ("Detener Nodo", controller.stop_node),
+                             ("Enviar Comando (GUI)", controller.send_command_dialog),
+                             ("Auto-ajustar XMRig", controller.autotune_node)):
+            tk.Button(controls_subframe, text=text, command=lambda a=action: self._run(a)).pack(side=tk.LEFT, padx=2)
+
+        # Recorrido y búsqueda del log persistente (ver node_log_store.py)
+        history_subframe = tk.Frame(self.frame)
+        history_subframe.pack(side=tk.TOP, fill=tk.X)
+        for text, action in (("◀ Anterior", controller.log_page_older), ("Siguiente ▶", controller.log_page_newer),
+                             ("En vivo", controller.log_live), ("Buscar en el log...", controller.search_log_dialog)):
+            tk.Button(history_subframe, text=text, command=lambda a=action: self._run(a)).pack(side=tk.LEFT, padx=2)
+        self.history_label = tk.Label(history_subframe, text="En vivo", anchor="w", font=("Courier", 8))
+        self.history_label.pack(side=tk.LEFT, fill=tk.X, padx=5)
+
+        # Área de texto para la salida
+        self.text = scrolledtext.ScrolledText(self.frame, width=50, height=20, wrap=tk.WORD, state=tk.DISABLED, bg="black", fg="lime green")
+        self.text.pack(side=tk.TOP, fill=tk.BOTH, expand=True, pady=5)
+        self.text.tag_configure("stderr", foreground="tomato")
+        self.text.tag_configure("gui", foreground="gold")
+        self.text.tag_configure("warn", foreground="orange")
+
+        # Estado del nodo (eventos del canal de control) y métricas en vivo
+        self.status_label = tk.Label(self.frame, justify=tk.LEFT, anchor="w", font=("Courier", 8, "bold"))
+        self.status_label.pack(side=tk.TOP, fill=tk.X)
+        self.metrics_label = tk.Label(self.frame, justify=tk.LEFT, anchor="w", font=("Courier", 8))
+        self.metrics_label.pack(side=tk.TOP, fill=tk.X)
+
+    def _run(self, action):
+        if self.port is not None:
+            action(self.port)
+
+    def show(self, port, title, status_text, metrics_text, chunks):
+        """Muestra el nodo `port` con su historial (argumentos de Text.insert ya agrupados)."""
+        self.port = port
+        self.frame.config(text=title)
+        self.status_label.config(textvariable=status_text)
+        self.metrics_label.config(textvariable=metrics_text)
+        self.show_live(chunks)
+        self.frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+    def show_live(self, chunks):
+        self.history = None
+        self.history_label.config(text="En vivo")
+        self._set_text(chunks)
+        self.text.see(tk.END)
+
+    def show_page(self, chunks, first, following, description):
+        """Una página del log en disco: la salida en vivo deja de dibujarse hasta volver con 'En vivo'."""
+        self.history = (first, following)
+        self.history_label.config(text=description)
+        self._set_text(chunks)
+        self.text.see('1.0')
+
+    def _set_text(self, chunks):
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        if chunks:
+            self.text.insert(tk.END, *chunks)
+        self.text.config(state=tk.DISABLED)
+
+    def hide(self):
+        self.port = None
+        self.frame.pack_forget()
+
 
 class P2PGUIController:
-    def __init__(self, master):
+    def __init__(self, master, ports=None, attach=None, max_lines=OUTPUT_MAX_LINES,
+                 max_lines_per_tick=OUTPUT_MAX_LINES_PER_TICK, debug_echo=GUI_DEBUG_ECHO, log_dir=NODE_LOG_DIR):
         self.master = master
         self.master.title("P2P Miner Node Controller")
         # Configurar la ventana para que se inicie maximizada si es Windows
         if os.name == 'nt':
             self.master.state('zoomed')
 
-        # Diccionarios para almacenar procesos de nodos, hilos, etc.
-        self.processes = {port: None for port in NODE_PORTS}
-        self.output_queues = {port: queue.Queue() for port in NODE_PORTS}
-        self.output_threads = {port: None for port in NODE_PORTS}
-        self.text_scroll_enabled = {port: tk.BooleanVar(value=True) for port in NODE_PORTS}
-        self.node_status_labels = {} # Para etiquetas de estado de nodo
-
-        # DICCIONARIOS CRÍTICOS INICIALIZADOS
-        self.text_areas = {} # Inicializa el diccionario para las áreas de texto de los logs
-        self.node_processes = {port: None for port in NODE_PORTS} # Para almacenar los procesos de los nodos
+        # Un solo hilo multiplexa la salida de todos los nodos hacia buffers acotados por nodo
+        self.output_mux = OutputMultiplexer()
+        self.pool_stats = PoolStatsClient() # Sesión HTTP, caché y backoff compartidos para la API del pool
+        self.node_metrics = NodeMetricsClient()
+        self.max_lines = max_lines
+        self.max_lines_per_tick = max_lines_per_tick
+        self.debug_echo = debug_echo
+        # Lecturas del log en disco (final, páginas, búsquedas) fuera del hilo de Tk
+        self.log_dir = log_dir
+        self.log_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="node-logs")
+        self.log_stores = {}
+        self._init_nodes(ports or NODE_PORTS)
+        # Arranque y detención en paralelo fuera del hilo de Tk (ver node_orchestrator.py)
+        self.orchestrator = NodeOrchestrator(self.output_mux.loop)
+        self.node_operations = {} # Puerto -> "start" o "stop" mientras la operación está en curso
+        self.operation_status = tk.StringVar(value="Listo.")
+        self.closing = False
+        # Reparto de CPU entre las instancias de XMRig de los nodos (ver cpu_topology.py)
+        self.cpu_mode = tk.StringVar(value=CPU_MODE_SPLIT)
+        self.use_stratum_proxy = tk.BooleanVar(value=False)
+        self.panels = [] # Paneles de log reutilizables (ver NodePanel)
 
         # Variables para las estadísticas del minero
         self.current_hashrate = tk.StringVar(value="N/A")
@@ -56,20 +557,60 @@ class P2PGUIController:
         self.pending_balance = tk.StringVar(value="N/A")
         self.last_activity = tk.StringVar(value="N/A")
 
-        # Esto DEBE ir antes de cualquier llamada que use self.text_areas
+        # Esto DEBE ir antes de cualquier llamada que use los paneles de log
         self._create_widgets() # Llamando a _create_widgets con el guion bajo
+        self._refresh_node_list()
+        if attach:
+            self.attach_cluster(attach)
 
         # Iniciar el bucle de actualización de las áreas de salida de los nodos
-        # Ahora es seguro llamarla porque self.text_areas ya existe
         self.update_output_areas()
 
-        # Iniciar la actualización de estadísticas del minero
-        self.master.after(1000, self.update_pool_stats_gui) # <--- ¡ESTA ES LA LÍNEA CORREGIDA!
+        # Iniciar la actualización periódica de estadísticas del minero
+        self.master.after(1000, self._schedule_pool_stats)
+        self.master.after(METRICS_REFRESH_INTERVAL_MS, self._schedule_node_metrics)
 
         # Configurar el protocolo para cerrar la ventana
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    def _init_nodes(self, ports, log_dirs=None):
+        """
+        Estado por nodo (sin widgets: los paneles se reasignan). Se rehace al conectarse a un
+        cluster; entonces `log_dirs` trae los logs que escribe el lanzador y la GUI solo los lee.
+        """
+        self.ports = list(ports)
+        self._close_log_stores()
+        if log_dirs is None: # Nodos propios: la GUI escribe su log persistente
+            log_dirs = {port: os.path.join(self.log_dir, f"node_{port}") for port in self.ports}
+            self.log_stores = {port: NodeLogStore(log_dirs[port]) for port in self.ports}
+        self.log_readers = {port: NodeLogReader(log_dirs[port]) for port in self.ports if log_dirs.get(port)}
+        # Lo anterior a esta posición es historial en disco; lo posterior llega por los buffers
+        self.log_history_start = {port: reader.end_position() for port, reader in self.log_readers.items()}
+        self.log_tail_loaded = set() # Nodos cuyo historial en memoria ya empieza con el final del log en disco
+        self.output_buffers = {port: self.output_mux.create_buffer(OUTPUT_BUFFER_LINES, self.log_stores.get(port))
+                               for port in self.ports}
+        # Historial de cada nodo fuera de Tk: al mostrarlo en un panel se vuelca de una vez
+        self.node_logs = {port: deque(maxlen=self.max_lines) for port in self.ports}
+        self.last_metrics = {port: None for port in self.ports} # Último snapshot, para calcular tasas
+        self.metrics_texts = {port: tk.StringVar(value="Métricas: nodo detenido") for port in self.ports}
+        # Canal de control de cada nodo (ver node_control.py): estado por eventos, comandos con respuesta
+        self.node_controls = {port: None for port in self.ports}
+        self.node_state = {port: {} for port in self.ports} # Último estado recibido: xmrig, hashrate, peers
+        self.status_texts = {port: tk.StringVar(value="Estado: nodo detenido") for port in self.ports}
+        self.text_scroll_enabled = {port: tk.BooleanVar(value=True) for port in self.ports}
+        self.dropped_lines = {port: 0 for port in self.ports} # Líneas descartadas por el límite de renderizado
+        self.node_processes = {port: None for port in self.ports} # Para almacenar los procesos de los nodos
+        # Nodos de un cluster ajeno (cluster_launcher.py): entrada del archivo de estado y lector de su log
+        self.attached = {}
+        self.log_followers = {}
+        self.node_list_rows = []
+        self.panel_for = {} # Puerto -> panel en el que se ve
+
     def _create_widgets(self): # <--- DEFINICIÓN ORIGINAL CON GUION BAJO
+        # Barra de estado: resultado de arrancar/detener nodos, sin ventanas modales
+        tk.Label(self.master, textvariable=self.operation_status, anchor="w", bd=1,
+                 relief=tk.SUNKEN).pack(side=tk.BOTTOM, fill=tk.X)
+
         # Frame principal para los controles globales
         global_controls_frame = tk.Frame(self.master, bd=2, relief="groove", padx=10, pady=10)
         global_controls_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
@@ -90,32 +631,37 @@ class P2PGUIController:
         tk.Button(global_buttons_frame, text="Detener Todos", command=self.stop_all_nodes).pack(side=tk.LEFT, padx=5)
         tk.Button(global_buttons_frame, text="Solicitar Info de Pool (Peers)", command=self.request_pool_info_all).pack(side=tk.LEFT, padx=5)
         tk.Button(global_buttons_frame, text="Actualizar Stats de Pool (Local)", command=self.update_pool_stats_gui).pack(side=tk.LEFT, padx=5)
+        tk.Button(global_buttons_frame, text="Tendencias de Hashrate", command=self.request_hashrate_trends_all).pack(side=tk.LEFT, padx=5)
+        tk.Button(global_buttons_frame, text="Conectar a Cluster...", command=self.attach_cluster).pack(side=tk.LEFT, padx=5)
+
+        # Reparto de CPU: núcleos repartidos entre los nodos o una sola instancia con todos
+        tk.Label(global_buttons_frame, text="CPU:").pack(side=tk.LEFT, padx=(15, 2))
+        tk.Radiobutton(global_buttons_frame, text="Repartir núcleos", variable=self.cpu_mode,
+                       value=CPU_MODE_SPLIT).pack(side=tk.LEFT)
+        tk.Radiobutton(global_buttons_frame, text="Una instancia, todos los núcleos", variable=self.cpu_mode,
+                       value=CPU_MODE_SINGLE).pack(side=tk.LEFT)
+        tk.Button(global_buttons_frame, text="Ver Plan de CPU", command=self.show_cpu_plan).pack(side=tk.LEFT, padx=5)
+        tk.Checkbutton(global_buttons_frame, text="Proxy stratum compartido", variable=self.use_stratum_proxy).pack(side=tk.LEFT, padx=5)
 
         # Frame para los nodos individuales
         nodes_frame = tk.Frame(self.master)
         nodes_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        for port in NODE_PORTS:
-            node_frame = tk.LabelFrame(nodes_frame, text=f"Nodo P2P - Puerto {port}", bd=2, relief="ridge", padx=10, pady=10)
-            node_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-            # Controles del nodo
-            controls_subframe = tk.Frame(node_frame)
-            controls_subframe.pack(side=tk.TOP, fill=tk.X, pady=5)
-            
-            start_button = tk.Button(controls_subframe, text="Iniciar Nodo", command=lambda p=port: self.start_node(p))
-            start_button.pack(side=tk.LEFT, padx=2)
-            
-            stop_button = tk.Button(controls_subframe, text="Detener Nodo", command=lambda p=port: self.stop_node(p))
-            stop_button.pack(side=tk.LEFT, padx=2)
-
-            send_command_button = tk.Button(controls_subframe, text="Enviar Comando (GUI)", command=lambda p=port: self.send_command_dialog(p))
-            send_command_button.pack(side=tk.LEFT, padx=2)
+        # Lista de nodos con su estado resumido; los elegidos (hasta NODE_PANELS) se ven en los paneles
+        list_frame = tk.Frame(nodes_frame)
+        list_frame.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
+        tk.Label(list_frame, text=f"Nodos (elegí hasta {NODE_PANELS})", anchor="w").pack(side=tk.TOP, fill=tk.X)
+        list_scroll = tk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        self.node_list = tk.Listbox(list_frame, selectmode=tk.EXTENDED, exportselection=False, width=44,
+                                    font=("Courier", 8), yscrollcommand=list_scroll.set)
+        list_scroll.config(command=self.node_list.yview)
+        list_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.node_list.pack(side=tk.LEFT, fill=tk.Y, expand=True)
+        self.node_list.bind("<<ListboxSelect>>", self._on_node_list_select)
 
-            # Área de texto para la salida
-            output_text = scrolledtext.ScrolledText(node_frame, width=50, height=20, wrap=tk.WORD, state=tk.DISABLED, bg="black", fg="lime green")
-            output_text.pack(side=tk.TOP, fill=tk.BOTH, expand=True, pady=5)
-            self.text_areas[port] = output_text # <--- ¡CORREGIDO! Usando self.text_areas aquí
+        panels_frame = tk.Frame(nodes_frame)
+        panels_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.panels = [NodePanel(panels_frame, self) for _ in range(NODE_PANELS)]
 
         # Área de texto para estadísticas globales del pool (solo lectura)
         self.pool_stats_frame = tk.LabelFrame(self.master, text="Estadísticas Globales de Minería (SupportXMR)", bd=2, relief="ridge", padx=10, pady=10)
@@ -124,6 +670,13 @@ class P2PGUIController:
         self.pool_stats_text = scrolledtext.ScrolledText(self.pool_stats_frame, width=80, height=10, wrap=tk.WORD, state=tk.DISABLED, bg="black", fg="cyan")
         self.pool_stats_text.pack(fill=tk.BOTH, expand=True, pady=5)
         
+        # Resumen del cluster: resultado de la consulta de pool info a todos los peers
+        self.cluster_summary_frame = tk.LabelFrame(self.master, text="Resumen del Cluster (Info de Pool de los Peers)", bd=2, relief="ridge", padx=10, pady=10)
+        self.cluster_summary_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.cluster_summary_text = scrolledtext.ScrolledText(self.cluster_summary_frame, width=80, height=8, wrap=tk.WORD, state=tk.DISABLED, bg="black", fg="cyan")
+        self.cluster_summary_text.pack(fill=tk.BOTH, expand=True, pady=5)
+
         # Configurar el cierre de la ventana (Esta línea ya la tienes en __init__, puede ser redundante aquí)
         # self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -141,116 +694,413 @@ class P2PGUIController:
 
 
     def start_node(self, port):
-        # Usamos self.node_processes aquí, por eso es importante inicializarlo en __init__
-        if self.node_processes[port] is None or self.node_processes[port].poll() is not None:
-            wallet_address = self.wallet_address_entry.get().strip()
-            if not wallet_address:
-                messagebox.showerror("Error", "La dirección de la billetera no puede estar vacía.")
-                return
-
-            try:
-                command = ["python", "-u", NODE_SCRIPT_PATH, str(port), wallet_address] # <--- ¡AÑADIDO EL '-u'!
-                
-                self.node_processes[port] = subprocess.Popen(
-                    command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE,
-                    universal_newlines=True,
-                    bufsize=1
-                )
-                messagebox.showinfo("Nodo Iniciado", f"Nodo P2P en puerto {port} iniciado.")
-                print(f"[{port}] Proceso del nodo lanzado. PID: {self.node_processes[port].pid}")
-
-                # Iniciar un hilo para leer la salida del proceso
-                threading.Thread(target=self._read_output, args=(self.node_processes[port], port), daemon=True).start()
-
-            except FileNotFoundError:
-                messagebox.showerror("Error", f"El script del nodo '{NODE_SCRIPT_PATH}' no fue encontrado. Asegúrate de que la ruta sea correcta.")
-            except Exception as e:
-                messagebox.showerror("Error al Iniciar Nodo", f"No se pudo iniciar el nodo en puerto {port}: {e}")
-        else:
-            messagebox.showinfo("Estado del Nodo", f"El nodo en puerto {port} ya está en ejecución.")
+        self.start_nodes([port])
 
     def stop_node(self, port):
-        # Usamos self.node_processes aquí
-        if self.node_processes[port] and self.node_processes[port].poll() is None:
-            try:
-                # Intentar enviar comando de stop interno al nodo si tiene _command_listener
-                # (Asumiendo que _command_listener lee de stdin)
-                self.send_node_command(port, "stop")
-                
-                # Darle un momento para que se detenga limpiamente
-                self.node_processes[port].wait(timeout=5)
-                
-                if self.node_processes[port].poll() is None: # Si sigue vivo, forzar terminación
-                    self.node_processes[port].terminate()
-                    self.node_processes[port].wait(timeout=5)
-                    if self.node_processes[port].poll() is None:
-                        self.node_processes[port].kill()
-                
-                self.node_processes[port] = None
-                messagebox.showinfo("Nodo Detenido", f"Nodo P2P en puerto {port} detenido.")
-                print(f"[{port}] Proceso del nodo detenido.")
-            except Exception as e:
-                messagebox.showerror("Error al Detener Nodo", f"No se pudo detener el nodo en puerto {port}: {e}")
-        else:
-            messagebox.showinfo("Estado del Nodo", f"El nodo en puerto {port} no está en ejecución.")
+        self.stop_nodes([port])
 
     def start_all_nodes(self):
-        for port in NODE_PORTS:
-            self.start_node(port)
+        self.start_nodes(self.ports)
 
     def stop_all_nodes(self):
-        for port in NODE_PORTS:
-            self.stop_node(port)
-            
-    def _read_output(self, process, port):
-        """Reads stdout and stderr from the process and puts it into the queue."""
-        print(f"[{port}] DEBUG: Hilo de lectura de salida iniciado para nodo {port}.")
+        self.stop_nodes(self.ports)
 
-        # Read stdout
-        for line in iter(process.stdout.readline, ''):
-            print(f"[{port} GUI - STDOUT] {line.strip()}")
-            self.output_queues[port].put(line)
-        print(f"[{port}] DEBUG: STDOUT pipe cerrado para nodo {port}.")
+    def _node_running(self, port):
+        if port in self.attached: # Nodo ajeno: se lo ve vivo mientras responde su canal de control
+            return self.node_controls[port] is not None and self.node_controls[port].connected
+        process = self.node_processes[port]
+        return process is not None and process.poll() is None
 
-        # Read stderr
-        for line in iter(process.stderr.readline, ''):
-            print(f"[{port} GUI - STDERR] {line.strip()}")
-            self.output_queues[port].put(f"ERROR: {line}")
-        print(f"[{port}] DEBUG: STDERR pipe cerrado para nodo {port}.")
+    # --- Lista de nodos y paneles de log ---
+    def _refresh_node_list(self):
+        """Rehace la lista (al cambiar el conjunto de nodos) y muestra los primeros en los paneles."""
+        self.node_list.delete(0, tk.END)
+        self.node_list_rows = [self._node_list_row(port) for port in self.ports]
+        self.node_list.insert(tk.END, *self.node_list_rows)
+        self.node_list.selection_set(0, min(NODE_PANELS, len(self.ports)) - 1)
+        self._show_ports(self.ports[:NODE_PANELS])
 
-        self.output_queues[port].put(f"\n--- Nodo {port} ha terminado. ---\n")
-        print(f"[{port}] Hilo de lectura de salida para Nodo {port} finalizado.")
+    def _node_list_row(self, port):
+        if not self._node_running(port):
+            if self.node_operations.get(port) == "start":
+                text = "iniciando..."
+            elif port in self.attached:
+                text = "sin conexión"
+            else:
+                text = "detenido"
+        else:
+            state = self.node_state[port]
+            hashrate = (state.get("hashrate") or {}).get("hashrate")
+            peers = state.get("peers") or {}
+            rate = "n/a" if hashrate is None else f"{hashrate:.0f} H/s"
+            text = (f"XMRig {(state.get('xmrig') or {}).get('state', '?'):<8} {rate:>9} "
+                    f"peers {peers.get('connected', '?')}/{peers.get('known', '?')}")
+        return f"{port:<6} {text}"
 
+    def _update_node_list(self):
+        """Actualiza solo las filas que cambiaron, conservando la selección."""
+        selected = set(self.node_list.curselection())
+        for index, port in enumerate(self.ports):
+            row = self._node_list_row(port)
+            if row != self.node_list_rows[index]:
+                self.node_list_rows[index] = row
+                self.node_list.delete(index)
+                self.node_list.insert(index, row)
+                if index in selected:
+                    self.node_list.selection_set(index)
 
-    def update_output_areas(self):
-        """Actualiza las áreas de texto de la GUI con la salida de las colas."""
-        for port in NODE_PORTS:
-            text_area = self.text_areas[port]
-            inserted_new_content = False
+    def _on_node_list_select(self, event=None):
+        ports = [self.ports[index] for index in self.node_list.curselection()]
+        self._show_ports(ports[:NODE_PANELS])
+
+    def _show_ports(self, ports):
+        """Asigna los paneles a `ports`, en orden; los paneles que sobran se ocultan."""
+        for panel in self.panels:
+            panel.hide()
+        self.panel_for = {}
+        for panel, port in zip(self.panels, ports):
+            title = f"Nodo P2P - Puerto {port}" + (" (cluster)" if port in self.attached else "")
+            panel.show(port, title, self.status_texts[port], self.metrics_texts[port],
+                       self._tagged_chunks(self.node_logs[port]))
+            self.panel_for[port] = panel
+            self._load_log_tail(port)
+
+    # --- Log persistente de los nodos (ver node_log_store.py) ---
+    def _close_log_stores(self):
+        for store in self.log_stores.values():
+            store.close()
+        self.log_stores = {}
+
+    def _load_log_tail(self, port):
+        """La primera vez que se muestra un nodo, su historial en memoria se completa con el final del log en disco."""
+        if port in self.log_tail_loaded or port not in self.log_readers:
+            return
+        self.log_tail_loaded.add(port)
+        room = self.node_logs[port].maxlen - len(self.node_logs[port])
+        if room <= 0:
+            return
+        future = self.log_executor.submit(self.log_readers[port].page_before, self.log_history_start[port],
+                                          min(room, LOG_PAGE_LINES))
+        future.add_done_callback(lambda f: self.master.after(0, self._on_log_tail, port, f))
+
+    def _on_log_tail(self, port, future):
+        if port not in self.log_tail_loaded: # Se cambió de cluster mientras se leía
+            return
+        try:
+            records = future.result()[0]
+        except OSError as e:
+            self.output_buffers[port].append("gui", f"No se pudo leer el log en disco del nodo {port}: {e}\n")
+            return
+        if not records:
+            return
+        older = [(timestamp, stream, text + "\n") for timestamp, _, stream, text in records]
+        older.append((time.time(), "gui", "--- fin del historial en disco ---\n"))
+        history = self.node_logs[port]
+        self.node_logs[port] = deque(older + list(history), maxlen=history.maxlen)
+        panel = self.panel_for.get(port)
+        if panel is not None and panel.history is None:
+            panel.show_live(self._tagged_chunks(self.node_logs[port]))
+
+    def log_page_older(self, port):
+        """Página anterior del log en disco (desde la salida en vivo, la más reciente)."""
+        panel = self.panel_for.get(port)
+        if panel is None or port not in self.log_readers:
+            return
+        position = panel.history[0] if panel.history else None
+        future = self.log_executor.submit(self.log_readers[port].page_before, position)
+        future.add_done_callback(lambda f: self.master.after(0, self._on_log_page, port, panel, f, "principio"))
+
+    def log_page_newer(self, port):
+        """Página siguiente; al pasar la última se vuelve a la salida en vivo."""
+        panel = self.panel_for.get(port)
+        if panel is None or not panel.history:
+            return
+        future = self.log_executor.submit(self.log_readers[port].page_after, panel.history[1])
+        future.add_done_callback(lambda f: self.master.after(0, self._on_log_page, port, panel, f, "final"))
+
+    def _on_log_page(self, port, panel, future, edge):
+        if panel.port != port: # El panel pasó a mostrar otro nodo
+            return
+        try:
+            records, first, following = future.result()
+        except OSError as e:
+            self.operation_status.set(f"No se pudo leer el log del nodo {port}: {e}")
+            return
+        if not records:
+            if edge == "final":
+                self.log_live(port)
+            else:
+                self.operation_status.set(f"Log del nodo {port}: no hay registros más viejos.")
+            return
+        span = " - ".join(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(records[i][0])) for i in (0, -1))
+        panel.show_page(self._log_chunks(records), first, following,
+                        f"Historial: {span} ({len(records)} líneas)")
+
+    def log_live(self, port):
+        panel = self.panel_for.get(port)
+        if panel is not None and panel.history is not None:
+            panel.show_live(self._tagged_chunks(self.node_logs[port]))
+
+    @staticmethod
+    def _log_chunks(records):
+        """Argumentos de Text.insert para registros del log en disco, con el tag de su nivel."""
+        tags = {"ERROR": "stderr", "WARN": "warn"}
+        chunks = []
+        for record in records:
+            chunks += [format_log_record(record) + "\n", tags.get(record[1], "")]
+        return chunks
+
+    def search_log_dialog(self, port):
+        """Ventana de búsqueda en el log en disco del nodo por texto, nivel y rango de tiempo."""
+        if port not in self.log_readers:
+            self.operation_status.set(f"El nodo {port} no tiene log en disco.")
+            return
+        window = tk.Toplevel(self.master)
+        window.title(f"Buscar en el log del Nodo {port}")
+        form = tk.Frame(window, padx=10, pady=5)
+        form.pack(side=tk.TOP, fill=tk.X)
+        fields = {}
+        for column, (key, label, width) in enumerate((("keyword", "Texto:", 25), ("since", "Desde:", 16),
+                                                      ("until", "Hasta:", 16))):
+            tk.Label(form, text=label).grid(row=0, column=column * 2, sticky="e", padx=2)
+            fields[key] = tk.Entry(form, width=width)
+            fields[key].grid(row=0, column=column * 2 + 1, padx=2)
+        level = tk.StringVar(value="Todos")
+        tk.OptionMenu(form, level, "Todos", *LOG_LEVELS).grid(row=0, column=6, padx=2)
+        results = scrolledtext.ScrolledText(window, width=120, height=30, wrap=tk.NONE, state=tk.DISABLED,
+                                            bg="black", fg="lime green")
+        results.tag_configure("stderr", foreground="tomato")
+        results.tag_configure("warn", foreground="orange")
+        status = tk.StringVar(value="Horas como AAAA-MM-DD HH:MM o HH:MM (hoy); nivel mínimo a la derecha.")
+        search = lambda event=None: self._run_log_search(port, fields, level.get(), results, status)
+        tk.Button(form, text="Buscar", command=search).grid(row=0, column=7, padx=5)
+        fields["keyword"].bind("<Return>", search)
+        tk.Label(window, textvariable=status, anchor="w").pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+        results.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=5)
+        fields["keyword"].focus_set()
+
+    def _run_log_search(self, port, fields, level, results, status):
+        try:
+            since, until = (parse_log_time(fields[key].get()) if fields[key].get().strip() else None
+                            for key in ("since", "until"))
+        except ValueError as e:
+            status.set(f"Búsqueda inválida: {e}")
+            return
+        keyword = fields["keyword"].get().strip() or None
+        status.set("Buscando...")
+        started = time.monotonic()
+        future = self.log_executor.submit(self.log_readers[port].search, keyword, since, until,
+                                          None if level == "Todos" else level)
+        future.add_done_callback(lambda f: self.master.after(0, self._show_log_search, f, results, status, started))
+
+    def _show_log_search(self, future, results, status, started):
+        if not results.winfo_exists(): # Se cerró la ventana
+            return
+        try:
+            result = future.result()
+        except OSError as e:
+            status.set(f"No se pudo leer el log: {e}")
+            return
+        results.config(state=tk.NORMAL)
+        results.delete('1.0', tk.END)
+        if result["matches"]:
+            results.insert(tk.END, *self._log_chunks(result["matches"]))
+        results.config(state=tk.DISABLED)
+        results.see(tk.END)
+        status.set(f"{len(result['matches'])} coincidencias{' (las más recientes)' if result['truncated'] else ''}; "
+                   f"{result['scanned']} de {result['blocks']} bloques leídos ({result['bytes'] / 2 ** 20:.1f} MiB) "
+                   f"en {time.monotonic() - started:.2f}s")
+
+    def _node_command(self, port, wallet_address):
+        command = ["python", "-u", NODE_SCRIPT_PATH, str(port), wallet_address] # <--- ¡AÑADIDO EL '-u'!
+        command += ["--peers", bootstrap_peers(self.ports, port, NODE_BOOTSTRAP_PEERS)]
+        # Cada nodo recibe su parte de la CPU según el modo elegido
+        command += ["--cpu-slot", f"{self.ports.index(port) + 1}/{len(self.ports)}",
+                    "--cpu-mode", self.cpu_mode.get()]
+        command += ["--metrics-port", str(self.node_metrics.metrics_port(port))]
+        command += ["--control-port", str(port + CONTROL_PORT_OFFSET)]
+        if self.use_stratum_proxy.get():
+            # Una sola conexión con el pool: el primer nodo aloja el proxy y el resto se conecta a él
+            if port == self.ports[0]:
+                command += ["--stratum-proxy", str(STRATUM_PROXY_PORT)]
+            else:
+                command += ["--pool-proxy", f"127.0.0.1:{STRATUM_PROXY_PORT}"]
+        return command
+
+    def start_nodes(self, ports):
+        """
+        Lanza los nodos indicados a la vez desde el loop del multiplexor y espera, sin bloquear
+        la GUI, a que cada uno abra su canal de control. El avance va a la barra de estado y al
+        log de cada nodo.
+        """
+        wallet_address = self.wallet_address_entry.get().strip()
+        if not wallet_address:
+            messagebox.showerror("Error", "La dirección de la billetera no puede estar vacía.")
+            return
+        nodes = {}
+        for port in ports:
+            if port in self.attached:
+                self.output_buffers[port].append("gui", f"El nodo en puerto {port} lo gestiona el lanzador del cluster.\n")
+                continue
+            if port in self.node_operations or self._node_running(port):
+                state = "ya está en ejecución" if port not in self.node_operations else "tiene una operación en curso"
+                self.output_buffers[port].append("gui", f"El nodo en puerto {port} {state}.\n")
+                continue
+            # Canal de control local: el token va por el entorno, no por la línea de comandos
+            control_token = secrets.token_hex(16)
+            env = dict(os.environ, **{CONTROL_TOKEN_ENV: control_token})
+            spawn = (lambda p=port, c=self._node_command(port, wallet_address), e=env, t=control_token:
+                     self._spawn_node(p, c, e, t))
+            nodes[port] = (spawn, lambda p=port: self.node_controls[p] is not None and self.node_controls[p].connected)
+        if not nodes:
+            self.operation_status.set("No hay nodos para iniciar: ya están en ejecución.")
+            return
+        self._run_operation("start", nodes, self.orchestrator.start_all)
+
+    async def _spawn_node(self, port, command, env, control_token):
+        """En el loop del multiplexor: lanza el proceso y registra el nodo en la GUI apenas existe."""
+        process = await self.output_mux.spawn_async(command, self.output_buffers[port], f"Nodo {port}", env)
+        self.master.after(0, self._on_node_spawned, port, process, control_token)
+        return process
+
+    def _on_node_spawned(self, port, process, control_token):
+        self.node_processes[port] = process
+        self._open_node_control(port, control_token)
+        print(f"[{port}] Proceso del nodo lanzado. PID: {process.pid}")
+
+    def stop_nodes(self, ports, on_done=None):
+        """
+        Detiene los nodos indicados a la vez ('stop', SIGTERM y kill, con sus plazos) sin
+        bloquear la GUI; los procesos de XMRig que sobrevivan a su nodo también se terminan.
+        """
+        nodes = {}
+        for port in ports:
+            if port in self.attached:
+                self._stop_attached_node(port)
+                continue
+            if self.node_operations.get(port) == "stop":
+                continue
+            if not self._node_running(port):
+                if port not in self.node_operations: # Un nodo que está arrancando todavía no tiene proceso
+                    self.output_buffers[port].append("gui", f"El nodo en puerto {port} no está en ejecución.\n")
+                continue
+            nodes[port] = (self.node_processes[port].asyncio_process, self.node_controls[port])
+        if not nodes:
+            self.operation_status.set("No hay nodos en ejecución para detener.")
+            if on_done is not None:
+                on_done()
+            return
+        self._run_operation("stop", nodes, self.orchestrator.stop_all, on_done)
+
+    def _stop_attached_node(self, port):
+        """Nodo de un cluster ajeno: se le pide 'stop' (el lanzador no reinicia un nodo que terminó así)."""
+        if self._node_running(port):
+            self.send_node_command(port, "stop")
+            self.output_buffers[port].append("gui", f"Se pidió 'stop' al nodo {port} del cluster.\n")
+
+    def _run_operation(self, action, nodes, method, on_done=None):
+        verb = "Iniciando" if action == "start" else "Deteniendo"
+        self.operation_status.set(f"{verb} {len(nodes)} nodo(s): {', '.join(str(port) for port in nodes)}...")
+        for port in nodes:
+            self.node_operations[port] = action
+        started = time.monotonic()
+        future = method(nodes, on_result=lambda result: self.master.after(0, self._on_operation_result, result))
+        future.add_done_callback(lambda f: self.master.after(0, self._on_operation_done, action, f, started, on_done))
+
+    def _on_operation_result(self, result):
+        """Resultado de un nodo (hilo de Tk): se anota en su log y se libera el puerto."""
+        port = result.port
+        if self.node_operations.get(port) == result.action:
+            del self.node_operations[port]
+        self.output_buffers[port].append("gui", f"{result.describe()}\n")
+        print(f"[{port}] {result.describe()}")
+        if result.action == "stop" or not result.ok:
+            if result.action == "stop" or self.node_processes[port] is result.process:
+                self.node_processes[port] = None
+            self._close_node_control(port)
+
+    def _on_operation_done(self, action, future, started, on_done):
+        try:
+            results = future.result()
+        except Exception as e:
+            self.operation_status.set(f"La operación sobre los nodos falló: {e}")
+        else:
+            summary = format_operation_summary(action, results, time.monotonic() - started)
+            print(summary)
+            self.operation_status.set(summary)
+        if on_done is not None:
+            on_done()
             
-            # <--- ¡CORRECCIÓN CLAVE! Habilitar el área de texto para escribir
-            text_area.config(state=tk.NORMAL) 
-
-            while not self.output_queues[port].empty():
-                line = self.output_queues[port].get_nowait()
-                text_area.insert(tk.END, line) # Aquí se inserta el texto
-                inserted_new_content = True
-                print(f"[{port}] DEBUG: Sacando de la cola y mostrando en GUI: {line.strip()}")
-
-            # <--- ¡CORRECCIÓN CLAVE! Deshabilitar el área de texto nuevamente después de escribir
-            text_area.config(state=tk.DISABLED) 
-
-            # Si se insertó contenido nuevo en el área de texto
-            if inserted_new_content:
-                if self.text_scroll_enabled[port].get():
-                    text_area.see(tk.END) # Asegura que la vista se desplace al final
-                text_area.update_idletasks() # Fuerza un refresco de la GUI para este widget
-        
-        # Vuelve a programar esta función para que se ejecute después de 100ms
-        self.master.after(100, self.update_output_areas)
+    def _drain_output_buffer(self, port):
+        """
+        Vacía el buffer de salida del nodo y devuelve (líneas a mostrar, líneas descartadas).
+        Solo se conservan las últimas `max_lines_per_tick`: si un nodo escribe más rápido
+        de lo que la GUI puede dibujar, se ve lo más reciente y se cuentan las omitidas.
+        """
+        lines = self.output_buffers[port].drain()
+        dropped = max(len(lines) - self.max_lines_per_tick, 0)
+        if dropped:
+            del lines[:dropped]
+        return lines, dropped
+
+    def _trim_output_area(self, text_area):
+        """Recorta las líneas más viejas para no superar `max_lines` en el área de texto."""
+        line_count = int(text_area.index('end-1c').split('.')[0])
+        excess = line_count - self.max_lines
+        if excess > 0:
+            text_area.delete('1.0', f'{excess + 1}.0')
+
+    @staticmethod
+    def _tagged_chunks(lines):
+        """Agrupa líneas consecutivas del mismo stream en argumentos (texto, tag) para Text.insert."""
+        chunks = []
+        current_stream = None
+        current = []
+        for _, stream, text in lines:
+            if stream == "stderr":
+                text = f"ERROR: {text}"
+            if stream != current_stream and current:
+                chunks += ["".join(current), current_stream]
+                current = []
+            current_stream = stream
+            current.append(text)
+        if current:
+            chunks += ["".join(current), current_stream]
+        return chunks
+
+    def update_output_areas(self):
+        """
+        Pasa la salida de los buffers al historial de cada nodo y, para los nodos que se ven en
+        un panel, a su área de texto (una inserción por panel y tick).
+        """
+        for port in self.ports:
+            lines, dropped = self._drain_output_buffer(port)
+            if not lines and not dropped:
+                continue
+
+            if dropped:
+                self.dropped_lines[port] += dropped
+                lines.insert(0, (time.time(), "gui", f"[... {dropped} líneas omitidas (total {self.dropped_lines[port]}) "
+                                                      f"por exceso de salida ...]\n"))
+            if self.debug_echo:
+                for timestamp, stream, text in lines:
+                    print(f"[{port} GUI - {stream.upper()} {time.strftime('%H:%M:%S', time.localtime(timestamp))}] {text.rstrip()}")
+            self.node_logs[port].extend(lines)
+
+            panel = self.panel_for.get(port)
+            if panel is None or panel.history is not None: # No visible o recorriendo el log en disco
+                continue
+            text_area = panel.text
+            text_area.config(state=tk.NORMAL) # Habilitar el área de texto para escribir
+            text_area.insert(tk.END, *self._tagged_chunks(lines)) # Una sola inserción por tick
+            self._trim_output_area(text_area)
+            text_area.config(state=tk.DISABLED)
+
+            if self.text_scroll_enabled[port].get():
+                text_area.see(tk.END) # Asegura que la vista se desplace al final
+
+        # Vuelve a programar esta función para el próximo tick
+        self.master.after(OUTPUT_UPDATE_INTERVAL_MS, self.update_output_areas)
 
     def send_command_dialog(self, port):
         command = simpledialog.askstring("Enviar Comando", f"Introduce el comando para el Nodo {port}:",
@@ -259,13 +1109,20 @@ class P2PGUIController:
             self.send_node_command(port, command)
 
     def send_node_command(self, port, command):
-        """Envía un comando interno al proceso del nodo via stdin."""
-        process = self.node_processes.get(port)
-        if not process or process.poll() is not None:
-            messagebox.showerror("Error de Envío", f"El Nodo {port} no está en ejecución.")
+        """Envía un comando interno al nodo: por el canal de control si está conectado, si no via stdin."""
+        if not self._node_running(port):
+            self.operation_status.set(f"No se envió '{command}': el Nodo {port} no está en ejecución.")
             return
+        process = self.node_processes[port]
 
-        if process.stdin:
+        control = self.node_controls.get(port)
+        if control is not None and control.connected:
+            future = control.request("command", {"command": command})
+            future.add_done_callback(lambda f: self.master.after(0, self._on_command_result, port, command, f))
+            print(f"[{port}] Comando '{command}' enviado al nodo (canal de control).")
+            return
+
+        if process is not None and process.stdin:
             try:
                 process.stdin.write(command + '\n')
                 process.stdin.flush()
@@ -277,51 +1134,198 @@ class P2PGUIController:
 
 
     def request_pool_info_all(self):
-        """Envía el comando 'request_pool_info' a todos los nodos activos."""
-        for port in NODE_PORTS:
-            if self.node_processes[port] and self.node_processes[port].poll() is None:
-                self.send_node_command(port, "request_pool_info")
+        """
+        Pide a un nodo activo que consulte a todo el cluster: él reparte la solicitud entre sus
+        peers y devuelve un único resumen, que aparece en el panel "Resumen del Cluster".
+        """
+        for port in self.ports:
+            control = self.node_controls[port]
+            if control is not None and control.connected:
+                self._update_cluster_summary_text(f"Consultando al cluster desde el Nodo {port}...")
+                future = control.request("cluster_pool_info", timeout=CLUSTER_QUERY_TIMEOUT + 5)
+                future.add_done_callback(lambda f, p=port: self.master.after(0, self._show_cluster_summary, p, f))
+                return
+        messagebox.showinfo("Info de Pool", "No hay nodos activos (con canal de control) para consultar al cluster.")
+
+    def _show_cluster_summary(self, port, future):
+        try:
+            summary = future.result()
+        except Exception as e:
+            self._update_cluster_summary_text(f"La consulta al cluster desde el Nodo {port} falló: {e}")
+            return
+        self._update_cluster_summary_text(format_cluster_summary(summary))
+
+    # --- Canal de control de los nodos ---
+    def _open_node_control(self, port, token, control_port=None):
+        self._close_node_control(port)
+        self.node_state[port] = {}
+        self.node_controls[port] = NodeControlClient(
+            self.output_mux.loop, control_port or port + CONTROL_PORT_OFFSET, token,
+            on_event=lambda event, data, p=port: self.master.after(0, self._on_node_event, p, event, data),
+            on_state=lambda connected, p=port: self.master.after(0, self._on_control_state, p, connected))
+
+    def _close_node_control(self, port):
+        control = self.node_controls[port]
+        if control is not None:
+            control.close()
+            self.node_controls[port] = None
+            self.node_state[port] = {}
+            self.status_texts[port].set("Estado: nodo detenido")
+
+    def _on_control_state(self, port, connected):
+        control = self.node_controls[port]
+        if control is None:
+            return
+        if connected:
+            # Estado completo al conectar; después llegan solo los eventos de cambios
+            future = control.request("status")
+            future.add_done_callback(lambda f: self.master.after(0, self._apply_node_status, port, f))
+        else:
+            self.status_texts[port].set("Estado: canal de control desconectado")
+
+    def _apply_node_status(self, port, future):
+        try:
+            status = future.result()
+        except Exception as e:
+            self.status_texts[port].set(f"Estado: sin respuesta ({e})")
+            return
+        self.node_state[port].update({key: status[key] for key in ("xmrig", "hashrate", "peers")})
+        self._render_node_status(port)
+
+    def _on_node_event(self, port, event, data):
+        if event == "cluster_summary":
+            self._update_cluster_summary_text(format_cluster_summary(data))
+            return
+        self.node_state[port][event] = data
+        self._render_node_status(port)
+
+    def _render_node_status(self, port):
+        control = self.node_controls[port]
+        if control is None:
+            return
+        state = self.node_state[port]
+        xmrig = state.get("xmrig") or {}
+        hashrate = state.get("hashrate") or {}
+        peers = state.get("peers") or {}
+        rate = "n/a" if hashrate.get("hashrate") is None else f"{hashrate['hashrate']:.1f} H/s"
+        shares = (f" shares {hashrate['shares_good']}/{hashrate['shares_total']}"
+                  if hashrate.get("shares_total") is not None else "")
+        samples, p50, p95 = control.latency()
+        latency = f"control p50 {p50 * 1000:.1f}ms p95 {p95 * 1000:.1f}ms" if samples else "control sin muestras"
+        restarts = f" ({xmrig['restarts']} reinicios)" if xmrig.get("restarts") else ""
+        governor = f" [{xmrig['governor']}]" if xmrig.get("governor") not in (None, "full") else ""
+        self.status_texts[port].set(f"XMRig {xmrig.get('state', '?')}{restarts}{governor} | {rate}{shares} | "
+                                    f"peers {peers.get('connected', '?')}/{peers.get('known', '?')} | {latency}")
+
+    def _on_command_result(self, port, command, future):
+        try:
+            future.result()
+        except ControlError as e:
+            self.output_buffers[port].append("gui", f"Comando '{command}' falló: {e}\n")
+
+    def request_hashrate_trends_all(self):
+        """Envía el comando 'stats' (agregados de 1m/1h/24h) a todos los nodos activos."""
+        for port in self.ports:
+            if self._node_running(port):
+                self.send_node_command(port, "stats")
             else:
-                print(f"[{port}] Nodo no activo para solicitar información de pool.")
+                print(f"[{port}] Nodo no activo para consultar tendencias de hashrate.")
+
+    def autotune_node(self, port):
+        """Pide al nodo que ejecute el auto-ajuste de XMRig (benchmark sobre varias configuraciones)."""
+        if not messagebox.askokcancel("Auto-ajuste de XMRig",
+                                      f"El Nodo {port} detendrá XMRig y ejecutará varios benchmarks, lo que puede "
+                                      "tardar varios minutos. Para resultados representativos conviene no tener "
+                                      "otras cargas pesadas en la máquina. ¿Continuar?"):
+            return
+        self.send_node_command(port, "autotune")
+
+    def show_cpu_plan(self):
+        """Muestra cómo se repartiría la CPU entre los nodos con el modo elegido."""
+        try:
+            topology = read_cpu_topology()
+            plan = plan_cpu_partitions(topology, len(self.ports), self.cpu_mode.get())
+            report = format_cpu_plan(topology, plan, labels=[f"Nodo {port}" for port in self.ports])
+        except Exception as e:
+            messagebox.showerror("Plan de CPU", f"No se pudo leer la topología de la CPU: {e}")
+            return
+        print(report)
+        messagebox.showinfo("Plan de CPU", report)
+
+    def _schedule_pool_stats(self):
+        """Actualiza las estadísticas del pool y se reprograma (la caché y el backoff evitan consultas de más)."""
+        self.update_pool_stats_gui()
+        self.master.after(POOL_STATS_REFRESH_INTERVAL_MS, self._schedule_pool_stats)
 
     def update_pool_stats_gui(self):
         """Actualiza el área de texto con las estadísticas de minería del pool."""
-        def fetch_stats():
-            try:
-                # Asegúrate de que MONERO_WALLET_ADDRESS esté actualizado si se cambió via GUI
-                current_api_url = f"https://supportxmr.com/api/miner/{MONERO_WALLET_ADDRESS}/stats"
-                response = requests.get(current_api_url)
-                response.raise_for_status()
-                stats = response.json()
-
-                output = f"Última Actualización: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-                output += f"Dirección de Billetera: {MONERO_WALLET_ADDRESS}\n"
-                output += f"Hashrate Actual: {stats.get('hashrate', 'N/A')} H/s\n"
-                output += f"Hashrate Promedio (última hora): {stats.get('avgHashrate', 'N/A')} H/s\n"
-                output += f"Pagado Total: {stats.get('amtPaid', 'N/A')} XMR\n"
-                output += f"Balance Pendiente: {stats.get('due', 'N/A')} XMR\n"
-                output += f"Pagos Confirmados: {stats.get('paymentsTotal', 'N/A')}\n"
-                output += f"Último Pago: {stats.get('lastPayment', 'N/A')}\n"
-                output += f"Shares Válidos: {stats.get('validShares', 'N/A')}\n"
-                output += f"Shares Inválidos: {stats.get('invalidShares', 'N/A')}\n"
-                output += f"Workers Activos: {stats.get('workersOnline', 'N/A')}\n"
-
-                self.master.after(0, lambda: self._update_pool_stats_text(output))
-
-            except requests.exceptions.RequestException as e:
-                error_msg = f"Error al obtener estadísticas del pool: {e}"
-                self.master.after(0, lambda: self._update_pool_stats_text(error_msg))
-                print(error_msg)
-            except json.JSONDecodeError:
-                error_msg = "Error al decodificar la respuesta JSON del pool."
-                self.master.after(0, lambda: self._update_pool_stats_text(error_msg))
-                print(error_msg)
-            except Exception as e:
-                error_msg = f"Error inesperado al actualizar stats del pool: {e}"
-                self.master.after(0, lambda: self._update_pool_stats_text(error_msg))
-                print(error_msg)
+        wallet = MONERO_WALLET_ADDRESS # Puede haber cambiado via GUI
+        future = self.pool_stats.get(wallet)
+        # El resultado llega en un hilo del cliente: la GUI se actualiza desde el loop de Tk
+        future.add_done_callback(lambda f: self.master.after(0, self._show_pool_stats, wallet, f))
+
+    def _show_pool_stats(self, wallet, future):
+        try:
+            result = future.result()
+        except PoolStatsError as e:
+            print(e)
+            self._update_pool_stats_text(str(e))
+            return
+        except Exception as e:
+            error_msg = f"Error inesperado al actualizar stats del pool: {e}"
+            print(error_msg)
+            self._update_pool_stats_text(error_msg)
+            return
+
+        stats = result["stats"]
+        fetched_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(result["fetched_at"]))
+        output = f"Última Actualización: {fetched_at}{' (en caché)' if result['cached'] else ''}\n"
+        if result["error"]:
+            output += f"Aviso: {result['error']}\n"
+        output += f"Dirección de Billetera: {wallet}\n"
+        output += f"Hashrate Actual: {stats.get('hashrate', 'N/A')} H/s\n"
+        output += f"Hashrate Promedio (última hora): {stats.get('avgHashrate', 'N/A')} H/s\n"
+        output += f"Pagado Total: {stats.get('amtPaid', 'N/A')} XMR\n"
+        output += f"Balance Pendiente: {stats.get('due', 'N/A')} XMR\n"
+        output += f"Pagos Confirmados: {stats.get('paymentsTotal', 'N/A')}\n"
+        output += f"Último Pago: {stats.get('lastPayment', 'N/A')}\n"
+        output += f"Shares Válidos: {stats.get('validShares', 'N/A')}\n"
+        output += f"Shares Inválidos: {stats.get('invalidShares', 'N/A')}\n"
+        output += f"Workers Activos: {stats.get('workersOnline', 'N/A')}\n"
+        self._update_pool_stats_text(output)
+
+    def _schedule_node_metrics(self):
+        """Consulta las métricas de los nodos que se ven en los paneles, actualiza la lista y se reprograma."""
+        for port in self.ports:
+            if port in self.attached or port in self.node_operations:
+                continue # El canal de un nodo ajeno se reconecta solo; uno que arranca todavía no tiene proceso
+            process = self.node_processes[port]
+            if process is None or process.poll() is not None:
+                if self.last_metrics[port] is not None:
+                    self.last_metrics[port] = None
+                    self.metrics_texts[port].set("Métricas: nodo detenido")
+                self._close_node_control(port)
+        for port in self.panel_for:
+            if not self._node_running(port):
+                continue
+            control = self.node_controls[port]
+            if control is not None and control.connected:
+                # Un ping por tick mantiene al día la latencia de ida y vuelta del canal de control
+                control.request("ping").add_done_callback(
+                    lambda f, p=port: self.master.after(0, self._render_node_status, p))
+            future = self.node_metrics.get(port)
+            future.add_done_callback(lambda f, p=port: self.master.after(0, self._show_node_metrics, p, f))
+        self._update_node_list()
+        self.master.after(METRICS_REFRESH_INTERVAL_MS, self._schedule_node_metrics)
 
-        threading.Thread(target=fetch_stats, daemon=True).start()
+    def _show_node_metrics(self, port, future):
+        try:
+            snapshot = future.result()
+        except Exception as e:
+            self.metrics_texts[port].set(f"Métricas: sin respuesta ({e.__class__.__name__})")
+            return
+        self.metrics_texts[port].set(format_node_metrics(snapshot, self.last_metrics[port]))
+        self.last_metrics[port] = snapshot
 
     def _update_pool_stats_text(self, text):
         self.pool_stats_text.config(state=tk.NORMAL)
@@ -329,17 +1333,95 @@ class P2PGUIController:
         self.pool_stats_text.insert(tk.END, text)
         self.pool_stats_text.config(state=tk.DISABLED)
 
+    def _update_cluster_summary_text(self, text):
+        self.cluster_summary_text.config(state=tk.NORMAL)
+        self.cluster_summary_text.delete(1.0, tk.END)
+        self.cluster_summary_text.insert(tk.END, text)
+        self.cluster_summary_text.config(state=tk.DISABLED)
+
+    def attach_cluster(self, path=None):
+        """
+        Se conecta a un cluster lanzado con cluster_launcher.py a partir de su archivo de estado:
+        la GUI muestra y controla sus nodos por el canal de control, sin ser dueña de los procesos.
+        """
+        if path is None:
+            path = filedialog.askopenfilename(title="Archivo de estado del cluster",
+                                              filetypes=[("Estado del cluster", "*.json"), ("Todos", "*.*")])
+            if not path:
+                return
+        if any(port not in self.attached and self._node_running(port) for port in self.ports) or self.node_operations:
+            self.operation_status.set("Detené primero los nodos lanzados por la GUI para conectarte a un cluster.")
+            return
+        try:
+            state = read_cluster_state(path)
+        except (OSError, ValueError) as e:
+            self.operation_status.set(f"No se pudo leer el estado del cluster '{path}': {e}")
+            return
+        self._detach_cluster()
+        entries = {entry["port"]: entry for entry in state["nodes"]}
+        self._init_nodes(sorted(entries), log_dirs={port: entry.get("log") for port, entry in entries.items()})
+        self.attached = entries
+        for port, entry in entries.items():
+            self._open_node_control(port, entry["token"], entry["control_port"])
+            if port in self.log_readers:
+                self.log_followers[port] = self.output_mux.follow_log(entry["log"], self.log_history_start[port],
+                                                                      self.output_buffers[port])
+        self._refresh_node_list()
+        self.operation_status.set(f"Conectado al cluster de {path}: {len(entries)} nodos "
+                                  f"(lanzador PID {state.get('launcher_pid')}).")
+
+    def _detach_cluster(self):
+        """Cierra los canales y lectores de log de los nodos actuales (sin detenerlos)."""
+        for follower in self.log_followers.values():
+            follower.cancel()
+        self.log_followers = {}
+        for port in self.ports:
+            self._close_node_control(port)
+
     def on_closing(self):
-        if messagebox.askokcancel("Salir", "¿Estás seguro de que quieres salir? Se detendrán todos los nodos activos."):
-            for port in NODE_PORTS:
-                if self.node_processes[port] is not None and self.node_processes[port].poll() is None:
-                    print(f"Deteniendo Nodo {port} antes de salir...")
-                    self.stop_node(port)
-            self.master.destroy()
+        if self.closing:
+            return
+        question = "¿Estás seguro de que quieres salir? Se detendrán todos los nodos activos."
+        if self.attached:
+            question = "¿Estás seguro de que quieres salir? Los nodos del cluster siguen en ejecución."
+        if messagebox.askokcancel("Salir", question):
+            self.closing = True
+            # Todos los nodos propios se detienen a la vez; la ventana sigue respondiendo mientras tanto
+            self.stop_nodes([port for port in self.ports if port not in self.attached], on_done=self._finish_closing)
+
+    def _finish_closing(self):
+        if self.node_operations: # Otra operación (ej. un arranque) todavía no terminó
+            self.master.after(100, self._finish_closing)
+            return
+        running = [port for port in self.ports if port not in self.attached and self._node_running(port)]
+        if running: # Nodos que terminaron de arrancar mientras se cerraba
+            self.stop_nodes(running, on_done=self._finish_closing)
+            return
+        self._detach_cluster()
+        self.output_mux.stop()
+        self._close_log_stores()
+        self.log_executor.shutdown(wait=False)
+        self.pool_stats.close()
+        self.node_metrics.close()
+        self.master.destroy()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="GUI para lanzar y monitorear nodos mineros P2P.")
+    parser.add_argument("--nodes", type=int, default=len(NODE_PORTS), help="Cantidad de nodos a administrar")
+    parser.add_argument("--base-port", type=int, default=NODE_PORTS[0], help="Puerto del primer nodo")
+    parser.add_argument("--attach", default=None, metavar="ESTADO",
+                        help="Conectarse al cluster de cluster_launcher.py descrito en este archivo de estado")
+    parser.add_argument("--log-dir", default=NODE_LOG_DIR,
+                        help=f"Directorio del log persistente de los nodos lanzados por la GUI (por defecto {NODE_LOG_DIR})")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
+    args = parse_args()
     root = tk.Tk()
-    app = P2PGUIController(root)
+    app = P2PGUIController(root, ports=[args.base_port + i for i in range(args.nodes)], attach=args.attach,
+                           log_dir=args.log_dir)
     # Ya tienes root.protocol en __init__, esta línea puede ser redundante o generar un doble registro
     # root.protocol("WM_DELETE_WINDOW", app.on_closing) 
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -17,6 +17,37 @@ import sys
 import subprocess
 import os # <-- ¡Asegúrate de que 'os' esté importado! Ya lo tienes.
 import queue
+import struct
+import argparse
+import asyncio
+import concurrent.futures
+import hashlib
+import uuid
+import secrets
+import urllib.request
+import urllib.error
+import math
+import random
+import heapq
+import itertools
+import signal
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, deque
+
+from cpu_topology import (CPU_MODES, CPU_MODE_SPLIT, read_cpu_topology, plan_cpu_partitions,
+                          xmrig_cpu_args, format_cpu_plan, parse_slot)
+from xmrig_tuner import TUNING_BENCH_SIZES, TuningCache, autotune, cpu_fingerprint, tuning_args
+from xmrig_supervisor import (XMRIG_CRASH_LOOP_LIMIT, XMRIG_CRASH_LOOP_WINDOW, XMRIG_STALL_TIMEOUT,
+                              XMRIG_WATCHDOG_INTERVAL, FAILURE_START, FAILURE_STALL, XmrigSupervisor, format_failure)
+from mining_governor import (GOVERNOR_LEVEL_NAMES, GOVERNOR_POLICY_DEFAULTS, MiningGovernor,
+                             SystemSampler, format_decision, load_governor_policy, scale_threads_args,
+                             set_low_priority, suspend_process)
+from stratum_proxy import StratumProxy, STRATUM_PROXY_HOST
+from node_metrics import NodeMetrics, MetricsHTTPServer, format_metrics
+from cluster_query import (CLUSTER_QUERY_POOL_INFO, CLUSTER_QUERY_TIMEOUT, ClusterQueryTracker,
+                           format_cluster_summary, response_hashrate, summarize_pool_info)
+from node_control import ControlServer, CONTROL_TOKEN_ENV
 
 # --- Configuración del Nodo ---
 PEER_NODES = [
@@ -24,7 +55,38 @@ PEER_NODES = [
     ('localhost', 8001),
     ('localhost', 8002)
 ]
-MESSAGE_BUFFER_SIZE = 4096
+MESSAGE_BUFFER_SIZE = 65536 # Tamaño de cada lectura del socket; un mensaje puede ocupar varias lecturas
+
+# --- Protocolo de transporte: tramas con prefijo de longitud ---
+# Cada mensaje viaja como <longitud: uint32 big-endian><payload>, lo que permite
+# recibir mensajes más grandes que una lectura y varios mensajes en un mismo segmento TCP.
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 4 * 1024 * 1024 # Tamaño máximo de payload aceptado (configurable con --max-frame-size)
+
+# --- Deduplicación de gossip (transacciones y bloques) ---
+GOSSIP_CACHE_SIZE = 50000 # Máximo de IDs de mensajes recordados
+GOSSIP_CACHE_TTL = 600 # Segundos que se recuerda un mensaje ya visto
+
+# --- Tabla de peers y sincronización de PEER_LIST por deltas ---
+PEER_TABLE_SIZE = 256 # Máximo de peers en la tabla; al llenarse se desaloja el peor
+PEER_DELTA_LOG_SIZE = 1024 # Cambios recordados para responder deltas; más atrás se envía la tabla completa
+PEER_SYNC_INTERVAL = 30 # Segundos entre sincronizaciones periódicas de la tabla
+PEER_SYNC_FANOUT = 3 # Peers (al azar) a los que se pide el delta en cada sincronización
+PEER_RETRY_INITIAL = 5 # Espera antes de reintentar un peer que falló (se duplica en cada fallo)
+PEER_RETRY_MAX = 300
+PEER_MAX_FAILURES = 5 # Fallos seguidos tras los que el peer sale de la tabla
+PEER_RTT_ALPHA = 0.25 # Peso de cada medición nueva en la media móvil del RTT
+PEER_RETRY_CHECK_INTERVAL = 1 # Cada cuántos segundos se buscan peers con reintento vencido
+
+# --- Configuración del pool de conexiones entre peers ---
+PEER_CONNECT_TIMEOUT = 5 # Timeout (segundos) para abrir una conexión saliente
+PEER_CONNECTION_TIMEOUT = 600 # Timeout de inactividad de lectura de un socket de peer
+LISTEN_BACKLOG = 128 # Conexiones entrantes pendientes de aceptar antes de rechazar nuevas
+POOL_IDLE_TIMEOUT = 300 # Segundos sin tráfico antes de cerrar una conexión saliente ociosa
+POOL_BACKOFF_INITIAL = 1 # Espera inicial (segundos) antes de reintentar un peer que falló
+POOL_BACKOFF_MAX = 60 # Espera máxima entre reintentos de conexión
+POOL_MAINTENANCE_INTERVAL = 30 # Cada cuántos segundos se purgan conexiones ociosas
+PEER_SEND_QUEUE_SIZE = 1000 # Mensajes pendientes por peer antes de considerarlo lento y desconectarlo
 
 # --- INICIO DEL CAMBIO PARA LA RUTA DE XMRIG ---
 # Determinar el directorio base de la aplicación (donde se encuentra el script principal)
@@ -38,6 +100,8 @@ else:
 # Construir la ruta al ejecutable de XMRig
 # Se asume que xmrig.exe está en la subcarpeta 'xmrig' dentro del directorio base.
 XMRIG_PATH = os.path.join(APPLICATION_BASE_DIR, "xmrig", "xmrig.exe")
+# Resultados del auto-ajuste (comando 'autotune'), por huella de CPU
+XMRIG_TUNING_CACHE = os.path.join(APPLICATION_BASE_DIR, "xmrig_tuning.json")
 
 # Opcional: Imprime la ruta para depuración (puedes borrar esta línea después)
 print(f"DEBUG: XMRig path detected: {XMRIG_PATH}")
@@ -48,6 +112,17 @@ print(f"DEBUG: XMRig path detected: {XMRIG_PATH}")
 MONERO_WALLET_ADDRESS_DEFAULT = "4931PMmb9FE2LapSempngoBNYoVP2ZdDt8C1bDScwhbNMcKzLw2guY5H1hxvNnRmfydJVKemEJQFdguxRK6J9hv5FHc8ABd" # <--- ¡CÁMBIAME SI AÚN NO LO HAS HECHO!
 POOL_URL = "pool.supportxmr.com:443" # URL de tu pool, puedes fijarla aquí
 
+# --- API HTTP local de XMRig ---
+# Cada nodo habilita la API de su XMRig en 127.0.0.1:<puerto del nodo + offset> (o --xmrig-api-port)
+# y consulta /2/summary periódicamente para obtener hashrate, shares y estado de conexión.
+XMRIG_API_PORT_OFFSET = 10000
+XMRIG_API_POLL_INTERVAL = 5 # Segundos entre consultas a la API
+XMRIG_API_TIMEOUT = 2 # Timeout de cada consulta HTTP
+
+# --- Historial de hashrate y shares (memoria fija) ---
+# Cada nivel: (nombre de la ventana, segundos por bucket, cantidad de buckets)
+HISTORY_TIERS = (("1m", 5, 12), ("1h", 60, 60), ("24h", 900, 96))
+
 # --- Tipos de Mensajes P2P ---
 MSG_TYPE_HANDSHAKE = "handshake"
 MSG_TYPE_TRANSACTION = "transaction"
@@ -57,13 +132,1414 @@ MSG_TYPE_REQUEST_PEERS = "request_peers"
 MSG_TYPE_POOL_INFO_REQUEST = "pool_info_request" # Nuevo tipo de mensaje
 MSG_TYPE_POOL_INFO_RESPONSE = "pool_info_response" # Nuevo tipo de mensaje
 MSG_TYPE_INTERNAL_COMMAND = "internal_command" # Para comandos internos enviados desde stdin (ej. por GUI)
+MSG_TYPE_STATS_REQUEST = "hashrate_stats_request" # Pide agregados de hashrate/shares por ventana de tiempo
+MSG_TYPE_STATS_RESPONSE = "hashrate_stats_response"
+
+# --- Codificaciones de mensajes negociadas en el handshake ---
+CODEC_JSON = "json" # Siempre soportado; es el que usan los peers antiguos
+CODEC_BINARY = "bin1" # Binario compacto estilo msgpack (ver _pack_value)
+SUPPORTED_CODECS = [CODEC_BINARY, CODEC_JSON] # En orden de preferencia
+BINARY_MAGIC = 0xB1 # Primer byte de un payload binario (un payload JSON empieza con '{')
+# Código de un byte para cada tipo de mensaje conocido; los demás viajan como texto
+MSG_TYPE_CODES = {
+    MSG_TYPE_HANDSHAKE: 1,
+    MSG_TYPE_TRANSACTION: 2,
+    MSG_TYPE_BLOCK: 3,
+    MSG_TYPE_PEER_LIST: 4,
+    MSG_TYPE_REQUEST_PEERS: 5,
+    MSG_TYPE_POOL_INFO_REQUEST: 6,
+    MSG_TYPE_POOL_INFO_RESPONSE: 7,
+    MSG_TYPE_INTERNAL_COMMAND: 8,
+    MSG_TYPE_STATS_REQUEST: 9,
+    MSG_TYPE_STATS_RESPONSE: 10,
+}
+MSG_TYPE_BY_CODE = {code: msg_type for msg_type, code in MSG_TYPE_CODES.items()}
+
+class XmrigApiClient:
+    """Cliente mínimo de la API HTTP local de XMRig: /2/summary y, para el gobernador, pause/resume."""
+    def __init__(self, port, access_token=None, host="127.0.0.1", timeout=XMRIG_API_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.base_url = f"http://{host}:{port}"
+        self.access_token = access_token
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        request = urllib.request.Request(self.base_url + path, data=body)
+        if self.access_token:
+            request.add_header("Authorization", f"Bearer {self.access_token}")
+        if body is not None:
+            request.add_header("Content-Type", "application/json")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def summary(self):
+        return self._request("/2/summary")
+
+    def json_rpc(self, method):
+        """Llamada JSON-RPC ('pause', 'resume'); XMRig debe haberse lanzado con --http-no-restricted."""
+        body = json.dumps({"id": 1, "jsonrpc": "2.0", "method": method}).encode("utf-8")
+        response = self._request("/json_rpc", body)
+        if response.get("error"):
+            raise ValueError(f"XMRig rechazó '{method}': {response['error']}")
+        return response.get("result")
+
+
+def parse_xmrig_summary(summary):
+    """Extrae de la respuesta de /2/summary los campos que usa el nodo."""
+    hashrate = summary.get("hashrate") or {}
+    totals = list(hashrate.get("total") or []) + [None, None, None]
+    results = summary.get("results") or {}
+    connection = summary.get("connection") or {}
+    shares_good = results.get("shares_good", 0)
+    shares_total = results.get("shares_total", 0)
+    return {
+        "hashrate_10s": totals[0],
+        "hashrate_60s": totals[1],
+        "hashrate_15m": totals[2],
+        "hashrate_max": hashrate.get("highest"),
+        "shares_good": shares_good,
+        "shares_total": shares_total,
+        "shares_rejected": max(shares_total - shares_good, 0),
+        "pool": connection.get("pool", ""),
+        "pool_uptime": connection.get("uptime", 0),
+        "pool_ping": connection.get("ping", 0),
+        "pool_failures": connection.get("failures", 0),
+        "uptime": summary.get("uptime", 0),
+        "algo": summary.get("algo") or connection.get("algo", ""),
+        "version": summary.get("version", ""),
+        "updated_at": time.time(),
+    }
+
+
+def format_hashrate(stats):
+    """Texto de hashrate al estilo de la salida de XMRig: '10s/60s/15m 4620.5 4601.2 n/a H/s'."""
+    values = [stats.get("hashrate_10s"), stats.get("hashrate_60s"), stats.get("hashrate_15m")]
+    return "10s/60s/15m " + " ".join("n/a" if v is None else f"{v:.1f}" for v in values) + " H/s"
+
+
+class TimeSeriesTier:
+    """
+    Nivel de resolución fija de la serie temporal: `size` buckets de `resolution` segundos
+    guardados en arrays circulares. Cada muestra se acumula en el bucket de su instante,
+    por lo que el nivel ya queda submuestreado y su memoria no crece con el tiempo.
+    """
+    __slots__ = ("name", "resolution", "size", "_slot", "_count", "_sum", "_min", "_max", "_accepted", "_rejected")
+
+    def __init__(self, name, resolution, size):
+        self.name = name
+        self.resolution = resolution
+        self.size = size
+        self._slot = array('q', [-1]) * size # Número de bucket (t // resolution) que ocupa cada posición
+        self._count = array('L', [0]) * size
+        self._sum = array('d', [0.0]) * size
+        self._min = array('d', [0.0]) * size
+        self._max = array('d', [0.0]) * size
+        self._accepted = array('L', [0]) * size
+        self._rejected = array('L', [0]) * size
+
+    def add(self, timestamp, hashrate, accepted, rejected):
+        bucket = int(timestamp // self.resolution)
+        i = bucket % self.size
+        if self._slot[i] != bucket: # Posición ocupada por un bucket viejo: reutilizarla
+            self._slot[i] = bucket
+            self._count[i] = 0
+            self._sum[i] = 0.0
+            self._accepted[i] = 0
+            self._rejected[i] = 0
+        if hashrate is not None:
+            if self._count[i] == 0:
+                self._min[i] = self._max[i] = hashrate
+            else:
+                self._min[i] = min(self._min[i], hashrate)
+                self._max[i] = max(self._max[i], hashrate)
+            self._count[i] += 1
+            self._sum[i] += hashrate
+        self._accepted[i] += accepted
+        self._rejected[i] += rejected
+
+    def aggregate(self, now, window):
+        """Agregados de los buckets dentro de los últimos `window` segundos."""
+        first_bucket = int((now - window) // self.resolution) + 1
+        last_bucket = int(now // self.resolution)
+        count = 0
+        total = 0.0
+        low = high = None
+        bucket_means = []
+        accepted = rejected = 0
+        for i in range(self.size):
+            if not first_bucket <= self._slot[i] <= last_bucket:
+                continue
+            accepted += self._accepted[i]
+            rejected += self._rejected[i]
+            n = self._count[i]
+            if n:
+                count += n
+                total += self._sum[i]
+                low = self._min[i] if low is None else min(low, self._min[i])
+                high = self._max[i] if high is None else max(high, self._max[i])
+                bucket_means.append(self._sum[i] / n)
+        p95 = None
+        if bucket_means:
+            # Percentil 95 (rango más cercano) sobre las medias de cada bucket
+            bucket_means.sort()
+            p95 = bucket_means[max(math.ceil(0.95 * len(bucket_means)) - 1, 0)]
+        return {
+            "samples": count,
+            "mean": round(total / count, 2) if count else None,
+            "min": low,
+            "max": high,
+            "p95": round(p95, 2) if p95 is not None else None,
+            "shares_accepted": accepted,
+            "shares_rejected": rejected,
+        }
+
+
+class HashrateHistory:
+    """Serie temporal de hashrate y shares con niveles de 1 minuto, 1 hora y 24 horas."""
+    __slots__ = ("tiers", "_lock")
+
+    def __init__(self, tiers=HISTORY_TIERS):
+        self.tiers = [TimeSeriesTier(name, resolution, size) for name, resolution, size in tiers]
+        self._lock = threading.Lock()
+
+    def record(self, hashrate=None, accepted=0, rejected=0, timestamp=None):
+        """Registra una muestra de hashrate (H/s) y/o los shares aceptados/rechazados desde la anterior."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for tier in self.tiers:
+                tier.add(timestamp, hashrate, accepted, rejected)
+
+    def window_names(self):
+        return [tier.name for tier in self.tiers]
+
+    def aggregate(self, window_name, now=None):
+        """Agregados (mean, min, max, p95, shares) de la ventana indicada ('1m', '1h' o '24h')."""
+        now = time.time() if now is None else now
+        for tier in self.tiers:
+            if tier.name == window_name:
+                with self._lock:
+                    return tier.aggregate(now, tier.resolution * tier.size)
+        raise ValueError(f"ventana desconocida: {window_name}")
+
+    def summary(self, now=None):
+        return {name: self.aggregate(name, now) for name in self.window_names()}
+
+
+def parse_speed_line(line):
+    """Primer valor numérico (hashrate de 10s) de una línea 'speed 10s/60s/15m ...' de XMRig."""
+    for token in line.split("speed", 1)[-1].split():
+        try:
+            return float(token)
+        except ValueError:
+            continue
+    return None
+
+
+class FrameTooLargeError(ValueError):
+    """La trama anunciada supera el tamaño máximo permitido."""
+
+
+class FrameDecoder:
+    """
+    Decodificador incremental de tramas con prefijo de longitud. Acumula los bytes
+    recibidos y devuelve los payloads completos, manejando lecturas parciales y
+    mensajes agrupados. El buffer solo se compacta una vez por lectura.
+    """
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Añade datos recibidos y devuelve la lista de payloads (bytes) completos."""
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        offset = 0
+        header_size = FRAME_HEADER.size
+        while len(buffer) - offset >= header_size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+            if length > self.max_frame_size:
+                raise FrameTooLargeError(f"trama de {length} bytes supera el máximo de {self.max_frame_size}")
+            end = offset + header_size + length
+            if end > len(buffer):
+                break # Trama incompleta: esperar más datos
+            frames.append(bytes(buffer[offset + header_size:end]))
+            offset = end
+        if offset:
+            del buffer[:offset]
+        return frames
+
+    def pending_bytes(self):
+        return len(self._buffer)
+
+
+# --- Codificación binaria (subconjunto de msgpack) ---
+_PACK_B = struct.Struct("!B")
+_PACK_BB = struct.Struct("!BB")
+_PACK_BH = struct.Struct("!BH")
+_PACK_BI = struct.Struct("!BI")
+_PACK_BQ = struct.Struct("!BQ")
+_PACK_Bb = struct.Struct("!Bb")
+_PACK_Bh = struct.Struct("!Bh")
+_PACK_Bi = struct.Struct("!Bi")
+_PACK_Bq = struct.Struct("!Bq")
+_PACK_BD = struct.Struct("!Bd")
+
+
+def _pack_value(buf, value):
+    """Añade a buf la codificación msgpack de un valor compatible con JSON."""
+    t = type(value)
+    if t is str:
+        raw = value.encode('utf-8')
+        n = len(raw)
+        if n < 32:
+            buf.append(0xA0 | n)
+        elif n < 0x100:
+            buf += _PACK_BB.pack(0xD9, n)
+        elif n < 0x10000:
+            buf += _PACK_BH.pack(0xDA, n)
+        else:
+            buf += _PACK_BI.pack(0xDB, n)
+        buf += raw
+    elif t is int:
+        if 0 <= value < 0x80:
+            buf.append(value)
+        elif -32 <= value < 0:
+            buf.append(value & 0xFF)
+        elif value >= 0:
+            if value < 0x100:
+                buf += _PACK_BB.pack(0xCC, value)
+            elif value < 0x10000:
+                buf += _PACK_BH.pack(0xCD, value)
+            elif value < 0x100000000:
+                buf += _PACK_BI.pack(0xCE, value)
+            elif value < 0x10000000000000000:
+                buf += _PACK_BQ.pack(0xCF, value)
+            else:
+                raise TypeError(f"entero fuera de 64 bits: {value}")
+        elif value >= -0x80:
+            buf += _PACK_Bb.pack(0xD0, value)
+        elif value >= -0x8000:
+            buf += _PACK_Bh.pack(0xD1, value)
+        elif value >= -0x80000000:
+            buf += _PACK_Bi.pack(0xD2, value)
+        elif value >= -0x8000000000000000:
+            buf += _PACK_Bq.pack(0xD3, value)
+        else:
+            raise TypeError(f"entero fuera de 64 bits: {value}")
+    elif t is dict:
+        n = len(value)
+        if n < 16:
+            buf.append(0x80 | n)
+        elif n < 0x10000:
+            buf += _PACK_BH.pack(0xDE, n)
+        else:
+            buf += _PACK_BI.pack(0xDF, n)
+        for k, v in value.items():
+            _pack_value(buf, k if type(k) is str else str(k)) # Igual que JSON: claves como texto
+            _pack_value(buf, v)
+    elif t is list or t is tuple:
+        n = len(value)
+        if n < 16:
+            buf.append(0x90 | n)
+        elif n < 0x10000:
+            buf += _PACK_BH.pack(0xDC, n)
+        else:
+            buf += _PACK_BI.pack(0xDD, n)
+        for v in value:
+            _pack_value(buf, v)
+    elif value is None:
+        buf.append(0xC0)
+    elif value is True:
+        buf.append(0xC3)
+    elif value is False:
+        buf.append(0xC2)
+    elif t is float:
+        buf += _PACK_BD.pack(0xCB, value)
+    else:
+        raise TypeError(f"tipo no serializable en binario: {t.__name__}")
+
+
+# Formatos de longitud fija: byte de tipo -> (Struct del valor, tamaño)
+_UNPACK_FIXED = {
+    0xCA: struct.Struct("!f"), 0xCB: struct.Struct("!d"),
+    0xCC: struct.Struct("!B"), 0xCD: struct.Struct("!H"), 0xCE: struct.Struct("!I"), 0xCF: struct.Struct("!Q"),
+    0xD0: struct.Struct("!b"), 0xD1: struct.Struct("!h"), 0xD2: struct.Struct("!i"), 0xD3: struct.Struct("!q"),
+}
+_UNPACK_LEN = {0xD9: _PACK_B, 0xDA: struct.Struct("!H"), 0xDB: struct.Struct("!I"),
+               0xDC: struct.Struct("!H"), 0xDD: struct.Struct("!I"),
+               0xDE: struct.Struct("!H"), 0xDF: struct.Struct("!I")}
+
+
+def _unpack_value(data, offset):
+    """Decodifica un valor msgpack desde data[offset:]. Devuelve (valor, nuevo offset)."""
+    b = data[offset]
+    offset += 1
+    # Los casos frecuentes (enteros pequeños, textos, listas y mapas cortos) van primero
+    if b < 0x80:
+        return b, offset
+    if b >= 0xA0:
+        if b < 0xC0:
+            end = offset + (b & 0x1F)
+            return str(data[offset:end], 'utf-8'), end
+        if b >= 0xE0:
+            return b - 0x100, offset
+    elif b >= 0x90:
+        items = []
+        for _ in range(b & 0x0F):
+            item, offset = _unpack_value(data, offset)
+            items.append(item)
+        return items, offset
+    else:
+        result = {}
+        for _ in range(b & 0x0F):
+            key, offset = _unpack_value(data, offset)
+            result[key], offset = _unpack_value(data, offset)
+        return result, offset
+
+    if b == 0xC0:
+        return None, offset
+    if b == 0xC2:
+        return False, offset
+    if b == 0xC3:
+        return True, offset
+    fmt = _UNPACK_FIXED.get(b)
+    if fmt is not None:
+        return fmt.unpack_from(data, offset)[0], offset + fmt.size
+    fmt = _UNPACK_LEN.get(b)
+    if fmt is None:
+        raise ValueError(f"byte de tipo binario no soportado: 0x{b:02x}")
+    n = fmt.unpack_from(data, offset)[0]
+    offset += fmt.size
+    if b <= 0xDB: # str8/16/32
+        end = offset + n
+        if end > len(data):
+            raise ValueError("texto truncado en mensaje binario")
+        return str(data[offset:end], 'utf-8'), end
+    if b <= 0xDD: # array16/32
+        items = []
+        for _ in range(n):
+            item, offset = _unpack_value(data, offset)
+            items.append(item)
+        return items, offset
+    result = {} # map16/32
+    for _ in range(n):
+        key, offset = _unpack_value(data, offset)
+        result[key], offset = _unpack_value(data, offset)
+    return result, offset
+
+
+def encode_binary_message(msg_type, data, msg_id=None):
+    """Payload binario: BINARY_MAGIC + msgpack([código de tipo, datos(, id)])."""
+    buf = bytearray((BINARY_MAGIC,))
+    fields = [MSG_TYPE_CODES.get(msg_type, msg_type), data]
+    if msg_id is not None:
+        fields.append(msg_id)
+    _pack_value(buf, fields)
+    return bytes(buf)
+
+
+def decode_binary_message(payload):
+    """Inverso de encode_binary_message: devuelve el mismo diccionario que el formato JSON."""
+    try:
+        fields, end = _unpack_value(payload, 1)
+    except (IndexError, struct.error, TypeError) as e: # Datos truncados o una clave no hashable
+        raise ValueError(f"mensaje binario mal formado: {e}") from e
+    if end != len(payload) or not isinstance(fields, list) or len(fields) < 2:
+        raise ValueError("mensaje binario mal formado")
+    msg_type = fields[0]
+    message = {"type": MSG_TYPE_BY_CODE.get(msg_type, msg_type), "data": fields[1]}
+    if len(fields) > 2:
+        message["id"] = fields[2]
+    return message
+
+
+def negotiate_codec(remote_codecs, local_codecs=SUPPORTED_CODECS):
+    """Elige el primer codec local (por preferencia) que el peer también anuncia; si no, JSON."""
+    for codec in local_codecs:
+        if codec in (remote_codecs or ()):
+            return codec
+    return CODEC_JSON
+
+
+class MessageCodec:
+    """
+    Codifica y decodifica los mensajes P2P ({"type", "data"[, "id"]}) dentro de tramas.
+    Cada payload puede ir en JSON o en binario (CODEC_BINARY); al decodificar, el formato
+    se detecta por el primer byte, así un mismo enlace admite ambos.
+    """
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+
+    def encode(self, msg_type, data, msg_id=None, codec=CODEC_JSON):
+        payload = None
+        if codec == CODEC_BINARY:
+            try:
+                payload = encode_binary_message(msg_type, data, msg_id)
+            except TypeError:
+                pass # Un valor sin representación binaria (ej. entero de más de 64 bits) va en JSON
+        if payload is None:
+            envelope = {"type": msg_type, "data": data}
+            if msg_id is not None:
+                envelope["id"] = msg_id # Identificador de mensajes gossip para deduplicar
+            payload = json.dumps(envelope).encode('utf-8')
+        if len(payload) > self.max_frame_size:
+            raise FrameTooLargeError(f"mensaje '{msg_type}' de {len(payload)} bytes supera el máximo de {self.max_frame_size}")
+        return FRAME_HEADER.pack(len(payload)) + payload
+
+    def decode(self, payload):
+        """Mensaje de un payload; ValueError si está truncado o mal formado."""
+        if payload and payload[0] == BINARY_MAGIC:
+            return decode_binary_message(payload)
+        message = json.loads(payload)
+        if not isinstance(message, dict):
+            raise ValueError("el mensaje JSON no es un objeto")
+        return message
+
+    def new_decoder(self):
+        return FrameDecoder(self.max_frame_size)
+
+
+class SeenMessageCache:
+    """
+    Caché acotada de IDs de mensajes gossip ya vistos (LRU con TTL). Permite descartar
+    un mensaje repetido antes de retransmitirlo, cortando los ecos en una malla completa.
+    Guarda el instante en que se vio cada mensaje por primera vez.
+    """
+    def __init__(self, max_entries=GOSSIP_CACHE_SIZE, ttl=GOSSIP_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # msg_id -> instante en que se vio por primera vez
+        self._lock = threading.Lock()
+
+    def add(self, msg_id):
+        """Registra el ID. Devuelve True si es nuevo y False si ya se había visto (duplicado)."""
+        now = time.time()
+        with self._lock:
+            first_seen = self._entries.get(msg_id)
+            if first_seen is not None and now - first_seen < self.ttl:
+                self._entries.move_to_end(msg_id)
+                return False
+            self._entries[msg_id] = now
+            self._entries.move_to_end(msg_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Descartar el menos usado
+            return True
+
+    def first_seen(self, msg_id):
+        with self._lock:
+            return self._entries.get(msg_id)
+
+    def purge_expired(self):
+        """Elimina las entradas vencidas. Devuelve cuántas se eliminaron."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [msg_id for msg_id, seen in self._entries.items() if seen < cutoff]
+            for msg_id in expired:
+                del self._entries[msg_id]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PeerInfo:
+    """Entrada de la tabla de peers."""
+    __slots__ = ("node_id", "address", "last_seen", "rtt", "failures", "retry_at", "connections",
+                 "delta_sync", "synced_version")
+
+    def __init__(self, node_id, address):
+        self.node_id = node_id
+        self.address = address # (host, puerto de escucha)
+        self.last_seen = 0.0 # Último mensaje recibido directamente de este peer (0 = nunca)
+        self.rtt = None # Tiempo de ida y vuelta (media móvil, segundos) de la sincronización de peers
+        self.failures = 0 # Fallos seguidos de conexión o envío; con más de 0 no recibe broadcasts
+        self.retry_at = 0.0
+        self.connections = 0 # Conexiones abiertas con handshake de este peer
+        self.delta_sync = False # El peer entiende PEER_LIST versionado (anunció node_id en el handshake)
+        self.synced_version = 0 # Versión de su tabla que ya recibimos
+
+    @property
+    def connected(self):
+        return self.connections > 0
+
+
+def legacy_peer_id(address):
+    """ID de un peer antiguo que no anuncia node_id: su dirección de escucha."""
+    return f"{address[0]}:{address[1]}"
+
+
+class PeerTable:
+    """
+    Tabla acotada de peers indexada por node ID (y por dirección). Registra la última
+    actividad, el RTT y los fallos de cada peer; cuando se llena se desaloja el peor
+    desconectado (con más fallos y visto hace más tiempo). Los peers conectados nunca se
+    desalojan: solo ellos pueden superar el máximo, para seguir recibiendo broadcasts.
+    Cada alta o baja incrementa la versión de la tabla y queda en un registro de cambios
+    acotado, del que se obtienen los deltas para PEER_LIST (ver delta()).
+    """
+    def __init__(self, own_id, max_entries=PEER_TABLE_SIZE, log_size=PEER_DELTA_LOG_SIZE):
+        self.own_id = own_id
+        self.max_entries = max_entries
+        self.version = 0
+        self._by_id = {}
+        self._by_address = {} # (host, puerto) -> node_id
+        self._changes = deque() # (versión, node_id) de cada alta/baja, en orden
+        self._log_size = log_size
+        self._log_floor = 0 # Los cambios posteriores a esta versión están todos en el registro
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, address):
+        return address in self._by_address
+
+    def get(self, address):
+        with self._lock:
+            node_id = self._by_address.get(address)
+            return self._by_id.get(node_id) if node_id is not None else None
+
+    def _log_change(self, node_id):
+        self.version += 1
+        self._changes.append((self.version, node_id))
+        if len(self._changes) > self._log_size:
+            self._log_floor = self._changes.popleft()[0]
+
+    def _remove(self, info):
+        del self._by_id[info.node_id]
+        if self._by_address.get(info.address) == info.node_id:
+            del self._by_address[info.address]
+        self._log_change(info.node_id)
+
+    @staticmethod
+    def _eviction_key(info):
+        """Orden de desalojo: primero los que más fallan, luego los vistos hace más tiempo."""
+        return (-info.failures, info.last_seen)
+
+    def _make_room(self, direct):
+        """
+        Libera una entrada si la tabla está llena. Un peer conectado (direct) desaloja al peor
+        desconectado; uno aprendido de terceros solo desaloja a un peer con fallos, así la tabla
+        no rota con cada PEER_LIST recibido.
+        """
+        if len(self._by_id) < self.max_entries:
+            return True
+        candidates = [info for info in self._by_id.values() if not info.connected]
+        if not candidates:
+            return direct
+        worst = min(candidates, key=self._eviction_key)
+        if not direct and not worst.failures:
+            return False
+        self._remove(worst)
+        return True
+
+    def upsert(self, node_id, address, direct=False, delta_sync=False):
+        """
+        Registra un peer. `direct` indica que lo identificó un handshake propio: su dirección
+        manda y queda conectado y sin fallos. Los peers aprendidos de un PEER_LIST no cambian una
+        entrada existente. Devuelve (PeerInfo o None si no hubo lugar, True si la entrada es nueva).
+        """
+        now = time.time()
+        with self._lock:
+            info = self._by_id.get(node_id)
+            other_id = self._by_address.get(address)
+            if other_id is not None and other_id != node_id:
+                other = self._by_id[other_id]
+                if not direct and (other.connected or info is not None):
+                    return info, False
+                self._remove(other) # La dirección ahora corresponde a otro nodo (ej. se reinició)
+            added = info is None
+            if added:
+                if not self._make_room(direct):
+                    return None, False
+                info = self._by_id[node_id] = PeerInfo(node_id, address)
+                self._by_address[address] = node_id
+                self._log_change(node_id)
+            elif direct and info.address != address:
+                if self._by_address.get(info.address) == node_id:
+                    del self._by_address[info.address]
+                info.address = address
+                self._by_address[address] = node_id
+                self._log_change(node_id)
+            if direct:
+                info.connections += 1
+                info.failures = 0
+                info.last_seen = now
+                info.delta_sync = delta_sync
+            return info, added
+
+    def remove(self, node_id, only_indirect=False):
+        """Quita un peer. Con only_indirect no se quita si estamos conectados a él."""
+        with self._lock:
+            info = self._by_id.get(node_id)
+            if info is None or (only_indirect and info.connected):
+                return False
+            self._remove(info)
+            return True
+
+    def touch(self, address):
+        info = self._by_id.get(self._by_address.get(address))
+        if info is not None:
+            info.last_seen = time.time()
+
+    def record_rtt(self, address, rtt):
+        with self._lock:
+            info = self._by_id.get(self._by_address.get(address))
+            if info is not None:
+                info.rtt = rtt if info.rtt is None else info.rtt + PEER_RTT_ALPHA * (rtt - info.rtt)
+
+    def release(self, node_id):
+        """Se cerró una conexión identificada con el peer. Devuelve True si ya no le quedan conexiones."""
+        with self._lock:
+            info = self._by_id.get(node_id)
+            if info is None or not info.connections:
+                return False
+            info.connections -= 1
+            return not info.connections
+
+    def record_success(self, address):
+        """Un intento de conexión con el peer tuvo éxito: vuelve a recibir broadcasts."""
+        with self._lock:
+            info = self._by_id.get(self._by_address.get(address))
+            if info is not None:
+                info.failures = 0
+
+    def record_failure(self, address):
+        """
+        Suma un fallo al peer: deja de recibir broadcasts hasta que un reintento tenga éxito
+        (con espera exponencial) y, tras PEER_MAX_FAILURES fallos seguidos, sale de la tabla.
+        Devuelve "removed", "failed" o None si el peer no está en la tabla.
+        """
+        with self._lock:
+            info = self._by_id.get(self._by_address.get(address))
+            if info is None:
+                return None
+            info.failures += 1
+            info.connections = 0
+            if info.failures >= PEER_MAX_FAILURES:
+                self._remove(info)
+                return "removed"
+            info.retry_at = time.time() + min(PEER_RETRY_INITIAL * 2 ** (info.failures - 1), PEER_RETRY_MAX)
+            return "failed"
+
+    def due_retries(self, now=None):
+        """Direcciones de peers con fallos a los que ya toca reintentar (se posterga el siguiente intento)."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            for info in self._by_id.values():
+                if info.failures and info.retry_at <= now:
+                    info.retry_at = now + PEER_RETRY_MAX # Hasta conocer el resultado de este intento
+                    due.append(info.address)
+        return due
+
+    def addresses(self):
+        """Destinos de los broadcasts: los peers sin fallos pendientes."""
+        with self._lock:
+            return [info.address for info in self._by_id.values() if not info.failures]
+
+    def reachable(self):
+        """Los mismos peers que addresses(), como {node_id: dirección} (consultas al cluster)."""
+        with self._lock:
+            return {info.node_id: info.address for info in self._by_id.values() if not info.failures}
+
+    def connected_count(self):
+        with self._lock:
+            return sum(1 for info in self._by_id.values() if info.connected)
+
+    def sync_candidates(self, count):
+        """
+        Hasta `count` peers conectados, elegidos al azar, para la sincronización periódica. Solo
+        se usan los ya sincronizados (de ellos llega solo el delta); si no hay ninguno, se pide la
+        tabla completa a uno solo.
+        """
+        with self._lock:
+            connected = [info for info in self._by_id.values() if info.connected and info.delta_sync]
+        synced = [info.address for info in connected if info.synced_version]
+        if synced:
+            return random.sample(synced, min(count, len(synced)))
+        return random.sample([info.address for info in connected], min(1, len(connected)))
+
+    def sync_since(self, address):
+        info = self.get(address)
+        return info.synced_version if info is not None else 0
+
+    def set_synced(self, address, version):
+        with self._lock:
+            info = self._by_id.get(self._by_address.get(address))
+            if info is not None:
+                info.synced_version = version
+
+    def delta(self, since):
+        """
+        Cambios de la tabla posteriores a la versión `since`: {"version", "full", "added", "removed"}.
+        Si el registro ya no los tiene todos (o since es 0), se envía la tabla completa.
+        """
+        with self._lock:
+            if not since or since < self._log_floor or since > self.version:
+                added = [[info.node_id, info.address[0], info.address[1]] for info in self._by_id.values()]
+                return {"version": self.version, "full": True, "added": added, "removed": []}
+            changed = set()
+            for version, node_id in reversed(self._changes):
+                if version <= since:
+                    break
+                changed.add(node_id)
+            added, removed = [], []
+            for node_id in changed:
+                info = self._by_id.get(node_id)
+                if info is None:
+                    removed.append(node_id)
+                else:
+                    added.append([node_id, info.address[0], info.address[1]])
+            return {"version": self.version, "full": False, "added": added, "removed": removed}
+
+    def legacy_list(self):
+        """Lista completa [[host, puerto], ...] para peers sin sincronización por deltas."""
+        return [list(address) for address in self.addresses()]
+
+    def rows(self):
+        """Copia de las entradas para mostrarlas (comando 'peers')."""
+        with self._lock:
+            return [(info.node_id, info.address, info.connected, info.last_seen, info.rtt, info.failures)
+                    for info in self._by_id.values()]
+
+
+class PeerConnection:
+    """
+    Envoltorio de un socket de peer. Serializa los envíos (varios hilos pueden escribir
+    en la misma conexión) y registra la última actividad para el desalojo por inactividad.
+    Expone getpeername()/sendall()/recv() para poder usarse donde antes se usaba el socket.
+    """
+    def __init__(self, sock, peer_tuple=None, outbound=False):
+        self.sock = sock
+        self.peer_tuple = peer_tuple # Tupla (host, puerto de escucha) del peer, si se conoce
+        self.outbound = outbound # True si la conexión la abrimos nosotros
+        self.closed = False
+        self.evicted = False # True si la cerramos nosotros por inactividad
+        self.codec = None # Codec negociado en el handshake recibido por esta conexión
+        self.peer_id = None # node_id anunciado en el handshake recibido por esta conexión
+        self.sync_sent_at = None # Instante (perf_counter) del REQUEST_PEERS pendiente, para medir el RTT
+        self.last_used = time.time()
+        self._send_lock = threading.Lock()
+        try:
+            self._peername = sock.getpeername()
+        except OSError:
+            self._peername = peer_tuple
+
+    def getpeername(self):
+        # Se guarda al crear la conexión para poder usarlo incluso después de cerrarla
+        return self._peername
+
+    def sendall(self, data):
+        with self._send_lock:
+            self.sock.sendall(data)
+        self.last_used = time.time()
+
+    def recv(self, bufsize):
+        data = self.sock.recv(bufsize)
+        self.last_used = time.time()
+        return data
+
+    def is_healthy(self):
+        """Una conexión es sana mientras su hilo lector no haya detectado cierre o error."""
+        return not self.closed and self.sock.fileno() != -1
+
+    def close(self, evicted=False):
+        if self.closed:
+            return
+        self.closed = True
+        self.evicted = evicted
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR) # Desbloquea al hilo lector si está en recv()
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class PeerConnectionPool:
+    """
+    Pool de conexiones persistentes indexado por la tupla (host, puerto) del peer.
+    Reutiliza el mismo socket para todos los mensajes hacia un peer, descarta las
+    conexiones caídas, cierra las salientes ociosas y aplica backoff exponencial
+    a los peers que no responden.
+    """
+    def __init__(self, on_connect, connect_timeout=PEER_CONNECT_TIMEOUT, idle_timeout=POOL_IDLE_TIMEOUT,
+                 backoff_initial=POOL_BACKOFF_INITIAL, backoff_max=POOL_BACKOFF_MAX):
+        self._on_connect = on_connect # Callback invocado con cada conexión nueva (handshake + hilo lector)
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._connections = {} # peer_tuple -> PeerConnection
+        self._backoff = {} # peer_tuple -> (instante del próximo intento, espera actual)
+        self._connect_locks = {} # Evita abrir dos conexiones simultáneas al mismo peer
+        self._lock = threading.Lock()
+
+    def _healthy_connection(self, peer_tuple):
+        """Devuelve la conexión sana del peer o None. Debe llamarse con self._lock tomado."""
+        conn = self._connections.get(peer_tuple)
+        if conn is not None and not conn.is_healthy():
+            del self._connections[peer_tuple]
+            conn = None
+        return conn
+
+    def _check_backoff(self, peer_tuple):
+        """Lanza ConnectionError si el peer falló hace poco y aún no toca reintentar."""
+        retry = self._backoff.get(peer_tuple)
+        if retry and time.time() < retry[0]:
+            raise ConnectionError(f"peer en backoff, próximo intento en {retry[0] - time.time():.1f}s")
+
+    def get(self, peer_tuple):
+        """Devuelve una conexión abierta al peer, reutilizando la existente o creando una nueva."""
+        with self._lock:
+            conn = self._healthy_connection(peer_tuple)
+            if conn is not None:
+                return conn
+            self._check_backoff(peer_tuple)
+            connect_lock = self._connect_locks.setdefault(peer_tuple, threading.Lock())
+
+        with connect_lock:
+            with self._lock: # Otro hilo pudo haber conectado mientras esperábamos
+                conn = self._healthy_connection(peer_tuple)
+                if conn is not None:
+                    return conn
+            try:
+                sock = socket.create_connection(peer_tuple, timeout=self.connect_timeout)
+            except OSError:
+                self._register_failure(peer_tuple)
+                raise
+            sock.settimeout(PEER_CONNECTION_TIMEOUT)
+            conn = PeerConnection(sock, peer_tuple, outbound=True)
+            with self._lock:
+                self._connections[peer_tuple] = conn
+                self._backoff.pop(peer_tuple, None)
+            self._on_connect(conn)
+            return conn
+
+    def send(self, peer_tuple, data):
+        """Envía datos al peer por su conexión persistente. Propaga la excepción si falla."""
+        conn = self.get(peer_tuple)
+        try:
+            conn.sendall(data)
+        except OSError:
+            self.discard(conn)
+            self._register_failure(peer_tuple)
+            raise
+
+    def adopt(self, peer_tuple, conn):
+        """Registra una conexión entrante ya identificada (tras el handshake) si no hay otra sana."""
+        conn.peer_tuple = peer_tuple
+        with self._lock:
+            if self._healthy_connection(peer_tuple) is None:
+                self._connections[peer_tuple] = conn
+                self._backoff.pop(peer_tuple, None)
+
+    def discard(self, conn):
+        """Quita una conexión del pool (la cierra si sigue abierta)."""
+        with self._lock:
+            if conn.peer_tuple is not None and self._connections.get(conn.peer_tuple) is conn:
+                del self._connections[conn.peer_tuple]
+        conn.close()
+
+    def close_peer(self, peer_tuple, backoff=False):
+        """Cierra la conexión de un peer. Con backoff=True además retrasa la próxima reconexión."""
+        with self._lock:
+            conn = self._connections.pop(peer_tuple, None)
+        if conn is not None:
+            conn.close()
+        if backoff:
+            self._register_failure(peer_tuple)
+
+    def _register_failure(self, peer_tuple):
+        with self._lock:
+            _, delay = self._backoff.get(peer_tuple, (0, 0))
+            delay = min(self.backoff_max, delay * 2) if delay else self.backoff_initial
+            self._backoff[peer_tuple] = (time.time() + delay, delay)
+
+    def evict_idle(self):
+        """Cierra las conexiones salientes sin tráfico durante más de idle_timeout. Devuelve cuántas cerró."""
+        now = time.time()
+        with self._lock:
+            idle = [c for c in self._connections.values()
+                    if c.outbound and now - c.last_used > self.idle_timeout]
+            for conn in idle:
+                del self._connections[conn.peer_tuple]
+        for conn in idle:
+            conn.close(evicted=True)
+        return len(idle)
+
+    def close_all(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+
+
+class PeerOutbox(ABC):
+    """
+    Cola de salida acotada de un peer. El broadcast solo encola y retorna; el envío real
+    lo hace el escritor propio del peer, por lo que un peer lento o caído no retrasa la
+    entrega al resto. Si la cola se llena, put() devuelve False y el peer se marca lento.
+    Cada motor de E/S aporta su escritor implementando _wake().
+    """
+    def __init__(self, node, peer_tuple, maxsize=PEER_SEND_QUEUE_SIZE):
+        self.node = node
+        self.peer_tuple = peer_tuple
+        self.maxsize = maxsize
+        self.closed = False
+        self.slow = False
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        with self._lock:
+            if self.closed:
+                return True # El peer ya se está desconectando; el mensaje se descarta
+            if len(self._items) >= self.maxsize:
+                self.slow = True
+                return False
+            self._items.append(data)
+        self._wake()
+        return True
+
+    def depth(self):
+        return len(self._items)
+
+    def _take_batch(self):
+        """Extrae todos los mensajes pendientes para enviarlos en una sola escritura."""
+        with self._lock:
+            batch = b"".join(self._items)
+            self._items.clear()
+        return batch
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._items.clear()
+        self._wake()
+
+    def _fail(self, error):
+        self.close()
+        self.node._on_outbox_failure(self, error)
+
+    @abstractmethod
+    def _wake(self):
+        """Avisa al escritor del peer que hay mensajes nuevos o que la cola se cerró."""
+
+
+class ThreadedPeerOutbox(PeerOutbox):
+    """Cola de salida drenada por un hilo escritor dedicado al peer (motor threads)."""
+    def __init__(self, node, peer_tuple, maxsize=PEER_SEND_QUEUE_SIZE):
+        super().__init__(node, peer_tuple, maxsize)
+        self._has_data = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _wake(self):
+        self._has_data.set()
+
+    def _run(self):
+        while True:
+            self._has_data.wait()
+            self._has_data.clear()
+            if self.closed:
+                return
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                # Puede bloquear (conexión o socket lleno), pero solo a este peer
+                self.node.connection_pool.send(self.peer_tuple, batch)
+            except Exception as e:
+                self._fail(e)
+                return
+
+
+class StreamConnection:
+    """
+    Equivalente de PeerConnection sobre streams de asyncio (motor --engine asyncio).
+    Ofrece la misma interfaz para que los handlers de mensajes no dependan del motor.
+    sendall() no bloquea: encola los datos en el transporte del event loop.
+    """
+    def __init__(self, engine, reader, writer, peer_tuple=None, outbound=False):
+        self.engine = engine
+        self.reader = reader
+        self.writer = writer
+        self.peer_tuple = peer_tuple
+        self.outbound = outbound
+        self.closed = False
+        self.evicted = False
+        self.codec = None
+        self.peer_id = None
+        self.sync_sent_at = None
+        self.last_used = time.time()
+        peername = writer.get_extra_info('peername')
+        self._peername = tuple(peername[:2]) if peername else peer_tuple
+
+    def getpeername(self):
+        return self._peername
+
+    def sendall(self, data):
+        if self.closed or self.writer.is_closing():
+            raise ConnectionError("la conexión está cerrada")
+        self.engine.call_soon(self.writer.write, data)
+        self.last_used = time.time()
+
+    def is_healthy(self):
+        return not self.closed and not self.writer.is_closing()
+
+    async def drain(self):
+        """Espera a que el transporte vacíe su buffer (contrapresión del escritor del peer)."""
+        await self.writer.drain()
+
+    def close(self, evicted=False):
+        if self.closed:
+            return
+        self.closed = True
+        self.evicted = evicted
+        self.engine.call_soon(self.writer.close)
+
+
+class AsyncioPeerConnectionPool(PeerConnectionPool):
+    """
+    Pool de conexiones para el motor asyncio. Mantiene la misma interfaz que
+    PeerConnectionPool, pero send() nunca bloquea el event loop: si no hay conexión
+    abierta la crea en segundo plano y los fallos se notifican con on_send_failure.
+    """
+    def __init__(self, engine, on_connect, on_send_failure, **kwargs):
+        super().__init__(on_connect, **kwargs)
+        self.engine = engine
+        self._on_send_failure = on_send_failure
+        self._pending_connects = {} # peer_tuple -> Future de la conexión en curso
+
+    def get(self, peer_tuple):
+        """Versión bloqueante para hilos fuera del event loop (comandos, connect_to_peer)."""
+        return self.engine.run_coroutine(self.connect(peer_tuple))
+
+    async def connect(self, peer_tuple):
+        with self._lock:
+            conn = self._healthy_connection(peer_tuple)
+            if conn is not None:
+                return conn
+            self._check_backoff(peer_tuple)
+            pending = self._pending_connects.get(peer_tuple)
+            if pending is None:
+                pending = asyncio.ensure_future(self._open(peer_tuple))
+                self._pending_connects[peer_tuple] = pending
+        return await asyncio.shield(pending)
+
+    async def _open(self, peer_tuple):
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(*peer_tuple), self.connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            self._register_failure(peer_tuple)
+            raise
+        finally:
+            with self._lock:
+                self._pending_connects.pop(peer_tuple, None)
+        conn = StreamConnection(self.engine, reader, writer, peer_tuple, outbound=True)
+        with self._lock:
+            self._connections[peer_tuple] = conn
+            self._backoff.pop(peer_tuple, None)
+        self._on_connect(conn)
+        return conn
+
+    def send(self, peer_tuple, data):
+        with self._lock:
+            conn = self._healthy_connection(peer_tuple)
+            if conn is None:
+                self._check_backoff(peer_tuple)
+        if conn is not None:
+            conn.sendall(data)
+        else:
+            self.engine.submit(self._connect_and_send(peer_tuple, data))
+
+    async def _connect_and_send(self, peer_tuple, data):
+        try:
+            conn = await self.connect(peer_tuple)
+            conn.sendall(data)
+        except Exception as e:
+            self._on_send_failure(peer_tuple, e)
+
+
+class AsyncioPeerOutbox(PeerOutbox):
+    """Cola de salida drenada por una tarea de asyncio por peer, con contrapresión vía drain()."""
+    def __init__(self, node, peer_tuple, engine, maxsize=PEER_SEND_QUEUE_SIZE):
+        super().__init__(node, peer_tuple, maxsize)
+        self.engine = engine
+        self._has_data = None # Se crea dentro del event loop
+        engine.submit(self._run())
+
+    def _wake(self):
+        self.engine.call_soon(self._set_event)
+
+    def _set_event(self):
+        if self._has_data is not None:
+            self._has_data.set()
+
+    async def _run(self):
+        self._has_data = asyncio.Event()
+        while True:
+            if not self._items and not self.closed:
+                await self._has_data.wait()
+            self._has_data.clear()
+            if self.closed:
+                return
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                conn = await self.node.connection_pool.connect(self.peer_tuple)
+                conn.sendall(batch)
+                await conn.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._fail(e)
+                return
+
+
+class AsyncioXmrigProcess:
+    """Adaptador con la interfaz de Popen (poll/wait/terminate/kill) sobre un proceso de asyncio."""
+    def __init__(self, engine, process):
+        self.engine = engine
+        self._process = process
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self._process.returncode
+
+    def poll(self):
+        return self._process.returncode
+
+    def wait(self, timeout=None):
+        try:
+            return self.engine.run_coroutine(self._process.wait(), timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+
+    def _signal(self, method):
+        try:
+            method()
+        except ProcessLookupError: # El proceso ya terminó
+            pass
+
+    def terminate(self):
+        self.engine.call_soon(self._signal, self._process.terminate)
+
+    def kill(self):
+        self.engine.call_soon(self._signal, self._process.kill)
+
+
+class AsyncioNodeEngine:
+    """
+    Motor de E/S alternativo (--engine asyncio). Un único hilo con un event loop atiende
+    el listener, las conexiones con todos los peers y la salida de XMRig, en lugar de un
+    hilo por conexión. Los handlers de mensajes y los comandos son los mismos del nodo.
+    """
+    def __init__(self, node):
+        self.node = node
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+        self._server = None
+        self._tasks = set()
+
+    # --- Utilidades para interactuar con el loop desde otros hilos ---
+    def in_loop_thread(self):
+        return self._thread is not None and threading.get_ident() == self._thread.ident
+
+    def call_soon(self, func, *args):
+        if self.in_loop_thread():
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def submit(self, coro):
+        """Programa una corrutina en el loop sin esperar su resultado."""
+        if self.in_loop_thread():
+            task = self.loop.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return task
+        return asyncio.run_coroutine_threadsafe(self._track(coro), self.loop)
+
+    async def _track(self, coro):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await coro
+        finally:
+            self._tasks.discard(task)
+
+    def run_coroutine(self, coro, timeout=None):
+        """Ejecuta una corrutina en el loop y espera su resultado (solo desde fuera del loop)."""
+        if self.in_loop_thread():
+            raise RuntimeError("run_coroutine no puede llamarse desde el hilo del event loop")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    # --- Ciclo de vida ---
+    def create_outbox(self, peer_tuple):
+        return AsyncioPeerOutbox(self.node, peer_tuple, self)
+
+    def create_connection_pool(self):
+        return AsyncioPeerConnectionPool(self, on_connect=self.node._on_outbound_connection,
+                                         on_send_failure=self.node._on_peer_send_failure)
+
+    def start(self):
+        """Arranca el hilo del event loop y el servidor de conexiones entrantes."""
+        self._thread = threading.Thread(target=self.loop.run_forever, name="p2p-asyncio", daemon=True)
+        self._thread.start()
+        self.run_coroutine(self._start_server())
+
+    async def _start_server(self):
+        self._server = await asyncio.start_server(self._handle_client, self.node.host, self.node.port,
+                                                  reuse_address=True, backlog=LISTEN_BACKLOG)
+        print(f"[{self.node.port}] Escuchando en {self.node.host}:{self.node.port} (motor asyncio)...")
+
+    def stop(self):
+        if self._thread is None or not self.loop.is_running():
+            return
+        try:
+            self.run_coroutine(self._shutdown(), timeout=5)
+        except Exception as e:
+            print(f"[{self.node.port}] Error al detener el motor asyncio: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        print(f"[{self.node.port}] Listener de conexiones finalizado.")
+
+    async def _shutdown(self):
+        if self._server is not None:
+            self._server.close()
+        current = asyncio.current_task()
+        tasks = [t for t in self._tasks if t is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --- Conexiones con peers ---
+    def start_reader(self, conn):
+        self.submit(self._read_from_connection(conn, conn.getpeername()))
+
+    async def _handle_client(self, reader, writer):
+        self._tasks.add(asyncio.current_task())
+        conn = StreamConnection(self, reader, writer)
+        addr = conn.getpeername()
+        print(f"[{self.node.port}] Conexión aceptada desde {addr}")
+        self.node._send_message(conn, MSG_TYPE_HANDSHAKE, self.node._handshake_data())
+        try:
+            await self._read_from_connection(conn, addr)
+        finally:
+            self._tasks.discard(asyncio.current_task())
+
+    async def _read_from_connection(self, conn, addr):
+        node = self.node
+        decoder = node.codec.new_decoder()
+        try:
+            while node.running:
+                data = await asyncio.wait_for(conn.reader.read(MESSAGE_BUFFER_SIZE), PEER_CONNECTION_TIMEOUT)
+                if not data:
+                    break
+                node._process_received_data(conn, addr, decoder, data)
+        except FrameTooLargeError as e:
+            print(f"[{node.port}] Cerrando conexión con {addr}: {e}")
+        except ConnectionResetError:
+            print(f"[{node.port}] Conexión con {addr} reseteada por el peer.")
+        except asyncio.TimeoutError:
+            print(f"[{node.port}] Timeout de conexión con {addr}.")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if not conn.closed:
+                print(f"[{node.port}] Error en la conexión con el cliente {addr}: {e}")
+        finally:
+            node._on_connection_closed(conn, addr)
+
+    async def connect_to_peer(self, peer_host, peer_port):
+        node = self.node
+        try:
+            conn = await node.connection_pool.connect((peer_host, peer_port))
+            print(f"[{node.port}] Conectado a peer existente {peer_host}:{peer_port}")
+            node.peer_table.record_success((peer_host, peer_port))
+            node._maybe_request_peer_sync(conn)
+        except Exception as e:
+            node._on_peer_connect_failure((peer_host, peer_port), e)
+
+    # --- XMRig como subproceso de asyncio ---
+    def spawn_xmrig(self, command):
+        return self.run_coroutine(self._spawn_xmrig(command))
+
+    async def _spawn_xmrig(self, command):
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        self.submit(self._read_xmrig_output(process))
+        return AsyncioXmrigProcess(self, process)
+
+    async def _read_xmrig_output(self, process):
+        async def pump(stream, handler):
+            async for raw_line in stream:
+                handler(raw_line.decode('utf-8', errors='replace'))
+        await asyncio.gather(pump(process.stdout, self.node._handle_xmrig_line),
+                             pump(process.stderr, self.node._handle_xmrig_error_line))
+        await process.wait()
+        self.node._on_xmrig_output_closed(process.returncode)
+
+
+class TimerQueue:
+    """
+    Temporizadores del bucle principal del nodo, en un heap ordenado por vencimiento. Solo se
+    usan desde el hilo del bucle: éste espera comandos hasta timeout() y después ejecuta los
+    vencidos con run_due().
+    """
+    def __init__(self):
+        self._heap = [] # (vencimiento monotónico, desempate, intervalo o None, función, args)
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def call_later(self, delay, func, *args):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), None, func, args))
+
+    def call_every(self, interval, func, *args):
+        heapq.heappush(self._heap, (time.monotonic() + interval, next(self._sequence), interval, func, args))
+
+    def timeout(self):
+        """Segundos hasta el próximo vencimiento (None si no hay temporizadores)."""
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - time.monotonic(), 0)
+
+    def run_due(self, on_error=None):
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            due, _, interval, func, args = heapq.heappop(self._heap)
+            if interval is not None:
+                # Sin ráfagas de recuperación: si el bucle se atrasó, el siguiente vence un intervalo después de ahora
+                heapq.heappush(self._heap, (max(due + interval, now), next(self._sequence), interval, func, args))
+            try:
+                func(*args)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(func, e)
+
 
 class P2PNode:
-    def __init__(self, port, wallet_address):
+    def __init__(self, port, wallet_address, max_frame_size=MAX_FRAME_SIZE, engine="threads",
+                 peer_nodes=None, autostart_xmrig=True, codecs=SUPPORTED_CODECS, xmrig_api_port=None,
+                 xmrig_cpu_slot=None, stratum_proxy_port=None, pool_proxy=None, proxy_upstream=None,
+                 metrics_port=None, max_peers=PEER_TABLE_SIZE, control_port=None,
+                 xmrig_stall_timeout=XMRIG_STALL_TIMEOUT, governor_policy=None):
         self.port = port
         self.host = '0.0.0.0'
-        self.peers = set() # Usaremos un set para almacenar los peers conectados
-        self.peers_lock = threading.Lock() # Bloqueo para proteger la lista de peers
+        self.node_id = secrets.token_hex(8) # Identidad del nodo en la tabla de peers (nueva en cada ejecución)
+        self.peer_table = PeerTable(self.node_id, max_peers) # Peers conocidos, acotada y versionada
+        self.last_peer_sync = 0 # Último REQUEST_PEERS enviado (time.time())
+        self.cluster_queries = ClusterQueryTracker() # Consultas scatter-gather en curso (ver cluster_query.py)
+        self.cluster_query_replies = {} # query_id -> reply del canal de control que espera el resumen
         self.running = True
         self.xmrig_process = None
         self.wallet_address = wallet_address
@@ -72,247 +1548,924 @@ class P2PNode:
         self.current_pool_url = "" 
         self.current_hashrate = "N/A"
         self.last_xmrig_activity = "N/A"
+        self.xmrig_stats = {} # Datos estructurados de la API de XMRig (ver parse_xmrig_summary)
+        self.hashrate_history = HashrateHistory() # Historial acotado para tendencias por ventana
+
+        # API HTTP de XMRig: puerto local propio del nodo y token aleatorio por ejecución
+        if xmrig_api_port is None:
+            xmrig_api_port = port + XMRIG_API_PORT_OFFSET
+        self.xmrig_api = XmrigApiClient(xmrig_api_port, secrets.token_hex(16)) if xmrig_api_port else None
+        self.xmrig_api_ok = False # True mientras la API responda; si no, se usa el parseo de stdout
+        self._xmrig_api_stop = threading.Event()
+        # Reinicia XMRig si termina solo o deja de informar actividad (ver xmrig_supervisor.py)
+        self.xmrig_supervisor = XmrigSupervisor(xmrig_stall_timeout)
+        # Gobernador de intensidad según la carga de la máquina (ver mining_governor.py); None = desactivado
+        self.governor = None
+        self.governor_sampler = None
+        self.xmrig_paused_by = None # "api" o "signal" mientras el gobernador tiene a XMRig en pausa
+        if governor_policy is not None:
+            try:
+                self.governor_sampler = SystemSampler(XMRIG_PATH)
+                self.governor = MiningGovernor(governor_policy)
+            except RuntimeError as e:
+                print(f"[{self.port}] Gobernador de carga desactivado: {e}")
 
         self.command_queue = queue.Queue() # Cola para comandos recibidos via stdin
+        self.timers = TimerQueue() # Tareas periódicas del bucle principal
+        self._listen_socket = None # Socket de escucha del motor de hilos (se cierra en stop)
+        self.codec = MessageCodec(max_frame_size) # Formato de los mensajes en la red
+        self.codecs = list(codecs) # Codecs que anunciamos en el handshake
+        self.peer_codecs = {} # peer_tuple -> codec negociado con ese peer
+        self.seen_messages = SeenMessageCache() # IDs de transacciones/bloques ya procesados
+        self.gossip_stats = {"relayed": 0, "duplicates_suppressed": 0, "bytes_suppressed": 0}
+        self.gossip_stats_lock = threading.Lock() # Con el motor de hilos, cada lector suma a los contadores
+        self.outboxes = {} # peer_tuple -> PeerOutbox (cola de salida con su propio escritor)
+        self.outboxes_lock = threading.Lock()
+        # Contadores por tipo de mensaje e histogramas de latencia; endpoint HTTP opcional
+        self.metrics = NodeMetrics(MSG_TYPE_CODES)
+        self._register_metrics()
+        self.metrics_server = MetricsHTTPServer(self.metrics, metrics_port) if metrics_port else None
+        # Canal de control en líneas JSON (ver node_control.py); el token llega por variable de entorno
+        self.control_server = None
+        if control_port:
+            self.control_server = ControlServer(self._handle_control_request, control_port,
+                                                os.environ.get(CONTROL_TOKEN_ENV) or None,
+                                                hello_info={"node_id": self.node_id, "port": port})
+        self.last_peers_event = None # Último estado de peers publicado (solo se publican cambios)
+        self.peer_nodes = PEER_NODES if peer_nodes is None else peer_nodes # Peers de arranque
+        self.autostart_xmrig = autostart_xmrig
+        self.xmrig_cpu_slot = xmrig_cpu_slot # Núcleos asignados a XMRig (ver cpu_topology); None = sin restricción
+        self.tuning_cache = TuningCache(XMRIG_TUNING_CACHE)
+
+        # Proxy stratum: este nodo puede alojarlo (una sola conexión con el pool para todas las
+        # instancias locales) o su XMRig puede conectarse al proxy de otro nodo ('host:puerto')
+        self.stratum_proxy = None
+        if stratum_proxy_port:
+            self.stratum_proxy = StratumProxy(stratum_proxy_port, proxy_upstream or f"stratum+ssl://{POOL_URL}",
+                                              wallet_address, log=lambda line: print(f"[{self.port}] {line}"))
+            pool_proxy = f"{STRATUM_PROXY_HOST}:{stratum_proxy_port}"
+        self.pool_proxy = pool_proxy
+        self.autotune_running = False
+        # Motor de E/S: None = un hilo por conexión; AsyncioNodeEngine = un único event loop
+        self.engine = AsyncioNodeEngine(self) if engine == "asyncio" else None
+        # Conexiones persistentes a los peers, reutilizadas por broadcast y solicitudes de pool
+        if self.engine is not None:
+            self.connection_pool = self.engine.create_connection_pool()
+        else:
+            self.connection_pool = PeerConnectionPool(on_connect=self._on_outbound_connection)
         print(f"[{self.port}] Nodo inicializado en el puerto {self.port} con billetera: {self.wallet_address[:10]}...")
 
-    def _create_message(self, msg_type, data):
-        return json.dumps({"type": msg_type, "data": data}).encode('utf-8')
+    def _create_message(self, msg_type, data, msg_id=None, codec=CODEC_JSON):
+        return self.codec.encode(msg_type, data, msg_id, codec)
+
+    def _handshake_data(self):
+        # "codecs" anuncia las codificaciones que entendemos y "node_id" la sincronización de peers
+        # por deltas; los peers antiguos ignoran ambos
+        return {"port": self.port, "codecs": self.codecs, "node_id": self.node_id}
+
+    def _codec_for(self, client_socket):
+        """Codec para enviar por una conexión: el negociado en ella o, si no, el de su peer."""
+        if client_socket.codec is not None:
+            return client_socket.codec
+        return self.peer_codecs.get(client_socket.peer_tuple, CODEC_JSON)
 
     def _send_message(self, client_socket, msg_type, data):
         try:
-            message = self._create_message(msg_type, data)
+            message = self._create_message(msg_type, data, codec=self._codec_for(client_socket))
             client_socket.sendall(message)
+            self.metrics.record_out(msg_type, len(message))
         except Exception as e:
             print(f"[{self.port}] Error al enviar mensaje a {client_socket.getpeername()}: {e}")
             # Ya no se llama remove_peer aquí, ya que el handler de conexión se encargará de esto
             # si la conexión realmente falló de forma irrecuperable.
 
-    def _broadcast_message(self, msg_type, data, exclude_peer=None):
-        message = self._create_message(msg_type, data)
-        with self.peers_lock:
-            peers_to_remove = []
-            for peer_tuple in list(self.peers): # Iterar sobre una copia para permitir modificación
-                try:
-                    peer_host, peer_port = peer_tuple
-                    # Reconectar o usar conexión existente
-                    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                        s.settimeout(5) # Pequeño timeout para la conexión
-                        s.connect(peer_tuple)
-                        s.sendall(message)
-                except Exception as e:
-                    print(f"[{self.port}] Error al transmitir a {peer_tuple}: {e}")
-                    peers_to_remove.append(peer_tuple)
-            for p in peers_to_remove:
-                self.peers.discard(p) # Usar discard para eliminar de un set
+    def _broadcast_message(self, msg_type, data, exclude_peer=None, msg_id=None):
+        """Envía un mensaje a todos los peers. exclude_peer puede ser una conexión o una tupla (host, puerto)."""
+        if exclude_peer is not None and not isinstance(exclude_peer, tuple):
+            exclude_peer = exclude_peer.peer_tuple # Peer identificado por el handshake de esa conexión
+        # Tomar una instantánea de los peers y encolar: el envío lo hace el escritor de cada peer
+        peers_snapshot = [p for p in self.peer_table.addresses() if p != exclude_peer]
+        self._fan_out(peers_snapshot, msg_type, data, msg_id)
+
+    def _fan_out(self, peers, msg_type, data, msg_id=None):
+        """Encola un mensaje para varios peers, codificándolo una sola vez por codec."""
+        start = time.perf_counter()
+        encoded = {}
+        queued_bytes = 0
+        for peer_tuple in peers:
+            codec = self.peer_codecs.get(peer_tuple, CODEC_JSON)
+            message = encoded.get(codec)
+            if message is None:
+                message = encoded[codec] = self._create_message(msg_type, data, msg_id, codec)
+            self._enqueue_message(peer_tuple, message)
+            queued_bytes += len(message)
+        if peers:
+            self.metrics.record_out(msg_type, queued_bytes, len(peers))
+            self.metrics.record_fan_out(len(peers), time.perf_counter() - start)
+
+    def _register_metrics(self):
+        """Valores instantáneos del nodo: se leen solo al exportar las métricas."""
+        def outbox_depths():
+            with self.outboxes_lock:
+                return [outbox.depth() for outbox in self.outboxes.values()]
+
+        self.metrics.register("p2p_peers", "Peers conectados", self.peer_table.connected_count)
+        self.metrics.register("p2p_peer_table_entries", "Peers en la tabla", lambda: len(self.peer_table))
+        self.metrics.register("p2p_peer_table_version", "Versión de la tabla de peers",
+                              lambda: self.peer_table.version, kind="counter")
+        self.metrics.register("p2p_outbox_depth_total", "Mensajes pendientes en las colas de salida",
+                              lambda: sum(outbox_depths()))
+        self.metrics.register("p2p_outbox_depth_max", "Mensajes pendientes en la cola de salida más cargada",
+                              lambda: max(outbox_depths(), default=0))
+        self.metrics.register("p2p_command_queue_depth", "Comandos internos pendientes",
+                              lambda: self.command_queue.qsize())
+        self.metrics.register("p2p_gossip_cache_entries", "IDs de mensajes gossip en caché",
+                              lambda: len(self.seen_messages))
+        self.metrics.register("p2p_gossip_relayed_total", "Mensajes gossip nuevos retransmitidos",
+                              lambda: self.gossip_stats["relayed"], kind="counter")
+        self.metrics.register("p2p_gossip_duplicates_total", "Mensajes gossip duplicados descartados",
+                              lambda: self.gossip_stats["duplicates_suppressed"], kind="counter")
+        self.metrics.register("p2p_threads", "Hilos activos del proceso", threading.active_count)
+        self.metrics.register("p2p_xmrig_restarts_total", "Reinicios de XMRig hechos por el supervisor",
+                              lambda: self.xmrig_supervisor.restarts, kind="counter")
+        self.metrics.register("p2p_governor_level", "Nivel del gobernador de carga (0 = minería completa)",
+                              lambda: GOVERNOR_LEVEL_NAMES.index(self.governor.level_name) if self.governor else 0)
+        self.metrics.register("p2p_xmrig_lost_seconds_total", "Segundos sin minar por fallas de XMRig",
+                              lambda: round(self.xmrig_supervisor.current_lost_time(), 1), kind="counter")
+
+    def _outbox_for(self, peer_tuple):
+        with self.outboxes_lock:
+            outbox = self.outboxes.get(peer_tuple)
+            if outbox is None or outbox.closed:
+                if self.engine is not None:
+                    outbox = self.engine.create_outbox(peer_tuple)
+                else:
+                    outbox = ThreadedPeerOutbox(self, peer_tuple)
+                self.outboxes[peer_tuple] = outbox
+            return outbox
+
+    def _enqueue_message(self, peer_tuple, message):
+        """Encola un mensaje ya codificado para un peer. Si su cola está llena, lo desconecta."""
+        if not self._outbox_for(peer_tuple).put(message):
+            self._evict_slow_peer(peer_tuple)
+
+    def _evict_slow_peer(self, peer_tuple):
+        print(f"[{self.port}] Peer {peer_tuple} marcado como lento (cola de salida llena). Desconectando.")
+        self._drop_outbox(peer_tuple)
+        self.peer_table.record_failure(peer_tuple)
+        self.connection_pool.close_peer(peer_tuple, backoff=True)
+
+    def _drop_outbox(self, peer_tuple, outbox=None):
+        with self.outboxes_lock:
+            current = self.outboxes.get(peer_tuple)
+            if current is not None and (outbox is None or current is outbox):
+                del self.outboxes[peer_tuple]
+        if current is not None:
+            current.close()
+
+    def _on_outbox_failure(self, outbox, error):
+        """El escritor de un peer no pudo enviar: se descarta su cola y el peer."""
+        self._drop_outbox(outbox.peer_tuple, outbox)
+        self._on_peer_send_failure(outbox.peer_tuple, error)
+
+    def publish_gossip(self, msg_type, data):
+        """Origina una transacción o bloque con un ID nuevo y lo difunde a todos los peers."""
+        msg_id = f"{self.port}-{uuid.uuid4().hex}"
+        self.seen_messages.add(msg_id) # Así no lo retransmitimos si vuelve por otro peer
+        self._publish("gossip", {"id": msg_id, "type": msg_type, "origin": True, "ts": time.time()})
+        self._broadcast_message(msg_type, data, msg_id=msg_id)
+        return msg_id
+
+    def _gossip_id(self, message):
+        """ID de un mensaje gossip: el que trae el sobre o, para peers antiguos, un hash de su contenido."""
+        msg_id = message.get("id")
+        if msg_id:
+            return msg_id
+        canonical = json.dumps([message.get("type"), message.get("data")], sort_keys=True).encode('utf-8')
+        return hashlib.sha256(canonical).hexdigest()
+
+    def _is_duplicate_gossip(self, msg_id, wire_size):
+        """Registra el mensaje en la caché; si ya se había visto, contabiliza el tráfico ahorrado."""
+        if self.seen_messages.add(msg_id):
+            with self.gossip_stats_lock:
+                self.gossip_stats["relayed"] += 1
+            return False
+        # Bytes que habríamos retransmitido a cada peer de no haber descartado el duplicado
+        saved = wire_size * max(len(self.peer_table) - 1, 0)
+        with self.gossip_stats_lock:
+            self.gossip_stats["duplicates_suppressed"] += 1
+            self.gossip_stats["bytes_suppressed"] += saved
+        return True
+
+    def _on_peer_send_failure(self, peer_tuple, error):
+        """Un envío a un peer falló (directamente o, con asyncio, en segundo plano)."""
+        print(f"[{self.port}] Error al transmitir a {peer_tuple}: {error}")
+        self._register_peer_failure(peer_tuple)
+
+    def _on_peer_connect_failure(self, peer_tuple, error):
+        print(f"[{self.port}] No se pudo conectar al peer {peer_tuple[0]}:{peer_tuple[1]}: {error}")
+        self._register_peer_failure(peer_tuple)
+
+    def _register_peer_failure(self, peer_tuple):
+        """Sin broadcasts hasta que un reintento funcione; tras varios fallos seguidos sale de la tabla."""
+        info = self.peer_table.get(peer_tuple)
+        if self.peer_table.record_failure(peer_tuple) == "removed":
+            print(f"[{self.port}] Peer {peer_tuple} eliminado de la tabla tras {PEER_MAX_FAILURES} fallos seguidos.")
+        self._publish_peers()
+        if info is not None:
+            # Las consultas al cluster no esperan al peer hasta el plazo
+            for query in self.cluster_queries.peer_unreachable(info.node_id):
+                self._finish_cluster_query(query)
+
+    def _on_outbound_connection(self, conn):
+        """Llamado por el pool al abrir una conexión saliente: handshake y lectura continua."""
+        self._send_message(conn, MSG_TYPE_HANDSHAKE, self._handshake_data())
+        if self.engine is not None:
+            self.engine.start_reader(conn)
+        else:
+            threading.Thread(target=self._read_from_connection, args=(conn, conn.getpeername()), daemon=True).start()
 
     def _handle_client_connection(self, client_socket, addr):
         print(f"[{self.port}] Conexión aceptada desde {addr}")
-        try:
-            # Enviar handshake al nuevo peer
-            self._send_message(client_socket, MSG_TYPE_HANDSHAKE, {"port": self.port})
+        # Enviar handshake al nuevo peer
+        self._send_message(client_socket, MSG_TYPE_HANDSHAKE, self._handshake_data())
+        self._read_from_connection(client_socket, addr)
 
+    def _read_from_connection(self, client_socket, addr):
+        """Lee y procesa mensajes de una conexión (entrante o saliente) hasta que se cierre."""
+        decoder = self.codec.new_decoder()
+        try:
             while self.running:
                 data = client_socket.recv(MESSAGE_BUFFER_SIZE)
                 if not data:
                     break
+                self._process_received_data(client_socket, addr, decoder, data)
 
-                try:
-                    message = json.loads(data.decode('utf-8'))
-                    self._process_received_message(client_socket, message)
-                except json.JSONDecodeError:
-                    print(f"[{self.port}] Mensaje JSON inválido de {addr}: {data.decode('utf-8', errors='ignore')}")
-                except Exception as e:
-                    print(f"[{self.port}] Error al procesar mensaje de {addr}: {e}")
-
+        except FrameTooLargeError as e:
+            print(f"[{self.port}] Cerrando conexión con {addr}: {e}")
         except ConnectionResetError:
             print(f"[{self.port}] Conexión con {addr} reseteada por el peer.")
         except socket.timeout:
             print(f"[{self.port}] Timeout de conexión con {addr}.")
         except Exception as e:
-            print(f"[{self.port}] Error en la conexión con el cliente {addr}: {e}")
+            if not client_socket.closed: # Si la cerramos nosotros, el error es esperado
+                print(f"[{self.port}] Error en la conexión con el cliente {addr}: {e}")
         finally:
+            self._on_connection_closed(client_socket, addr)
+
+    def _process_received_data(self, client_socket, addr, decoder, data):
+        """Decodifica los mensajes completos contenidos en una lectura y los procesa."""
+        for payload in decoder.feed(data):
+            message = None
+            try:
+                message = self.codec.decode(payload)
+                start = time.perf_counter()
+                self._process_received_message(client_socket, message, wire_size=len(payload))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                print(f"[{self.port}] Mensaje JSON inválido de {addr}: {payload[:200].decode('utf-8', errors='ignore')}")
+            except Exception as e:
+                print(f"[{self.port}] Error al procesar mensaje de {addr}: {e}")
+            finally:
+                if isinstance(message, dict):
+                    self.metrics.record_in(message.get("type"), FRAME_HEADER.size + len(payload),
+                                           time.perf_counter() - start)
+                else:
+                    self.metrics.record_decode_error()
+
+    def _on_connection_closed(self, client_socket, addr):
+        if not client_socket.evicted: # Un cierre por inactividad no implica que el peer se haya ido
             self.remove_peer(client_socket)
-            client_socket.close()
-            print(f"[{self.port}] Conexión con {addr} cerrada.")
+        self.connection_pool.discard(client_socket)
+        print(f"[{self.port}] Conexión con {addr} cerrada.")
 
-    def _process_received_message(self, client_socket, message):
+    def _process_received_message(self, client_socket, message, wire_size=0):
         msg_type = message.get("type")
         msg_data = message.get("data")
 
+        if msg_type in (MSG_TYPE_TRANSACTION, MSG_TYPE_BLOCK):
+            # Descartar los mensajes gossip repetidos antes de cualquier log o retransmisión
+            msg_id = self._gossip_id(message)
+            if self._is_duplicate_gossip(msg_id, wire_size):
+                return
+            # Primera recepción (solo llega a quien pidió el evento por nombre, ej. bench_cluster.py)
+            self._publish("gossip", {"id": msg_id, "type": msg_type, "origin": False, "ts": time.time()})
+
         print(f"[{self.port}] Recibido '{msg_type}' de {client_socket.getpeername()}")
+        if client_socket.peer_id is not None:
+            self.peer_table.touch(client_socket.peer_tuple)
 
         if msg_type == MSG_TYPE_HANDSHAKE:
             peer_port = msg_data.get("port")
             peer_addr = client_socket.getpeername()[0] # Obtener el host real
-            self.add_peer((peer_addr, peer_port))
-            print(f"[{self.port}] Handshake con {peer_addr}:{peer_port}. Peers actuales: {len(self.peers)}")
-            # Enviar lista de peers conocidos al nuevo peer
-            self._send_message(client_socket, MSG_TYPE_PEER_LIST, list(self.peers))
+            node_id = msg_data.get("node_id")
+            if node_id == self.node_id:
+                print(f"[{self.port}] Conexión consigo mismo ({peer_addr}:{peer_port}); se ignora.")
+                return
+            delta_sync = node_id is not None
+            if client_socket.peer_id is None: # Un handshake por conexión
+                client_socket.peer_id = node_id or legacy_peer_id((peer_addr, peer_port))
+                self.peer_table.upsert(client_socket.peer_id, (peer_addr, peer_port), direct=True,
+                                       delta_sync=delta_sync)
+                self._publish_peers()
+            # Elegir la codificación para los mensajes que le enviemos a este peer
+            codec = negotiate_codec(msg_data.get("codecs"), self.codecs)
+            client_socket.codec = codec
+            self.peer_codecs[(peer_addr, peer_port)] = codec
+            # Reutilizar esta conexión como enlace bidireccional hacia el peer
+            self.connection_pool.adopt((peer_addr, peer_port), client_socket)
+            print(f"[{self.port}] Handshake con {peer_addr}:{peer_port} (codec {codec}). "
+                  f"Peers conectados: {self.peer_table.connected_count()}")
+            if not delta_sync:
+                # Peer antiguo: se le envía la lista completa, como siempre
+                self._send_message(client_socket, MSG_TYPE_PEER_LIST, self.peer_table.legacy_list())
+            else:
+                self._maybe_request_peer_sync(client_socket)
 
         elif msg_type == MSG_TYPE_TRANSACTION:
             print(f"[{self.port}] Nueva transacción recibida: {msg_data}")
-            self._broadcast_message(MSG_TYPE_TRANSACTION, msg_data, exclude_peer=client_socket)
+            self._broadcast_message(MSG_TYPE_TRANSACTION, msg_data, exclude_peer=client_socket, msg_id=msg_id)
 
         elif msg_type == MSG_TYPE_BLOCK:
             print(f"[{self.port}] Nuevo bloque recibido: {msg_data.get('index')}")
-            self._broadcast_message(MSG_TYPE_BLOCK, msg_data, exclude_peer=client_socket)
+            self._broadcast_message(MSG_TYPE_BLOCK, msg_data, exclude_peer=client_socket, msg_id=msg_id)
 
         elif msg_type == MSG_TYPE_REQUEST_PEERS:
-            # Un peer solicita nuestra lista de peers
-            self._send_message(client_socket, MSG_TYPE_PEER_LIST, list(self.peers))
-            print(f"[{self.port}] Enviando lista de {len(self.peers)} peers a {client_socket.getpeername()}")
+            # Un peer solicita nuestra lista de peers: los actuales piden los cambios desde una versión
+            since = msg_data.get("since") if isinstance(msg_data, dict) else None
+            if isinstance(since, int):
+                delta = self.peer_table.delta(since)
+                delta["node_id"] = self.node_id
+                self._send_message(client_socket, MSG_TYPE_PEER_LIST, delta)
+                print(f"[{self.port}] Enviando {'tabla completa' if delta['full'] else 'delta'} de peers "
+                      f"(v{since} -> v{delta['version']}: {len(delta['added'])} altas, {len(delta['removed'])} bajas) "
+                      f"a {client_socket.getpeername()}")
+            else:
+                peer_list = self.peer_table.legacy_list()
+                self._send_message(client_socket, MSG_TYPE_PEER_LIST, peer_list)
+                print(f"[{self.port}] Enviando lista de {len(peer_list)} peers a {client_socket.getpeername()}")
 
         elif msg_type == MSG_TYPE_PEER_LIST:
-            # Recibimos una lista de peers de otro nodo
-            new_peers = msg_data
-            added_count = 0
-            for peer in new_peers:
-                peer_tuple = tuple(peer) # Asegurarse de que sea una tupla
-                if peer_tuple[1] != self.port and peer_tuple not in self.peers: # No añadirme a mí mismo
-                    if self.add_peer(peer_tuple):
-                        added_count += 1
-            if added_count > 0:
-                print(f"[{self.port}] Añadidos {added_count} nuevos peers. Total: {len(self.peers)}")
+            # Recibimos una lista de peers de otro nodo: un delta versionado o, de un peer antiguo, la lista completa
+            if isinstance(msg_data, dict):
+                self._apply_peer_delta(client_socket, msg_data)
+            else:
+                added_count = 0
+                for peer in msg_data:
+                    peer_tuple = tuple(peer) # Asegurarse de que sea una tupla
+                    if peer_tuple[1] != self.port: # No añadirme a mí mismo
+                        _, added = self.peer_table.upsert(legacy_peer_id(peer_tuple), peer_tuple)
+                        added_count += added
+                if added_count > 0:
+                    print(f"[{self.port}] Añadidos {added_count} nuevos peers. Total: {len(self.peer_table)}")
+                    self._publish_peers()
 
         elif msg_type == MSG_TYPE_POOL_INFO_REQUEST:
             # Nuevo: Manejar solicitud de información de pool
             print(f"[{self.port}] Recibida solicitud de información de pool de {client_socket.getpeername()}.")
-            pool_data = {
-                "wallet_address": self.wallet_address,
-                "pool_url": self.current_pool_url,
-                "hashrate": self.current_hashrate,
-                "last_activity": self.last_xmrig_activity,
-                "node_port": self.port # Para identificar qué nodo responde
-            }
+            pool_data = self._pool_info()
+            if isinstance(msg_data, dict) and msg_data.get("query_id"):
+                pool_data["query_id"] = msg_data["query_id"] # El que consulta agrupa las respuestas por este ID
             self._send_message(client_socket, MSG_TYPE_POOL_INFO_RESPONSE, pool_data)
 
         elif msg_type == MSG_TYPE_POOL_INFO_RESPONSE:
-            # Nuevo: Manejar respuesta de información de pool
+            # Respuesta a una consulta al cluster: se agrupa; si ninguna la espera (peer antiguo
+            # que responde sin query_id a otra solicitud) se muestra como antes
+            query_id = msg_data.get("query_id")
+            node_id = msg_data.get("node_id") or client_socket.peer_id
+            query = self.cluster_queries.add_response(query_id, node_id, msg_data) if node_id else None
+            if query is not None:
+                if query.complete:
+                    self._finish_cluster_query(query)
+                return
+            if query_id is not None:
+                print(f"[{self.port}] Respuesta de pool de {client_socket.getpeername()} fuera de plazo; se descarta.")
+                return
             responding_node_port = msg_data.get("node_port", "Desconocido")
             print(f"\n--- Info de Pool del Nodo {responding_node_port} ({client_socket.getpeername()[0]}) ---")
             print(f"  Billetera: {msg_data.get('wallet_address', 'N/A')}")
             print(f"  Pool URL: {msg_data.get('pool_url', 'N/A')}")
             print(f"  Hashrate: {msg_data.get('hashrate', 'N/A')}")
             print(f"  Última Actividad: {msg_data.get('last_activity', 'N/A')}")
+            xmrig_stats = msg_data.get("xmrig_stats") or {}
+            if xmrig_stats:
+                print(f"  Shares: {xmrig_stats.get('shares_good', 0)}/{xmrig_stats.get('shares_total', 0)} "
+                      f"aceptados, uptime {xmrig_stats.get('uptime', 0)}s")
+            supervisor = msg_data.get("xmrig_supervisor")
+            if supervisor:
+                print(f"  Reinicios de XMRig: {supervisor.get('restarts', 0)} "
+                      f"({supervisor.get('lost_time', 0):.0f}s sin minar por fallas)")
+            for window, aggregate in (msg_data.get("trends") or {}).items():
+                print(f"  Tendencia {window}: {self._format_aggregate(aggregate)}")
+            if msg_data.get("stratum_proxy"):
+                self._print_proxy_stats(msg_data["stratum_proxy"], prefix=" ")
             print("---------------------------------------------------\n")
 
+        elif msg_type == MSG_TYPE_STATS_REQUEST:
+            windows = self._stats_windows(msg_data.get("window"))
+            now = time.time()
+            self._send_message(client_socket, MSG_TYPE_STATS_RESPONSE, {
+                "node_port": self.port,
+                "windows": {name: self.hashrate_history.aggregate(name, now) for name in windows},
+            })
+
+        elif msg_type == MSG_TYPE_STATS_RESPONSE:
+            responding_node_port = msg_data.get("node_port", "Desconocido")
+            for window, aggregate in (msg_data.get("windows") or {}).items():
+                print(f"[{self.port}] Stats del Nodo {responding_node_port} ({window}): {self._format_aggregate(aggregate)}")
+
         elif msg_type == MSG_TYPE_INTERNAL_COMMAND:
-            # Manejar comandos internos que no son P2P, pero vienen de un sistema de control (como la GUI)
+            # Manejar comandos internos que no son P2P, pero vienen de un sistema de control (como la GUI).
+            # Se encolan para el bucle principal: así no bloquean el hilo (o event loop) de lectura.
             command = msg_data.get("command")
-            self._execute_internal_command(command)
-
-    def add_peer(self, peer_tuple):
-        """Añade un peer si no es el propio nodo y no está ya en la lista."""
-        with self.peers_lock:
-            if peer_tuple[1] != self.port and peer_tuple not in self.peers:
-                self.peers.add(peer_tuple)
-                return True
-            return False
+            if not isinstance(command, str) or not command.strip():
+                print(f"[{self.port}] Comando interno inválido de {client_socket.getpeername()}: {command!r}; se ignora.")
+                return
+            self.command_queue.put(command.strip())
+
+    def _pool_info(self):
+        """Información de pool y minería de este nodo (respuesta a POOL_INFO_REQUEST)."""
+        pool_data = {
+            "wallet_address": self.wallet_address,
+            "pool_url": self.current_pool_url,
+            "hashrate": self.current_hashrate,
+            "last_activity": self.last_xmrig_activity,
+            "node_port": self.port, # Para identificar qué nodo responde
+            "node_id": self.node_id,
+            "xmrig_stats": self.xmrig_stats, # Datos de la API de XMRig (vacío si no está disponible)
+            "xmrig_supervisor": self.xmrig_supervisor.stats(), # Reinicios y tiempo sin minar por fallas
+            "trends": self.hashrate_history.summary() # Agregados de hashrate/shares por ventana
+        }
+        if self.stratum_proxy is not None:
+            pool_data["stratum_proxy"] = self.stratum_proxy.stats()
+        return pool_data
+
+    def _stats_windows(self, window):
+        """Ventanas pedidas: una concreta o todas si no se indica (o no existe)."""
+        names = self.hashrate_history.window_names()
+        return [window] if window in names else names
+
+    @staticmethod
+    def _format_aggregate(aggregate):
+        def fmt(value):
+            return "n/a" if value is None else f"{value:.1f}"
+        return (f"media {fmt(aggregate.get('mean'))} H/s, mín {fmt(aggregate.get('min'))}, "
+                f"máx {fmt(aggregate.get('max'))}, p95 {fmt(aggregate.get('p95'))}, "
+                f"shares {aggregate.get('shares_accepted', 0)} aceptados / {aggregate.get('shares_rejected', 0)} rechazados "
+                f"({aggregate.get('samples', 0)} muestras)")
+
+    def _print_proxy_stats(self, stats, prefix=None):
+        prefix = prefix or f"[{self.port}]"
+        if not stats.get("running"):
+            print(f"{prefix} Proxy stratum detenido.")
+            return
+        print(f"{prefix} Proxy stratum {stats['listen']} -> {stats['upstream']} "
+              f"({'conectado' if stats['upstream_connected'] else 'desconectado'}, "
+              f"{stats['upstream_connects']} conexiones): {len(stats['workers'])} mineros, {stats['jobs']} trabajos, "
+              f"shares {stats['accepted']} aceptados / {stats['rejected']} rechazados / "
+              f"{stats['local_rejects']} rechazados localmente")
+        rtt = stats.get("share_rtt_ms")
+        if rtt:
+            print(f"{prefix}   Latencia de shares: p50 {rtt['p50']} ms, p95 {rtt['p95']} ms, máx {rtt['max']} ms "
+                  f"({rtt['samples']} muestras)")
+
+    def _request_peer_sync(self, conn):
+        """Pide a un peer los cambios de su tabla desde la última versión que nos envió."""
+        since = self.peer_table.sync_since(conn.peer_tuple) if conn.peer_tuple is not None else 0
+        conn.sync_sent_at = time.perf_counter()
+        self.last_peer_sync = time.time()
+        self._send_message(conn, MSG_TYPE_REQUEST_PEERS, {"since": since})
+
+    def _maybe_request_peer_sync(self, conn):
+        """
+        Al conectar con un peer solo se pide su tabla si la nuestra casi no tiene peers o no se
+        sincronizó hace poco; si no, sus cambios llegan con la sincronización periódica. Así una
+        malla que se completa no intercambia una tabla entera por cada conexión nueva.
+        """
+        if conn.sync_sent_at is not None:
+            return
+        if len(self.peer_table) > 1 and time.time() - self.last_peer_sync < PEER_SYNC_INTERVAL:
+            return
+        self._request_peer_sync(conn)
+
+    def _apply_peer_delta(self, client_socket, delta):
+        """Aplica un PEER_LIST versionado. Las bajas solo quitan peers a los que no estamos conectados."""
+        if client_socket.sync_sent_at is not None:
+            self.peer_table.record_rtt(client_socket.peer_tuple, time.perf_counter() - client_socket.sync_sent_at)
+            client_socket.sync_sent_at = None
+        added_count = removed_count = 0
+        for node_id, peer_host, peer_port in delta.get("added") or ():
+            if node_id != self.node_id:
+                _, added = self.peer_table.upsert(node_id, (peer_host, peer_port))
+                added_count += added
+        for node_id in delta.get("removed") or ():
+            removed_count += self.peer_table.remove(node_id, only_indirect=True)
+        self.peer_table.set_synced(client_socket.peer_tuple, delta.get("version", 0))
+        if added_count or removed_count:
+            print(f"[{self.port}] Tabla de peers: {added_count} altas, {removed_count} bajas "
+                  f"(v{delta.get('version')} de {client_socket.getpeername()}). Total: {len(self.peer_table)}")
+            self._publish_peers()
+
+    def _sync_peer_tables(self):
+        """Sincronización periódica: pide el delta de su tabla a unos pocos peers conectados al azar."""
+        for peer_tuple in self.peer_table.sync_candidates(PEER_SYNC_FANOUT):
+            try:
+                self._request_peer_sync(self.connection_pool.get(peer_tuple))
+            except Exception as e:
+                print(f"[{self.port}] No se pudo sincronizar la tabla de peers con {peer_tuple}: {e}")
+
+    def _retry_failed_peers(self):
+        for peer_host, peer_port in self.peer_table.due_retries():
+            if self.engine is not None:
+                self.engine.submit(self.engine.connect_to_peer(peer_host, peer_port))
+            else:
+                threading.Thread(target=self.connect_to_peer, args=(peer_host, peer_port), daemon=True).start()
 
     def remove_peer(self, client_socket):
-        """Intenta remover un peer usando la información del socket."""
-        peer_to_remove = None
-        try:
-            addr = client_socket.getpeername()
-            with self.peers_lock:
-                for peer_tuple in self.peers:
-                    # Comparamos la dirección IP y el puerto de conexión real
-                    if peer_tuple[0] == addr[0] and peer_tuple[1] == addr[1]:
-                        peer_to_remove = peer_tuple
-                        break
-                if peer_to_remove:
-                    self.peers.discard(peer_to_remove)
-                    print(f"[{self.port}] Peer {peer_to_remove} desconectado. Peers restantes: {len(self.peers)}")
-        except OSError: # Socket puede estar ya cerrado
-            pass
-        except Exception as e:
-            print(f"[{self.port}] Error al remover peer: {e}")
+        """Se cerró la conexión de un peer: se identifica por su handshake, no por el puerto efímero."""
+        if client_socket.peer_id is not None and self.peer_table.release(client_socket.peer_id):
+            print(f"[{self.port}] Peer {client_socket.peer_tuple} desconectado. "
+                  f"Peers conectados: {self.peer_table.connected_count()}")
+            self._publish_peers()
+
+    def _print_peer_table(self):
+        now = time.time()
+        rows = sorted(self.peer_table.rows(), key=lambda row: (not row[2], row[1]))
+        print(f"[{self.port}] Tabla de peers v{self.peer_table.version}: {len(rows)} peers "
+              f"({self.peer_table.connected_count()} conectados, máximo {self.peer_table.max_entries})")
+        for node_id, (peer_host, peer_port), connected, last_seen, rtt, failures in rows:
+            seen = f"visto hace {now - last_seen:.0f}s" if last_seen else "nunca visto"
+            rtt_text = f"rtt {rtt * 1000:.1f}ms" if rtt is not None else "rtt n/a"
+            print(f"[{self.port}]   {node_id:<16} {peer_host}:{peer_port} "
+                  f"{'conectado' if connected else 'desconectado'}, {seen}, {rtt_text}, fallos {failures}")
 
     def connect_to_peer(self, peer_host, peer_port):
         if (peer_host, peer_port) == (self.host, self.port):
             return # No conectar a sí mismo
 
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(5)
-                s.connect((peer_host, peer_port))
-                print(f"[{self.port}] Conectado a peer existente {peer_host}:{peer_port}")
-                self._send_message(s, MSG_TYPE_HANDSHAKE, {"port": self.port})
-                # Solicitar lista de peers del nuevo peer
-                self._send_message(s, MSG_TYPE_REQUEST_PEERS, {})
-
-                # Mantener la conexión abierta para intercambio de mensajes
-                # Esto es una simplificación; en un sistema real, el _handle_client_connection
-                # se encargaría de la lectura continua. Aquí es solo para handshake inicial.
-                # Para un intercambio de mensajes bidireccional continuo, cada conexión requiere un hilo de lectura.
-                # Para simplificar el ejemplo, las conexiones de "salida" se abren y cierran por cada mensaje.
-                # El listener se encarga de las conexiones "entrantes" y su lectura continua.
+            # El pool abre la conexión, envía el handshake y lanza el hilo lector.
+            # La conexión queda abierta y se reutiliza para todos los mensajes hacia este peer.
+            conn = self.connection_pool.get((peer_host, peer_port))
+            print(f"[{self.port}] Conectado a peer existente {peer_host}:{peer_port}")
+            self.peer_table.record_success((peer_host, peer_port))
+            # Solicitar la tabla de peers del nuevo peer (si hace falta y el handshake no lo hizo ya)
+            self._maybe_request_peer_sync(conn)
         except Exception as e:
-            print(f"[{self.port}] No se pudo conectar al peer {peer_host}:{peer_port}: {e}")
+            self._on_peer_connect_failure((peer_host, peer_port), e)
 
     def start_xmrig(self):
+        """Lanza XMRig. Devuelve True si quedó en ejecución."""
         if self.xmrig_process and self.xmrig_process.poll() is None:
             print(f"[{self.port}] XMRig ya está en ejecución.")
-            return
+            return True
+        if self.autotune_running:
+            print(f"[{self.port}] Auto-ajuste en curso: XMRig se iniciará al terminar.")
+            return False
 
         try:
             # Comando básico para XMRig. ¡Ajusta los parámetros según tu configuración deseada!
             # Asegúrate de usar un pool y una una dirección de billetera válidos.
             xmrig_command = [
                 XMRIG_PATH, # <-- ¡Ahora usa la ruta dinámica!
-                "-o", "pool.supportxmr.com:443", # Ejemplo de pool
+                "-o", POOL_URL, # Ejemplo de pool
                 "-u", self.wallet_address,
                 "-k", # Keepalive
                 "--tls" # Usar TLS/SSL si el pool lo soporta
                 # "--cpu", # ELIMINADO
-                # "--nicehash" # ELIMINADO
                 # "-p", "x" # Contraseña para el worker (opcional)
             ]
-            print(f"[{self.port}] Iniciando XMRig con comando: {' '.join(xmrig_command)}")
-            
-            # stdout y stderr pipeados para leer la salida de XMRig
-            self.xmrig_process = subprocess.Popen(
-                xmrig_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True, # Para texto en lugar de bytes
-                bufsize=1 # Línea por línea
-            )
-            threading.Thread(target=self._read_xmrig_output, daemon=True).start()
+            if self.pool_proxy:
+                # Vía proxy stratum local: sin TLS (localhost) y con nonce en modo nicehash,
+                # para que cada instancia use el rango de nonces que le asigna el proxy
+                xmrig_command = [XMRIG_PATH, "-o", self.pool_proxy, "-u", self.wallet_address, "-k", "--nicehash",
+                                 f"--rig-id=nodo-{self.port}"]
+            if self.xmrig_api is not None:
+                # Habilitar la API HTTP solo en localhost, protegida con el token del nodo
+                xmrig_command += [
+                    f"--http-host={self.xmrig_api.host}",
+                    f"--http-port={self.xmrig_api.port}",
+                    f"--http-access-token={self.xmrig_api.access_token}",
+                ]
+                if self.governor is not None:
+                    xmrig_command.append("--http-no-restricted") # pause/resume por JSON-RPC (solo localhost y con token)
+            # Hilos, afinidad y NUMA según el reparto de CPU entre los nodos de esta máquina
+            cpu_args = xmrig_cpu_args(self.xmrig_cpu_slot)
+            tuned = self._tuned_entry()
+            if tuned is not None:
+                # La configuración auto-ajustada reemplaza la cantidad de hilos del plan
+                cpu_args = [arg for arg in cpu_args if not arg.startswith("--threads=")] + tuning_args(tuned["config"])
+                print(f"[{self.port}] Usando configuración auto-ajustada del {tuned['tuned_at']} "
+                      f"({tuned['hashrate']:.1f} H/s en benchmark).")
+            if self.governor is not None:
+                cpu_args = scale_threads_args(cpu_args, self.governor.settings[1])
+            xmrig_command += cpu_args
+            print(f"[{self.port}] Iniciando XMRig con comando: {' '.join(self._redact_command(xmrig_command))}")
+            self.current_pool_url = POOL_URL
+            if self.stratum_proxy is not None:
+                self.current_pool_url = (f"{self.stratum_proxy.upstream_host}:{self.stratum_proxy.upstream_port} "
+                                         f"(vía proxy {self.pool_proxy})")
+            elif self.pool_proxy:
+                self.current_pool_url = f"proxy stratum {self.pool_proxy}"
+
+            if self.engine is not None:
+                # Con asyncio, la salida de XMRig se lee con tareas del event loop
+                self.xmrig_process = self.engine.spawn_xmrig(xmrig_command)
+            else:
+                # stdout y stderr pipeados para leer la salida de XMRig
+                self.xmrig_process = subprocess.Popen(
+                    xmrig_command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True, # Para texto en lugar de bytes
+                    bufsize=1 # Línea por línea
+                )
+                threading.Thread(target=self._read_xmrig_output, daemon=True).start()
+                # stderr se lee en paralelo: si se leyera al cerrar stdout, un pipe lleno bloquearía a XMRig
+                threading.Thread(target=self._read_xmrig_stderr, daemon=True).start()
+            if self.xmrig_api is not None:
+                self._xmrig_api_stop.clear()
+                threading.Thread(target=self._poll_xmrig_api, args=(self.xmrig_process,), daemon=True).start()
             print(f"[{self.port}] XMRig iniciado.")
+            self.xmrig_supervisor.started()
+            self.xmrig_paused_by = None # Un proceso nuevo nunca está en pausa (el anterior pudo caerse pausado)
+            if self.governor is not None and self.governor.level:
+                self._apply_governor_to_new_process()
+            self._publish("xmrig", self._xmrig_state())
+            return True
 
         except FileNotFoundError:
             print(f"[{self.port}] Error: {XMRIG_PATH} no encontrado. Asegúrate de que esté en la ruta correcta.")
         except Exception as e:
             print(f"[{self.port}] Error al iniciar XMRig: {e}")
+        return False
+
+    def _xmrig_watchdog(self):
+        """Revisión periódica del supervisor: una salida inesperada o un cuelgue programan el reinicio."""
+        if self.autotune_running:
+            return
+        process = self.xmrig_process
+        reason = self.xmrig_supervisor.check(process is not None and process.poll() is None)
+        if reason is None:
+            return
+        returncode = process.poll() if process is not None else None
+        if reason == FAILURE_STALL:
+            print(f"[{self.port}] XMRig sin hashrate ni shares en {self.xmrig_supervisor.stall_timeout}s: "
+                  f"se termina el proceso (PID: {process.pid}).")
+            try:
+                process.kill() # Colgado: no se espera que atienda SIGTERM
+            except OSError:
+                pass
+        self._on_xmrig_failure(reason, returncode)
+
+    def _on_xmrig_failure(self, reason, returncode=None):
+        self.xmrig_paused_by = None # La pausa era del proceso que falló
+        delay = self.xmrig_supervisor.failure(reason, returncode)
+        print(f"[{self.port}] Supervisor de XMRig: {format_failure(self.xmrig_supervisor.history[-1])}.")
+        if delay is None:
+            print(f"[{self.port}] XMRig falló {XMRIG_CRASH_LOOP_LIMIT} veces en {XMRIG_CRASH_LOOP_WINDOW}s: "
+                  f"no se reinicia hasta un 'start_xmrig' manual.")
+        else:
+            self.timers.call_later(delay, self._restart_xmrig)
+        self._publish("xmrig", self._xmrig_state())
+
+    def _restart_xmrig(self):
+        if not self.running or not self.xmrig_supervisor.restarting():
+            return # Se detuvo o se inició a pedido mientras tanto
+        if self.autotune_running: # Al terminar, el auto-ajuste no lo reinicia (no estaba en ejecución)
+            self.timers.call_later(XMRIG_WATCHDOG_INTERVAL, self._restart_xmrig)
+            return
+        self.xmrig_supervisor.restarted()
+        print(f"[{self.port}] Supervisor de XMRig: reinicio #{self.xmrig_supervisor.restarts}.")
+        if not self.start_xmrig():
+            self._on_xmrig_failure(FAILURE_START)
+
+    # --- Gobernador de carga (ver mining_governor.py) ---
+    def _governor_tick(self):
+        """Muestra periódica: completa el costo de las decisiones anteriores y cambia de nivel si hace falta."""
+        process = self.xmrig_process
+        running = process is not None and process.poll() is None
+        hashrate = None
+        if running: # En pausa el último hashrate informado queda viejo
+            hashrate = 0.0 if self.xmrig_paused_by else self._hashrate_state()["hashrate"]
+        for decision in self.governor.settle(hashrate):
+            print(f"[{self.port}] Gobernador: {format_decision(decision)}")
+        previous = self.governor.settings
+        decision = self.governor.decide(self.governor_sampler.sample(process.pid if running else None), hashrate)
+        if decision is None:
+            return
+        print(f"[{self.port}] Gobernador: {format_decision(decision)}")
+        if running:
+            self._apply_governor_level(previous)
+        self._publish("xmrig", self._xmrig_state())
+
+    def _apply_governor_level(self, previous):
+        """Lleva al XMRig en ejecución del nivel `previous` (prioridad baja, hilos, pausa) al actual."""
+        low, threads, paused = self.governor.settings
+        was_low, was_threads, was_paused = previous
+        if threads != was_threads:
+            # XMRig no cambia la cantidad de hilos en caliente: se reinicia y start_xmrig aplica el nivel
+            print(f"[{self.port}] Gobernador: reiniciando XMRig con {threads:.0%} de los hilos.")
+            self.stop_xmrig()
+            if not self.start_xmrig(): # Como en _restart_xmrig: el supervisor reintenta con backoff
+                self._on_xmrig_failure(FAILURE_START)
+            return
+        if low != was_low and not set_low_priority(self.xmrig_process.pid, low):
+            print(f"[{self.port}] Gobernador: no se pudo {'bajar' if low else 'restaurar'} la prioridad de XMRig "
+                  f"(restaurarla puede requerir privilegios).")
+        if paused != was_paused:
+            self._set_xmrig_paused(paused)
+
+    def _apply_governor_to_new_process(self):
+        """Un XMRig recién lanzado arranca con la prioridad y la pausa del nivel actual."""
+        low, _, paused = self.governor.settings
+        if low:
+            set_low_priority(self.xmrig_process.pid, True)
+        if paused: # La API todavía no responde: la pausa va por señal
+            self._set_xmrig_paused(True)
+
+    def _set_xmrig_paused(self, paused):
+        """Pausa o reanuda la minería: por la API de XMRig si responde, si no con SIGSTOP/SIGCONT."""
+        pid = self.xmrig_process.pid
+        if paused:
+            if self.xmrig_api is not None and self.xmrig_api_ok:
+                try:
+                    self.xmrig_api.json_rpc("pause")
+                    self.xmrig_paused_by = "api"
+                except (OSError, ValueError) as e:
+                    print(f"[{self.port}] Gobernador: la API no pudo pausar XMRig ({e}); se usa una señal.")
+            if self.xmrig_paused_by is None and suspend_process(pid, True):
+                self.xmrig_paused_by = "signal"
+            if self.xmrig_paused_by is not None:
+                self.xmrig_supervisor.pause()
+            return
+        if self.xmrig_paused_by == "api":
+            try:
+                self.xmrig_api.json_rpc("resume")
+            except (OSError, ValueError) as e:
+                print(f"[{self.port}] Gobernador: la API no pudo reanudar XMRig ({e}).")
+        elif self.xmrig_paused_by == "signal":
+            suspend_process(pid, False)
+        self.xmrig_paused_by = None
+        self.xmrig_supervisor.resume()
+
+    def _print_governor(self):
+        if self.governor is None:
+            print(f"[{self.port}] Gobernador de carga desactivado (opción --governor).")
+            return
+        policy = self.governor.policy
+        sample = self.governor.last_sample
+        print(f"[{self.port}] Gobernador: nivel {self.governor.level_name}; límites carga ajena {policy['max_load']}%, "
+              f"memoria {policy['max_memory']}%, temperatura {policy['max_temperature']}°C, histéresis "
+              f"{policy['hysteresis']}; horas de silencio {', '.join(policy['quiet_hours']) or 'ninguna'} "
+              f"({policy['quiet_level']}).")
+        if sample is not None:
+            print(f"[{self.port}] Última muestra: CPU {sample['cpu']}% (minería {sample['mining_cpu']}%, ajena "
+                  f"{sample['other_cpu']}%), memoria {sample['memory']}%, temperatura {sample['temperature']}.")
+        for decision in self.governor.decisions:
+            print(f"[{self.port}]   {format_decision(decision)}")
+
+    def _print_xmrig_history(self):
+        stats = self.xmrig_supervisor.stats()
+        print(f"[{self.port}] Supervisor de XMRig: {stats['state']}, {stats['restarts']} reinicios, "
+              f"{stats['failures']} fallas, {stats['lost_time']:.0f}s sin minar por fallas.")
+        for entry in self.xmrig_supervisor.history:
+            print(f"[{self.port}]   {format_failure(entry)}")
+
+    def _tuning_fingerprint(self):
+        """Huella de CPU del caché de auto-ajuste: con plan de CPU, cuenta solo los núcleos de esta instancia."""
+        return cpu_fingerprint(len(self.xmrig_cpu_slot["cpus"]) if self.xmrig_cpu_slot else None)
+
+    def _tuned_entry(self):
+        try:
+            return self.tuning_cache.get(self._tuning_fingerprint()["key"])
+        except Exception as e:
+            print(f"[{self.port}] No se pudo leer el caché de auto-ajuste: {e}")
+            return None
+
+    def start_autotune(self, bench="1M"):
+        """Lanza el auto-ajuste en segundo plano (detiene XMRig mientras dura y lo reinicia al terminar)."""
+        if self.autotune_running:
+            print(f"[{self.port}] Ya hay un auto-ajuste en curso.")
+            return
+        self.autotune_running = True
+        self._publish("xmrig", self._xmrig_state())
+        threading.Thread(target=self._run_autotune, args=(bench,), daemon=True).start()
+
+    def _run_autotune(self, bench):
+        was_running = self.xmrig_process is not None and self.xmrig_process.poll() is None
+        try:
+            if was_running:
+                self.stop_xmrig() # El benchmark necesita los mismos núcleos
+            fingerprint = self._tuning_fingerprint()
+            slot = self.xmrig_cpu_slot
+            max_threads = slot["threads"] if slot else fingerprint["cores"]
+            extra_args = [arg for arg in xmrig_cpu_args(slot) if not arg.startswith("--threads=")]
+            print(f"[{self.port}] Auto-ajuste de XMRig ({bench}) para {fingerprint['key']}, hasta {max_threads} hilos...")
+            best, results = autotune(XMRIG_PATH, max_threads, extra_args, bench,
+                                     log=lambda line: print(f"[{self.port}] {line}"))
+            if best is None:
+                print(f"[{self.port}] Auto-ajuste sin resultados válidos; no se modificó el caché.")
+            else:
+                self.tuning_cache.store_result(fingerprint, best, results, bench)
+                print(f"[{self.port}] Auto-ajuste terminado. Mejor configuración: "
+                      f"{' '.join(tuning_args(best['config']))} ({best['hashrate']:.1f} H/s).")
+        except Exception as e:
+            print(f"[{self.port}] Error durante el auto-ajuste: {e}")
+        finally:
+            self.autotune_running = False
+            self._publish("xmrig", self._xmrig_state())
+        if was_running and self.running:
+            self.start_xmrig()
+
+    def _redact_command(self, command):
+        """Copia del comando apta para el log (sin el token de la API)."""
+        return [arg.split("=", 1)[0] + "=***" if arg.startswith("--http-access-token") else arg for arg in command]
 
     def _read_xmrig_output(self):
         """Lee la salida de XMRig y actualiza el estado del nodo."""
-        for line in iter(self.xmrig_process.stdout.readline, ''):
-            sys.stdout.write(f"[{self.port} XMRig] {line}")
-            # Aquí podrías parsear la línea para actualizar hashrate, shares, etc.
-            if "speed" in line and "current" in line:
-                try:
-                    parts = line.split("speed")
-                    if len(parts) > 1:
-                        hashrate_str = parts[1].strip().split(';')[0].strip()
-                        self.current_hashrate = hashrate_str
-                        self.last_xmrig_activity = time.strftime('%H:%M:%S')
-                except Exception as e:
-                    print(f"[{self.port} XMRig Parser Error] {e}")
+        process = self.xmrig_process
+        for line in iter(process.stdout.readline, ''):
+            self._handle_xmrig_line(line)
+        process.wait()
+        self._on_xmrig_output_closed(process.returncode)
 
+    def _read_xmrig_stderr(self):
         for line in iter(self.xmrig_process.stderr.readline, ''):
-            sys.stderr.write(f"[{self.port} XMRig ERROR] {line}")
+            self._handle_xmrig_error_line(line)
+
+    def _poll_xmrig_api(self, process):
+        """Consulta /2/summary de XMRig periódicamente mientras el proceso siga vivo."""
+        # El evento de parada es compartido: tras un reinicio, el poller viejo termina por sí solo
+        while self.running and process.poll() is None and process is self.xmrig_process:
+            try:
+                self._update_xmrig_stats(parse_xmrig_summary(self.xmrig_api.summary()))
+                if not self.xmrig_api_ok:
+                    print(f"[{self.port}] API HTTP de XMRig disponible en {self.xmrig_api.base_url}.")
+                    self.xmrig_api_ok = True
+            except (OSError, ValueError) as e: # URLError y HTTPError heredan de OSError
+                if self.xmrig_api_ok:
+                    print(f"[{self.port}] API de XMRig no disponible ({e}); se usa la salida de consola.")
+                self.xmrig_api_ok = False
+            if self._xmrig_api_stop.wait(XMRIG_API_POLL_INTERVAL):
+                break
+        if process is self.xmrig_process: # Un poller viejo no pisa el estado del proceso nuevo
+            self.xmrig_api_ok = False
+
+    def _update_xmrig_stats(self, stats):
+        previous = self.xmrig_stats
+        self.xmrig_stats = stats
+        # Los shares del resumen son acumulados: al historial van las diferencias
+        accepted = max(stats.get("shares_good", 0) - previous.get("shares_good", 0), 0)
+        rejected = max(stats.get("shares_rejected", 0) - previous.get("shares_rejected", 0), 0)
+        self.hashrate_history.record(stats.get("hashrate_10s"), accepted, rejected)
+        if stats.get("pool"):
+            self.current_pool_url = stats["pool"]
+        if any(stats.get(k) is not None for k in ("hashrate_10s", "hashrate_60s", "hashrate_15m")):
+            self.current_hashrate = format_hashrate(stats)
+        # Hay actividad si cambió el hashrate o se enviaron nuevos shares
+        if (stats.get("hashrate_10s") or stats.get("shares_total", 0) != previous.get("shares_total", 0)):
+            self.last_xmrig_activity = time.strftime('%H:%M:%S')
+            self.xmrig_supervisor.activity()
+        self._publish("hashrate", self._hashrate_state())
+
+    def _handle_xmrig_line(self, line):
+        sys.stdout.write(f"[{self.port} XMRig] {line}")
+        # Con la API disponible los datos estructurados llegan por HTTP; esto queda como respaldo.
+        # Línea de XMRig: "miner    speed 10s/60s/15m 1523.4 1519.8 n/a H/s max 1530.2 H/s"
+        if not self.xmrig_api_ok and "speed" in line and "H/s" in line:
+            try:
+                parts = line.split("speed")
+                if len(parts) > 1:
+                    hashrate_str = parts[1].strip().split(';')[0].strip()
+                    self.current_hashrate = hashrate_str
+                    self.last_xmrig_activity = time.strftime('%H:%M:%S')
+                    hashrate = parse_speed_line(line)
+                    self.hashrate_history.record(hashrate)
+                    if hashrate:
+                        self.xmrig_supervisor.activity()
+                    self._publish("hashrate", self._hashrate_state())
+            except Exception as e:
+                print(f"[{self.port} XMRig Parser Error] {e}")
+
+    def _handle_xmrig_error_line(self, line):
+        sys.stderr.write(f"[{self.port} XMRig ERROR] {line}")
 
-        print(f"[{self.port}] Hilo de lectura de XMRig finalizado. Código de salida: {self.xmrig_process.returncode}")
+    def _on_xmrig_output_closed(self, returncode):
+        print(f"[{self.port}] Hilo de lectura de XMRig finalizado. Código de salida: {returncode}")
         # self.xmrig_process = None # <--- ¡ELIMINA ESTA LÍNEA!
         self.current_hashrate = "N/A"
         self.last_xmrig_activity = "N/A"
+        self.xmrig_stats = {}
+        self._publish("xmrig", self._xmrig_state(returncode))
 
     def stop_xmrig(self):
+        self.xmrig_supervisor.stopped() # Detención a pedido: no se reinicia
+        if self.xmrig_paused_by == "signal" and self.xmrig_process is not None:
+            suspend_process(self.xmrig_process.pid, False) # Detenido con SIGSTOP no atendería SIGTERM
+        self.xmrig_paused_by = None
         # Asegúrate de que xmrig_process exista y sea un objeto Popen
         if self.xmrig_process is not None:
+            self._xmrig_api_stop.set()
             if self.xmrig_process.poll() is None: # Si el proceso aún está en ejecución
                 print(f"[{self.port}] Deteniendo XMRig (PID: {self.xmrig_process.pid})...")
                 try:
@@ -330,6 +2483,8 @@ class P2PNode:
             self.xmrig_process = None # <--- MANTENER ESTA LÍNEA AQUÍ
             self.current_hashrate = "N/A"
             self.last_xmrig_activity = "N/A"
+            self.xmrig_stats = {}
+            self._publish("xmrig", self._xmrig_state())
         else:
             print(f"[{self.port}] XMRig no está en ejecución (objeto de proceso es None).")
 
@@ -337,12 +2492,14 @@ class P2PNode:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             s.bind((self.host, self.port))
-            s.listen(5)
+            s.listen(LISTEN_BACKLOG)
+            self._listen_socket = s # stop() lo cierra para liberar el puerto y despertar a accept()
             print(f"[{self.port}] Escuchando en {self.host}:{self.port}...")
             while self.running:
                 try:
-                    conn, addr = s.accept()
-                    conn.settimeout(600) # Timeout para la conexión de cliente
+                    sock, addr = s.accept()
+                    sock.settimeout(PEER_CONNECTION_TIMEOUT) # Timeout para la conexión de cliente
+                    conn = PeerConnection(sock)
                     threading.Thread(target=self._handle_client_connection, args=(conn, addr), daemon=True).start()
                 except socket.timeout:
                     continue
@@ -369,7 +2526,10 @@ class P2PNode:
             try:
                 # sys.stdin.readline() es bloqueante, pero en un hilo separado no bloquea el main loop.
                 # Cuando la GUI escribe al stdin del subprocess, esta línea lo captura.
-                command_line = sys.stdin.readline().strip() 
+                raw_line = sys.stdin.readline()
+                if raw_line == '': # EOF: el proceso padre cerró stdin
+                    break
+                command_line = raw_line.strip()
                 if command_line:
                     self.command_queue.put(command_line)
                 # No se necesita sleep si readline es bloqueante y esperamos entrada.
@@ -380,9 +2540,14 @@ class P2PNode:
                 break
         print(f"[{self.port}] Hilo de escucha de comandos finalizado.")
 
-    def _execute_internal_command(self, command):
-        """Ejecuta comandos internos recibidos a través de la cola de comandos."""
+    def _execute_internal_command(self, command, reply=None):
+        """
+        Ejecuta comandos internos recibidos a través de la cola de comandos. `reply` (canal de
+        control) recibe el resultado: el resumen del cluster para 'request_pool_info' y, para
+        el resto, la confirmación de que se ejecutó.
+        """
         print(f"[{self.port}] Ejecutando comando interno: '{command}'")
+        result = {"command": command}
         if command == "stop":
             self.stop()
         elif command == "start_xmrig":
@@ -390,74 +2555,420 @@ class P2PNode:
         elif command == "stop_xmrig":
             self.stop_xmrig()
         elif command == "peers":
-            print(f"[{self.port}] Peers conectados: {list(self.peers)}")
+            self._print_peer_table()
+        elif command == "xmrig_history":
+            self._print_xmrig_history()
+        elif command == "governor":
+            self._print_governor()
         elif command == "request_pool_info":
-            self._request_pool_info_from_peers() # Nuevo: Comando para solicitar info de pool
+            self._request_pool_info_from_peers(reply) # Nuevo: Comando para solicitar info de pool
+            return
+        elif command.startswith("send_transaction ") or command.startswith("send_block "):
+            # Originar gossip: 'send_transaction <json o texto>' / 'send_block <json o texto>'
+            name, payload = command.split(" ", 1)
+            try:
+                data = json.loads(payload)
+            except json.JSONDecodeError:
+                data = payload
+            msg_type = MSG_TYPE_TRANSACTION if name == "send_transaction" else MSG_TYPE_BLOCK
+            if msg_type == MSG_TYPE_BLOCK and not isinstance(data, dict):
+                data = {"index": data}
+            msg_id = result["msg_id"] = self.publish_gossip(msg_type, data)
+            print(f"[{self.port}] {msg_type} {msg_id} difundido a {len(self.peer_table.addresses())} peers.")
+        elif command == "autotune" or command.startswith("autotune "):
+            # 'autotune [1M|10M]': benchmark de XMRig sobre una grilla de configuraciones
+            bench = command[len("autotune"):].strip() or "1M"
+            if bench not in TUNING_BENCH_SIZES:
+                print(f"[{self.port}] Tamaño de benchmark inválido '{bench}' (opciones: {', '.join(TUNING_BENCH_SIZES)}).")
+            else:
+                self.start_autotune(bench)
+        elif command == "proxy_stats":
+            if self.stratum_proxy is None:
+                print(f"[{self.port}] Este nodo no aloja un proxy stratum.")
+            else:
+                self._print_proxy_stats(self.stratum_proxy.stats())
+        elif command == "stats" or command.startswith("stats "):
+            # 'stats [1m|1h|24h]': agregados del historial local de hashrate y shares
+            window = command[len("stats"):].strip() or None
+            for name in self._stats_windows(window):
+                print(f"[{self.port}] Stats {name}: {self._format_aggregate(self.hashrate_history.aggregate(name))}")
+        elif command == "request_stats" or command.startswith("request_stats "):
+            # 'request_stats [1m|1h|24h]': pedir los mismos agregados a todos los peers
+            window = command[len("request_stats"):].strip() or None
+            peers_snapshot = self.peer_table.addresses()
+            self._fan_out(peers_snapshot, MSG_TYPE_STATS_REQUEST, {"window": window})
+            print(f"[{self.port}] Solicitud de stats enviada a {len(peers_snapshot)} peers.")
+        elif command == "metrics":
+            for line in format_metrics(self.metrics.snapshot()).splitlines():
+                print(f"[{self.port}] {line}")
+        elif command == "gossip_stats":
+            print(f"[{self.port}] Gossip: {self.gossip_stats['relayed']} retransmitidos, "
+                  f"{self.gossip_stats['duplicates_suppressed']} duplicados descartados "
+                  f"({self.gossip_stats['bytes_suppressed']} bytes ahorrados), {len(self.seen_messages)} IDs en caché.")
         else:
             print(f"[{self.port}] Comando desconocido: {command}")
+            if reply is not None:
+                reply(error=f"comando desconocido: {command}")
+            return
+        if reply is not None:
+            reply(result)
 
-    def _request_pool_info_from_peers(self):
-        """Envía un mensaje POOL_INFO_REQUEST a todos los peers conectados."""
-        print(f"[{self.port}] Solicitando información de pool a los peers...")
-        with self.peers_lock:
-            for peer_tuple in list(self.peers):
-                try:
-                    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                        s.settimeout(5)
-                        s.connect(peer_tuple)
-                        self._send_message(s, MSG_TYPE_POOL_INFO_REQUEST, {"requester_port": self.port})
-                        print(f"[{self.port}] Solicitud de pool enviada a {peer_tuple}")
-                except Exception as e:
-                    print(f"[{self.port}] No se pudo enviar solicitud de pool a {peer_tuple}: {e}")
+    def _request_pool_info_from_peers(self, reply=None):
+        """
+        Consulta scatter-gather: envía POOL_INFO_REQUEST con un ID de consulta a todos los peers
+        a la vez; las respuestas se agrupan hasta que respondan todos o venza el plazo común.
+        `reply` (canal de control) recibe el resumen al terminar.
+        """
+        targets = self.peer_table.reachable()
+        query = self.cluster_queries.start(CLUSTER_QUERY_POOL_INFO, targets)
+        if reply is not None:
+            self.cluster_query_replies[query.query_id] = reply
+        if not query.complete:
+            self.timers.call_later(CLUSTER_QUERY_TIMEOUT, self._expire_cluster_queries)
+        self._fan_out(list(targets.values()), MSG_TYPE_POOL_INFO_REQUEST,
+                      {"requester_port": self.port, "query_id": query.query_id, "timeout": CLUSTER_QUERY_TIMEOUT})
+        print(f"[{self.port}] Consulta de pool {query.query_id} enviada a {len(targets)} peers "
+              f"(plazo {CLUSTER_QUERY_TIMEOUT}s).")
+        if query.complete: # Sin peers: el resumen solo tiene a este nodo
+            self._finish_cluster_query(query)
+
+    def _expire_cluster_queries(self):
+        """Consultas al cluster cuyo plazo venció: se resumen con las respuestas que llegaron."""
+        for query in self.cluster_queries.expire():
+            self._finish_cluster_query(query)
+
+    def _finish_cluster_query(self, query):
+        """Imprime el resumen del cluster y lo entrega por el canal de control (respuesta y evento)."""
+        summary = summarize_pool_info(query, self.node_id, self._pool_info())
+        for line in format_cluster_summary(summary).splitlines():
+            print(f"[{self.port}] {line}")
+        reply = self.cluster_query_replies.pop(query.query_id, None)
+        if reply is not None:
+            reply(summary)
+        self._publish("cluster_summary", summary)
+
+    # --- Canal de control (ver node_control.py) ---
+    def _handle_control_request(self, cmd, args, reply):
+        """
+        Solicitudes del canal de control. Las consultas de estado se responden enseguida desde
+        el hilo del cliente; 'command' y 'cluster_pool_info' pasan por la cola de comandos del
+        bucle principal y se responden al ejecutarse.
+        """
+        if cmd == "ping":
+            reply({"time": time.time()})
+        elif cmd == "status":
+            reply(self._control_status())
+        elif cmd == "peers":
+            reply([{"node_id": node_id, "host": address[0], "port": address[1], "connected": connected,
+                    "last_seen": last_seen, "rtt": rtt, "failures": failures}
+                   for node_id, address, connected, last_seen, rtt, failures in self.peer_table.rows()])
+        elif cmd == "metrics":
+            reply(self.metrics.snapshot())
+        elif cmd == "command":
+            command = str(args.get("command") or "").strip()
+            if not command:
+                reply(error="falta 'command'")
+            else:
+                self.command_queue.put((command, reply))
+        elif cmd == "cluster_pool_info":
+            self.command_queue.put(("request_pool_info", reply))
+        else:
+            reply(error=f"solicitud desconocida: {cmd}")
+
+    def _publish(self, event, data):
+        if self.control_server is not None:
+            self.control_server.publish(event, data)
+
+    def _peers_state(self):
+        return {"connected": self.peer_table.connected_count(), "known": len(self.peer_table),
+                "version": self.peer_table.version}
+
+    def _publish_peers(self):
+        """Evento 'peers' solo si cambió la cantidad de peers conectados o conocidos."""
+        if self.control_server is None:
+            return
+        state = self._peers_state()
+        if (state["connected"], state["known"]) != self.last_peers_event:
+            self.last_peers_event = (state["connected"], state["known"])
+            self._publish("peers", state)
+
+    def _hashrate_state(self):
+        return {
+            "hashrate": response_hashrate({"xmrig_stats": self.xmrig_stats,
+                                           "trends": {"1m": self.hashrate_history.aggregate("1m")}}),
+            "text": self.current_hashrate,
+            "shares_good": self.xmrig_stats.get("shares_good"),
+            "shares_total": self.xmrig_stats.get("shares_total"),
+            "pool_url": self.current_pool_url,
+            "last_activity": self.last_xmrig_activity,
+        }
+
+    def _xmrig_state(self, returncode=None):
+        if self.autotune_running:
+            state = "tuning"
+        elif self.xmrig_process is not None and self.xmrig_process.poll() is None:
+            state = "running"
+        else:
+            state = "stopped"
+        pid = self.xmrig_process.pid if state == "running" else None
+        return {"state": state, "pid": pid, "returncode": returncode, "api": self.xmrig_api_ok,
+                "supervisor": self.xmrig_supervisor.state, "restarts": self.xmrig_supervisor.restarts,
+                "governor": self.governor.level_name if self.governor is not None else None}
+
+    def _control_status(self):
+        return {
+            "port": self.port,
+            "node_id": self.node_id,
+            "engine": "asyncio" if self.engine is not None else "threads",
+            "running": self.running,
+            "xmrig": self._xmrig_state(),
+            "hashrate": self._hashrate_state(),
+            "peers": self._peers_state(),
+            "stratum_proxy": self.stratum_proxy is not None,
+            "pool_proxy": self.pool_proxy,
+            "command_queue": self.command_queue.qsize(),
+            "governor": self.governor.status() if self.governor is not None else None,
+        }
 
     def run(self):
         # Iniciar listener de conexiones entrantes
-        threading.Thread(target=self._listen_for_connections, daemon=True).start()
+        if self.engine is not None:
+            self.engine.start()
+        else:
+            threading.Thread(target=self._listen_for_connections, daemon=True).start()
+
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+                print(f"[{self.port}] Métricas en http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                print(f"[{self.port}] No se pudo iniciar el endpoint de métricas: {e}")
+                self.metrics_server = None
+
+        if self.control_server is not None:
+            try:
+                self.control_server.start()
+                print(f"[{self.port}] Canal de control en {self.control_server.host}:{self.control_server.port}")
+            except OSError as e:
+                print(f"[{self.port}] No se pudo iniciar el canal de control: {e}")
+                self.control_server = None
 
         # Iniciar hilo para escuchar comandos desde stdin (ej. de la GUI)
         # Esto es crucial para que la GUI pueda enviar comandos al nodo
         threading.Thread(target=self._command_listener, daemon=True).start()
 
         # Conectar a peers predefinidos (si aún no estamos conectados)
-        for peer_host, peer_port in PEER_NODES:
+        for peer_host, peer_port in self.peer_nodes:
             if (peer_host, peer_port) != (self.host, self.port): # No intentar conectar a sí mismo
-                threading.Thread(target=self.connect_to_peer, args=(peer_host, peer_port), daemon=True).start()
+                if self.engine is not None:
+                    self.engine.submit(self.engine.connect_to_peer(peer_host, peer_port))
+                else:
+                    threading.Thread(target=self.connect_to_peer, args=(peer_host, peer_port), daemon=True).start()
+
+        # El proxy stratum se inicia antes que XMRig para que éste pueda conectarse enseguida
+        if self.stratum_proxy is not None:
+            try:
+                self.stratum_proxy.start()
+            except OSError as e:
+                print(f"[{self.port}] No se pudo iniciar el proxy stratum: {e}")
+                self.stratum_proxy = None
 
         # Iniciar XMRig automáticamente al arrancar el nodo
-        self.start_xmrig()
+        if self.autostart_xmrig:
+            self.start_xmrig()
 
-        # Bucle principal del nodo
+        # Tareas periódicas: mantenimiento del pool, sincronización de la tabla de peers, reintentos
+        # y supervisión de XMRig
+        self.timers.call_every(POOL_MAINTENANCE_INTERVAL, self._pool_maintenance)
+        self.timers.call_every(PEER_RETRY_CHECK_INTERVAL, self._retry_failed_peers)
+        self.timers.call_every(XMRIG_WATCHDOG_INTERVAL, self._xmrig_watchdog)
+        if self.governor is not None:
+            self.timers.call_every(self.governor.policy["sample_interval"], self._governor_tick)
+        self.timers.call_later(PEER_SYNC_INTERVAL, self._periodic_peer_sync)
+
+        # Bucle principal del nodo: espera un comando o el próximo temporizador, sin sondeo
         while self.running:
-            # Procesar comandos de la cola (desde stdin)
-            while not self.command_queue.empty():
-                command = self.command_queue.get_nowait()
-                self._execute_internal_command(command)
-            
-            # Aquí podrías añadir lógica adicional que el nodo necesite hacer periódicamente
-            # Ej: Descubrimiento de nuevos peers, re-broadcasting de transacciones, etc.
-            time.sleep(1) # Pequeña pausa para no saturar la CPU
+            try:
+                item = self.command_queue.get(timeout=self.timers.timeout())
+            except queue.Empty:
+                item = None
+            if item is not None: # None solo despierta al bucle (ver stop)
+                # Texto (stdin o mensaje interno) o (comando, reply) desde el canal de control
+                command, reply = item if isinstance(item, tuple) else (item, None)
+                try:
+                    self._execute_internal_command(command, reply)
+                except Exception as e:
+                    self._on_command_error(command, e, reply)
+            if self.running:
+                self.timers.run_due(self._on_timer_error)
 
+        if self.engine is not None:
+            self.engine.stop()
+        # El canal de control se cierra al final, después de responder el 'stop' que lo pidió
+        if self.control_server is not None:
+            self.control_server.stop()
         print(f"[{self.port}] Nodo en puerto {self.port} detenido.")
 
+    def _pool_maintenance(self):
+        evicted = self.connection_pool.evict_idle()
+        if evicted:
+            print(f"[{self.port}] Cerradas {evicted} conexiones ociosas del pool.")
+        self.seen_messages.purge_expired()
+
+    def _periodic_peer_sync(self):
+        """Pide deltas de la tabla de peers y se reprograma PEER_SYNC_INTERVAL después de la última sincronización."""
+        if time.time() - self.last_peer_sync >= PEER_SYNC_INTERVAL:
+            self._sync_peer_tables()
+        # Los handshakes también sincronizan: el próximo turno cuenta desde la última, sea cual sea
+        delay = self.last_peer_sync + PEER_SYNC_INTERVAL - time.time()
+        self.timers.call_later(max(delay, PEER_RETRY_CHECK_INTERVAL), self._periodic_peer_sync)
+
+    def _on_timer_error(self, func, error):
+        print(f"[{self.port}] Error en la tarea periódica {getattr(func, '__name__', func)}: {error}")
+
+    def _on_command_error(self, command, error, reply=None):
+        print(f"[{self.port}] Error al ejecutar el comando '{command}': {error}")
+        if reply is not None:
+            reply(error=f"error al ejecutar '{command}': {error}")
+
     def stop(self):
         print(f"[{self.port}] Señal de detención recibida. Deteniendo nodo...")
         self.running = False
+        self.command_queue.put(None) # Despierta al bucle principal si está esperando
+        if self._listen_socket is not None:
+            try:
+                self._listen_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listen_socket.close()
         self.stop_xmrig() # Asegurarse de detener XMRig al cerrar
+        if self.stratum_proxy is not None:
+            self.stratum_proxy.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        with self.outboxes_lock:
+            outboxes = list(self.outboxes.values())
+            self.outboxes.clear()
+        for outbox in outboxes:
+            outbox.close()
+        self.connection_pool.close_all()
 
 # --- Punto de entrada del script ---
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nodo minero P2P que controla una instancia de XMRig.")
+    parser.add_argument("port", type=int, help="Puerto de escucha del nodo")
+    parser.add_argument("wallet_address", help="Dirección de billetera Monero")
+    parser.add_argument("--max-frame-size", type=int, default=MAX_FRAME_SIZE,
+                        help=f"Tamaño máximo en bytes de un mensaje P2P (por defecto {MAX_FRAME_SIZE})")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads",
+                        help="Motor de E/S: un hilo por conexión (threads) o un único event loop (asyncio)")
+    parser.add_argument("--peers", default=None,
+                        help="Peers de arranque 'host:puerto,host:puerto' (por defecto PEER_NODES; '' para ninguno)")
+    parser.add_argument("--no-xmrig", action="store_true", help="No iniciar XMRig al arrancar el nodo")
+    parser.add_argument("--xmrig-path", default=None,
+                        help=f"Ejecutable de XMRig (por defecto {XMRIG_PATH}); ej. un XMRig simulado para benchmarks")
+    parser.add_argument("--xmrig-api-port", type=int, default=None,
+                        help=f"Puerto local de la API HTTP de XMRig (por defecto puerto+{XMRIG_API_PORT_OFFSET}; 0 la desactiva)")
+    parser.add_argument("--xmrig-stall-timeout", type=float, default=XMRIG_STALL_TIMEOUT,
+                        help=f"Segundos sin hashrate ni shares tras los que XMRig se reinicia (por defecto "
+                             f"{XMRIG_STALL_TIMEOUT}; 0 solo reinicia si termina)")
+    parser.add_argument("--governor", action="store_true",
+                        help="Reducir la minería cuando otros procesos necesitan la CPU (ver mining_governor.py)")
+    parser.add_argument("--governor-policy", default=None, metavar="ARCHIVO",
+                        help="Política del gobernador en JSON (claves de GOVERNOR_POLICY_DEFAULTS); activa --governor")
+    parser.add_argument("--max-load", type=float, default=None,
+                        help=f"Gobernador: %% de CPU usado por otros procesos a partir del cual se reduce la minería "
+                             f"(por defecto {GOVERNOR_POLICY_DEFAULTS['max_load']}); activa --governor")
+    parser.add_argument("--quiet-hours", default=None, metavar="HH:MM-HH:MM,...",
+                        help="Gobernador: franjas horarias con la minería reducida al menos a 'quiet_level' "
+                             "(por defecto en pausa); activa --governor")
+    parser.add_argument("--json-only", action="store_true",
+                        help="No anunciar el codec binario en el handshake (compatibilidad con peers antiguos)")
+    parser.add_argument("--cpu-slot", default=None,
+                        help="Parte de la CPU para XMRig 'I/N' (instancia I de N en esta máquina), ver cpu_topology.py")
+    parser.add_argument("--cpu-mode", choices=CPU_MODES, default=CPU_MODE_SPLIT,
+                        help="Con --cpu-slot: repartir núcleos entre las N instancias (split) o todos a la primera (single)")
+    parser.add_argument("--stratum-proxy", type=int, default=None, metavar="PUERTO",
+                        help="Alojar un proxy stratum local en este puerto: una sola conexión con el pool para "
+                             "todas las instancias de XMRig de la máquina (incluida la de este nodo)")
+    parser.add_argument("--pool-proxy", default=None, metavar="HOST:PUERTO",
+                        help="Conectar XMRig al proxy stratum de otro nodo en lugar de directamente al pool")
+    parser.add_argument("--proxy-upstream", default=None,
+                        help=f"Pool del proxy stratum (por defecto stratum+ssl://{POOL_URL}; stratum+tcp:// sin TLS)")
+    parser.add_argument("--max-peers", type=int, default=PEER_TABLE_SIZE,
+                        help=f"Tamaño máximo de la tabla de peers (por defecto {PEER_TABLE_SIZE}); al llenarse se desaloja el peor")
+    parser.add_argument("--control-port", type=int, default=None, metavar="PUERTO",
+                        help="Canal de control en líneas JSON en 127.0.0.1:PUERTO (ver node_control.py); "
+                             f"el token se toma de la variable de entorno {CONTROL_TOKEN_ENV}")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PUERTO",
+                        help="Exponer métricas en http://127.0.0.1:PUERTO/metrics (formato Prometheus) "
+                             "y /metrics.json (desactivado por defecto)")
+    return parser.parse_args(argv)
+
+
+def parse_peer_list(text):
+    """Convierte 'host:puerto,host:puerto' en una lista de tuplas (host, puerto)."""
+    peers = []
+    for item in text.split(","):
+        item = item.strip()
+        if item:
+            host, _, peer_port = item.rpartition(":")
+            peers.append((host or "localhost", int(peer_port)))
+    return peers
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Uso: python p2p_miner_node.py <puerto> <direccion_billetera_monero>")
+        print("Uso: python p2p_miner_node.py <puerto> <direccion_billetera_monero> [opciones]")
         sys.exit(1)
 
-    port = int(sys.argv[1])
-    wallet_address = sys.argv[2] # La dirección de la billetera es el segundo argumento
+    args = parse_args()
+    port = args.port
+    wallet_address = args.wallet_address # La dirección de la billetera es el segundo argumento
+
+    if args.peers is not None:
+        PEER_NODES = parse_peer_list(args.peers)
+    if args.xmrig_path:
+        XMRIG_PATH = args.xmrig_path
 
     # Filtrar PEER_NODES para no incluir el propio puerto
     # Esto es importante para que cada nodo solo intente conectar a otros, no a sí mismo
     PEER_NODES = [peer for peer in PEER_NODES if peer[1] != port]
 
-    node = P2PNode(port, wallet_address)
+    xmrig_cpu_slot = None
+    autostart_xmrig = not args.no_xmrig
+    if args.cpu_slot:
+        slot_index, slot_count = parse_slot(args.cpu_slot)
+        cpu_topology = read_cpu_topology()
+        cpu_plan = plan_cpu_partitions(cpu_topology, slot_count, args.cpu_mode)
+        print(f"[{port}] Plan de CPU (instancia {slot_index + 1} de {slot_count}, modo {args.cpu_mode}):")
+        print(format_cpu_plan(cpu_topology, cpu_plan))
+        xmrig_cpu_slot = cpu_plan[slot_index]
+        if xmrig_cpu_slot is None:
+            print(f"[{port}] Sin núcleos asignados en el plan de CPU: XMRig no se inicia automáticamente.")
+            autostart_xmrig = False
+
+    governor_policy = None
+    if args.governor or args.governor_policy or args.max_load is not None or args.quiet_hours:
+        try:
+            governor_policy = load_governor_policy(args.governor_policy,
+                                                   {"max_load": args.max_load, "quiet_hours": args.quiet_hours})
+        except (OSError, ValueError) as e:
+            print(f"[{port}] Política del gobernador inválida: {e}")
+            sys.exit(1)
+
+    node = P2PNode(port, wallet_address, max_frame_size=args.max_frame_size, engine=args.engine,
+                   peer_nodes=PEER_NODES, autostart_xmrig=autostart_xmrig,
+                   codecs=[CODEC_JSON] if args.json_only else SUPPORTED_CODECS,
+                   xmrig_api_port=args.xmrig_api_port, xmrig_cpu_slot=xmrig_cpu_slot,
+                   stratum_proxy_port=args.stratum_proxy, pool_proxy=args.pool_proxy,
+                   proxy_upstream=args.proxy_upstream, metrics_port=args.metrics_port,
+                   max_peers=args.max_peers, control_port=args.control_port,
+                   xmrig_stall_timeout=args.xmrig_stall_timeout, governor_policy=governor_policy)
+    # SIGTERM (ej. la GUI al escalar la detención) detiene el nodo igual que el comando 'stop'. El
+    # handler corre en el hilo principal, que puede estar dentro de la cola: el put va en otro hilo.
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+        target=node.command_queue.put, args=("stop",), daemon=True).start())
     try:
         node.run()
     except KeyboardInterrupt:
@@ -465,4 +2976,4 @@ if __name__ == "__main__":
         node.stop()
     except Exception as e:
         print(f"[{node.port}] Error inesperado en el nodo: {e}")
-        node.stop()
\ No newline at end of file
+        node.stop()
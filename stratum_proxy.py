@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+# stratum_proxy.py
+#
+# P2P Miner GUI - Proxy stratum local compartido por las instancias de XMRig.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Mantiene una única conexión (TLS) con el pool y atiende a las instancias
+# locales de XMRig como si fuera el pool. Cada instancia recibe los mismos trabajos pero
+# con un rango de nonces propio (modo "nicehash": el byte más alto del nonce queda fijo
+# por instancia), y sus shares se reenvían por la conexión compartida. Mide la latencia
+# de ida y vuelta de cada share (proxy -> pool -> proxy).
+#
+
+import asyncio
+import concurrent.futures
+import json
+import ssl
+import threading
+import time
+from collections import deque
+
+STRATUM_PROXY_HOST = "127.0.0.1" # Solo las instancias locales se conectan al proxy
+STRATUM_DEFAULT_UPSTREAM = "stratum+ssl://pool.supportxmr.com:443"
+STRATUM_AGENT = "P2PMinerGUI-proxy/1.0"
+STRATUM_KEEPALIVE_INTERVAL = 60 # Segundos entre 'keepalived' hacia el pool
+STRATUM_RECONNECT_INITIAL = 1 # Backoff de reconexión con el pool (se duplica hasta el máximo)
+STRATUM_RECONNECT_MAX = 60
+STRATUM_LOGIN_TIMEOUT = 30 # Espera máxima por el primer trabajo al aceptar un minero
+STRATUM_MAX_WORKERS = 256 # Un valor del byte fijo del nonce por instancia
+STRATUM_LINE_LIMIT = 64 * 1024
+STRATUM_LATENCY_SAMPLES = 1000 # Latencias de shares recientes usadas para los percentiles
+NICEHASH_NONCE_BYTE = 42 # Byte más significativo del nonce (offset 39..42) en el blob de Monero
+
+
+def parse_stratum_url(url):
+    """Convierte 'stratum+ssl://host:puerto' / 'stratum+tcp://host:puerto' / 'host:puerto' en (host, puerto, tls)."""
+    tls = False
+    if "://" in url:
+        scheme, url = url.split("://", 1)
+        tls = scheme in ("stratum+ssl", "stratum+tls", "ssl", "tls")
+    host, _, port = url.rpartition(":")
+    return host, int(port), tls
+
+
+def nicehash_blob(blob, index):
+    """Copia del blob del trabajo con el byte alto del nonce fijado al índice de la instancia."""
+    offset = NICEHASH_NONCE_BYTE * 2
+    return blob[:offset] + f"{index:02x}" + blob[offset + 2:]
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[max(int(len(sorted_values) * fraction + 0.5) - 1, 0)]
+
+
+class StratumWorker:
+    """Instancia de XMRig conectada al proxy."""
+    def __init__(self, index, writer, peer):
+        self.index = index
+        self.writer = writer
+        self.peer = peer
+        self.session_id = f"w{index:02x}-{int(time.time() * 1000) & 0xffffffff:08x}"
+        self.rig_id = None
+        self.accepted = 0
+        self.rejected = 0
+        self.connected_at = time.time()
+
+
+class StratumProxy:
+    """
+    Proxy stratum (protocolo JSON-RPC por líneas de XMRig) con su propio event loop en un
+    hilo, independiente del motor de E/S del nodo.
+    """
+    def __init__(self, listen_port, upstream_url, wallet, password="x", listen_host=STRATUM_PROXY_HOST, log=print):
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.upstream_host, self.upstream_port, self.upstream_tls = parse_stratum_url(upstream_url)
+        self.wallet = wallet
+        self.password = password
+        self.log = log
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+        self._server = None
+        self._tasks = set()
+        self.running = False
+
+        # Estado de la conexión con el pool
+        self._upstream_writer = None
+        self._upstream_session = None
+        self._next_request_id = 1
+        self._pending = {} # id de pedido al pool -> Future (login) o (worker, id del minero, instante de envío)
+        self.job = None # Último trabajo del pool
+        self._job_ready = None # asyncio.Event, creado en el loop
+
+        self.workers = {} # índice -> StratumWorker
+        self.latencies = deque(maxlen=STRATUM_LATENCY_SAMPLES)
+        self.counters = {"jobs": 0, "submits": 0, "accepted": 0, "rejected": 0, "upstream_connects": 0,
+                         "local_rejects": 0}
+
+    # --- Ciclo de vida ---
+    def start(self):
+        """Arranca el loop, abre el puerto local y empieza a conectar con el pool."""
+        self.running = True
+        self._thread = threading.Thread(target=self.loop.run_forever, name="stratum-proxy", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self):
+        self._job_ready = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_worker, self.listen_host, self.listen_port,
+                                                  reuse_address=True, limit=STRATUM_LINE_LIMIT)
+        self._spawn(self._upstream_loop())
+        self.log(f"Proxy stratum escuchando en {self.listen_host}:{self.listen_port} "
+                 f"(pool {self.upstream_host}:{self.upstream_port}{' TLS' if self.upstream_tls else ''}).")
+
+    def _spawn(self, coro):
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def stop(self):
+        if self._thread is None or not self.loop.is_running():
+            return
+        self.running = False
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=5)
+        except (concurrent.futures.TimeoutError, RuntimeError):
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _shutdown(self):
+        if self._server is not None:
+            self._server.close()
+        for worker in list(self.workers.values()):
+            worker.writer.close()
+        if self._upstream_writer is not None:
+            self._upstream_writer.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # --- Conexión con el pool ---
+    async def _upstream_loop(self):
+        backoff = STRATUM_RECONNECT_INITIAL
+        while self.running:
+            try:
+                await self._upstream_session_run()
+                backoff = STRATUM_RECONNECT_INITIAL
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log(f"Proxy stratum: conexión con el pool perdida ({e}); reintento en {backoff}s.")
+            finally:
+                self._on_upstream_closed()
+            if self.running:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, STRATUM_RECONNECT_MAX)
+
+    async def _upstream_session_run(self):
+        ssl_context = ssl.create_default_context() if self.upstream_tls else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.upstream_host, self.upstream_port, ssl=ssl_context,
+                                    server_hostname=self.upstream_host if ssl_context else None,
+                                    limit=STRATUM_LINE_LIMIT),
+            timeout=STRATUM_LOGIN_TIMEOUT)
+        self._upstream_writer = writer
+        self.counters["upstream_connects"] += 1
+
+        login = self.loop.create_future()
+        self._send_upstream("login", {"login": self.wallet, "pass": self.password, "agent": STRATUM_AGENT,
+                                      "algo": ["rx/0"]}, login)
+        keepalive = self._spawn(self._upstream_keepalive())
+        reader_task = self._spawn(self._read_upstream(reader))
+        try:
+            done, _ = await asyncio.wait({login, reader_task}, timeout=STRATUM_LOGIN_TIMEOUT,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if login not in done:
+                if reader_task in done:
+                    reader_task.result() # Propaga el motivo del cierre
+                raise TimeoutError("el pool no respondió al login")
+            result = login.result()
+            self._upstream_session = result["id"]
+            self.log(f"Proxy stratum: sesión iniciada con el pool ({len(self.workers)} mineros locales).")
+            if result.get("job"):
+                self._set_job(result["job"])
+            await reader_task # Hasta que el pool cierre la conexión
+        finally:
+            keepalive.cancel()
+            reader_task.cancel()
+            writer.close()
+
+    async def _read_upstream(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("el pool cerró la conexión")
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            self._on_upstream_message(message)
+
+    async def _upstream_keepalive(self):
+        while True:
+            await asyncio.sleep(STRATUM_KEEPALIVE_INTERVAL)
+            if self._upstream_session:
+                self._send_upstream("keepalived", {"id": self._upstream_session})
+
+    def _send_upstream(self, method, params, pending=None):
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        self._pending[request_id] = pending
+        self._upstream_writer.write((json.dumps({"id": request_id, "jsonrpc": "2.0", "method": method,
+                                                 "params": params}) + "\n").encode())
+        return request_id
+
+    def _on_upstream_message(self, message):
+        if message.get("method") == "job":
+            self._set_job(message.get("params") or {})
+            return
+        if "id" not in message or message["id"] not in self._pending:
+            return
+        pending = self._pending.pop(message["id"])
+        if isinstance(pending, asyncio.Future):
+            if message.get("error"):
+                pending.set_exception(ConnectionError(f"login rechazado: {message['error']}"))
+            else:
+                pending.set_result(message.get("result") or {})
+        elif pending is not None:
+            self._on_submit_result(pending, message)
+
+    def _on_upstream_closed(self):
+        self._upstream_writer = None
+        self._upstream_session = None
+        if self._job_ready is not None:
+            self._job_ready.clear()
+        # Los shares sin respuesta se informan como rechazados a cada minero
+        for request_id, pending in list(self._pending.items()):
+            if isinstance(pending, tuple):
+                self._on_submit_result(pending, {"error": {"code": -1, "message": "Conexión con el pool perdida"}})
+            elif isinstance(pending, asyncio.Future) and not pending.done():
+                pending.set_exception(ConnectionError("conexión cerrada durante el login"))
+        self._pending.clear()
+
+    def _set_job(self, job):
+        self.job = job
+        self.counters["jobs"] += 1
+        self._job_ready.set()
+        # Una sola notificación del pool se reparte a todos los mineros locales
+        for worker in list(self.workers.values()):
+            self._send_worker(worker, {"jsonrpc": "2.0", "method": "job", "params": self._worker_job(worker)})
+
+    # --- Mineros locales ---
+    def _worker_job(self, worker):
+        job = dict(self.job)
+        job["blob"] = nicehash_blob(job["blob"], worker.index)
+        job["id"] = worker.session_id
+        return job
+
+    def _send_worker(self, worker, message):
+        try:
+            worker.writer.write((json.dumps(message) + "\n").encode())
+        except (ConnectionError, RuntimeError):
+            pass # La desconexión se maneja en _handle_worker
+
+    def _reply(self, worker, request_id, result=None, error=None):
+        self._send_worker(worker, {"id": request_id, "jsonrpc": "2.0", "error": error, "result": result})
+
+    def _free_index(self):
+        for index in range(STRATUM_MAX_WORKERS):
+            if index not in self.workers:
+                return index
+        return None
+
+    async def _handle_worker(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        index = self._free_index()
+        if index is None:
+            self.log(f"Proxy stratum: rechazado {peer}, sin rangos de nonce libres.")
+            writer.close()
+            return
+        worker = StratumWorker(index, writer, peer)
+        self.workers[index] = worker
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                await self._on_worker_message(worker, message)
+        except (ConnectionError, ValueError): # ValueError: línea más larga que el límite
+            pass
+        finally:
+            self.workers.pop(index, None)
+            writer.close()
+            self.log(f"Proxy stratum: minero #{index} desconectado ({worker.accepted} shares aceptados).")
+
+    async def _on_worker_message(self, worker, message):
+        method = message.get("method")
+        request_id = message.get("id")
+        params = message.get("params") or {}
+        if method == "login":
+            worker.rig_id = params.get("rigid") or params.get("agent")
+            try:
+                await asyncio.wait_for(self._job_ready.wait(), timeout=STRATUM_LOGIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._reply(worker, request_id, error={"code": -1, "message": "Sin trabajo del pool"})
+                return
+            # La extensión 'nicehash' hace que XMRig no toque el byte del nonce fijado por el proxy
+            self._reply(worker, request_id, result={"id": worker.session_id, "job": self._worker_job(worker),
+                                                    "extensions": ["nicehash", "keepalive"], "status": "OK"})
+            self.log(f"Proxy stratum: minero #{worker.index} conectado desde {worker.peer} ({worker.rig_id}).")
+        elif method == "submit":
+            self._forward_submit(worker, request_id, params)
+        elif method == "keepalived":
+            self._reply(worker, request_id, result={"status": "KEEPALIVED"})
+        else:
+            self._reply(worker, request_id, error={"code": -1, "message": f"Método no soportado: {method}"})
+
+    def _forward_submit(self, worker, request_id, params):
+        self.counters["submits"] += 1
+        nonce = str(params.get("nonce", ""))
+        if len(nonce) != 8 or not all(c in "0123456789abcdefABCDEF" for c in nonce):
+            self.counters["local_rejects"] += 1
+            worker.rejected += 1
+            self._reply(worker, request_id, error={"code": -1, "message": "Nonce inválido"})
+            return
+        if int(nonce[6:8], 16) != worker.index:
+            # Un nonce fuera del rango asignado podría duplicar el share de otra instancia
+            self.counters["local_rejects"] += 1
+            worker.rejected += 1
+            self._reply(worker, request_id, error={"code": -1, "message": "Nonce fuera del rango asignado"})
+            return
+        if self._upstream_writer is None or not self._upstream_session:
+            self.counters["local_rejects"] += 1
+            worker.rejected += 1
+            self._reply(worker, request_id, error={"code": -1, "message": "Pool no disponible"})
+            return
+        upstream_params = dict(params)
+        upstream_params["id"] = self._upstream_session
+        self._send_upstream("submit", upstream_params, (worker, request_id, time.perf_counter()))
+
+    def _on_submit_result(self, pending, message):
+        worker, request_id, sent_at = pending
+        if message.get("error"):
+            self.counters["rejected"] += 1
+            worker.rejected += 1
+        else:
+            self.latencies.append(time.perf_counter() - sent_at)
+            self.counters["accepted"] += 1
+            worker.accepted += 1
+        if worker.index in self.workers:
+            self._reply(worker, request_id, result=message.get("result"), error=message.get("error"))
+
+    # --- Estadísticas ---
+    def stats(self):
+        """Resumen del proxy (se calcula en el hilo del loop para leer un estado consistente)."""
+        if self._thread is None or not self.loop.is_running():
+            return {"running": False}
+        return asyncio.run_coroutine_threadsafe(self._stats(), self.loop).result(timeout=5)
+
+    async def _stats(self):
+        latencies = sorted(self.latencies)
+        summary = {
+            "running": self.running,
+            "listen": f"{self.listen_host}:{self.listen_port}",
+            "upstream": f"{self.upstream_host}:{self.upstream_port}",
+            "upstream_connected": bool(self._upstream_session),
+            "workers": {f"#{worker.index}": {"rig_id": worker.rig_id, "accepted": worker.accepted,
+                                       "rejected": worker.rejected} for worker in self.workers.values()},
+            "pending_submits": sum(1 for pending in self._pending.values() if isinstance(pending, tuple)),
+            **self.counters,
+        }
+        if latencies:
+            summary["share_rtt_ms"] = {
+                "samples": len(latencies),
+                "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+                "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            }
+        return summary
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# tests/test_cluster_query.py
+#
+# P2P Miner GUI - Pruebas del resumen de consultas al cluster.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Arma el resumen de una consulta de pool info con respuestas de peers que
+# informan el puerto como número, como texto, con un valor inválido o sin él. El resumen
+# debe normalizar el puerto a int (o None) y el texto del log debe poder ordenarlo.
+#
+# Uso: python -m pytest tests/test_cluster_query.py
+#
+
+import os
+import sys
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from cluster_query import (CLUSTER_QUERY_POOL_INFO, ClusterQueryTracker, format_cluster_summary, # noqa: E402
+                           summarize_pool_info)
+
+
+class ClusterSummaryTest(unittest.TestCase):
+    def test_peer_ports_are_normalized(self):
+        peers = {"a": ("10.0.0.1", 5001), "b": ("10.0.0.2", 5002), "c": ("10.0.0.3", 5003),
+                 "d": ("10.0.0.4", 5004), "e": ("10.0.0.5", 5005)}
+        ports = {"a": 5001, "b": "5002", "c": "puerto", "d": None, "e": True}
+        tracker = ClusterQueryTracker()
+        query = tracker.start(CLUSTER_QUERY_POOL_INFO, peers)
+        for node_id, port in ports.items():
+            data = {"node_port": port, "hashrate": "100 H/s", "xmrig_stats": {"hashrate_10s": 100.0}}
+            tracker.add_response(query.query_id, node_id, data)
+        self.assertTrue(query.complete)
+
+        summary = summarize_pool_info(query, "local", {"node_port": 5000})
+        by_id = {node["node_id"]: node["node_port"] for node in summary["nodes"]}
+        self.assertEqual(by_id, {"local": 5000, "a": 5001, "b": 5002, "c": None, "d": None, "e": None})
+
+        text = format_cluster_summary(summary)
+        self.assertIn("Nodo 5002 [mining]", text)
+        self.assertLess(text.index("Nodo 5000 [local]"), text.index("Nodo 5001"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# tests/test_codec.py
+#
+# P2P Miner GUI - Pruebas de la codificación de mensajes P2P.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Comprueba que el formato binario (bin1) y JSON producen el mismo mensaje
+# para cada MSG_TYPE_* y para datos anidados, que se usa JSON con los peers que no anuncian
+# bin1 y que los payloads truncados o basura se rechazan con ValueError.
+#
+# Uso: python -m pytest tests/test_codec.py
+#
+
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from p2p_miner_node import (BINARY_MAGIC, CODEC_BINARY, CODEC_JSON, FRAME_HEADER, MSG_TYPE_CODES,
+                            SUPPORTED_CODECS, MessageCodec, P2PNode, negotiate_codec)
+
+NESTED = {
+    "index": 3300000,
+    "hash": "ab" * 32,
+    "txs": [{"from": "ñandú", "amount": 1.5, "fee": -7, "memo": None, "ok": True},
+            {"from": "x" * 300, "amount": 0.0, "tags": [], "ok": False}],
+    "limits": [0, 127, 128, 255, 256, 65535, 65536, 2 ** 32 - 1, 2 ** 32, 2 ** 64 - 1,
+               -1, -32, -33, -128, -129, -32768, -32769, -2 ** 31, -2 ** 31 - 1, -2 ** 63],
+    "wide": {f"k{i}": list(range(i)) for i in range(20)},
+    "long_text": "é" * 70000,
+}
+
+
+class CodecRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.codec = MessageCodec()
+
+    def round_trip(self, msg_type, data, msg_id=None, codec=CODEC_BINARY):
+        frame = self.codec.encode(msg_type, data, msg_id, codec)
+        (length,) = FRAME_HEADER.unpack_from(frame)
+        self.assertEqual(length, len(frame) - FRAME_HEADER.size)
+        return frame[FRAME_HEADER.size:], self.codec.decode(frame[FRAME_HEADER.size:])
+
+    def test_every_message_type(self):
+        data = {"port": 5000, "codecs": SUPPORTED_CODECS, "node_id": "0123456789abcdef"}
+        for msg_type in MSG_TYPE_CODES:
+            for codec in (CODEC_BINARY, CODEC_JSON):
+                with self.subTest(msg_type=msg_type, codec=codec):
+                    payload, message = self.round_trip(msg_type, data, codec=codec)
+                    self.assertEqual(payload[0] == BINARY_MAGIC, codec == CODEC_BINARY)
+                    self.assertEqual(message, {"type": msg_type, "data": data})
+
+    def test_unknown_type_and_gossip_id(self):
+        _, message = self.round_trip("future_type", [1, 2], msg_id="5000-abc")
+        self.assertEqual(message, {"type": "future_type", "data": [1, 2], "id": "5000-abc"})
+
+    def test_nested_payload_matches_json(self):
+        _, binary = self.round_trip("block", NESTED, "id-1", CODEC_BINARY)
+        _, text = self.round_trip("block", NESTED, "id-1", CODEC_JSON)
+        self.assertEqual(binary, text)
+        self.assertEqual(binary["data"], NESTED)
+
+    def test_non_string_keys_become_text(self):
+        _, message = self.round_trip("block", {1: "a", "b": {2: 3}})
+        self.assertEqual(message["data"], {"1": "a", "b": {"2": 3}}) # Igual que json.dumps
+
+    def test_large_int_falls_back_to_json(self):
+        data = {"difficulty": 2 ** 70, "neg": -2 ** 65}
+        payload, message = self.round_trip("block", data, codec=CODEC_BINARY)
+        self.assertEqual(payload[:1], b"{")
+        self.assertEqual(message["data"], data)
+
+    def test_bytes_rejected(self):
+        # Los datos deben ser compatibles con JSON en ambos formatos
+        for codec in (CODEC_BINARY, CODEC_JSON):
+            with self.subTest(codec=codec), self.assertRaises(TypeError):
+                self.codec.encode("block", {"raw": b"\x00\x01"}, codec=codec)
+
+
+class CodecNegotiationTest(unittest.TestCase):
+    def test_negotiate(self):
+        self.assertEqual(negotiate_codec([CODEC_JSON, CODEC_BINARY]), CODEC_BINARY)
+        self.assertEqual(negotiate_codec([CODEC_JSON]), CODEC_JSON)
+        self.assertEqual(negotiate_codec(None), CODEC_JSON) # Peer antiguo: no anuncia codecs
+        self.assertEqual(negotiate_codec(["bin9"]), CODEC_JSON)
+        self.assertEqual(negotiate_codec([CODEC_BINARY], [CODEC_JSON]), CODEC_JSON)
+
+    def test_fan_out_uses_each_peer_codec(self):
+        with mock.patch("sys.stdout"):
+            node = P2PNode(0, "wallet", autostart_xmrig=False, xmrig_api_port=0)
+        modern, legacy = ("127.0.0.1", 4001), ("127.0.0.1", 4002)
+        node.peer_codecs[modern] = negotiate_codec(SUPPORTED_CODECS)
+        node.peer_codecs[legacy] = negotiate_codec(None)
+        sent = {}
+        node._enqueue_message = lambda peer_tuple, message: sent.setdefault(peer_tuple, message)
+        node._fan_out([modern, legacy, ("127.0.0.1", 4003)], "transaction", {"amount": 1}, "m-1")
+        self.assertEqual(sent[modern][FRAME_HEADER.size], BINARY_MAGIC)
+        self.assertEqual(sent[legacy][FRAME_HEADER.size:FRAME_HEADER.size + 1], b"{")
+        self.assertEqual(sent[("127.0.0.1", 4003)], sent[legacy]) # Sin handshake: JSON
+        decoded = {node.codec.decode(frame[FRAME_HEADER.size:])["data"]["amount"] for frame in sent.values()}
+        self.assertEqual(decoded, {1})
+
+
+class CodecRejectionTest(unittest.TestCase):
+    def setUp(self):
+        self.codec = MessageCodec()
+        frame = self.codec.encode("block", NESTED, "id-1", CODEC_BINARY)
+        self.payload = frame[FRAME_HEADER.size:]
+
+    def test_truncated_binary(self):
+        for size in (1, 2, 5, 100, len(self.payload) // 2, len(self.payload) - 1):
+            with self.subTest(size=size), self.assertRaises(ValueError):
+                self.codec.decode(self.payload[:size])
+
+    def test_trailing_bytes(self):
+        with self.assertRaises(ValueError):
+            self.codec.decode(self.payload + b"\x00")
+
+    def test_garbage(self):
+        garbage = [
+            bytes([BINARY_MAGIC, 0xC1]), # Byte de tipo no usado por msgpack
+            bytes([BINARY_MAGIC, 0x92, 0x01]), # Lista de 2 con un solo elemento
+            bytes([BINARY_MAGIC, 0x05]), # No es una lista [tipo, datos]
+            bytes([BINARY_MAGIC, 0x92, 0x01, 0x81, 0x91, 0x01, 0x02]), # Clave no hashable
+            bytes([BINARY_MAGIC, 0x92, 0x01, 0xA2, 0xFF, 0xFE]), # UTF-8 inválido
+            b"{\"type\": \"block\"", b"\xff\xfe", b"[1, 2]", b"42", b"",
+        ]
+        for payload in garbage:
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                self.codec.decode(payload)
+
+    def test_json_envelope(self):
+        message = self.codec.decode(json.dumps({"type": "block", "data": {"index": 1}}).encode())
+        self.assertEqual(message, {"type": "block", "data": {"index": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# tests/test_framing.py
+#
+# P2P Miner GUI - Pruebas del entramado con prefijo de longitud.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Alimenta FrameDecoder con tramas agrupadas en una lectura, una trama
+# partida byte a byte, una trama del tamaño máximo exacto y cabeceras que anuncian más
+# que el máximo, que deben rechazarse antes de recibir el payload.
+#
+# Uso: python -m pytest tests/test_framing.py
+#
+
+import os
+import sys
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from p2p_miner_node import FRAME_HEADER, FrameDecoder, FrameTooLargeError, MessageCodec
+
+
+def frame(payload):
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class FrameDecoderTest(unittest.TestCase):
+    def test_coalesced_frames(self):
+        payloads = [b'{"a": 1}', b"", b"x" * 1000, b'{"b": 2}']
+        decoder = FrameDecoder()
+        data = b"".join(frame(payload) for payload in payloads)
+        self.assertEqual(decoder.feed(data), payloads)
+        self.assertEqual(decoder.pending_bytes(), 0)
+
+    def test_coalesced_with_partial_tail(self):
+        decoder = FrameDecoder()
+        second = frame(b"segunda")
+        self.assertEqual(decoder.feed(frame(b"primera") + second[:6]), [b"primera"])
+        self.assertEqual(decoder.pending_bytes(), 6) # Solo queda la trama incompleta
+        self.assertEqual(decoder.feed(second[6:]), [b"segunda"])
+        self.assertEqual(decoder.pending_bytes(), 0)
+
+    def test_split_byte_by_byte(self):
+        payloads = [b'{"type": "block", "data": {"index": 1}}', b"z" * 300]
+        data = b"".join(frame(payload) for payload in payloads)
+        decoder = FrameDecoder()
+        received = []
+        for i in range(len(data)):
+            frames = decoder.feed(data[i:i + 1])
+            received.extend(frames)
+            # Una trama sale justo con su último byte, nunca antes
+            if frames:
+                self.assertIn(i + 1, (len(frame(payloads[0])), len(data)))
+        self.assertEqual(received, payloads)
+        self.assertEqual(decoder.pending_bytes(), 0)
+
+    def test_exactly_max_size(self):
+        decoder = FrameDecoder(max_frame_size=64 * 1024)
+        payload = bytes(range(256)) * 256
+        self.assertEqual(len(payload), 64 * 1024)
+        self.assertEqual(decoder.feed(frame(payload)), [payload])
+
+    def test_oversize_header_rejected(self):
+        decoder = FrameDecoder(max_frame_size=1024)
+        with self.assertRaises(FrameTooLargeError):
+            decoder.feed(FRAME_HEADER.pack(1025)) # Sin esperar al payload
+        # Una cabecera enorme partida en dos lecturas también se rechaza al completarse
+        decoder = FrameDecoder(max_frame_size=1024)
+        header = FRAME_HEADER.pack(0xFFFFFFFF)
+        self.assertEqual(decoder.feed(header[:2]), [])
+        with self.assertRaises(FrameTooLargeError):
+            decoder.feed(header[2:])
+
+    def test_oversize_after_valid_frames(self):
+        decoder = FrameDecoder(max_frame_size=16)
+        with self.assertRaises(FrameTooLargeError):
+            decoder.feed(frame(b"ok") + FRAME_HEADER.pack(17) + b"x" * 17)
+
+
+class FrameEncoderTest(unittest.TestCase):
+    def test_encode_respects_max_size(self):
+        codec = MessageCodec(max_frame_size=64)
+        encoded = codec.encode("transaction", "x" * 20)
+        self.assertEqual(FrameDecoder(64).feed(encoded), [encoded[FRAME_HEADER.size:]])
+        with self.assertRaises(FrameTooLargeError):
+            codec.encode("transaction", "x" * 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# tests/test_gossip.py
+#
+# P2P Miner GUI - Pruebas de la deduplicación del gossip.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Comprueba la caché de IDs vistos (duplicados, desalojo LRU y vencimiento por
+# TTL), que una transacción se retransmite a todos los peers menos al que la envió, que el
+# eco se descarta contabilizando el tráfico ahorrado y que los contadores no pierden
+# incrementos con varios hilos lectores.
+#
+# Uso: python -m pytest tests/test_gossip.py
+#
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from p2p_miner_node import MSG_TYPE_BLOCK, MSG_TYPE_TRANSACTION, P2PNode, SeenMessageCache
+
+
+class SeenMessageCacheTest(unittest.TestCase):
+    def test_duplicate_returns_false(self):
+        cache = SeenMessageCache()
+        self.assertTrue(cache.add("a"))
+        self.assertFalse(cache.add("a"))
+        self.assertTrue(cache.add("b"))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.first_seen("a"))
+        self.assertIsNone(cache.first_seen("c"))
+
+    def test_lru_eviction(self):
+        cache = SeenMessageCache(max_entries=3, ttl=60)
+        for msg_id in "abc":
+            cache.add(msg_id)
+        self.assertFalse(cache.add("a")) # Un duplicado cuenta como uso reciente
+        cache.add("d") # Desaloja a "b", el menos usado
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.first_seen("b"))
+        self.assertFalse(cache.add("a"))
+        self.assertTrue(cache.add("b"))
+
+    def test_ttl_expiry(self):
+        cache = SeenMessageCache(ttl=0.05)
+        cache.add("a")
+        cache.add("b")
+        time.sleep(0.1)
+        self.assertTrue(cache.add("a")) # Vencido: vuelve a ser nuevo
+        self.assertEqual(cache.purge_expired(), 1) # Solo queda vencido "b"
+        self.assertEqual(len(cache), 1)
+
+
+class FakeConnection:
+    """Conexión entrante ya identificada por el handshake del peer `peer_tuple`."""
+    def __init__(self, peer_id, peer_tuple):
+        self.peer_id = peer_id
+        self.peer_tuple = peer_tuple
+
+    def getpeername(self):
+        return (self.peer_tuple[0], 50000) # Puerto efímero, no el de escucha
+
+
+class GossipRelayTest(unittest.TestCase):
+    def setUp(self):
+        stdout = mock.patch("sys.stdout")
+        stdout.start()
+        self.addCleanup(stdout.stop)
+        self.node = P2PNode(0, "wallet", autostart_xmrig=False, xmrig_api_port=0)
+        self.peers = [("127.0.0.1", 4001), ("127.0.0.1", 4002), ("127.0.0.1", 4003)]
+        for i, address in enumerate(self.peers):
+            self.node.peer_table.upsert(f"node-{i}", address, direct=True)
+        self.sent = []
+        self.node._enqueue_message = lambda peer_tuple, message: self.sent.append(peer_tuple)
+
+    def receive(self, sender, msg_type, msg_id, data, wire_size=100):
+        connection = FakeConnection(f"node-{self.peers.index(sender)}", sender)
+        self.node._process_received_message(connection, {"type": msg_type, "id": msg_id, "data": data}, wire_size)
+
+    def test_relay_excludes_sender(self):
+        self.receive(self.peers[0], MSG_TYPE_TRANSACTION, "tx-1", {"amount": 1})
+        self.assertCountEqual(self.sent, self.peers[1:])
+        self.sent.clear()
+        self.receive(self.peers[2], MSG_TYPE_BLOCK, "block-1", {"index": 7})
+        self.assertCountEqual(self.sent, self.peers[:2])
+
+    def test_echo_suppressed(self):
+        self.receive(self.peers[0], MSG_TYPE_TRANSACTION, "tx-1", {"amount": 1})
+        self.sent.clear()
+        # El mismo mensaje vuelve por los otros dos peers: no se retransmite
+        self.receive(self.peers[1], MSG_TYPE_TRANSACTION, "tx-1", {"amount": 1}, wire_size=120)
+        self.receive(self.peers[2], MSG_TYPE_TRANSACTION, "tx-1", {"amount": 1}, wire_size=120)
+        self.assertEqual(self.sent, [])
+        stats = self.node.gossip_stats
+        self.assertEqual((stats["relayed"], stats["duplicates_suppressed"]), (1, 2))
+        self.assertEqual(stats["bytes_suppressed"], 2 * 120 * (len(self.peers) - 1))
+
+    def test_own_messages_not_relayed_back(self):
+        msg_id = self.node.publish_gossip(MSG_TYPE_TRANSACTION, {"amount": 2})
+        self.assertCountEqual(self.sent, self.peers)
+        self.sent.clear()
+        self.receive(self.peers[1], MSG_TYPE_TRANSACTION, msg_id, {"amount": 2})
+        self.assertEqual(self.sent, [])
+
+    def test_counters_from_many_threads(self):
+        # Con el motor de hilos cada conexión cuenta desde su propio hilo lector
+        per_thread, threads = 2000, 8
+        barrier = threading.Barrier(threads)
+
+        def reader():
+            barrier.wait()
+            for _ in range(per_thread):
+                self.node._is_duplicate_gossip("tx-shared", 10)
+
+        workers = [threading.Thread(target=reader) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stats = self.node.gossip_stats
+        self.assertEqual(stats["relayed"], 1)
+        self.assertEqual(stats["duplicates_suppressed"], per_thread * threads - 1)
+        self.assertEqual(stats["bytes_suppressed"], (per_thread * threads - 1) * 10 * (len(self.peers) - 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
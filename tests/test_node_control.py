@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# tests/test_node_control.py
+#
+# P2P Miner GUI - Pruebas del cliente del canal de control.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Levanta un nodo de control simulado (asyncio, 127.0.0.1) que responde al
+# hello y después manda líneas JSON que no son objetos y un evento cuyo callback falla.
+# El cliente debe ignorar unas, registrar el error del otro y seguir conectado, recibiendo
+# eventos y respondiendo solicitudes sin reconectarse.
+#
+# Uso: python -m pytest tests/test_node_control.py
+#
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from node_control import NodeControlClient, encode_line # noqa: E402
+
+TIMEOUT = 5
+
+
+class FakeNode:
+    """Canal de control mínimo: responde cada solicitud y antes del primer resultado envía `preamble`."""
+    def __init__(self, preamble):
+        self.preamble = preamble
+        self.connections = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message["cmd"] == "hello":
+                    writer.write(encode_line({"id": message["id"], "type": "result", "result": {"port": 1}}))
+                    for raw in self.preamble:
+                        writer.write(raw)
+                else:
+                    writer.write(encode_line({"id": message["id"], "type": "result", "result": message["cmd"]}))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class NodeControlClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_bad_lines_and_failing_callback_keep_connection(self):
+        events = []
+        received = asyncio.Event()
+
+        def on_event(event, data):
+            events.append(event)
+            if event == "falla":
+                raise RuntimeError("callback roto")
+            if event == "ok":
+                received.set()
+
+        node = FakeNode([b"[1, 2]\n", b"\"texto\"\n", b"null\n",
+                         encode_line({"type": "event", "event": "falla", "data": {}}),
+                         encode_line({"type": "event", "event": "ok", "data": {}})])
+        await node.start()
+        self.addAsyncCleanup(node.stop)
+        client = NodeControlClient(asyncio.get_running_loop(), node.port, host="127.0.0.1", on_event=on_event)
+        with mock.patch("sys.stdout"):
+            try:
+                await asyncio.wait_for(received.wait(), TIMEOUT)
+                result = await asyncio.wait_for(asyncio.wrap_future(client.request("status")), TIMEOUT)
+            finally:
+                client.close()
+                await asyncio.sleep(0)
+        self.assertEqual(events, ["falla", "ok"])
+        self.assertEqual(result, "status")
+        self.assertEqual(node.connections, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
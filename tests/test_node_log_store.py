@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# tests/test_node_log_store.py
+#
+# P2P Miner GUI - Pruebas de lectura concurrente del log persistente.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Escribe un log con segmentos chicos para que roten, se compriman y la
+# retención los borre. Un mismo NodeLogReader se comparte entre hilos (como hace la GUI con
+# su pool de lectura): dos lecturas que descartan a la vez el índice de un segmento borrado
+# no deben fallar, y tras la retención el reader no guarda índices de segmentos inexistentes.
+#
+# Uso: python -m pytest tests/test_node_log_store.py
+#
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from node_log_store import NodeLogReader, NodeLogStore # noqa: E402
+
+
+class InterleavingIndexes(dict):
+    """Al recorrerse por primera vez corre `hook` en otro hilo, como un lector concurrente."""
+    def __init__(self, *args, hook=None):
+        super().__init__(*args)
+        self.hook = hook
+        self.thread = None
+
+    def __iter__(self):
+        keys = list(super().__iter__())
+        hook, self.hook = self.hook, None
+        if hook is not None: # Después de tomar las claves y antes de que se usen
+            self.thread = threading.Thread(target=hook)
+            self.thread.start()
+            self.thread.join(timeout=0.5) # Con el lock, el otro hilo espera a que este termine
+        return iter(keys)
+
+
+class NodeLogReaderConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = NodeLogStore(self.tmp.name, block_size=512, segment_size=2048, max_bytes=4096)
+        self.addCleanup(self.store.close)
+        self.reader = NodeLogReader(self.tmp.name)
+
+    def write(self, start, count):
+        for i in range(start, start + count):
+            self.store.append("stdout", f"share aceptado {i}")
+        self.store.close() # Espera las compresiones y la retención
+        self.store = NodeLogStore(self.tmp.name, block_size=512, segment_size=2048, max_bytes=4096)
+
+    def test_concurrent_reads_drop_deleted_segments_once(self):
+        self.write(0, 300)
+        self.reader.tail(20)
+        self.assertTrue(self.reader._indexes)
+        self.write(300, 600) # La retención borra los segmentos ya indexados
+
+        errors = []
+
+        def read():
+            try:
+                self.reader.tail(20)
+            except Exception as e:
+                errors.append(e)
+
+        indexes = InterleavingIndexes(self.reader._indexes, hook=read)
+        self.reader._indexes = indexes
+        read()
+        indexes.thread.join(timeout=10)
+        self.assertEqual(errors, [])
+        for path in self.reader._indexes:
+            self.assertTrue(os.path.exists(path))
+        records, _, _ = self.reader.tail(1)
+        self.assertEqual(records[-1][3], "share aceptado 899")
+
+    def test_shared_reader_while_writing(self):
+        errors = []
+        done = threading.Event()
+
+        def read_loop():
+            while not done.is_set():
+                try:
+                    self.reader.tail(20)
+                    self.reader.search("share", limit=10)
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        readers = [threading.Thread(target=read_loop) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        try:
+            for i in range(3000):
+                self.store.append("stdout", f"share aceptado {i}")
+        finally:
+            done.set()
+            for thread in readers:
+                thread.join(timeout=10)
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# tests/test_peer_table.py
+#
+# P2P Miner GUI - Pruebas de la tabla de peers acotada y de la sincronización por deltas.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Comprueba el desalojo del peor peer desconectado cuando la tabla está llena,
+# que el delta desde la versión N trae solo los cambios posteriores y que, si el registro
+# de cambios ya no cubre la versión pedida, se envía la tabla completa.
+#
+# Uso: python -m pytest tests/test_peer_table.py
+#
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from p2p_miner_node import P2PNode, PeerTable
+
+
+def address(i):
+    return ("10.0.0.1", 5000 + i)
+
+
+class PeerTableEvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.table = PeerTable("own", max_entries=3)
+
+    def add_disconnected(self, i, failures=0, last_seen=0.0):
+        info, added = self.table.upsert(f"n{i}", address(i), direct=True)
+        self.assertTrue(added)
+        self.table.release(f"n{i}")
+        info.failures = failures
+        info.last_seen = last_seen
+        return info
+
+    def test_evicts_most_failures_first(self):
+        self.add_disconnected(1, failures=0, last_seen=1.0)
+        self.add_disconnected(2, failures=2, last_seen=50.0)
+        self.add_disconnected(3, failures=1, last_seen=2.0)
+        info, added = self.table.upsert("n4", address(4), direct=True)
+        self.assertTrue(added)
+        self.assertEqual(len(self.table), 3)
+        self.assertIsNone(self.table.get(address(2)))
+        self.assertIsNotNone(self.table.get(address(1)))
+
+    def test_evicts_oldest_among_equal_failures(self):
+        self.add_disconnected(1, last_seen=30.0)
+        self.add_disconnected(2, last_seen=10.0)
+        self.add_disconnected(3, last_seen=20.0)
+        self.table.upsert("n4", address(4), direct=True)
+        self.assertIsNone(self.table.get(address(2)))
+        self.assertEqual(len(self.table), 3)
+
+    def test_connected_peers_never_evicted(self):
+        for i in range(3):
+            self.table.upsert(f"n{i}", address(i), direct=True)
+        # Un peer aprendido de un PEER_LIST no entra; uno conectado sí, superando el máximo
+        self.assertEqual(self.table.upsert("n9", address(9)), (None, False))
+        info, added = self.table.upsert("n4", address(4), direct=True)
+        self.assertTrue(added)
+        self.assertEqual(len(self.table), 4)
+        self.assertTrue(all(self.table.get(address(i)) for i in range(3)))
+
+    def test_learned_peer_only_evicts_failing(self):
+        self.add_disconnected(1)
+        self.add_disconnected(2)
+        self.add_disconnected(3)
+        self.assertEqual(self.table.upsert("n9", address(9)), (None, False)) # La tabla no rota
+        self.table.record_failure(address(3))
+        info, added = self.table.upsert("n9", address(9))
+        self.assertTrue(added)
+        self.assertIsNone(self.table.get(address(3)))
+
+
+class PeerTableDeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.table = PeerTable("own", log_size=4)
+
+    def test_delta_contains_only_newer_entries(self):
+        for i in range(3):
+            self.table.upsert(f"n{i}", address(i))
+        since = self.table.version
+        self.table.upsert("n3", address(3))
+        self.table.remove("n0")
+        delta = self.table.delta(since)
+        self.assertFalse(delta["full"])
+        self.assertEqual(delta["version"], since + 2)
+        self.assertEqual(delta["added"], [["n3", "10.0.0.1", 5003]])
+        self.assertEqual(delta["removed"], ["n0"])
+
+    def test_delta_up_to_date(self):
+        self.table.upsert("n1", address(1))
+        delta = self.table.delta(self.table.version)
+        self.assertEqual((delta["full"], delta["added"], delta["removed"]), (False, [], []))
+
+    def test_full_sync_on_version_gap(self):
+        for i in range(3):
+            self.table.upsert(f"n{i}", address(i))
+        since = self.table.version
+        for i in range(3, 9): # Más cambios de los que guarda el registro
+            self.table.upsert(f"n{i}", address(i))
+        delta = self.table.delta(since)
+        self.assertTrue(delta["full"])
+        self.assertEqual(len(delta["added"]), 9)
+        self.assertEqual(delta["removed"], [])
+
+    def test_full_sync_on_first_request_or_restart(self):
+        self.table.upsert("n1", address(1))
+        self.assertTrue(self.table.delta(0)["full"])
+        # Versión mayor que la nuestra: el peer nos vio antes de que nos reiniciáramos
+        self.assertTrue(self.table.delta(self.table.version + 10)["full"])
+
+
+class FakeConnection:
+    def __init__(self, peer_tuple):
+        self.peer_tuple = peer_tuple
+        self.sync_sent_at = None
+
+    def getpeername(self):
+        return self.peer_tuple
+
+
+class PeerSyncTest(unittest.TestCase):
+    """Un nodo aplica los deltas de la tabla de otro y solo pide lo que cambió desde su última versión."""
+    def test_incremental_sync(self):
+        with mock.patch("sys.stdout"):
+            node = P2PNode(0, "wallet", autostart_xmrig=False, xmrig_api_port=0)
+            source = PeerTable("source", log_size=4)
+            source_address = ("10.0.0.2", 6000)
+            node.peer_table.upsert("source", source_address, direct=True, delta_sync=True)
+            connection = FakeConnection(source_address)
+
+            def sync():
+                delta = source.delta(node.peer_table.sync_since(source_address))
+                node._apply_peer_delta(connection, delta)
+                return delta
+
+            for i in range(3):
+                source.upsert(f"n{i}", address(i))
+            self.assertTrue(sync()["full"])
+            self.assertEqual(node.peer_table.sync_since(source_address), source.version)
+
+            source.upsert("n3", address(3))
+            source.remove("n1")
+            delta = sync()
+            self.assertFalse(delta["full"])
+            self.assertEqual(len(delta["added"]) + len(delta["removed"]), 2)
+            self.assertIsNone(node.peer_table.get(address(1)))
+            self.assertIsNotNone(node.peer_table.get(address(3)))
+
+            for i in range(4, 10): # El registro de la fuente ya no cubre nuestra versión
+                source.upsert(f"n{i}", address(i))
+            self.assertTrue(sync()["full"])
+            self.assertTrue(all(node.peer_table.get(address(i)) for i in (0, 2, 3, 4, 9)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# tests/test_pool_stats.py
+#
+# P2P Miner GUI - Pruebas del cliente de estadísticas del pool.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Usa un servidor HTTP local en lugar de la API del pool para comprobar el
+# caché con TTL, la consulta compartida entre pedidos simultáneos, el backoff tras errores,
+# el respeto de Retry-After en HTTP 429 y que durante la espera se devuelven los datos
+# viejos con el error en "error".
+#
+# Uso: python -m pytest tests/test_pool_stats.py
+#
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from p2p_gui_controller import PoolStatsClient, PoolStatsError
+
+WALLET = "4AdUndXHHZ6cfufTMvppY6JwXNouMBzSkbLYfpAV5Usx3skxNgYeYTRj5UzqtReoS44qo9mtmXCqY45DJ852K5Jv2684Rge"
+STATS = {"hash": 1520, "validShares": 41, "invalidShares": 2}
+
+
+class FakePoolApi(ThreadingHTTPServer):
+    """API del pool simulada. `status`/`retry_after` fijan la respuesta; `release` retiene las consultas."""
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakePoolApiHandler)
+        self.status = 200
+        self.retry_after = None
+        self.release = threading.Event()
+        self.release.set()
+        self.paths = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url_template(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/miner/{{wallet}}/stats"
+
+    def close(self):
+        self.release.set()
+        self.shutdown()
+        self.server_close()
+
+
+class FakePoolApiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.server.release.wait(5)
+        data = json.dumps(STATS if self.server.status == 200 else {"error": "busy"}).encode("utf-8")
+        self.send_response(self.server.status)
+        if self.server.retry_after is not None:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PoolStatsClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakePoolApi()
+        self.addCleanup(self.server.close)
+
+    def client(self, **kwargs):
+        client = PoolStatsClient(self.server.url_template, timeout=5, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_ttl_cache(self):
+        client = self.client(ttl=60)
+        first = client.get(WALLET).result(timeout=5)
+        self.assertEqual(first["stats"], STATS)
+        self.assertFalse(first["cached"])
+        self.assertEqual(self.server.paths, [f"/miner/{WALLET}/stats"])
+
+        second = client.get(WALLET).result(timeout=5)
+        self.assertTrue(second["cached"])
+        self.assertEqual((second["stats"], second["fetched_at"]), (STATS, first["fetched_at"]))
+        self.assertEqual(len(self.server.paths), 1) # Dentro del TTL no se consulta
+
+        self.assertFalse(client.get(WALLET, force=True).result(timeout=5)["cached"])
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_ttl_expired(self):
+        client = self.client(ttl=0.1)
+        client.get(WALLET).result(timeout=5)
+        time.sleep(0.15)
+        self.assertFalse(client.get(WALLET).result(timeout=5)["cached"])
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_shared_inflight_request(self):
+        client = self.client(ttl=60)
+        self.server.release.clear()
+        futures = [client.get(WALLET) for _ in range(5)]
+        self.assertTrue(all(future is futures[0] for future in futures))
+        self.server.release.set()
+        self.assertEqual(futures[0].result(timeout=5)["stats"], STATS)
+        self.assertEqual(len(self.server.paths), 1)
+
+    def test_backoff_after_errors(self):
+        client = self.client(ttl=60, backoff_initial=0.3, backoff_max=10)
+        self.server.status = 500
+        with self.assertRaises(PoolStatsError):
+            client.get(WALLET).result(timeout=5)
+        with self.assertRaisesRegex(PoolStatsError, "en espera tras 1 errores"):
+            client.get(WALLET).result(timeout=5)
+        self.assertEqual(len(self.server.paths), 1) # Durante el backoff no se consulta
+
+        time.sleep(0.35)
+        with self.assertRaises(PoolStatsError):
+            client.get(WALLET).result(timeout=5)
+        self.assertEqual(len(self.server.paths), 2)
+        time.sleep(0.35) # El segundo error duplica la espera (0.6s)
+        with self.assertRaisesRegex(PoolStatsError, "en espera tras 2 errores"):
+            client.get(WALLET).result(timeout=5)
+        self.assertEqual(len(self.server.paths), 2)
+
+        # Un acierto reinicia el contador de errores
+        time.sleep(0.3)
+        self.server.status = 200
+        self.assertEqual(client.get(WALLET).result(timeout=5)["stats"], STATS)
+        self.server.status = 500
+        with self.assertRaises(PoolStatsError):
+            client.get(WALLET, force=True).result(timeout=5)
+        self.assertIn("tras 1 errores", client.get(WALLET, force=True).result(timeout=5)["error"])
+
+    def test_retry_after_on_429(self):
+        client = self.client(ttl=60, backoff_initial=0.05, backoff_max=0.05)
+        self.server.status = 429
+        self.server.retry_after = 1
+        with self.assertRaisesRegex(PoolStatsError, "HTTP 429"):
+            client.get(WALLET).result(timeout=5)
+        time.sleep(0.2) # Pasó el backoff propio pero no el Retry-After del pool
+        with self.assertRaisesRegex(PoolStatsError, "en espera"):
+            client.get(WALLET).result(timeout=5)
+        self.assertEqual(len(self.server.paths), 1)
+
+        time.sleep(0.9)
+        self.server.status = 200
+        self.assertEqual(client.get(WALLET).result(timeout=5)["stats"], STATS)
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_stale_data_while_backing_off(self):
+        client = self.client(ttl=0.05, backoff_initial=5)
+        fresh = client.get(WALLET).result(timeout=5)
+        time.sleep(0.1)
+        self.server.status = 503
+        with self.assertRaises(PoolStatsError):
+            client.get(WALLET).result(timeout=5)
+
+        stale = client.get(WALLET).result(timeout=5)
+        self.assertEqual((stale["stats"], stale["fetched_at"]), (STATS, fresh["fetched_at"]))
+        self.assertTrue(stale["cached"])
+        self.assertIn("en espera", stale["error"])
+        self.assertEqual(len(self.server.paths), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
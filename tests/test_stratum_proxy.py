@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# tests/test_stratum_proxy.py
+#
+# P2P Miner GUI - Pruebas del proxy stratum local.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Levanta un pool stratum simulado (asyncio, 127.0.0.1) y dos mineros
+# simulados conectados al proxy. Comprueba que el proxy abre una sola sesión con el pool,
+# que reparte un byte de nonce distinto a cada minero, que rechaza localmente los nonces
+# fuera de rango o mal formados, que cada resultado de submit vuelve al minero que lo envió y que se
+# recupera cuando el pool corta la conexión.
+#
+# Uso: python -m pytest tests/test_stratum_proxy.py
+#
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import stratum_proxy
+from stratum_proxy import NICEHASH_NONCE_BYTE, StratumProxy
+
+TIMEOUT = 5
+BLOB = "0e" * 76 # Blob de 76 bytes como los de Monero
+
+
+class FakePool:
+    """Pool stratum mínimo: responde al login con un trabajo y acepta los shares devolviendo el nonce."""
+    def __init__(self):
+        self.server = None
+        self.port = None
+        self.logins = 0
+        self.submits = []
+        self.writers = []
+        self.hold = set() # Nonces que el pool no responde (shares pendientes al cortar)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop(self):
+        """Corta todas las conexiones abiertas, como un pool que se reinicia."""
+        for writer in self.writers:
+            writer.close()
+        self.writers.clear()
+
+    async def _handle(self, reader, writer):
+        self.writers.append(writer)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            params = message.get("params") or {}
+            if message["method"] == "login":
+                self.logins += 1
+                job = {"blob": BLOB, "job_id": f"job-{self.logins}", "target": "b88d0600", "algo": "rx/0"}
+                result = {"id": f"session-{self.logins}", "job": job, "status": "OK"}
+            elif message["method"] == "submit":
+                self.submits.append(params)
+                if params["nonce"] in self.hold:
+                    continue
+                result = {"status": "OK", "nonce": params["nonce"]}
+            else:
+                result = {"status": "KEEPALIVED"}
+            writer.write((json.dumps({"id": message["id"], "jsonrpc": "2.0", "error": None,
+                                      "result": result}) + "\n").encode())
+        writer.close()
+
+
+class FakeMiner:
+    """Cliente stratum como una instancia de XMRig: login, submits y notificaciones de trabajo."""
+    def __init__(self, port):
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.next_id = 1
+        self.jobs = []
+
+    async def connect(self, rig_id):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        reply = await self.request("login", {"login": "x", "pass": "x", "rigid": rig_id})
+        self.jobs.append(reply["result"]["job"])
+        return reply
+
+    def send(self, method, params):
+        request_id = self.next_id
+        self.next_id += 1
+        self.writer.write((json.dumps({"id": request_id, "jsonrpc": "2.0", "method": method,
+                                       "params": params}) + "\n").encode())
+        return request_id
+
+    async def reply_to(self, request_id):
+        while True:
+            message = json.loads(await asyncio.wait_for(self.reader.readline(), TIMEOUT))
+            if message.get("method") == "job":
+                self.jobs.append(message["params"])
+            elif message.get("id") == request_id:
+                return message
+
+    async def request(self, method, params):
+        return await self.reply_to(self.send(method, params))
+
+    async def next_job(self):
+        while True:
+            message = json.loads(await asyncio.wait_for(self.reader.readline(), TIMEOUT))
+            if message.get("method") == "job":
+                self.jobs.append(message["params"])
+                return message["params"]
+
+    def nonce(self, low=0):
+        """Nonce dentro del rango del minero: el byte alto es el fijado por el proxy en el blob."""
+        return f"{low:06x}" + self.jobs[-1]["blob"][NICEHASH_NONCE_BYTE * 2:NICEHASH_NONCE_BYTE * 2 + 2]
+
+    def close(self):
+        self.writer.close()
+
+
+async def wait_for(condition):
+    for _ in range(TIMEOUT * 50):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("la condición no se cumplió a tiempo")
+
+
+class StratumProxyTest(unittest.IsolatedAsyncioTestCase):
+    """Cada prueba arranca un pool simulado, el proxy y dos mineros ya conectados."""
+    async def asyncSetUp(self):
+        # Reconexión inmediata para que las pruebas de corte no esperen el backoff real
+        self._reconnect_initial = stratum_proxy.STRATUM_RECONNECT_INITIAL
+        stratum_proxy.STRATUM_RECONNECT_INITIAL = 0.05
+        self.pool = FakePool()
+        await self.pool.start()
+        self.proxy = StratumProxy(0, f"127.0.0.1:{self.pool.port}", "wallet", log=lambda text: None)
+        self.proxy.start()
+        proxy_port = self.proxy._server.sockets[0].getsockname()[1]
+        self.miners = [FakeMiner(proxy_port), FakeMiner(proxy_port)]
+        self.logins = [await miner.connect(f"rig{i}") for i, miner in enumerate(self.miners)]
+
+    async def asyncTearDown(self):
+        for miner in self.miners:
+            if miner.writer is not None:
+                miner.close()
+        self.proxy.stop()
+        await self.pool.stop()
+        stratum_proxy.STRATUM_RECONNECT_INITIAL = self._reconnect_initial
+
+    async def submit(self, miner, nonce, job_id="job-1"):
+        return await miner.request("submit", {"id": "x", "job_id": job_id, "nonce": nonce, "result": "00" * 32})
+
+    async def test_single_upstream_login(self):
+        for reply in self.logins:
+            self.assertIsNone(reply["error"])
+            self.assertIn("nicehash", reply["result"]["extensions"])
+        self.assertEqual(self.pool.logins, 1)
+        self.assertEqual(self.proxy.stats()["upstream_connects"], 1)
+
+    async def test_distinct_nonce_byte_per_miner(self):
+        # Mismo trabajo, pero con el byte 42 del blob distinto en cada minero
+        offset = NICEHASH_NONCE_BYTE * 2
+        blobs = [miner.jobs[-1]["blob"] for miner in self.miners]
+        self.assertNotEqual(blobs[0][offset:offset + 2], blobs[1][offset:offset + 2])
+        for blob in blobs:
+            self.assertEqual(len(blob), len(BLOB))
+            self.assertEqual(blob[:offset] + blob[offset + 2:], BLOB[:offset] + BLOB[offset + 2:])
+
+    async def test_foreign_nonce_rejected_locally(self):
+        # Un nonce con el byte alto de otro minero se rechaza sin llegar al pool
+        reply = await self.submit(self.miners[0], self.miners[1].nonce())
+        self.assertEqual(reply["error"]["message"], "Nonce fuera del rango asignado")
+        self.assertEqual(self.pool.submits, [])
+        self.assertEqual(self.proxy.stats()["local_rejects"], 1)
+
+    async def test_malformed_nonce_rejected(self):
+        # Un nonce que no es hexadecimal se responde con un error y el minero sigue conectado
+        for nonce in ("zzzzzz00", "0x000000", "0000 +00", "00000"):
+            reply = await self.submit(self.miners[0], nonce)
+            self.assertEqual(reply["error"]["message"], "Nonce inválido")
+        self.assertEqual(self.pool.submits, [])
+        nonce = self.miners[0].nonce(3)
+        self.assertEqual((await self.submit(self.miners[0], nonce))["result"]["nonce"], nonce)
+
+    async def test_submit_results_routed_to_sender(self):
+        # Submits simultáneos: cada resultado vuelve al minero que lo envió
+        nonces = [miner.nonce(7) for miner in self.miners]
+        ids = [miner.send("submit", {"id": "x", "job_id": "job-1", "nonce": nonce, "result": "00" * 32})
+               for miner, nonce in zip(self.miners, nonces)]
+        for miner, request_id, nonce in zip(self.miners, ids, nonces):
+            reply = await miner.reply_to(request_id)
+            self.assertIsNone(reply["error"])
+            self.assertEqual(reply["result"]["nonce"], nonce)
+        self.assertEqual({submit["id"] for submit in self.pool.submits}, {"session-1"})
+        self.assertEqual(self.proxy.stats()["accepted"], 2)
+
+    async def test_pending_share_failed_on_pool_drop(self):
+        # El pool corta con un share sin responder: el minero recibe el rechazo
+        held = self.miners[0].nonce(9)
+        self.pool.hold.add(held)
+        request_id = self.miners[0].send("submit", {"id": "x", "job_id": "job-1", "nonce": held,
+                                                    "result": "00" * 32})
+        await wait_for(lambda: any(submit["nonce"] == held for submit in self.pool.submits))
+        self.pool.drop()
+        reply = await self.miners[0].reply_to(request_id)
+        self.assertEqual(reply["error"]["message"], "Conexión con el pool perdida")
+
+    async def test_reconnects_after_pool_drop(self):
+        # El proxy vuelve a iniciar sesión y reparte el trabajo nuevo a todos los mineros
+        self.pool.drop()
+        for miner in self.miners:
+            job = await miner.next_job()
+            self.assertEqual(job["job_id"], "job-2")
+        self.assertEqual(self.pool.logins, 2)
+
+        # Los shares vuelven a llegar al pool con la sesión nueva
+        nonce = self.miners[1].nonce(11)
+        reply = await self.submit(self.miners[1], nonce, "job-2")
+        self.assertEqual(reply["result"]["nonce"], nonce)
+        self.assertEqual(self.pool.submits[-1]["id"], "session-2")
+
+
+if __name__ == "__main__":
+    unittest.main()
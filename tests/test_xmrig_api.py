@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# tests/test_xmrig_api.py
+#
+# P2P Miner GUI - Pruebas del cliente de la API HTTP de XMRig.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Sirve un /2/summary fijo desde un http.server local que exige el token
+# Bearer, como XMRig con --http-access-token. Comprueba la autenticación, los campos que
+# extrae parse_xmrig_summary y que el nodo vuelve a leer el hashrate de la consola de
+# XMRig cuando la API deja de responder.
+#
+# Uso: python -m pytest tests/test_xmrig_api.py
+#
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import p2p_miner_node
+from p2p_miner_node import P2PNode, XmrigApiClient, parse_xmrig_summary
+
+TOKEN = "secreto"
+SUMMARY = {
+    "version": "6.21.0",
+    "algo": "rx/0",
+    "uptime": 3605,
+    "hashrate": {"total": [1523.4, 1519.8, None], "highest": 1530.2},
+    "results": {"shares_good": 41, "shares_total": 43},
+    "connection": {"pool": "pool.supportxmr.com:443", "uptime": 3600, "ping": 35, "failures": 1},
+}
+
+
+class FakeXmrigApi(ThreadingHTTPServer):
+    """API de XMRig simulada: /2/summary con token Bearer; `failing` la hace responder 500."""
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeXmrigHandler)
+        self.failing = False
+        self.requests = [] # (ruta, cabecera Authorization)
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeXmrigHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        authorization = self.headers.get("Authorization")
+        self.server.requests.append((self.path, authorization))
+        if authorization != f"Bearer {TOKEN}":
+            self._send(401, {"error": "unauthorized"})
+        elif self.server.failing:
+            self._send(500, {"error": "internal"})
+        elif self.path == "/2/summary":
+            self._send(200, SUMMARY)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProcess:
+    """Proceso de XMRig vivo para _poll_xmrig_api."""
+    def poll(self):
+        return None
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("la condición no se cumplió a tiempo")
+        time.sleep(0.01)
+
+
+class XmrigApiClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeXmrigApi()
+        self.addCleanup(self.server.close)
+
+    def test_token_auth(self):
+        summary = XmrigApiClient(self.server.port, TOKEN).summary()
+        self.assertEqual(summary["version"], "6.21.0")
+        self.assertEqual(self.server.requests[-1], ("/2/summary", f"Bearer {TOKEN}"))
+
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            XmrigApiClient(self.server.port, "otro").summary()
+        self.assertEqual(error.exception.code, 401)
+        with self.assertRaises(urllib.error.HTTPError):
+            XmrigApiClient(self.server.port).summary()
+        self.assertIsNone(self.server.requests[-1][1]) # Sin token no se envía la cabecera
+
+    def test_parse_summary(self):
+        stats = parse_xmrig_summary(XmrigApiClient(self.server.port, TOKEN).summary())
+        self.assertEqual((stats["hashrate_10s"], stats["hashrate_60s"], stats["hashrate_15m"]),
+                         (1523.4, 1519.8, None))
+        self.assertEqual(stats["hashrate_max"], 1530.2)
+        self.assertEqual((stats["shares_good"], stats["shares_total"], stats["shares_rejected"]), (41, 43, 2))
+        self.assertEqual((stats["uptime"], stats["pool_uptime"]), (3605, 3600))
+        self.assertEqual((stats["pool"], stats["pool_ping"], stats["pool_failures"]),
+                         ("pool.supportxmr.com:443", 35, 1))
+        self.assertEqual(stats["algo"], "rx/0")
+
+    def test_parse_partial_summary(self):
+        # Un XMRig recién iniciado todavía no informa hashrate ni conexión
+        stats = parse_xmrig_summary({"uptime": 1})
+        self.assertEqual((stats["hashrate_10s"], stats["hashrate_60s"], stats["hashrate_15m"]), (None, None, None))
+        self.assertEqual((stats["shares_rejected"], stats["pool"]), (0, ""))
+
+    def test_fallback_to_console(self):
+        node = P2PNode(0, "wallet", autostart_xmrig=False, xmrig_api_port=self.server.port)
+        node.xmrig_api.access_token = TOKEN
+        node.running = True
+        line = "[2025-01-01 00:00:00.000]  miner    speed current 880.5 H/s; 10s/60s/15m 880.5 870.1 n/a H/s\n"
+        with mock.patch.object(p2p_miner_node, "XMRIG_API_POLL_INTERVAL", 0.02), \
+                mock.patch("sys.stdout"):
+            node.xmrig_process = FakeProcess()
+            poller = threading.Thread(target=node._poll_xmrig_api, args=(node.xmrig_process,), daemon=True)
+            poller.start()
+            try:
+                # Con la API disponible el hashrate sale del resumen y la consola se ignora
+                wait_for(lambda: node.xmrig_api_ok)
+                self.assertEqual(node.xmrig_stats["hashrate_10s"], 1523.4)
+                self.assertIn("1523.4", node.current_hashrate)
+                node._handle_xmrig_line(line)
+                self.assertIn("1523.4", node.current_hashrate)
+
+                # La API falla: se vuelve al parseo de la salida de consola
+                self.server.failing = True
+                wait_for(lambda: not node.xmrig_api_ok)
+                node._handle_xmrig_line(line)
+                self.assertIn("880.5", node.current_hashrate)
+
+                # Y cuando se recupera, los datos vuelven a llegar por HTTP
+                self.server.failing = False
+                wait_for(lambda: node.xmrig_api_ok)
+            finally:
+                node._xmrig_api_stop.set()
+                poller.join(timeout=5)
+
+    def test_old_poller_keeps_new_state(self):
+        # Reinicio (gobernador o supervisor): el poller del proceso anterior termina después de
+        # que el del nuevo ya vio la API; no debe volver a la salida de consola
+        node = P2PNode(0, "wallet", autostart_xmrig=False, xmrig_api_port=self.server.port)
+        node.xmrig_api.access_token = TOKEN
+        node.running = True
+        with mock.patch.object(p2p_miner_node, "XMRIG_API_POLL_INTERVAL", 0.02), \
+                mock.patch("sys.stdout"):
+            old = node.xmrig_process = FakeProcess()
+            poller = threading.Thread(target=node._poll_xmrig_api, args=(old,), daemon=True)
+            poller.start()
+            wait_for(lambda: node.xmrig_api_ok)
+            node.xmrig_process = FakeProcess()
+            poller.join(timeout=5)
+            self.assertFalse(poller.is_alive())
+            self.assertTrue(node.xmrig_api_ok)
+
+            # El poller del proceso actual sí lo desactiva al terminar
+            current = threading.Thread(target=node._poll_xmrig_api, args=(node.xmrig_process,), daemon=True)
+            current.start()
+            node._xmrig_api_stop.set()
+            current.join(timeout=5)
+            self.assertFalse(node.xmrig_api_ok)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# tests/test_xmrig_governor.py
+#
+# P2P Miner GUI - Pruebas del gobernador de carga sobre el XMRig del nodo.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Lanza el XMRig simulado de benchmarks/fake_xmrig.py desde un nodo con el
+# gobernador en el nivel de pausa y comprueba que, si el proceso pausado se cae, el XMRig
+# que relanza el supervisor también queda en pausa.
+#
+# Uso: python -m pytest tests/test_xmrig_governor.py
+#
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import psutil
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import p2p_miner_node
+from mining_governor import GOVERNOR_LEVEL_NAMES, load_governor_policy
+from p2p_miner_node import P2PNode
+
+FAKE_XMRIG = os.path.join(BASE_DIR, "benchmarks", "fake_xmrig.py")
+
+
+def is_suspended(process, timeout=2):
+    """SIGSTOP es asíncrono: se espera un poco a que el proceso figure detenido."""
+    deadline = time.monotonic() + timeout
+    while psutil.Process(process.pid).status() != psutil.STATUS_STOPPED:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@unittest.skipIf(os.name == "nt", "la pausa por señal (SIGSTOP) es solo de POSIX")
+class GovernorRestartTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        xmrig = os.path.join(directory.name, "xmrig")
+        with open(xmrig, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_XMRIG}" "$@"\n')
+        os.chmod(xmrig, 0o755)
+        patches = [mock.patch.object(p2p_miner_node, "XMRIG_PATH", xmrig), mock.patch("sys.stdout")]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        # Sin API de XMRig (xmrig_api_port=0): la pausa va por señal
+        self.node = P2PNode(0, "wallet", autostart_xmrig=False, xmrig_api_port=0,
+                            governor_policy=load_governor_policy())
+        self.node.running = True
+        self.node.governor.level = GOVERNOR_LEVEL_NAMES.index("paused")
+        self.addCleanup(self.node.stop_xmrig)
+
+    def test_restart_after_crash_while_paused(self):
+        self.assertTrue(self.node.start_xmrig())
+        first = self.node.xmrig_process
+        self.assertEqual(self.node.xmrig_paused_by, "signal")
+        self.assertTrue(is_suspended(first))
+
+        # Se cae el proceso pausado: el supervisor lo detecta y programa el reinicio
+        first.kill()
+        first.wait(timeout=5)
+        self.node._xmrig_watchdog()
+        self.assertEqual(self.node.xmrig_supervisor.state, "restarting")
+        self.assertIsNone(self.node.xmrig_paused_by)
+
+        # El XMRig relanzado arranca con la pausa del nivel actual, no minando a pleno
+        self.node._restart_xmrig()
+        second = self.node.xmrig_process
+        self.assertIsNot(second, first)
+        self.assertEqual(self.node.xmrig_paused_by, "signal")
+        self.assertTrue(is_suspended(second))
+        self.assertTrue(self.node.xmrig_supervisor.paused)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# tests/test_xmrig_tuner.py
+#
+# P2P Miner GUI - Pruebas del auto-ajuste de XMRig.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Comprueba la lectura del hashrate de `xmrig --bench` (línea final y, si la
+# corrida se cortó, la última línea 'speed'), que autotune elige la mejor corrida con un
+# XMRig simulado cuyo hashrate depende de la configuración, y el caché por huella de CPU.
+#
+# Uso: python -m pytest tests/test_xmrig_tuner.py
+#
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from xmrig_tuner import (TUNING_LOCK_STALE, TuningCache, autotune, cpu_fingerprint, parse_bench_output,
+                         run_benchmark, tuning_args)
+
+# XMRig simulado para --bench: el hashrate es máximo con FAKE_BENCH_BEST_THREADS hilos, la
+# mitad en modo 'light' y un 20% menor sin huge pages. FAKE_BENCH_CRASH corta la corrida
+# antes de la línea final.
+FAKE_BENCH = """\
+import os, sys
+args = sys.argv[1:]
+option = lambda name, default: next((a.split("=", 1)[1] for a in args if a.startswith(name + "=")), default)
+threads = int(option("--threads", "1"))
+best = int(os.environ.get("FAKE_BENCH_BEST_THREADS", threads))
+useful = threads if threads <= best else best - (threads - best) / 2
+hashrate = float(os.environ.get("FAKE_BENCH_HASHRATE", "1000")) * max(useful, 0) / best
+hashrate *= 0.5 if option("--randomx-mode", "fast") == "light" else 1
+hashrate *= 0.8 if "--no-huge-pages" in args else 1
+print(f"[2025-01-01 00:00:10.000]  miner    speed 10s/60s/15m {hashrate:.1f} n/a n/a H/s max {hashrate:.1f} H/s")
+if os.environ.get("FAKE_BENCH_CRASH"):
+    sys.exit(1)
+print(f"[2025-01-01 00:00:20.000]  bench    benchmark finished in 20.000 seconds ({hashrate:.1f} h/s) hash sum = 0")
+"""
+
+BENCH_OUTPUT = """\
+[2025-01-01 00:00:00.000]  bench    start benchmark hashes 1M
+[2025-01-01 00:00:10.000]  miner    speed 10s/60s/15m 4102.3 n/a n/a H/s max 4110.0 H/s
+[2025-01-01 00:00:20.000]  miner    speed 10s/60s/15m 4188.9 4150.2 n/a H/s max 4190.0 H/s
+[2025-01-01 00:00:23.880]  bench    benchmark finished in 23.880 seconds (41876.5 h/s) hash sum = DA1CD2F7ED2E0305
+"""
+
+
+class ParseBenchOutputTest(unittest.TestCase):
+    def test_finished_line(self):
+        self.assertEqual(parse_bench_output(BENCH_OUTPUT), 41876.5)
+
+    def test_speed_line_fallback(self):
+        # Corrida cortada antes de terminar: vale el último 'speed' informado
+        interrupted = "\n".join(BENCH_OUTPUT.splitlines()[:3])
+        self.assertEqual(parse_bench_output(interrupted), 4188.9)
+
+    def test_no_result(self):
+        self.assertIsNone(parse_bench_output(""))
+        self.assertIsNone(parse_bench_output("[2025-01-01]  miner    speed 10s/60s/15m n/a n/a n/a H/s max n/a H/s"))
+
+
+@unittest.skipIf(os.name == "nt", "el XMRig simulado es un script con shebang")
+class AutotuneTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.xmrig = os.path.join(self.directory, "xmrig")
+        with open(self.xmrig, "w") as f:
+            f.write(f"#!{sys.executable}\n{FAKE_BENCH}")
+        os.chmod(self.xmrig, 0o755)
+        self.log = []
+
+    def tearDown(self):
+        os.unlink(self.xmrig)
+        os.rmdir(self.directory)
+
+    def test_picks_best_run(self):
+        with mock.patch.dict(os.environ, {"FAKE_BENCH_HASHRATE": "1500", "FAKE_BENCH_BEST_THREADS": "3"}):
+            best, results = autotune(self.xmrig, 4, log=self.log.append)
+        # Hilos 4, 3 y 2 por cada combinación de modo de RandomX y huge pages
+        self.assertEqual(len(results), 12)
+        self.assertEqual(len(self.log), 12)
+        self.assertTrue(all(result["error"] is None for result in results))
+        self.assertEqual(best["config"], {"threads": 3, "huge_pages": True, "randomx_mode": "fast"})
+        self.assertEqual(best["hashrate"], 1500.0)
+        self.assertEqual(max(result["hashrate"] for result in results), best["hashrate"])
+
+    def test_interrupted_runs_use_speed_line(self):
+        grid = [{"threads": 2, "huge_pages": True, "randomx_mode": "fast"}]
+        with mock.patch.dict(os.environ, {"FAKE_BENCH_HASHRATE": "1000", "FAKE_BENCH_BEST_THREADS": "2",
+                                          "FAKE_BENCH_CRASH": "1"}):
+            best, results = autotune(self.xmrig, 2, grid=grid, log=self.log.append)
+        self.assertEqual(best["hashrate"], 1000.0)
+
+    def test_no_valid_runs(self):
+        best, results = autotune(os.path.join(self.directory, "no-existe"), 2, log=self.log.append)
+        self.assertIsNone(best)
+        self.assertTrue(results and all(result["hashrate"] is None for result in results))
+        self.assertTrue(all(result["error"] for result in results))
+
+    def test_run_benchmark_args(self):
+        config = {"threads": 2, "huge_pages": False, "randomx_mode": "light"}
+        self.assertEqual(tuning_args(config), ["--threads=2", "--randomx-mode=light", "--no-huge-pages"])
+        with mock.patch.dict(os.environ, {"FAKE_BENCH_HASHRATE": "1000", "FAKE_BENCH_BEST_THREADS": "2"}):
+            hashrate, seconds, error = run_benchmark(self.xmrig, config)
+        self.assertEqual((hashrate, error), (1000.0 * 0.5 * 0.8, None))
+
+
+class TuningCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "xmrig_tuning.json")
+        self.cache = TuningCache(self.path)
+
+    def result(self, threads, hashrate):
+        return {"config": {"threads": threads, "huge_pages": True, "randomx_mode": "fast"},
+                "hashrate": hashrate, "seconds": 1.0, "error": None}
+
+    def test_store_and_load_by_fingerprint(self):
+        small, large = cpu_fingerprint(2), cpu_fingerprint(8)
+        self.assertIn("|2c|", small["key"])
+        best = self.result(2, 900.0)
+        entry = self.cache.store_result(small, best, [best, self.result(1, 500.0)], "1M")
+        self.cache.store_result(large, self.result(8, 3000.0), [], "10M")
+
+        self.assertEqual(self.cache.get(small["key"]), entry)
+        self.assertEqual(entry["config"], best["config"])
+        self.assertEqual((entry["hashrate"], entry["bench"], len(entry["results"])), (900.0, "1M", 2))
+        self.assertNotIn("key", entry["fingerprint"])
+        self.assertEqual(self.cache.get(large["key"])["hashrate"], 3000.0)
+        self.assertIsNone(self.cache.get("otra cpu"))
+        # Solo queda el caché: ni temporales ni el lock
+        self.assertEqual(os.listdir(self.directory.name), ["xmrig_tuning.json"])
+
+    def test_corrupt_cache(self):
+        with open(self.path, "w") as f:
+            f.write("{no es json")
+        self.assertEqual(self.cache.load(), {})
+        self.cache.put("cpu", {"hashrate": 1.0})
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"cpu": {"hashrate": 1.0}})
+
+    def test_lock_held_by_other_process(self):
+        with open(f"{self.path}.lock", "w") as f:
+            f.write("1")
+        with self.assertRaises(TimeoutError):
+            with self.cache._locked(timeout=0.1):
+                pass
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_lock_is_discarded(self):
+        lock_path = f"{self.path}.lock"
+        with open(lock_path, "w") as f:
+            f.write("1")
+        old = time.time() - TUNING_LOCK_STALE - 1
+        os.utime(lock_path, (old, old))
+        self.cache.put("cpu", {"hashrate": 1.0})
+        self.assertEqual(self.cache.get("cpu"), {"hashrate": 1.0})
+        self.assertFalse(os.path.exists(lock_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# xmrig_supervisor.py
+#
+# P2P Miner GUI - Supervisión de XMRig dentro del nodo.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Decide cuándo reiniciar XMRig. El nodo le avisa cuándo lo inicia o lo detiene
+# a pedido y cada actividad (hashrate o shares nuevos); en cada revisión periódica le pregunta
+# si el proceso terminó solo o si se colgó (sin actividad durante `stall_timeout`). Cada falla
+# se reintenta con espera exponencial; demasiadas fallas en poco tiempo (crash loop) hacen que
+# se rinda hasta el próximo inicio manual. Registra el historial de reinicios y el tiempo sin
+# minar por fallas, que el nodo informa en la respuesta de pool info.
+#
+
+import time
+from collections import deque
+
+XMRIG_WATCHDOG_INTERVAL = 2 # Segundos entre revisiones del proceso de XMRig
+XMRIG_STALL_TIMEOUT = 300 # Segundos sin hashrate ni shares para considerarlo colgado (XMRig informa cada 60s)
+XMRIG_RESTART_BACKOFF_INITIAL = 5 # Espera antes del primer reinicio (se duplica en cada falla seguida)
+XMRIG_RESTART_BACKOFF_MAX = 300
+XMRIG_RESTART_RESET_AFTER = 300 # Una ejecución más larga que esto vuelve la espera al valor inicial
+XMRIG_CRASH_LOOP_LIMIT = 5 # Fallas dentro de XMRIG_CRASH_LOOP_WINDOW tras las que se deja de reiniciar
+XMRIG_CRASH_LOOP_WINDOW = 600
+XMRIG_RESTART_HISTORY = 20 # Fallas recordadas
+
+# Estados
+SUPERVISOR_STOPPED = "stopped" # Detenido a pedido (o nunca iniciado): no se supervisa
+SUPERVISOR_RUNNING = "running"
+SUPERVISOR_RESTARTING = "restarting" # Esperando el reinicio
+SUPERVISOR_GAVE_UP = "gave_up" # Crash loop: se espera un inicio manual
+
+# Motivos de falla
+FAILURE_EXIT = "exit" # El proceso terminó solo
+FAILURE_STALL = "stall" # Sigue vivo pero sin actividad
+FAILURE_START = "start_failed" # No se pudo lanzar
+
+FAILURE_TEXTS = {
+    FAILURE_EXIT: "terminó inesperadamente",
+    FAILURE_STALL: "sin actividad",
+    FAILURE_START: "no se pudo iniciar",
+}
+
+
+class XmrigSupervisor:
+    """
+    Estado de la supervisión de un XMRig. No toca el proceso: el nodo llama a started(),
+    stopped() y activity(), revisa con check() y, ante una falla, failure() le devuelve la
+    espera antes de reiniciar o None si se alcanzó el límite de crash loop.
+    """
+    def __init__(self, stall_timeout=XMRIG_STALL_TIMEOUT, backoff_initial=XMRIG_RESTART_BACKOFF_INITIAL,
+                 backoff_max=XMRIG_RESTART_BACKOFF_MAX, reset_after=XMRIG_RESTART_RESET_AFTER,
+                 crash_loop_limit=XMRIG_CRASH_LOOP_LIMIT, crash_loop_window=XMRIG_CRASH_LOOP_WINDOW):
+        self.stall_timeout = stall_timeout # 0 o None desactiva la detección de cuelgues
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.reset_after = reset_after
+        self.crash_loop_limit = crash_loop_limit
+        self.crash_loop_window = crash_loop_window
+        self.state = SUPERVISOR_STOPPED
+        self.started_at = None
+        self.last_activity = None
+        self.consecutive_failures = 0
+        self.restarts = 0
+        self.failures = 0
+        self.lost_time = 0.0 # Segundos sin minar por fallas (hasta el reinicio siguiente)
+        self.down_since = None # Inicio del período sin minar en curso
+        self.paused = False # En pausa a propósito (gobernador): sin actividad no es un cuelgue
+        self.history = deque(maxlen=XMRIG_RESTART_HISTORY)
+        self._recent_failures = deque()
+
+    def _end_downtime(self, now):
+        if self.down_since is not None:
+            self.lost_time += max(now - self.down_since, 0.0)
+            self.down_since = None
+
+    def started(self, now=None):
+        """XMRig se lanzó (a pedido o por un reinicio)."""
+        now = time.time() if now is None else now
+        if self.state == SUPERVISOR_GAVE_UP: # Inicio manual después de un crash loop: se empieza de cero
+            self.consecutive_failures = 0
+            self._recent_failures.clear()
+        self._end_downtime(now)
+        self.state = SUPERVISOR_RUNNING
+        self.paused = False
+        self.started_at = self.last_activity = now
+
+    def stopped(self, now=None):
+        """XMRig se detuvo a pedido: se deja de supervisar (y de contar tiempo perdido)."""
+        self._end_downtime(time.time() if now is None else now)
+        self.state = SUPERVISOR_STOPPED
+        self.paused = False
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self, now=None):
+        """Fin de una pausa: el plazo sin actividad vuelve a contar desde ahora."""
+        self.paused = False
+        self.activity(now)
+
+    def activity(self, now=None):
+        self.last_activity = time.time() if now is None else now
+
+    def check(self, alive, now=None):
+        """Motivo de falla del XMRig supervisado (FAILURE_EXIT o FAILURE_STALL) o None si está bien."""
+        if self.state != SUPERVISOR_RUNNING:
+            return None
+        if not alive:
+            return FAILURE_EXIT
+        now = time.time() if now is None else now
+        if self.stall_timeout and not self.paused and now - self.last_activity >= self.stall_timeout:
+            return FAILURE_STALL
+        return None
+
+    def failure(self, reason, returncode=None, now=None):
+        """Registra una falla. Devuelve los segundos de espera antes de reiniciar o None si se rinde."""
+        now = time.time() if now is None else now
+        uptime = now - self.started_at if self.started_at is not None and reason != FAILURE_START else 0.0
+        if self.down_since is None:
+            # Un cuelgue dejó de minar en la última actividad; una salida, ahora
+            self.down_since = self.last_activity if reason == FAILURE_STALL and self.last_activity else now
+        if uptime >= self.reset_after:
+            self.consecutive_failures = 0
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._recent_failures.append(now)
+        while self._recent_failures and self._recent_failures[0] <= now - self.crash_loop_window:
+            self._recent_failures.popleft()
+        if len(self._recent_failures) >= self.crash_loop_limit:
+            self.state = SUPERVISOR_GAVE_UP
+            delay = None
+        else:
+            self.state = SUPERVISOR_RESTARTING
+            delay = min(self.backoff_initial * 2 ** (self.consecutive_failures - 1), self.backoff_max)
+        self.history.append({"time": now, "reason": reason, "returncode": returncode,
+                             "uptime": round(uptime, 1), "delay": delay})
+        return delay
+
+    def restarting(self):
+        """True mientras haya un reinicio pendiente (un stop manual lo cancela)."""
+        return self.state == SUPERVISOR_RESTARTING
+
+    def restarted(self):
+        self.restarts += 1
+
+    def current_lost_time(self, now=None):
+        now = time.time() if now is None else now
+        return self.lost_time + (max(now - self.down_since, 0.0) if self.down_since is not None else 0.0)
+
+    def stats(self, now=None):
+        """Resumen para pool info, el canal de control y las métricas."""
+        now = time.time() if now is None else now
+        return {
+            "state": self.state,
+            "restarts": self.restarts,
+            "failures": self.failures,
+            "lost_time": round(self.current_lost_time(now), 1),
+            "uptime": round(now - self.started_at, 1) if self.state == SUPERVISOR_RUNNING else None,
+            "last_failure": dict(self.history[-1]) if self.history else None,
+        }
+
+
+def format_failure(entry):
+    """Una línea del historial de fallas."""
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+    text = f"{when} {FAILURE_TEXTS.get(entry['reason'], entry['reason'])}"
+    if entry.get("returncode") is not None:
+        text += f" (código {entry['returncode']})"
+    text += f" tras {entry['uptime']:.0f}s"
+    text += f", reinicio en {entry['delay']:.0f}s" if entry.get("delay") is not None else ", sin reinicio (crash loop)"
+    return text
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+# xmrig_tuner.py
+#
+# P2P Miner GUI - Auto-ajuste de XMRig con su modo de benchmark.
+# Copyright (c) 2025 Marcelo Tonini - Mendoza, Argentina
+# Licencia: MIT
+#
+# Descripción: Ejecuta `xmrig --bench` sobre una grilla de configuraciones (cantidad de
+# hilos, huge pages y modo de RandomX), lee el hashrate de cada corrida y guarda la mejor
+# en un caché JSON indexado por la huella de la CPU (modelo, núcleos y memoria). El nodo
+# carga ese resultado en cada start_xmrig.
+#
+# Uso: python xmrig_tuner.py <ruta a xmrig> [--bench 1M] [--threads 8] [--cache xmrig_tuning.json]
+#
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import subprocess
+import tempfile
+import time
+
+try:
+    import psutil
+except ImportError: # psutil es opcional: sin él la memoria se lee con os.sysconf
+    psutil = None
+
+TUNING_BENCH_SIZES = ("1M", "10M") # Tamaños de benchmark que acepta XMRig (--bench)
+TUNING_RANDOMX_MODES = ("fast", "light")
+TUNING_HUGE_PAGES = (True, False)
+TUNING_RUN_TIMEOUT = 900 # Segundos máximos por corrida de benchmark
+TUNING_LOCK_TIMEOUT = 10 # Segundos máximos esperando el lock del caché
+TUNING_LOCK_STALE = 60 # Un lock más viejo que esto quedó de un proceso caído y se descarta
+
+# "[fecha] bench    benchmark finished in 23.880 seconds (41876.5 h/s) hash sum = ..."
+BENCH_FINISHED_RE = re.compile(r"benchmark finished in\s+([\d.]+)\s+seconds\s+\(([\d.]+)\s*h/s\)", re.IGNORECASE)
+SPEED_RE = re.compile(r"speed\s+10s/60s/15m\s+([\d.]+)")
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine() or "desconocido"
+
+
+def _total_memory():
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+def cpu_fingerprint(cores=None):
+    """
+    Huella de la CPU para el caché: modelo, núcleos disponibles para la instancia y memoria
+    total (en GiB). `cores` permite usar los núcleos de una parte del plan de CPU.
+    """
+    fingerprint = {
+        "model": _cpu_model(),
+        "cores": cores or os.cpu_count() or 1,
+        "memory_gib": round(_total_memory() / 1024 ** 3),
+    }
+    fingerprint["key"] = f"{fingerprint['model']}|{fingerprint['cores']}c|{fingerprint['memory_gib']}GiB"
+    return fingerprint
+
+
+def tuning_grid(max_threads, randomx_modes=TUNING_RANDOMX_MODES, huge_pages=TUNING_HUGE_PAGES):
+    """Configuraciones a probar: algunos conteos de hilos por cada modo de RandomX y huge pages."""
+    thread_counts = sorted({max_threads, max_threads - 1, max_threads * 3 // 4, max_threads // 2} - {0},
+                           reverse=True)
+    thread_counts = [n for n in thread_counts if n >= 1]
+    return [{"threads": threads, "huge_pages": pages, "randomx_mode": mode}
+            for mode in randomx_modes for pages in huge_pages for threads in thread_counts]
+
+
+def tuning_args(config):
+    """Argumentos de XMRig para una configuración de la grilla."""
+    args = [f"--threads={config['threads']}", f"--randomx-mode={config['randomx_mode']}"]
+    if not config["huge_pages"]:
+        args.append("--no-huge-pages")
+    return args
+
+
+def parse_bench_output(output):
+    """
+    Hashrate (H/s) de una corrida de `xmrig --bench`: el de la línea final 'benchmark finished',
+    o el último 'speed' informado si la corrida se cortó antes.
+    """
+    finished = BENCH_FINISHED_RE.findall(output)
+    if finished:
+        return float(finished[-1][1])
+    speeds = SPEED_RE.findall(output)
+    return float(speeds[-1]) if speeds else None
+
+
+def run_benchmark(xmrig_path, config, extra_args=(), bench="1M", timeout=TUNING_RUN_TIMEOUT):
+    """Ejecuta una corrida de benchmark y devuelve (hashrate o None, segundos, error o None)."""
+    command = [xmrig_path, f"--bench={bench}", "--no-color"] + list(extra_args) + tuning_args(config)
+    start = time.monotonic()
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, time.monotonic() - start, f"superó {timeout}s"
+    except OSError as e:
+        return None, time.monotonic() - start, str(e)
+    hashrate = parse_bench_output(result.stdout)
+    error = None if hashrate is not None else f"sin resultado (código {result.returncode})"
+    return hashrate, time.monotonic() - start, error
+
+
+def autotune(xmrig_path, max_threads, extra_args=(), bench="1M", grid=None, log=print,
+             timeout=TUNING_RUN_TIMEOUT):
+    """
+    Prueba la grilla completa y devuelve (mejor resultado o None, lista de resultados). Cada
+    resultado es {"config", "hashrate", "seconds", "error"}.
+    """
+    grid = grid or tuning_grid(max_threads)
+    results = []
+    for i, config in enumerate(grid, 1):
+        hashrate, seconds, error = run_benchmark(xmrig_path, config, extra_args, bench, timeout)
+        results.append({"config": config, "hashrate": hashrate, "seconds": round(seconds, 1), "error": error})
+        status = f"{hashrate:.1f} H/s" if hashrate is not None else f"error: {error}"
+        log(f"Auto-ajuste {i}/{len(grid)}: {' '.join(tuning_args(config))} -> {status} ({seconds:.1f}s)")
+    valid = [r for r in results if r["hashrate"] is not None]
+    best = max(valid, key=lambda r: r["hashrate"]) if valid else None
+    return best, results
+
+
+class TuningCache:
+    """Caché JSON de configuraciones auto-ajustadas, una entrada por huella de CPU."""
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        return self.load().get(key)
+
+    @contextlib.contextmanager
+    def _locked(self, timeout=TUNING_LOCK_TIMEOUT):
+        """
+        Lock entre procesos (varios nodos comparten el caché) con un archivo creado en
+        exclusiva, que funciona igual en Linux y en Windows.
+        """
+        lock_path = f"{self.path}.lock"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > TUNING_LOCK_STALE:
+                        os.unlink(lock_path)
+                        continue
+                except OSError:
+                    continue # Otro proceso lo liberó mientras tanto
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"el caché {self.path} sigue bloqueado por otro proceso ({lock_path})")
+                time.sleep(0.05)
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            yield
+        finally:
+            os.unlink(lock_path)
+
+    def put(self, key, entry):
+        # Leer, combinar y escribir bajo el lock: dos nodos que terminan a la vez no pisan sus entradas
+        with self._locked():
+            data = self.load()
+            data[key] = entry
+            # Escritura atómica con un temporal único: un nodo leyendo el caché nunca ve un archivo a medio escribir
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                            dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def store_result(self, fingerprint, best, results, bench):
+        entry = {
+            "fingerprint": {k: v for k, v in fingerprint.items() if k != "key"},
+            "config": best["config"],
+            "hashrate": best["hashrate"],
+            "bench": bench,
+            "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "results": results,
+        }
+        self.put(fingerprint["key"], entry)
+        return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-ajuste de XMRig con --bench sobre una grilla de configuraciones.")
+    parser.add_argument("xmrig_path")
+    parser.add_argument("--bench", choices=TUNING_BENCH_SIZES, default="1M")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Máximo de hilos a probar")
+    parser.add_argument("--cache", default="xmrig_tuning.json")
+    args = parser.parse_args()
+
+    fingerprint = cpu_fingerprint(args.threads)
+    best, results = autotune(args.xmrig_path, args.threads, bench=args.bench)
+    if best is None:
+        print("Ninguna corrida de benchmark terminó correctamente.")
+        return
+    TuningCache(args.cache).store_result(fingerprint, best, results, args.bench)
+    print(f"Mejor configuración para {fingerprint['key']}: {' '.join(tuning_args(best['config']))} "
+          f"({best['hashrate']:.1f} H/s)")
+
+
+if __name__ == "__main__":
+    main()